@@ -1,7 +1,7 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count, Sum
+from django.db.models import Count, Sum, Q
 from datetime import datetime, timedelta
 from core.custom_permission import*
 from students.models import*
@@ -12,6 +12,12 @@ from fees.models import*
 from library.models import*
 from users.models import*
 from examinations.models import*
+from fees.payment_service import PaymentError, record_payment
+from fees.defaulters_service import (
+    UNPAID_STATUSES, DEFAULT_PAGE_SIZE, overdue_invoices, defaulters_queryset, bucket_summary, paginate
+)
+from fees.fact_service import ROLLUP_PERIODS, fact_queryset, rollup
+from api.query_instrumentation import query_budget
 
 class AdminDashboardOverviewAPIView(APIView):
     permission_classes = [IsAuthenticated, StudentsModulePermission, TeachersModulePermission, 
@@ -178,6 +184,7 @@ class RecentActivitiesAPIView(APIView):
 class AdminStudentListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated, StudentsModulePermission]
     
+    @query_budget(10)
     def get(self, request):
         try:
             # Query parameters
@@ -188,7 +195,7 @@ class AdminStudentListCreateAPIView(APIView):
             limit = int(request.GET.get('limit', 20))
             
             # Base queryset
-            queryset = Student.objects.filter(is_active=True)
+            queryset = Student.objects.filter(is_active=True).select_related('class_assigned', 'section')
             
             # Apply filters
             if class_id:
@@ -418,10 +425,10 @@ class AdminStudentDetailAPIView(APIView):
         }
     
     def get_fee_status(self, student_id):
-        pending_fees = FeeStructure.objects.filter(
-            student_id=student_id,
-            status='pending'
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # O(1): balance row maintained by the fee ledger
+        pending_fees = StudentFeeBalance.objects.filter(
+            student_id=student_id
+        ).values_list('balance', flat=True).first() or 0
         
         return {
             'pending_amount': pending_fees,
@@ -536,6 +543,7 @@ class BulkStudentImportAPIView(APIView):
 class AdminTeacherListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated, TeachersModulePermission]
     
+    @query_budget(10)
     def get(self, request):
         try:
             # Query parameters
@@ -811,23 +819,29 @@ class AssignClassTeacherAPIView(APIView):
 class AdminClassListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated, ClassesModulePermission]
     
+    @query_budget(12)
     def get(self, request):
         try:
-            classes = Class.objects.filter(is_active=True).order_by('name')
+            classes = list(Class.objects.filter(is_active=True).order_by('name'))
+            
+            # Section and student counts of all classes in one grouped query each
+            sections_count = dict(
+                Section.objects.filter(class_assigned__in=classes)
+                .values_list('class_assigned').annotate(count=Count('id'))
+            )
+            students_count = dict(
+                Student.objects.filter(class_assigned__in=classes, is_active=True)
+                .values_list('class_assigned').annotate(count=Count('id'))
+            )
             
             classes_data = []
             for class_obj in classes:
-                # Get sections count
-                sections_count = Section.objects.filter(class_assigned=class_obj).count()
-                # Get students count
-                students_count = Student.objects.filter(class_assigned=class_obj, is_active=True).count()
-                
                 classes_data.append({
                     'id': class_obj.id,
                     'name': class_obj.name,
                     'description': class_obj.description,
-                    'sections_count': sections_count,
-                    'students_count': students_count,
+                    'sections_count': sections_count.get(class_obj.id, 0),
+                    'students_count': students_count.get(class_obj.id, 0),
                     'created_at': class_obj.created_at.isoformat()
                 })
             
@@ -875,6 +889,7 @@ class AdminClassListCreateAPIView(APIView):
 class AdminSectionListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated, ClassesModulePermission]
     
+    @query_budget(10)
     def get(self, request):
         try:
             class_id = request.GET.get('class_id')
@@ -884,14 +899,17 @@ class AdminSectionListCreateAPIView(APIView):
             
             if class_id:
                 queryset = queryset.filter(class_assigned_id=class_id)
+            sections = list(queryset)
+            
+            # Student counts of all sections in one grouped query
+            students_by_section = dict(
+                Student.objects.filter(section__in=sections, is_active=True)
+                .values_list('section').annotate(count=Count('id'))
+            )
             
             sections_data = []
-            for section in queryset:
-                # Get students count
-                students_count = Student.objects.filter(
-                    section=section,
-                    is_active=True
-                ).count()
+            for section in sections:
+                students_count = students_by_section.get(section.id, 0)
                 
                 sections_data.append({
                     'id': section.id,
@@ -1541,57 +1559,67 @@ class FeeCollectionAPIView(APIView):
             student_id = request.GET.get('student_id')
             class_id = request.GET.get('class_id')
             fee_type = request.GET.get('fee_type')
-            status = request.GET.get('status')  # pending, paid, overdue
+            status = request.GET.get('status')  # PENDING, PARTIAL, PAID, OVERDUE, CANCELLED
             start_date = request.GET.get('start_date')
             end_date = request.GET.get('end_date')
             page = int(request.GET.get('page', 1))
             limit = int(request.GET.get('limit', 20))
             
             # Base queryset
-            queryset = FeeStructure.objects.select_related('student', 'fee_structure')
+            queryset = FeeInvoice.objects.select_related('student__user')
             
             # Apply filters
             if student_id:
                 queryset = queryset.filter(student_id=student_id)
             if class_id:
-                queryset = queryset.filter(student__class_assigned_id=class_id)
+                queryset = queryset.filter(student__current_class_id=class_id)
             if fee_type:
-                queryset = queryset.filter(fee_structure__fee_type=fee_type)
+                queryset = queryset.filter(
+                    id__in=InvoiceItem.objects.filter(fee_type=fee_type.upper()).values('invoice_id')
+                )
             if status:
-                queryset = queryset.filter(status=status)
+                queryset = queryset.filter(status=status.upper())
             if start_date:
-                queryset = queryset.filter(created_at__date__gte=start_date)
+                queryset = queryset.filter(invoice_date__gte=start_date)
             if end_date:
-                queryset = queryset.filter(created_at__date__lte=end_date)
+                queryset = queryset.filter(invoice_date__lte=end_date)
             
             # Pagination
             offset = (page - 1) * limit
             total_count = queryset.count()
-            collections = queryset.order_by('-created_at')[offset:offset + limit]
+            collections = queryset.order_by('-invoice_date', '-id')[offset:offset + limit]
             
             # Calculate totals
-            total_amount = queryset.aggregate(total=Sum('amount'))['total'] or 0
-            paid_amount = queryset.filter(status='paid').aggregate(total=Sum('amount_paid'))['total'] or 0
-            pending_amount = queryset.filter(status='pending').aggregate(total=Sum('amount'))['total'] or 0
+            totals = queryset.aggregate(
+                total_amount=Sum('total_amount'),
+                paid_amount=Sum('paid_amount'),
+                pending_amount=Sum('balance_amount', filter=~Q(status='CANCELLED'))
+            )
+            pending_amount = totals['pending_amount'] or 0
+            if not (fee_type or status or start_date or end_date):
+                # Unfiltered outstanding comes straight from the ledger balances
+                balances = StudentFeeBalance.objects.filter(balance__gt=0)
+                if student_id:
+                    balances = balances.filter(student_id=student_id)
+                if class_id:
+                    balances = balances.filter(student__current_class_id=class_id)
+                pending_amount = balances.aggregate(total=Sum('balance'))['total'] or 0
             
             collections_data = []
-            for collection in collections:
+            for invoice in collections:
                 collections_data.append({
-                    'id': collection.id,
-                    'student_id': collection.student.id,
-                    'student_name': collection.student.full_name,
-                    'admission_number': collection.student.admission_number,
-                    'fee_structure_name': collection.fee_structure.name,
-                    'fee_type': collection.fee_structure.fee_type,
-                    'amount': float(collection.amount),
-                    'amount_paid': float(collection.amount_paid or 0),
-                    'remaining_amount': float(collection.amount - (collection.amount_paid or 0)),
-                    'status': collection.status,
-                    'due_date': collection.due_date.isoformat() if collection.due_date else None,
-                    'payment_date': collection.payment_date.isoformat() if collection.payment_date else None,
-                    'payment_method': collection.payment_method,
-                    'transaction_id': collection.transaction_id,
-                    'created_at': collection.created_at.isoformat()
+                    'id': invoice.id,
+                    'student_id': invoice.student_id,
+                    'student_name': invoice.student.user.get_full_name(),
+                    'admission_number': invoice.student.admission_number,
+                    'invoice_number': invoice.invoice_number,
+                    'amount': float(invoice.total_amount),
+                    'amount_paid': float(invoice.paid_amount),
+                    'remaining_amount': float(invoice.balance_amount),
+                    'status': invoice.status,
+                    'invoice_date': invoice.invoice_date.isoformat(),
+                    'due_date': invoice.due_date.isoformat(),
+                    'created_at': invoice.created_at.isoformat()
                 })
             
             return Response({
@@ -1599,8 +1627,8 @@ class FeeCollectionAPIView(APIView):
                 'data': {
                     'collections': collections_data,
                     'summary': {
-                        'total_amount': float(total_amount),
-                        'paid_amount': float(paid_amount),
+                        'total_amount': float(totals['total_amount'] or 0),
+                        'paid_amount': float(totals['paid_amount'] or 0),
                         'pending_amount': float(pending_amount)
                     },
                     'pagination': {
@@ -1622,66 +1650,58 @@ class FeeCollectionAPIView(APIView):
             data = request.data
             
             # Validate required fields
-            required_fields = ['student_id', 'amount_paid', 'payment_method']
+            required_fields = ['student_id', 'invoice_id', 'amount_paid', 'payment_method']
             for field in required_fields:
                 if not data.get(field):
                     return Response({'error': f'{field} is required', 'status': 'error'}, status=400)
             
             # Validate student
-            student = Student.objects.filter(id=data['student_id'], is_active=True).first()
+            student = Student.objects.select_related('user').filter(id=data['student_id'], is_active=True).first()
             if not student:
                 return Response({'error': 'Student not found', 'status': 'error'}, status=404)
             
-            # Validate amount
-            try:
-                amount_paid = float(data['amount_paid'])
-                if amount_paid <= 0:
-                    return Response({'error': 'Amount must be positive', 'status': 'error'}, status=400)
-            except (ValueError, TypeError):
-                return Response({'error': 'Invalid amount format', 'status': 'error'}, status=400)
+            # Validate invoice
+            if not FeeInvoice.objects.filter(id=data['invoice_id'], student=student).exists():
+                return Response({'error': 'Fee invoice not found', 'status': 'error'}, status=404)
             
-            # Find pending fee collection or create new one
-            collection_id = data.get('collection_id')
-            if collection_id:
-                collection = FeeStructure.objects.filter(id=collection_id, student=student).first()
-                if not collection:
-                    return Response({'error': 'Fee collection record not found', 'status': 'error'}, status=404)
-            else:
-                return Response({'error': 'collection_id is required', 'status': 'error'}, status=400)
-            
-            # Update payment
-            collection.amount_paid = (collection.amount_paid or 0) + amount_paid
-            collection.payment_date = datetime.now().date()
-            collection.payment_method = data['payment_method']
-            collection.transaction_id = data.get('transaction_id')
-            collection.remarks = data.get('remarks', '')
-            
-            # Update status
-            if collection.amount_paid >= collection.amount:
-                collection.status = 'paid'
-            else:
-                collection.status = 'partial'
+            payment_mode = str(data['payment_method']).upper()
+            if payment_mode not in dict(FeePayment.PAYMENT_MODES):
+                return Response({'error': 'Invalid payment_method', 'status': 'error'}, status=400)
             
-            collection.collected_by = request.user
-            collection.save()
+            # Idempotent on transaction_id: a retried submit returns the original payment
+            try:
+                payment, created = record_payment(
+                    data['invoice_id'],
+                    data['amount_paid'],
+                    payment_mode,
+                    transaction_id=data.get('transaction_id', ''),
+                    received_by=request.user.get_full_name() or request.user.username,
+                    remarks=data.get('remarks', ''),
+                )
+            except PaymentError as e:
+                return Response({'error': str(e), 'status': 'error'}, status=400)
             
+            invoice = payment.invoice
             return Response({
                 'status': 'success',
                 'data': {
-                    'collection_id': collection.id,
-                    'student_name': student.full_name,
-                    'amount_paid': float(amount_paid),
-                    'remaining_amount': float(collection.amount - collection.amount_paid),
-                    'status': collection.status,
-                    'message': 'Payment recorded successfully'
+                    'payment_id': payment.id,
+                    'invoice_id': invoice.id,
+                    'invoice_number': invoice.invoice_number,
+                    'student_name': student.user.get_full_name(),
+                    'amount_paid': float(payment.amount),
+                    'remaining_amount': float(invoice.balance_amount),
+                    'status': invoice.status,
+                    'duplicate': not created,
+                    'message': 'Payment recorded successfully' if created else 'Payment already recorded'
                 }
-            }, status=200)
+            }, status=201 if created else 200)
             
         except Exception as e:
             return Response({'error': 'Failed to record payment', 'status': 'error'}, status=500)
 
 # Input POST: {
-#   "collection_id": 1,
+#   "invoice_id": 1,
 #   "student_id": 1,
 #   "amount_paid": 5000.00,
 #   "payment_method": "cash",
@@ -1701,109 +1721,126 @@ class FeeReportsAPIView(APIView):
             fee_type = request.GET.get('fee_type')
             start_date = request.GET.get('start_date')
             end_date = request.GET.get('end_date')
+            today = datetime.now().date()
             
             # Base queryset
-            queryset = FeeStructure.objects.select_related('student', 'fee_structure')
+            queryset = FeeInvoice.objects.exclude(status='CANCELLED')
             
             # Apply date filters
             if start_date:
-                queryset = queryset.filter(created_at__date__gte=start_date)
+                queryset = queryset.filter(invoice_date__gte=start_date)
             if end_date:
-                queryset = queryset.filter(created_at__date__lte=end_date)
+                queryset = queryset.filter(invoice_date__lte=end_date)
             
             if class_id:
-                queryset = queryset.filter(student__class_assigned_id=class_id)
+                queryset = queryset.filter(student__current_class_id=class_id)
             if fee_type:
-                queryset = queryset.filter(fee_structure__fee_type=fee_type)
+                queryset = queryset.filter(
+                    id__in=InvoiceItem.objects.filter(fee_type=fee_type.upper()).values('invoice_id')
+                )
             
             if report_type == 'summary':
                 # Summary report
-                total_amount = queryset.aggregate(total=Sum('amount'))['total'] or 0
-                paid_amount = queryset.filter(status='paid').aggregate(total=Sum('amount_paid'))['total'] or 0
-                pending_amount = queryset.filter(status='pending').aggregate(total=Sum('amount'))['total'] or 0
-                overdue_amount = queryset.filter(
-                    status='pending',
-                    due_date__lt=datetime.now().date()
-                ).aggregate(total=Sum('amount'))['total'] or 0
+                totals = queryset.aggregate(
+                    total_amount=Sum('total_amount'),
+                    paid_amount=Sum('paid_amount'),
+                    pending_amount=Sum('balance_amount'),
+                    overdue_amount=Sum('balance_amount', filter=Q(due_date__lt=today))
+                )
+                total_amount = totals['total_amount'] or 0
+                paid_amount = totals['paid_amount'] or 0
+                pending_amount = totals['pending_amount'] or 0
+                if not (start_date or end_date or fee_type):
+                    # Unfiltered outstanding comes straight from the ledger balances
+                    balances = StudentFeeBalance.objects.filter(balance__gt=0)
+                    if class_id:
+                        balances = balances.filter(student__current_class_id=class_id)
+                    pending_amount = balances.aggregate(total=Sum('balance'))['total'] or 0
                 
                 # Collection by fee type
-                fee_type_summary = queryset.values('fee_structure__fee_type').annotate(
-                    total_amount=Sum('amount'),
-                    paid_amount=Sum('amount_paid', filter=Q(status='paid')),
-                    pending_amount=Sum('amount', filter=Q(status='pending'))
-                )
+                fee_type_summary = InvoiceItem.objects.filter(invoice__in=queryset).values('fee_type').annotate(
+                    total_amount=Sum('net_amount'),
+                    discount=Sum('discount')
+                ).order_by('fee_type')
                 
                 data = {
                     'overall_summary': {
                         'total_amount': float(total_amount),
                         'paid_amount': float(paid_amount),
                         'pending_amount': float(pending_amount),
-                        'overdue_amount': float(overdue_amount),
+                        'overdue_amount': float(totals['overdue_amount'] or 0),
                         'collection_percentage': round((paid_amount / total_amount) * 100, 2) if total_amount > 0 else 0
                     },
                     'fee_type_summary': [
                         {
-                            'fee_type': item['fee_structure__fee_type'],
+                            'fee_type': item['fee_type'],
                             'total_amount': float(item['total_amount'] or 0),
-                            'paid_amount': float(item['paid_amount'] or 0),
-                            'pending_amount': float(item['pending_amount'] or 0)
+                            'discount': float(item['discount'] or 0)
                         }
                         for item in fee_type_summary
                     ]
                 }
                 
             elif report_type == 'defaulters':
-                # Defaulters report (overdue payments)
-                defaulters = queryset.filter(
-                    status='pending',
-                    due_date__lt=datetime.now().date()
-                ).order_by('due_date')
+                # Defaulters report (overdue invoices, bucketed and paginated in SQL)
+                overdue = overdue_invoices(class_id=class_id)
+                rows, next_cursor = paginate(
+                    defaulters_queryset(class_id=class_id),
+                    request.GET.get('cursor'),
+                    int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+                )
+                buckets = bucket_summary(overdue)
                 
                 defaulters_data = []
-                for collection in defaulters:
-                    overdue_days = (datetime.now().date() - collection.due_date).days
+                for row in rows:
                     defaulters_data.append({
-                        'student_id': collection.student.id,
-                        'student_name': collection.student.full_name,
-                        'admission_number': collection.student.admission_number,
-                        'class_name': collection.student.class_assigned.name if collection.student.class_assigned else None,
-                        'fee_type': collection.fee_structure.fee_type,
-                        'amount': float(collection.amount),
-                        'due_date': collection.due_date.isoformat(),
-                        'overdue_days': overdue_days,
-                        'parent_phone': collection.student.parent_phone
+                        'student_id': row['student_id'],
+                        'student_name': row['student_name'],
+                        'admission_number': row['admission_number'],
+                        'class_name': row['class_name'],
+                        'invoice_number': row['invoice_number'],
+                        'amount': float(row['balance_amount']),
+                        'due_date': row['due_date'].isoformat(),
+                        'overdue_days': row['overdue_days'],
+                        'bucket': row['bucket'],
+                        'parent_phone': row['contact_phone']
                     })
                 
                 data = {
                     'defaulters': defaulters_data,
-                    'total_defaulters': len(defaulters_data),
-                    'total_overdue_amount': float(sum(item['amount'] for item in defaulters_data))
+                    'buckets': [
+                        {**item, 'amount': float(item['amount'])}
+                        for item in buckets
+                    ],
+                    'total_defaulters': overdue.values('student_id').distinct().count(),
+                    'total_overdue_amount': float(sum(item['amount'] for item in buckets)),
+                    'next_cursor': next_cursor
                 }
                 
             else:
                 # Detailed report
-                collections = queryset.order_by('-created_at')[:100]  # Limit to 100 records
+                invoices = queryset.select_related('student__user').order_by('-invoice_date', '-id')[:100]  # Limit to 100 records
                 
                 detailed_data = []
-                for collection in collections:
+                for invoice in invoices:
                     detailed_data.append({
-                        'collection_id': collection.id,
-                        'student_name': collection.student.full_name,
-                        'admission_number': collection.student.admission_number,
-                        'fee_structure_name': collection.fee_structure.name,
-                        'fee_type': collection.fee_structure.fee_type,
-                        'amount': float(collection.amount),
-                        'amount_paid': float(collection.amount_paid or 0),
-                        'status': collection.status,
-                        'payment_date': collection.payment_date.isoformat() if collection.payment_date else None,
-                        'payment_method': collection.payment_method,
-                        'collected_by': collection.collected_by.username if collection.collected_by else None
+                        'invoice_id': invoice.id,
+                        'invoice_number': invoice.invoice_number,
+                        'student_name': invoice.student.user.get_full_name(),
+                        'admission_number': invoice.student.admission_number,
+                        'amount': float(invoice.total_amount),
+                        'amount_paid': float(invoice.paid_amount),
+                        'balance_amount': float(invoice.balance_amount),
+                        'status': invoice.status,
+                        'due_date': invoice.due_date.isoformat()
                     })
                 
                 data = {'detailed_collections': detailed_data}
             
             return Response({'status': 'success', 'data': data}, status=200)
             
+        except ValueError:
+            return Response({'error': 'Invalid pagination parameters', 'status': 'error'}, status=400)
         except Exception as e:
             return Response({'error': 'Failed to generate fee reports', 'status': 'error'}, status=500)
 
@@ -3949,160 +3986,181 @@ class FinancialReportsAPIView(APIView):
     def get(self, request):
         try:
             # Query parameters
-            report_type = request.GET.get('type', 'summary')  # summary, detailed, monthly
+            report_type = request.GET.get('type', 'summary')  # summary, detailed, defaulters
+            period = request.GET.get('period', 'month')  # day, week, month, quarter, year
             start_date = request.GET.get('start_date')
             end_date = request.GET.get('end_date')
             class_id = request.GET.get('class_id')
             fee_type = request.GET.get('fee_type')
+            today = datetime.now().date()
+            
+            if period not in ROLLUP_PERIODS:
+                return Response({'error': f"Invalid period. Use one of: {', '.join(ROLLUP_PERIODS)}", 'status': 'error'}, status=400)
             
             # Date range
             if start_date:
                 start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
             else:
-                start_date = datetime.now().date().replace(day=1)  # Start of current month
+                start_date = today.replace(day=1)  # Start of current month
             
             if end_date:
                 end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
             else:
-                end_date = datetime.now().date()
-            
-            # Base queryset
-            fee_collections = FeeCollection.objects.filter(
-                created_at__date__gte=start_date,
-                created_at__date__lte=end_date
-            ).select_related('student', 'fee_structure')
-            
-            if class_id:
-                fee_collections = fee_collections.filter(student__class_assigned_id=class_id)
-            if fee_type:
-                fee_collections = fee_collections.filter(fee_structure__fee_type=fee_type)
+                end_date = today
             
             if report_type == 'summary':
-                # Financial summary
-                total_amount_due = fee_collections.aggregate(total=Sum('amount'))['total'] or 0
-                total_collected = fee_collections.filter(status='paid').aggregate(total=Sum('amount_paid'))['total'] or 0
-                total_pending = fee_collections.filter(status='pending').aggregate(total=Sum('amount'))['total'] or 0
-                total_overdue = fee_collections.filter(
-                    status='pending',
-                    due_date__lt=datetime.now().date()
-                ).aggregate(total=Sum('amount'))['total'] or 0
-                
-                # Monthly breakdown
-                monthly_collections = fee_collections.filter(status='paid').extra(
-                    select={'month': "DATE_FORMAT(payment_date, '%%Y-%%m')"}
-                ).values('month').annotate(
-                    total_collected=Sum('amount_paid'),
-                    transaction_count=Count('id')
-                ).order_by('month')
-                
-                # Fee type breakdown
-                fee_type_breakdown = fee_collections.values('fee_structure__fee_type').annotate(
-                    total_due=Sum('amount'),
-                    total_collected=Sum('amount_paid', filter=Q(status='paid')),
-                    total_pending=Sum('amount', filter=Q(status='pending'))
+                # Rolled up from the daily fee facts, not from raw invoices/payments
+                facts = fact_queryset(start_date, end_date, class_id=class_id, fee_type=fee_type)
+                totals = facts.aggregate(
+                    total_due=Sum('due_amount'),
+                    total_collected=Sum('collected_amount'),
+                    total_transactions=Sum('payment_count')
                 )
+                total_amount_due = totals['total_due'] or 0
+                total_collected = totals['total_collected'] or 0
                 
-                # Class-wise breakdown
-                class_breakdown = fee_collections.values('student__class_assigned__name').annotate(
-                    total_due=Sum('amount'),
-                    total_collected=Sum('amount_paid', filter=Q(status='paid')),
-                    total_pending=Sum('amount', filter=Q(status='pending')),
-                    student_count=Count('student_id', distinct=True)
+                # Pending and overdue are what is still owed on the invoices
+                # due in the range (the cohort of total_due); due minus
+                # collected mixes cohorts, as payments in the range can be
+                # for invoices due before it
+                unpaid = FeeInvoice.objects.filter(
+                    status__in=UNPAID_STATUSES,
+                    due_date__gte=start_date,
+                    due_date__lte=end_date
+                )
+                if class_id:
+                    unpaid = unpaid.filter(student__current_class_id=class_id)
+                if fee_type:
+                    unpaid = unpaid.filter(
+                        id__in=InvoiceItem.objects.filter(fee_type=fee_type).values('invoice_id')
+                    )
+                unpaid_totals = unpaid.aggregate(
+                    total_pending=Sum('balance_amount'),
+                    total_overdue=Sum('balance_amount', filter=Q(due_date__lt=today))
+                )
+                pending_by_class = dict(
+                    unpaid.order_by().values('student__current_class_id')
+                    .annotate(total=Sum('balance_amount'))
+                    .values_list('student__current_class_id', 'total')
                 )
                 
                 data = {
                     'summary': {
                         'total_amount_due': float(total_amount_due),
                         'total_collected': float(total_collected),
-                        'total_pending': float(total_pending),
-                        'total_overdue': float(total_overdue),
+                        'total_pending': float(unpaid_totals['total_pending'] or 0),
+                        'total_overdue': float(unpaid_totals['total_overdue'] or 0),
                         'collection_percentage': round((total_collected / total_amount_due) * 100, 2) if total_amount_due > 0 else 0,
-                        'total_transactions': fee_collections.filter(status='paid').count()
+                        'total_transactions': totals['total_transactions'] or 0
                     },
-                    'monthly_collections': [
+                    'period': period,
+                    'period_breakdown': [
                         {
-                            'month': item['month'],
-                            'total_collected': float(item['total_collected'] or 0),
-                            'transaction_count': item['transaction_count']
+                            'period': item['period'].isoformat(),
+                            'total_due': float(item['due_amount'] or 0),
+                            'total_collected': float(item['collected_amount'] or 0),
+                            'transaction_count': item['payment_count'] or 0
                         }
-                        for item in monthly_collections
+                        for item in rollup(facts, period=period)
                     ],
                     'fee_type_breakdown': [
                         {
-                            'fee_type': item['fee_structure__fee_type'],
-                            'total_due': float(item['total_due'] or 0),
-                            'total_collected': float(item['total_collected'] or 0),
-                            'total_pending': float(item['total_pending'] or 0),
-                            'collection_rate': round((item['total_collected'] or 0) / (item['total_due'] or 1) * 100, 2)
+                            'fee_type': item['fee_type'],
+                            'total_due': float(item['due_amount'] or 0),
+                            'total_collected': float(item['collected_amount'] or 0),
+                            'collection_rate': round((item['collected_amount'] or 0) / (item['due_amount'] or 1) * 100, 2)
                         }
-                        for item in fee_type_breakdown
+                        for item in rollup(facts, 'fee_type')
+                    ],
+                    'payment_mode_breakdown': [
+                        {
+                            'payment_mode': item['payment_mode'],
+                            'total_collected': float(item['collected_amount'] or 0),
+                            'transaction_count': item['payment_count'] or 0
+                        }
+                        for item in rollup(facts.exclude(payment_mode=''), 'payment_mode')
                     ],
                     'class_breakdown': [
                         {
-                            'class_name': item['student__class_assigned__name'],
-                            'total_due': float(item['total_due'] or 0),
-                            'total_collected': float(item['total_collected'] or 0),
-                            'total_pending': float(item['total_pending'] or 0),
-                            'student_count': item['student_count']
+                            'class_id': item['class_obj'],
+                            'class_name': item['class_obj__display_name'],
+                            'total_due': float(item['due_amount'] or 0),
+                            'total_collected': float(item['collected_amount'] or 0),
+                            'total_pending': float(pending_by_class.get(item['class_obj']) or 0)
                         }
-                        for item in class_breakdown
+                        for item in rollup(facts, 'class_obj', 'class_obj__display_name')
                     ]
                 }
                 
             elif report_type == 'defaulters':
-                # Defaulters report
-                defaulters = fee_collections.filter(
-                    status='pending',
-                    due_date__lt=datetime.now().date()
-                ).order_by('due_date')
+                # Defaulters report (overdue invoices, bucketed in SQL)
+                overdue = overdue_invoices(as_of=today, class_id=class_id)
+                rows, next_cursor = paginate(
+                    defaulters_queryset(as_of=today, class_id=class_id),
+                    request.GET.get('cursor'),
+                    int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+                )
+                overdue_totals = overdue.aggregate(
+                    total_overdue_amount=Sum('balance_amount'),
+                    total_defaulters=Count('student_id', distinct=True)
+                )
                 
                 defaulters_data = []
-                total_overdue_amount = 0
-                
-                for collection in defaulters[:100]:  # Limit to 100 records
-                    overdue_days = (datetime.now().date() - collection.due_date).days
-                    total_overdue_amount += collection.amount
-                    
+                for row in rows:
                     defaulters_data.append({
-                        'student_id': collection.student.id,
-                        'student_name': collection.student.full_name,
-                        'admission_number': collection.student.admission_number,
-                        'class_name': collection.student.class_assigned.name if collection.student.class_assigned else None,
-                        'fee_type': collection.fee_structure.fee_type,
-                        'amount_due': float(collection.amount),
-                        'due_date': collection.due_date.isoformat(),
-                        'overdue_days': overdue_days,
-                        'parent_phone': collection.student.parent_phone,
-                        'parent_email': collection.student.parent_email
+                        'student_id': row['student_id'],
+                        'student_name': row['student_name'],
+                        'admission_number': row['admission_number'],
+                        'class_name': row['class_name'],
+                        'invoice_number': row['invoice_number'],
+                        'amount_due': float(row['balance_amount']),
+                        'due_date': row['due_date'].isoformat(),
+                        'overdue_days': row['overdue_days'],
+                        'bucket': row['bucket'],
+                        'parent_phone': row['contact_phone']
                     })
                 
                 data = {
                     'defaulters': defaulters_data,
                     'summary': {
-                        'total_defaulters': len(defaulters_data),
-                        'total_overdue_amount': float(total_overdue_amount),
-                        'average_overdue_days': round(
-                            sum(item['overdue_days'] for item in defaulters_data) / len(defaulters_data), 1
-                        ) if defaulters_data else 0
-                    }
+                        'total_defaulters': overdue_totals['total_defaulters'],
+                        'total_overdue_amount': float(overdue_totals['total_overdue_amount'] or 0),
+                        'buckets': [
+                            {**item, 'amount': float(item['amount'])}
+                            for item in bucket_summary(overdue)
+                        ]
+                    },
+                    'next_cursor': next_cursor
                 }
                 
             else:
                 # Detailed transactions report
-                transactions = fee_collections.filter(status='paid').order_by('-payment_date')[:200]
+                transactions = FeePayment.objects.filter(
+                    status='SUCCESS',
+                    payment_date__gte=start_date,
+                    payment_date__lte=end_date
+                ).select_related('invoice__student__user')
+                if class_id:
+                    transactions = transactions.filter(invoice__student__current_class_id=class_id)
+                if fee_type:
+                    transactions = transactions.filter(
+                        invoice_id__in=InvoiceItem.objects.filter(fee_type=fee_type).values('invoice_id')
+                    )
+                transactions = transactions.order_by('-payment_date', '-id')[:200]
                 
                 transactions_data = []
                 for transaction in transactions:
+                    student = transaction.invoice.student
                     transactions_data.append({
                         'transaction_id': transaction.id,
-                        'student_name': transaction.student.full_name,
-                        'admission_number': transaction.student.admission_number,
-                        'fee_type': transaction.fee_structure.fee_type,
-                        'amount_paid': float(transaction.amount_paid or 0),
-                        'payment_date': transaction.payment_date.isoformat() if transaction.payment_date else None,
-                        'payment_method': transaction.payment_method,
+                        'student_name': student.user.get_full_name(),
+                        'admission_number': student.admission_number,
+                        'invoice_number': transaction.invoice.invoice_number,
+                        'amount_paid': float(transaction.amount),
+                        'payment_date': transaction.payment_date.isoformat(),
+                        'payment_method': transaction.payment_mode,
                         'transaction_ref': transaction.transaction_id,
-                        'collected_by': transaction.collected_by.username if transaction.collected_by else None
+                        'collected_by': transaction.received_by
                     })
                 
                 data = {
@@ -1,16 +1,22 @@
 # api/middleware.py
+from django.conf import settings
 from django.http import JsonResponse
+from django.urls import reverse
 from django.utils.deprecation import MiddlewareMixin
 from schools.models import School
+from schools.user_index import schools_for_email
 from django.db import connection
+from .query_instrumentation import QueryBudgetExceeded, QueryStats, view_query_budget
+from school_matrix import structured_logging
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
+request_logger = logging.getLogger('api.requests')
 
 class TenantHeaderMiddleware(MiddlewareMixin):
     def process_request(self, request):
-        print(f"🔄 Processing request: {request.path}")
-        
         # Skip for admin endpoints और static files
         if (request.path.startswith('/admin/') or 
             request.path.startswith('/static/') or 
@@ -20,7 +26,12 @@ class TenantHeaderMiddleware(MiddlewareMixin):
         
         # Get tenant code from header
         tenant_code = request.headers.get('Tenant-Name') or request.headers.get('X-Tenant-Code')
-        print(f"----------tenant_code: {tenant_code}")
+        
+        # Optional header-less login: find the school from the email
+        if not tenant_code and settings.HEADERLESS_LOGIN_ENABLED and request.path == reverse('login'):
+            tenant_code, error_response = self._tenant_code_from_login(request)
+            if error_response:
+                return error_response
         
         # Check if tenant header is missing
         if not tenant_code:
@@ -40,20 +51,19 @@ class TenantHeaderMiddleware(MiddlewareMixin):
             # Store tenant info in request
             request.tenant = school
             
-            print(f"✅ Tenant set: {tenant_code} -> schema: {connection.schema_name}")
-            logger.info(f"Tenant set from header: {tenant_code}")
+            structured_logging.bind(tenant=tenant_code, schema=connection.schema_name)
+            logger.debug('Tenant set from header: %s', tenant_code)
             
         except School.DoesNotExist:
-            print(f"❌ School not found: {tenant_code}")
+            logger.warning('School not found: %s', tenant_code)
             return JsonResponse({
                 'success': False,
                 'error': 'Invalid tenant',
                 'message': f'School with code {tenant_code} not found'
             }, status=404)
             
-        except Exception as e:
-            print(f"❌ Error setting tenant: {str(e)}")
-            logger.error(f"Error setting tenant from header: {str(e)}")
+        except Exception:
+            logger.exception('Error setting tenant from header: %s', tenant_code)
             return JsonResponse({
                 'success': False,
                 'error': 'Tenant setup failed',
@@ -62,11 +72,86 @@ class TenantHeaderMiddleware(MiddlewareMixin):
         
         return None
 
-    def process_response(self, request, response):
-        # Clean response processing
+    def _tenant_code_from_login(self, request):
+        """Resolve the school of a login request through the global user index"""
         try:
-            if hasattr(request, 'tenant'):
-                print("✅ Request completed for tenant")
-        except Exception as e:
-            logger.error(f"Error in response processing: {str(e)}")
+            email = json.loads(request.body or b'{}').get('email')
+        except (ValueError, AttributeError):
+            email = request.POST.get('email')
+        if not email:
+            return None, None
+        
+        schools = schools_for_email(email)
+        if len(schools) == 1:
+            return schools[0].school_code, None
+        if len(schools) > 1:
+            return None, JsonResponse({
+                'success': False,
+                'error': 'Tenant header required',
+                'message': 'This email is registered with more than one school, send the Tenant-Name header'
+            }, status=400)
+        return None, JsonResponse({
+            'success': False,
+            'error': 'Invalid email or password'
+        }, status=401)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Per-request ORM statistics: query count, DB time, slowest statement and
+    repeated statements, tagged with the tenant schema and URL name.
+
+    Logged once per request on 'api.requests' as structured fields (with
+    tenant, user, route and latency) and returned as a Server-Timing header. Views may declare a query_budget (see
+    api.query_instrumentation.query_budget); going over it logs a warning,
+    or raises QueryBudgetExceeded when QUERY_BUDGET_STRICT is on (tests).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        structured_logging.clear()
+        if not settings.QUERY_INSTRUMENTATION_ENABLED:
+            return self.get_response(request)
+
+        stats = QueryStats()
+        request._query_budget = None
+        started = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        fields = {
+            'path': request.path,
+            'method': request.method,
+            'status_code': response.status_code,
+            'url_name': match.view_name if match else '',
+            'schema': getattr(connection, 'schema_name', ''),
+            'user_id': getattr(getattr(request, 'user', None), 'pk', None),
+            'total_ms': round(total_ms, 2),
+            'query_budget': request._query_budget,
+            **stats.as_log_fields(),
+        }
+
+        response['Server-Timing'] = (
+            f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}'
+        )
+
+        budget = request._query_budget
+        if budget is not None and stats.count > budget:
+            message = f'{fields["url_name"] or request.path} ran {stats.count} queries (budget {budget})'
+            request_logger.warning(message, extra=fields)
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+        else:
+            request_logger.info('%s %s: %s queries in %.1f ms', request.method, request.path,
+                              stats.count, stats.total_ms, extra=fields)
         return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = view_query_budget(view_func, request.method)
+        if request.resolver_match:
+            structured_logging.bind(url_name=request.resolver_match.view_name)
+        return None
@@ -0,0 +1,106 @@
+# api/query_instrumentation.py
+
+import re
+import time
+from collections import Counter
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more queries than its query_budget (raised when QUERY_BUDGET_STRICT)"""
+
+
+# Literal values and IN lists are folded so repeats of one statement share a fingerprint
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?|\d+|\'[^\']*\')(?:, ?(?:%s|\?|\d+|\'[^\']*\'))*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+SQL_PREVIEW_LENGTH = 300
+
+
+def fingerprint(sql):
+    """
+    Normalized statement text
+
+    Example: "SELECT ... WHERE id IN (%s, %s, %s)" -> "SELECT ... WHERE id IN (...)"
+    """
+    sql = _WHITESPACE.sub(' ', sql or '').strip()
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    return _NUMBER.sub('?', sql)
+
+
+class QueryStats:
+    """
+    connection.execute_wrapper() callable that times every statement
+
+    Only counters, the slowest statement and a fingerprint Counter are kept,
+    so a request with thousands of queries costs a few KB.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = ''
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.fingerprints[fingerprint(sql)] += 1
+            if elapsed_ms > self.slowest_ms:
+                self.slowest_ms = elapsed_ms
+                self.slowest_sql = sql
+
+    def duplicates(self, limit=5):
+        """[(fingerprint, count)] of statements run more than once - usually N+1 loops"""
+        return [(sql, count) for sql, count in self.fingerprints.most_common(limit) if count > 1]
+
+    def as_log_fields(self):
+        return {
+            'query_count': self.count,
+            'db_ms': round(self.total_ms, 2),
+            'slowest_ms': round(self.slowest_ms, 2),
+            'slowest_sql': self.slowest_sql[:SQL_PREVIEW_LENGTH],
+            'duplicate_queries': [
+                {'sql': sql[:SQL_PREVIEW_LENGTH], 'count': count} for sql, count in self.duplicates()
+            ],
+        }
+
+
+def query_budget(max_queries):
+    """
+    Cap the queries of a view (function view, APIView class or handler method)
+
+    Example:
+        @query_budget(8)
+        def get(self, request): ...
+
+    The same can be declared as a class attribute: `query_budget = 8`.
+    The budget counts every statement of the request, including the tenant
+    lookup and the SET search_path django-tenants runs before each query.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def view_query_budget(view_func, method):
+    """Budget of the resolved view for this HTTP method, None when not set"""
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    if view_class is not None:
+        handler = getattr(view_class, method.lower(), None)
+        budget = getattr(handler, 'query_budget', None)
+        if budget is not None:
+            return budget
+        budget = getattr(view_class, 'query_budget', None)
+        if isinstance(budget, int):
+            return budget
+    return getattr(view_func, 'query_budget', None)
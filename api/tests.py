@@ -1,3 +1,168 @@
-from django.test import TestCase
+import io
+import json
+import logging
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from school_matrix import structured_logging
+from school_matrix.structured_logging import (
+    JsonFormatter, QueueJsonHandler, RequestContextFilter, SamplingFilter,
+)
+from schools.provisioning import seed_rbac
+from schools.testing import SchoolTestCase
+from students.views import (
+    ParentContactListAPIView, StudentClassSectionAPIView, StudentListAPIView, StudentSearchAPIView,
+)
+from teachers.models import TeacherSubject
+from teachers.views import TeacherListAPIView, TeacherSubjectsListAPIView
+from .query_instrumentation import QueryBudgetExceeded, QueryStats, fingerprint, view_query_budget
+
+
+class FingerprintTests(SimpleTestCase):
+
+    def test_literals_and_in_lists_are_folded(self):
+        self.assertEqual(
+            fingerprint("SELECT *  FROM t WHERE id IN (1, 2, 3) AND name = 'x' AND n > 5"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? AND n > ?',
+        )
+
+    def test_duplicates(self):
+        stats = QueryStats()
+        for sql in ['SELECT 1 FROM t WHERE id = 1', 'SELECT 1 FROM t WHERE id = 2', 'SELECT 2']:
+            stats(lambda *args: None, sql, None, False, {})
+
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(stats.duplicates(), [('SELECT ? FROM t WHERE id = ?', 2)])
+
+
+def _record(level=logging.INFO, msg='served %s', args=('/x/',), **extra):
+    record = logging.LogRecord('api.requests', level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+class StructuredLoggingTests(SimpleTestCase):
+
+    def tearDown(self):
+        structured_logging.clear()
+
+    def test_json_carries_bound_context_and_extra(self):
+        structured_logging.bind(tenant='TEST', schema='test')
+        record = _record(schema='explicit', query_count=3)
+        RequestContextFilter().filter(record)
+
+        payload = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(payload['message'], 'served /x/')
+        self.assertEqual(payload['tenant'], 'TEST')
+        self.assertEqual(payload['schema'], 'explicit')
+        self.assertEqual(payload['query_count'], 3)
+
+    def test_sampling_keeps_warnings_and_failed_requests(self):
+        sampler = SamplingFilter(rate=0)
+
+        self.assertFalse(sampler.filter(_record()))
+        self.assertTrue(sampler.filter(_record(status_code=500)))
+        self.assertTrue(sampler.filter(_record(level=logging.WARNING)))
+        self.assertTrue(SamplingFilter(rate=1).filter(_record()))
+
+    def test_queue_handler_writes_json_lines(self):
+        handler = QueueJsonHandler()
+        handler.target.stream = io.StringIO()
+        handler.handle(_record(status_code=200))
+        handler._stop_listener()
+
+        # Once the listener is gone records are written directly
+        handler.handle(_record(msg='after stop', args=()))
+
+        lines = [json.loads(line) for line in handler.target.stream.getvalue().splitlines()]
+        self.assertEqual([line['message'] for line in lines], ['served /x/', 'after stop'])
+        self.assertEqual(lines[0]['status_code'], 200)
+
+
+class QueryBudgetTests(SchoolTestCase):
+    """Budgeted views stay within budget however many rows they return"""
+
+    ROWS = 15
+
+    def setUp(self):
+        super().setUp()
+        seed_rbac()
+        self.admin = self.make_user('school_admin')
+        self.class_obj = self.make_class()
+        self.section = self.make_section(self.class_obj)
+
+    def assertWithinBudget(self, view_class, path, **kwargs):
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=self.admin)
+        view = view_class.as_view()
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, **kwargs)
+
+        self.assertEqual(response.status_code, 200, response.data)
+        budget = view_query_budget(view, 'GET')
+        self.assertIsNotNone(budget)
+        self.assertLessEqual(len(queries), budget, '\n'.join(query['sql'] for query in queries))
+
+    def test_student_views(self):
+        for _ in range(self.ROWS):
+            self.make_student(self.class_obj, self.section)
+
+        self.assertWithinBudget(StudentListAPIView, '/students/?class=%d' % self.class_obj.id)
+        self.assertWithinBudget(StudentSearchAPIView, '/students/search/?q=Father')
+        self.assertWithinBudget(ParentContactListAPIView, '/students/parents/contacts/')
+        self.assertWithinBudget(
+            StudentClassSectionAPIView, '/students/',
+            class_id=self.class_obj.id, section_id=self.section.id,
+        )
+
+    def test_teacher_views(self):
+        subjects = [self.make_subject(f'Subject {n}') for n in range(3)]
+        teachers = [self.make_teacher() for _ in range(self.ROWS)]
+        for teacher in teachers:
+            for subject in subjects:
+                TeacherSubject.objects.create(teacher=teacher, subject=subject, academic_year='2024-2025')
+
+        self.assertWithinBudget(TeacherListAPIView, '/teachers/')
+        self.assertWithinBudget(TeacherSubjectsListAPIView, '/teachers/subjects/', teacher_id=teachers[0].id)
+
+    def test_teacher_list_counts_prefetched_subjects(self):
+        teacher = self.make_teacher()
+        for n in range(2):
+            TeacherSubject.objects.create(
+                teacher=teacher, subject=self.make_subject(f'Subject {n}'), academic_year='2024-2025',
+            )
+
+        request = APIRequestFactory().get('/teachers/')
+        force_authenticate(request, user=self.admin)
+        response = TeacherListAPIView.as_view()(request)
+
+        self.assertEqual(response.data['data'][0]['total_subjects'], 2)
+
+    def test_exceeding_budget_fails_when_strict(self):
+        self.make_student(self.class_obj, self.section)
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        with mock.patch.object(StudentListAPIView.get, 'query_budget', 1), \
+                override_settings(QUERY_BUDGET_STRICT=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                client.get('/api/v1/students/students/', HTTP_TENANT_NAME=self.tenant.school_code)
+
+    def test_exceeding_budget_logs_when_not_strict(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        with mock.patch.object(StudentListAPIView.get, 'query_budget', 1), \
+                override_settings(QUERY_BUDGET_STRICT=False), \
+                self.assertLogs('api.requests', 'WARNING') as logs:
+            response = client.get('/api/v1/students/students/', HTTP_TENANT_NAME=self.tenant.school_code)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+        self.assertIn('(budget 1)', logs.output[0])
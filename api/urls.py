@@ -9,5 +9,7 @@ urlpatterns = [
     path('teachers/', include('teachers.urls')),
     path('students/', include('students.urls')),
     path('school/', include('schools.urls')),
+    path('fees/', include('fees.urls')),
+    path('library/', include('library.urls')),
     path('admin-dashboard/', include('school_dashboard.urls'))
 ]
\ No newline at end of file
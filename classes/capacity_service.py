@@ -0,0 +1,226 @@
+# classes/capacity_service.py
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils.translation import gettext_lazy as _
+
+
+def section_allocation(section):
+    """Seats a section takes out of its class capacity (inactive sections take none)"""
+    return section.capacity if section.is_active else 0
+
+
+def loaded_allocation(section):
+    """
+    (class id, allocation) the section's row counts in the database, None
+    for a new section
+
+    Taken from the snapshot made in Section.from_db; a deferred load has
+    none, so the stored row is read instead.
+    """
+    loaded = getattr(section, '_loaded_allocation', None)
+    if loaded is not None or section._state.adding or section.pk is None:
+        return loaded
+    row = type(section).objects.filter(pk=section.pk).values_list('class_obj_id', 'capacity', 'is_active').first()
+    if row is None:
+        return None
+    class_id, capacity, is_active = row
+    return class_id, capacity if is_active else 0
+
+
+def allocation_change(section):
+    """
+    How saving `section` moves Class.allocated_capacity
+
+    Returns:
+        tuple: (old class id, old allocation, new allocation), or None when
+            neither the class, the capacity nor is_active changed
+    """
+    loaded = loaded_allocation(section)
+    old_class_id, old_allocation = loaded if loaded else (section.class_obj_id, 0)
+    new_allocation = section_allocation(section)
+    if old_class_id == section.class_obj_id and old_allocation == new_allocation:
+        return None
+    return old_class_id, old_allocation, new_allocation
+
+
+def validate_allocation(section, change):
+    """
+    O(1) check of a section's capacity against the class counter
+
+    Raises:
+        ValidationError: The class would be over-allocated
+    """
+    old_class_id, old_allocation, new_allocation = change
+    class_obj = section.class_obj
+    others = class_obj.allocated_capacity
+    if old_class_id == class_obj.id:
+        others -= old_allocation
+        if new_allocation <= old_allocation:
+            return  # shrinking or deactivating always fits
+    total = others + new_allocation
+    if total > class_obj.capacity:
+        raise ValidationError({
+            'capacity': _(
+                f'Section capacity ({section.capacity}) + other sections capacity '
+                f'({others}) = {total} exceeds class '
+                f'capacity ({class_obj.capacity}). Maximum allowed: '
+                f'{class_obj.capacity - others}'
+            )
+        })
+
+
+def apply_allocation(section, change):
+    """
+    Move the class counters with F() updates (call inside the save's transaction)
+
+    Growth is a conditional UPDATE, so two concurrent saves cannot both
+    take the last free seats.
+
+    Raises:
+        ValidationError: The class filled up since validation
+    """
+    from .models import Class
+
+    old_class_id, old_allocation, new_allocation = change
+    new_class_id = section.class_obj_id
+    if old_class_id != new_class_id:
+        if old_allocation:
+            Class.objects.filter(pk=old_class_id).update(allocated_capacity=F('allocated_capacity') - old_allocation)
+        delta = new_allocation
+    else:
+        delta = new_allocation - old_allocation
+
+    if delta > 0:
+        updated = Class.objects.filter(
+            pk=new_class_id, allocated_capacity__lte=F('capacity') - delta
+        ).update(allocated_capacity=F('allocated_capacity') + delta)
+        if not updated:
+            raise ValidationError({
+                'capacity': _(f'Class capacity has no room left for {delta} more seats.')
+            })
+    elif delta < 0:
+        Class.objects.filter(pk=new_class_id).update(allocated_capacity=F('allocated_capacity') + delta)
+
+    # Keep a loaded class in step so later validations on it stay O(1)
+    if delta and type(section).class_obj.is_cached(section):
+        section.class_obj.allocated_capacity += delta
+
+
+def release_allocation(section):
+    """Give a section's seats back to its class (call before the row is deleted)"""
+    from .models import Class
+
+    loaded = loaded_allocation(section)
+    class_id, allocation = loaded if loaded else (section.class_obj_id, section_allocation(section))
+    if allocation:
+        Class.objects.filter(pk=class_id).update(allocated_capacity=F('allocated_capacity') - allocation)
+
+
+def create_sections(class_obj, rows, dry_run=False):
+    """
+    Create many sections of one class, validated together
+
+    All rows are checked against the class before anything is written: new
+    names must be unique within the class, incharges active, and the summed
+    capacity must fit next to the existing sections. The insert is one
+    bulk_create plus one counter update.
+
+    Args:
+        class_obj: Class to add the sections to
+        rows: [{'name', 'capacity', 'room_number', 'section_incharge', 'is_active'}]
+        dry_run: Only validate
+
+    Returns:
+        tuple: (created sections, errors as [{'index', 'field', 'message'}])
+    """
+    from teachers.models import Teacher
+    from .models import Class, Section
+
+    errors = []
+    if not class_obj.is_active:
+        errors.append({'index': None, 'field': 'class_obj', 'message': 'Cannot create section for inactive class.'})
+
+    existing = set(Section.objects.filter(class_obj=class_obj).values_list('name', flat=True))
+    incharge_ids = {row['section_incharge'] for row in rows if row.get('section_incharge')}
+    incharges = Teacher.objects.in_bulk(incharge_ids)
+
+    sections, seen = [], set()
+    for index, row in enumerate(rows):
+        if row['name'] in existing or row['name'] in seen:
+            errors.append({'index': index, 'field': 'name',
+                           'message': f'Section {row["name"]} already exists for this class'})
+        seen.add(row['name'])
+
+        incharge_id = row.get('section_incharge')
+        if incharge_id:
+            teacher = incharges.get(incharge_id)
+            if teacher is None:
+                errors.append({'index': index, 'field': 'section_incharge',
+                               'message': f'section_incharge {incharge_id} not found'})
+            elif not teacher.is_active:
+                errors.append({'index': index, 'field': 'section_incharge',
+                               'message': 'Selected teacher is not active.'})
+
+        sections.append(Section(
+            class_obj=class_obj,
+            name=row['name'],
+            capacity=row['capacity'],
+            room_number=row.get('room_number', ''),
+            section_incharge_id=incharge_id or None,
+            is_active=row.get('is_active', True),
+        ))
+
+    requested = sum(section_allocation(section) for section in sections)
+    available = class_obj.capacity - class_obj.allocated_capacity
+    if requested > available:
+        errors.append({'index': None, 'field': 'capacity', 'message': (
+            f'New sections need {requested} seats but class capacity ({class_obj.capacity}) '
+            f'has {available} left after existing sections ({class_obj.allocated_capacity}).'
+        )})
+
+    if errors or dry_run:
+        return [], errors
+
+    with transaction.atomic():
+        created = Section.objects.bulk_create(sections)
+        if requested:
+            updated = Class.objects.filter(
+                pk=class_obj.pk, allocated_capacity__lte=F('capacity') - requested
+            ).update(allocated_capacity=F('allocated_capacity') + requested)
+            if not updated:
+                # Another save took the seats since the counter was read
+                transaction.set_rollback(True)
+                return [], [{'index': None, 'field': 'capacity',
+                             'message': 'Class capacity changed while creating sections, please retry.'}]
+    class_obj.allocated_capacity += requested
+    for section in created:
+        section._loaded_allocation = (class_obj.id, section_allocation(section))
+    return created, []
+
+
+def recount_allocated_capacity(class_ids=None):
+    """
+    Recompute Class.allocated_capacity from the active sections in one
+    UPDATE (backfill, or repair after raw SQL / queryset updates)
+
+    Returns:
+        int: Classes updated
+    """
+    from .models import Class, Section
+
+    allocated = (
+        Section.objects.filter(class_obj=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('class_obj')
+        .annotate(total=Sum('capacity'))
+        .values('total')
+    )
+    classes = Class.objects.all()
+    if class_ids is not None:
+        classes = classes.filter(pk__in=class_ids)
+    return classes.update(
+        allocated_capacity=Coalesce(Subquery(allocated, output_field=IntegerField()), Value(0))
+    )
@@ -0,0 +1,83 @@
+# classes/class_subject_service.py
+
+
+def bulk_assign_subjects(class_obj, sections, subjects, teacher=None, periods_per_week=5):
+    """
+    Assign the same subjects to a class (or to several of its sections)
+    in one insert
+
+    Runs the checks of ClassSubject.clean() against objects the caller has
+    already loaded, so nothing is fetched per row: existing assignments
+    come from one query and the new rows go in with one bulk_create.
+    ignore_conflicts covers a concurrent request inserting the same row:
+    unique_class_section_subject_session for section rows and
+    unique_class_wide_subject_session for class-wide ones (their NULL
+    section never conflicts in the first constraint).
+
+    Args:
+        class_obj: Class, with its session loaded
+        sections: Sections of the class, or [None] for a class-wide assignment
+        subjects: Active subjects to assign
+        teacher: Teacher for every new row (optional for non-core subjects)
+        periods_per_week: Periods per week of every new row
+
+    Returns:
+        tuple: (created ClassSubjects, skipped [{'section', 'subject', 'reason'}],
+            validation errors [{'section', 'subject', 'errors'}])
+    """
+    from .models import ClassSubject
+
+    session = class_obj.session
+    section_ids = [section.id for section in sections if section is not None]
+
+    existing = ClassSubject.objects.filter(
+        class_obj=class_obj, session=session, subject__in=subjects
+    )
+    if section_ids:
+        existing = existing.filter(section_id__in=section_ids)
+    else:
+        existing = existing.filter(section__isnull=True)
+    existing = set(existing.values_list('section_id', 'subject_id'))
+
+    to_create, skipped, errors = [], [], []
+    for section in sections:
+        section_name = section.name if section else None
+        for subject in subjects:
+            if (section.id if section else None, subject.id) in existing:
+                skipped.append({'section': section_name, 'subject': subject.name, 'reason': 'Already assigned'})
+                continue
+            # ✅ Core subjects must have teacher assigned (as in ClassSubject.clean)
+            if subject.is_core and not teacher:
+                errors.append({
+                    'section': section_name,
+                    'subject': subject.name,
+                    'errors': {'teacher': [
+                        f'{subject.name} is a core subject and must have a teacher assigned. '
+                        f'Either assign a teacher or mark this subject as optional.'
+                    ]}
+                })
+                continue
+            to_create.append(ClassSubject(
+                class_obj=class_obj,
+                section=section,
+                subject=subject,
+                teacher=teacher,
+                periods_per_week=periods_per_week,
+                session=session,
+                is_optional=not subject.is_core,
+            ))
+
+    if not to_create:
+        return [], skipped, errors
+
+    ClassSubject.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    # ignore_conflicts leaves pk unset; read the new rows back for the response
+    wanted = {(row.section_id, row.subject_id) for row in to_create}
+    created = [
+        row for row in ClassSubject.objects.filter(
+            class_obj=class_obj, session=session, subject__in=subjects
+        ).select_related('class_obj', 'section', 'subject', 'teacher__user')
+        if (row.section_id, row.subject_id) in wanted
+    ]
+    return created, skipped, errors
@@ -0,0 +1,20 @@
+# classes/management/commands/recount_class_capacity.py
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from classes.capacity_service import recount_allocated_capacity
+
+
+class Command(BaseCommand):
+    help = 'Recompute each class allocated_capacity from its active sections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', type=str, required=True, help='Tenant schema (e.g., school_gvs01)')
+        parser.add_argument('--class-id', type=int, action='append', dest='class_ids',
+                            help='Only these classes (repeatable)')
+
+    def handle(self, *args, **options):
+        with schema_context(options['schema']):
+            self.stdout.write('🔄 Recounting section capacity...')
+            updated = recount_allocated_capacity(options['class_ids'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {updated} classes updated'))
@@ -1,9 +1,13 @@
 # classes/models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Sum
+
+from .capacity_service import (
+    allocation_change, apply_allocation, release_allocation, section_allocation, validate_allocation,
+)
+from .timetable_service import conflict_errors, find_conflicts
 
 
 User = get_user_model()
@@ -44,6 +48,11 @@ class Class(models.Model):
         help_text="Academic session for this class"
     )
     capacity = models.PositiveIntegerField(default=40)
+    allocated_capacity = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Summed capacity of the active sections, kept up to date by Section.save()",
+    )
     class_teacher = models.ForeignKey(
         'teachers.Teacher',
         on_delete=models.SET_NULL,
@@ -65,6 +74,12 @@ class Class(models.Model):
             ),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_capacity = instance.__dict__.get('capacity')
+        return instance
+
     def clean(self):
         """Model-level validation"""
         if self.capacity < 1:
@@ -83,23 +98,27 @@ class Class(models.Model):
             })
         
         # ✅ FIX 1: Validate total section capacity doesn't exceed class capacity
-        if self.pk:  # Only for updates
-            total_section_capacity = self.sections.filter(is_active=True).aggregate(
-                total=Sum('capacity')
-            )['total'] or 0
-            
-            if total_section_capacity > self.capacity:
+        # (only when the capacity changes; the sections' total is kept in allocated_capacity)
+        if self.pk and self.capacity != getattr(self, '_loaded_capacity', None):
+            if self.allocated_capacity > self.capacity:
                 raise ValidationError({
                     'capacity': _(
                         f'Class capacity ({self.capacity}) cannot be less than '
-                        f'total section capacity ({total_section_capacity}). '
+                        f'total section capacity ({self.allocated_capacity}). '
                         f'Please increase class capacity or reduce section capacities.'
                     )
                 })
 
     def save(self, *args, **kwargs):
         self.full_clean()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # allocated_capacity moves with F() updates from Section.save(); never write back a stale copy
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'allocated_capacity'
+            ]
         super().save(*args, **kwargs)
+        self._loaded_capacity = self.capacity
 
     def __str__(self):
         return f"{self.display_name} ({self.session.name})"
@@ -144,6 +163,19 @@ class Section(models.Model):
             ),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What this row counts towards Class.allocated_capacity in the database.
+        # Read __dict__ only: touching a deferred field would reload the row
+        # through from_db again. Deferred loads get no snapshot.
+        loaded = instance.__dict__
+        if all(name in loaded for name in ('class_obj_id', 'capacity', 'is_active')):
+            instance._loaded_allocation = (
+                loaded['class_obj_id'], loaded['capacity'] if loaded['is_active'] else 0
+            )
+        return instance
+
     @property
     def session(self):
         return self.class_obj.session
@@ -166,29 +198,26 @@ class Section(models.Model):
             })
         
         # ✅ FIX 1: Validate section capacity against class capacity
-        # Get total capacity of other sections in same class
-        other_sections_capacity = Section.objects.filter(
-            class_obj=self.class_obj,
-            is_active=True
-        ).exclude(pk=self.pk).aggregate(
-            total=Sum('capacity')
-        )['total'] or 0
-        
-        total_capacity = other_sections_capacity + self.capacity
-        
-        if total_capacity > self.class_obj.capacity:
-            raise ValidationError({
-                'capacity': _(
-                    f'Section capacity ({self.capacity}) + other sections capacity '
-                    f'({other_sections_capacity}) = {total_capacity} exceeds class '
-                    f'capacity ({self.class_obj.capacity}). Maximum allowed: '
-                    f'{self.class_obj.capacity - other_sections_capacity}'
-                )
-            })
+        # (against the class counter, and only when capacity, class or is_active changed)
+        change = allocation_change(self)
+        if change:
+            validate_allocation(self, change)
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        change = allocation_change(self)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if change:
+                apply_allocation(self, change)
+        self._loaded_allocation = (self.class_obj_id, section_allocation(self))
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # Before the delete, while a deferred load can still read its row
+            release_allocation(self)
+            result = super().delete(*args, **kwargs)
+        return result
 
     def __str__(self):
         return f"{self.class_obj.display_name} - Section {self.name} ({self.session.name})"
@@ -258,6 +287,12 @@ class ClassSubject(models.Model):
                 fields=['class_obj', 'section', 'subject', 'session'],
                 name='unique_class_section_subject_session',
             ),
+            # NULLs are distinct in the constraint above, so class-wide rows need their own
+            models.UniqueConstraint(
+                fields=['class_obj', 'subject', 'session'],
+                condition=models.Q(section__isnull=True),
+                name='unique_class_wide_subject_session',
+            ),
         ]
 
     def clean(self):
@@ -367,12 +402,24 @@ class TimeTable(models.Model):
 
     def clean(self):
         """Model-level validation"""
+        self.validate_slot()
+
+        # Teacher, room and class-section double booking
+        conflicts = find_conflicts([self])
+        if conflicts:
+            raise ValidationError(conflict_errors(conflicts))
+
+    def validate_slot(self):
+        """
+        Checks that need no other timetable rows; bulk imports run these
+        per slot and find_conflicts() once for the whole batch
+        """
         if self.start_time >= self.end_time:
             raise ValidationError({
                 'end_time': _('End time must be after start time.')
             })
 
-        if self.section.class_obj != self.class_obj:
+        if self.section.class_obj_id != self.class_obj_id:
             raise ValidationError({
                 'section': _('Section does not belong to the selected class.')
             })
@@ -387,50 +434,11 @@ class TimeTable(models.Model):
                 'subject': _('Cannot assign inactive subject.')
             })
         
-        if self.session != self.class_obj.session:
+        if self.session_id != self.class_obj.session_id:
             raise ValidationError({
                 'session': _('Session must match the class session.')
             })
 
-        # ✅ FIX 3: Check teacher availability (no double booking)
-        teacher_conflicts = TimeTable.objects.filter(
-            teacher=self.teacher,
-            day=self.day,
-            session=self.session,
-            is_active=True
-        ).exclude(pk=self.pk)
-
-        for slot in teacher_conflicts:
-            if not (self.end_time <= slot.start_time or self.start_time >= slot.end_time):
-                raise ValidationError({
-                    'teacher': _(
-                        f'Teacher {self.teacher.get_full_name()} is already assigned to '
-                        f'{slot.class_obj.display_name} {slot.section.name} from '
-                        f'{slot.start_time.strftime("%H:%M")} to {slot.end_time.strftime("%H:%M")} '
-                        f'on {slot.get_day_display()}.'
-                    )
-                })
-        
-        # ✅ FIX 3: Check room availability (no double booking)
-        if self.room_number:
-            room_conflicts = TimeTable.objects.filter(
-                room_number=self.room_number,
-                day=self.day,
-                session=self.session,
-                is_active=True
-            ).exclude(pk=self.pk)
-            
-            for slot in room_conflicts:
-                if not (self.end_time <= slot.start_time or self.start_time >= slot.end_time):
-                    raise ValidationError({
-                        'room_number': _(
-                            f'Room {self.room_number} is already occupied by '
-                            f'{slot.class_obj.display_name} {slot.section.name} from '
-                            f'{slot.start_time.strftime("%H:%M")} to {slot.end_time.strftime("%H:%M")} '
-                            f'on {slot.get_day_display()}.'
-                        )
-                    })
-
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Class, Section, Subject, ClassSubject, TimeTable
+from .timetable_generator import DEFAULT_TIME_BUDGET
 
 
 class ClassSerializer(serializers.ModelSerializer):
@@ -34,7 +36,7 @@ class ClassSubjectSerializer(serializers.ModelSerializer):
     class_name = serializers.CharField(source='class_obj.display_name', read_only=True)
     section_name = serializers.CharField(source='section.name', read_only=True, allow_null=True)
     subject_name = serializers.CharField(source='subject.name', read_only=True)
-    teacher_name = serializers.CharField(source='teacher.full_name', read_only=True, allow_null=True)
+    teacher_name = serializers.CharField(source='teacher.user.get_full_name', read_only=True, allow_null=True)
     
     class Meta:
         model = ClassSubject
@@ -46,10 +48,100 @@ class TimeTableSerializer(serializers.ModelSerializer):
     class_name = serializers.CharField(source='class_obj.display_name', read_only=True)
     section_name = serializers.CharField(source='section.name', read_only=True)
     subject_name = serializers.CharField(source='subject.name', read_only=True)
-    teacher_name = serializers.CharField(source='teacher.full_name', read_only=True)
+    teacher_name = serializers.CharField(source='teacher.user.get_full_name', read_only=True)
     day_display = serializers.CharField(source='get_day_display', read_only=True)
     
     class Meta:
         model = TimeTable
         fields = '__all__'
-        read_only_fields = ['id']
\ No newline at end of file
+        read_only_fields = ['id']
+
+
+class SectionBulkRowSerializer(serializers.Serializer):
+    """One section of a bulk create; the class comes from the URL"""
+    name = serializers.ChoiceField(choices=Section.SECTION_CHOICES)
+    capacity = serializers.IntegerField(min_value=1, default=40)
+    room_number = serializers.CharField(max_length=10, required=False, allow_blank=True, default='')
+    section_incharge = serializers.IntegerField(required=False, allow_null=True)
+    is_active = serializers.BooleanField(default=True)
+
+
+class BulkAssignSubjectsSerializer(serializers.Serializer):
+    """Body of a bulk subject assignment; the ids are resolved by the view in bulk"""
+    class_id = serializers.IntegerField()
+    section_id = serializers.IntegerField(required=False, allow_null=True)
+    section_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    subject_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    teacher_id = serializers.IntegerField(required=False, allow_null=True)
+    periods_per_week = serializers.IntegerField(
+        min_value=1, max_value=20, default=5,
+        error_messages={
+            'min_value': 'Periods per week must be between 1 and 20.',
+            'max_value': 'Periods per week must be between 1 and 20.',
+        }
+    )
+
+
+class TimeTableImportRowSerializer(serializers.Serializer):
+    """One row of a bulk timetable import; the ids are resolved by the view in bulk"""
+    class_obj = serializers.IntegerField()
+    section = serializers.IntegerField()
+    subject = serializers.IntegerField()
+    teacher = serializers.IntegerField()
+    day = serializers.ChoiceField(choices=TimeTable.DAY_CHOICES)
+    period = serializers.IntegerField(min_value=1)
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    room_number = serializers.CharField(max_length=10, required=False, allow_blank=True, default='')
+    session = serializers.IntegerField(required=False)
+
+
+class PeriodGridSerializer(serializers.Serializer):
+    period = serializers.IntegerField(min_value=1)
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+    def validate(self, data):
+        if data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError({'end_time': 'End time must be after start time'})
+        return data
+
+
+class TimeTableGenerateSerializer(serializers.Serializer):
+    """Options of a whole-school timetable generation run"""
+    session_id = serializers.IntegerField(required=False)
+    periods = PeriodGridSerializer(many=True)
+    days = serializers.ListField(
+        child=serializers.ChoiceField(choices=TimeTable.DAY_CHOICES), required=False
+    )
+    unavailable = serializers.DictField(
+        child=serializers.ListField(child=serializers.RegexField(r'^[A-Za-z]{3}:\d+$')),
+        required=False,
+        help_text='{"<teacher_id>": ["MON:1", "TUE:3"]}'
+    )
+    max_per_day = serializers.IntegerField(min_value=1, default=2)
+    time_budget = serializers.IntegerField(min_value=1, default=DEFAULT_TIME_BUDGET)
+    replace_existing = serializers.BooleanField(default=False)
+    allow_partial = serializers.BooleanField(default=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate_time_budget(self, value):
+        # The search runs inside the request: stay under the worker timeout
+        if value > settings.TIMETABLE_MAX_TIME_BUDGET:
+            raise serializers.ValidationError(
+                f'Ensure this value is less than or equal to {settings.TIMETABLE_MAX_TIME_BUDGET}.'
+            )
+        return value
+
+    def validate_periods(self, value):
+        numbers = [period['period'] for period in value]
+        if not numbers:
+            raise serializers.ValidationError('At least one period is required')
+        if len(numbers) != len(set(numbers)):
+            raise serializers.ValidationError('Period numbers must be unique')
+        return value
+
+    def validate_unavailable(self, value):
+        if any(not str(teacher_id).isdigit() for teacher_id in value):
+            raise serializers.ValidationError('Keys must be teacher ids')
+        return value
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from teachers.models import Teacher
+from .models import Class, Section, Subject, TimeTable
+from .timetable_cache import bump_timetable_version
+
+# User fields that make up the teacher names in the cached grids
+TEACHER_NAME_FIELDS = {'first_name', 'last_name'}
+
+# Grids are dropped once the write commits: bumping inside the transaction
+# lets a concurrent request re-cache the old rows under the new version
+
+
+@receiver(post_save, sender=TimeTable)
+@receiver(post_delete, sender=TimeTable)
+def invalidate_timetable_grids(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(bump_timetable_version)
+
+
+# Class, section, subject and teacher names are part of the cached grids
+@receiver(post_save, sender=Class)
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Teacher)
+def invalidate_timetable_names(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(bump_timetable_version)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_timetable_teacher_names(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Skip the frequent saves that cannot rename a teacher (e.g. last_login on every login)
+    if raw or instance.user_type != 'teacher':
+        return
+    if update_fields is not None and not TEACHER_NAME_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(bump_timetable_version)
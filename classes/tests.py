@@ -1,3 +1,298 @@
-from django.test import TestCase
+from datetime import time
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, override_settings
+
+from schools.testing import SchoolTestCase
+from .capacity_service import create_sections, recount_allocated_capacity
+from .class_subject_service import bulk_assign_subjects
+from .models import Class, ClassSubject, Section, TimeTable
+from .serializers import BulkAssignSubjectsSerializer, TimeTableGenerateSerializer
+from .timetable_cache import teacher_week, timetable_version
+from .timetable_generator import TimetableGenerator
+from .timetable_service import find_conflicts
+
+# One school day of two 40 minute periods
+GRID = [(1, time(9, 0), time(9, 40)), (2, time(9, 40), time(10, 20))]
+
+
+class TimetableConflictTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.class_obj = self.make_class()
+        self.section_a = self.make_section(self.class_obj, 'A', room_number='101')
+        self.section_b = self.make_section(self.class_obj, 'B', room_number='102')
+        self.subject = self.make_subject()
+        self.teacher = self.make_teacher()
+        self.saved = self.period(self.section_a, self.teacher, 1, time(9, 0), time(9, 40))
+        self.saved.save()
+
+    def period(self, section, teacher, period, start, end, room_number=None):
+        return TimeTable(
+            class_obj=self.class_obj, section=section, day='MON', period=period, subject=self.subject,
+            teacher=teacher, start_time=start, end_time=end, session=self.session,
+            room_number=section.room_number if room_number is None else room_number,
+        )
+
+    def test_overlapping_teacher_is_a_conflict(self):
+        proposed = self.period(self.section_b, self.teacher, 2, time(9, 20), time(10, 0))
+
+        conflicts = find_conflicts([proposed])
+
+        self.assertEqual([conflict['dimension'] for conflict in conflicts], ['teacher'])
+        self.assertEqual(conflicts[0]['index'], 0)
+
+    def test_back_to_back_periods_do_not_clash(self):
+        proposed = self.period(self.section_b, self.teacher, 2, time(9, 40), time(10, 20))
+
+        self.assertEqual(find_conflicts([proposed]), [])
+
+    def test_batch_is_checked_against_itself(self):
+        other_teacher = self.make_teacher('Ravi', 'Kumar')
+        first = self.period(self.section_b, other_teacher, 2, time(9, 40), time(10, 20), room_number='201')
+        second = self.period(self.section_a, other_teacher, 2, time(9, 40), time(10, 20), room_number='201')
+
+        dimensions = {(conflict['index'], conflict['dimension']) for conflict in find_conflicts([first, second])}
+
+        self.assertEqual(dimensions, {(0, 'teacher'), (1, 'teacher'), (0, 'room'), (1, 'room')})
+
+    def test_save_rejects_a_double_booked_section(self):
+        clash = self.period(self.section_a, self.make_teacher('Ravi', 'Kumar'), 1, time(9, 0), time(9, 40),
+                            room_number='')
+
+        with self.assertRaises(ValidationError):
+            clash.save()
+
+
+class TimetableGeneratorTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.class_obj = self.make_class()
+        self.section = self.make_section(self.class_obj, 'A', room_number='101')
+        self.maths = self.make_subject('Mathematics')
+        self.science = self.make_subject('Science')
+        self.teacher = self.make_teacher()
+
+    def assign(self, subject, periods_per_week, teacher=None):
+        ClassSubject.objects.create(
+            class_obj=self.class_obj, section=self.section, subject=subject, session=self.session,
+            teacher=teacher or self.teacher, periods_per_week=periods_per_week,
+        )
+
+    def test_feasible_demand_is_placed_without_conflicts(self):
+        self.assign(self.maths, 3)
+        self.assign(self.science, 1, teacher=self.make_teacher('Ravi', 'Kumar'))
+
+        generator = TimetableGenerator(self.session, GRID, days=['MON', 'TUE'], max_per_day=2)
+        result = generator.solve()
+
+        self.assertTrue(result['complete'])
+        self.assertEqual(result['placed'], 4)
+        self.assertEqual(find_conflicts(generator.entries()), [])
+        self.assertEqual(generator.save(), 4)
+        self.assertEqual(TimeTable.objects.filter(session=self.session).count(), 4)
+
+    def test_infeasible_group_does_not_block_the_rest(self):
+        # Six maths periods cannot fit two days of two periods
+        self.assign(self.maths, 6)
+
+        result = TimetableGenerator(self.session, GRID, days=['MON', 'TUE'], max_per_day=2).solve()
+
+        self.assertFalse(result['complete'])
+        self.assertEqual(result['placed'], 4)
+        self.assertEqual(result['unscheduled'][0]['missing_periods'], 2)
+
+    def test_max_per_day_limits_a_subject(self):
+        self.assign(self.maths, 2)
+
+        generator = TimetableGenerator(self.session, GRID, days=['MON', 'TUE'], max_per_day=1)
+        result = generator.solve()
+
+        self.assertTrue(result['complete'])
+        self.assertEqual(sorted(entry.day for entry in generator.entries()), ['MON', 'TUE'])
+
+
+class TimetableGenerateSerializerTests(SimpleTestCase):
+
+    PERIODS = [{'period': 1, 'start_time': '09:00', 'end_time': '09:40'}]
+
+    @override_settings(TIMETABLE_MAX_TIME_BUDGET=10)
+    def test_time_budget_is_capped(self):
+        serializer = TimeTableGenerateSerializer(data={'periods': self.PERIODS, 'time_budget': 60})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('time_budget', serializer.errors)
+
+    @override_settings(TIMETABLE_MAX_TIME_BUDGET=10)
+    def test_default_time_budget_is_within_the_cap(self):
+        serializer = TimeTableGenerateSerializer(data={'periods': self.PERIODS})
+
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertLessEqual(serializer.validated_data['time_budget'], 10)
+
+
+class TimetableCacheTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.class_obj = self.make_class()
+        self.section = self.make_section(self.class_obj, 'A')
+        self.subject = self.make_subject()
+        self.teacher = self.make_teacher()
+
+    def add_period(self, period):
+        start, end = GRID[period - 1][1:]
+        return TimeTable.objects.create(
+            class_obj=self.class_obj, section=self.section, day='MON', period=period, subject=self.subject,
+            teacher=self.teacher, start_time=start, end_time=end, session=self.session,
+        )
+
+    def test_version_moves_only_when_the_write_commits(self):
+        version = timetable_version()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.add_period(1)
+            self.assertEqual(timetable_version(), version)
+
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(timetable_version(), version)
+
+    def test_cached_grid_is_served_until_invalidated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_period(1)
+        self.assertEqual(len(teacher_week(self.teacher.id, self.session.id)), 1)
+
+        with self.assertNumQueries(0):
+            teacher_week(self.teacher.id, self.session.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_period(2)
+        self.assertEqual(len(teacher_week(self.teacher.id, self.session.id)), 2)
+
+
+class CapacityCounterTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.class_obj = self.make_class(capacity=80)
+
+    def allocated(self):
+        return Class.objects.get(pk=self.class_obj.pk).allocated_capacity
+
+    def test_sections_move_the_counter(self):
+        self.make_section(self.class_obj, 'A', capacity=40)
+        section_b = self.make_section(self.class_obj, 'B', capacity=30)
+        self.assertEqual(self.allocated(), 70)
+
+        section_b = Section.objects.get(pk=section_b.pk)
+        section_b.capacity = 40
+        section_b.save()
+        self.assertEqual(self.allocated(), 80)
+
+        section_b.is_active = False
+        section_b.save()
+        self.assertEqual(self.allocated(), 40)
+
+        Section.objects.get(name='A', class_obj=self.class_obj).delete()
+        self.assertEqual(self.allocated(), 0)
+
+    def test_over_allocation_is_rejected(self):
+        self.make_section(self.class_obj, 'A', capacity=60)
+
+        with self.assertRaises(ValidationError):
+            self.make_section(Class.objects.get(pk=self.class_obj.pk), 'B', capacity=30)
+        self.assertEqual(self.allocated(), 60)
+
+    def test_bulk_create_checks_the_whole_batch(self):
+        created, errors = create_sections(self.class_obj, [
+            {'name': 'A', 'capacity': 50},
+            {'name': 'B', 'capacity': 50},
+        ])
+        self.assertEqual(created, [])
+        self.assertEqual([error['field'] for error in errors], ['capacity'])
+
+        created, errors = create_sections(self.class_obj, [
+            {'name': 'A', 'capacity': 40},
+            {'name': 'B', 'capacity': 40},
+        ])
+        self.assertEqual((len(created), errors), (2, []))
+        self.assertEqual(self.allocated(), 80)
+
+    def test_recount_repairs_the_counter(self):
+        self.make_section(self.class_obj, 'A', capacity=40)
+        Class.objects.filter(pk=self.class_obj.pk).update(allocated_capacity=5)
+
+        recount_allocated_capacity([self.class_obj.pk])
+
+        self.assertEqual(self.allocated(), 40)
+
+    def test_deferred_loads_keep_the_counter(self):
+        section = self.make_section(self.class_obj, 'A', capacity=40)
+
+        renamed = Section.objects.only('name').get(pk=section.pk)
+        renamed.name = 'B'
+        renamed.save()
+        self.assertEqual(self.allocated(), 40)
+
+        resized = Section.objects.defer('capacity').get(pk=section.pk)
+        resized.capacity = 50
+        resized.save()
+        self.assertEqual(self.allocated(), 50)
+
+        Section.objects.only('name').get(pk=section.pk).delete()
+        self.assertEqual(self.allocated(), 0)
+
+
+class BulkAssignSubjectsTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.class_obj = Class.objects.select_related('session').get(pk=self.make_class().pk)
+        self.sections = [self.make_section(self.class_obj, name) for name in ('A', 'B')]
+        self.maths = self.make_subject('Mathematics')
+        self.art = self.make_subject('Art', is_core=False)
+        self.teacher = self.make_teacher()
+
+    def test_assigns_every_section_and_skips_existing_rows(self):
+        created, skipped, errors = bulk_assign_subjects(
+            self.class_obj, self.sections, [self.maths, self.art], teacher=self.teacher,
+        )
+        self.assertEqual((len(created), skipped, errors), (4, [], []))
+        self.assertEqual(
+            {(row.section.name, row.subject.name, row.is_optional) for row in created},
+            {('A', 'Mathematics', False), ('B', 'Mathematics', False), ('A', 'Art', True), ('B', 'Art', True)},
+        )
+
+        created, skipped, errors = bulk_assign_subjects(
+            self.class_obj, self.sections, [self.maths], teacher=self.teacher,
+        )
+        self.assertEqual(created, [])
+        self.assertEqual([row['reason'] for row in skipped], ['Already assigned'] * 2)
+
+    def test_class_wide_rows_are_not_duplicated(self):
+        bulk_assign_subjects(self.class_obj, [None], [self.maths], teacher=self.teacher)
+        created, skipped, _ = bulk_assign_subjects(self.class_obj, [None], [self.maths], teacher=self.teacher)
+
+        self.assertEqual((created, len(skipped)), ([], 1))
+        self.assertEqual(ClassSubject.objects.filter(class_obj=self.class_obj, section__isnull=True).count(), 1)
+
+    def test_core_subject_needs_a_teacher(self):
+        created, _, errors = bulk_assign_subjects(self.class_obj, self.sections[:1], [self.maths, self.art])
+
+        self.assertEqual([row.subject_id for row in created], [self.art.id])
+        self.assertEqual([error['subject'] for error in errors], ['Mathematics'])
+        self.assertIn('teacher', errors[0]['errors'])
+
+    def test_serializer_rejects_bad_input(self):
+        for body in [
+            {'class_id': 'x', 'subject_ids': [1]},
+            {'class_id': 1, 'subject_ids': []},
+            {'class_id': 1, 'subject_ids': [1, 'two']},
+            {'class_id': 1, 'subject_ids': [1], 'periods_per_week': 40},
+        ]:
+            with self.subTest(body=body):
+                self.assertFalse(BulkAssignSubjectsSerializer(data=body).is_valid())
@@ -0,0 +1,99 @@
+# classes/timetable_cache.py
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Cache keys are tenant-prefixed by the CACHES KEY_FUNCTION (django_tenants.cache.make_key)
+VERSION_KEY = 'timetable:version'
+
+WEEK_ORDER = {'MON': 0, 'TUE': 1, 'WED': 2, 'THU': 3, 'FRI': 4, 'SAT': 5, 'SUN': 6}
+
+
+def timetable_version():
+    """Current timetable version of the tenant; changes on every TimeTable write"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so a lost version key never reuses an old number
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def bump_timetable_version():
+    """Invalidate every cached grid of the tenant (called from TimeTable writes)"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def teacher_week(teacher_id, session_id):
+    """
+    Serialized weekly grid of a teacher, ordered by day and period
+
+    Returns:
+        list: TimeTableSerializer data of the teacher's active periods
+    """
+    from .models import TimeTable
+    from .serializers import TimeTableSerializer
+
+    def build():
+        periods = TimeTable.objects.filter(
+            teacher_id=teacher_id, session_id=session_id, is_active=True
+        ).select_related('class_obj', 'section', 'subject', 'teacher__user')
+        return _in_week_order(TimeTableSerializer(periods, many=True).data)
+
+    return _cached(f'teacher:{teacher_id}', session_id, TimeTableSerializer, build)
+
+
+def section_week(section_id, session_id, serializer_class=None):
+    """
+    Serialized weekly grid of a class-section, ordered by day and period
+
+    Args:
+        serializer_class: Shape of each period (default: TimeTableSerializer);
+            every shape is cached separately
+    """
+    from .models import TimeTable
+    from .serializers import TimeTableSerializer
+
+    serializer_class = serializer_class or TimeTableSerializer
+
+    def build():
+        periods = TimeTable.objects.filter(
+            section_id=section_id, session_id=session_id, is_active=True
+        ).select_related('class_obj', 'section', 'subject', 'teacher__user')
+        return _in_week_order(serializer_class(periods, many=True).data)
+
+    return _cached(f'section:{section_id}', session_id, serializer_class, build)
+
+
+def periods_on(grid, day):
+    """Periods of one day (MON, TUE, ...) from a weekly grid"""
+    return [period for period in grid if period['day'] == day]
+
+
+def by_day(grid):
+    """{day: [periods]} in week order"""
+    grouped = {}
+    for period in grid:
+        grouped.setdefault(period['day'], []).append(period)
+    return grouped
+
+
+def _cached(owner, session_id, serializer_class, build):
+    key = f'timetable:{session_id}:{timetable_version()}:{serializer_class.__name__}:{owner}'
+    grid = cache.get(key)
+    if grid is None:
+        grid = build()
+        cache.set(key, grid, settings.TIMETABLE_CACHE_TIMEOUT)
+    return grid
+
+
+def _in_week_order(data):
+    # TimeTable.Meta orders by the day code alphabetically (FRI first); the grid runs MON-SAT
+    rows = [dict(row) for row in data]
+    rows.sort(key=lambda row: (WEEK_ORDER.get(row['day'], 7), row['period']))
+    return rows
@@ -0,0 +1,433 @@
+# classes/timetable_generator.py
+
+import logging
+import time
+from collections import defaultdict
+
+from django.db import transaction
+
+from .timetable_cache import bump_timetable_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
+DEFAULT_TIME_BUDGET = 10  # seconds
+
+
+class _Group:
+    """
+    The remaining periods of one (section, subject, teacher) demand
+
+    `domain` holds the (day, period) slots the next period of this group
+    could still take; it shrinks as sections, teachers and rooms fill up.
+    """
+
+    __slots__ = ('index', 'section', 'subject_id', 'teacher_id', 'room', 'required', 'remaining', 'domain', 'per_day')
+
+    def __init__(self, index, section, subject_id, teacher_id, room, remaining, domain):
+        self.index = index
+        self.section = section
+        self.subject_id = subject_id
+        self.teacher_id = teacher_id
+        self.room = room
+        self.required = remaining
+        self.remaining = remaining
+        self.domain = domain
+        self.per_day = defaultdict(int)
+
+
+class _Frame:
+    """One period being placed: the candidate slots tried so far and how to undo the current one"""
+
+    __slots__ = ('group', 'candidates', 'next', 'slot', 'undo')
+
+    def __init__(self, group, candidates):
+        self.group = group
+        self.candidates = candidates
+        self.next = 0
+        self.slot = None
+        self.undo = None
+
+
+class TimetableGenerator:
+    """
+    Build a conflict-free timetable for every section of a session
+
+    Demand comes from ClassSubject.periods_per_week (a class-wide
+    ClassSubject applies to each section without its own row). Each period
+    needs a slot where its section, teacher and room (the section's
+    room_number) are all free, the teacher is available and the subject
+    has not hit max_per_day for that section.
+
+    The solver is a backtracking search with forward checking: placing a
+    period removes its slot from the domain of every group sharing the
+    section, teacher or room, and the next group tried is the one with
+    the least slack (free slots minus periods still needed). The periods
+    of a group are interchangeable, so they are placed in increasing slot
+    order and each ordering is explored only once. Groups that cannot get
+    all their periods even on an empty timetable are cut down to what fits
+    before the search, so the rest is still solved. Existing timetable
+    rows are kept as pinned periods unless replace_existing.
+
+    Usage:
+        generator = TimetableGenerator(session, grid)
+        result = generator.solve()
+        if result['complete']:
+            generator.save()
+    """
+
+    def __init__(self, session, grid, days=None, unavailable=None, max_per_day=2,
+                 time_budget=DEFAULT_TIME_BUDGET, replace_existing=False):
+        """
+        Args:
+            session: SchoolSession to build the timetable for
+            grid: [(period, start_time, end_time)] of one school day
+            days: Day codes to fill (default: MON-SAT)
+            unavailable: {teacher_id: {(day, period)}} slots a teacher cannot take
+            max_per_day: Most periods of one subject per section per day
+            time_budget: Seconds before the search stops with the best partial result
+            replace_existing: Ignore (and on save, delete) the session's current timetable
+        """
+        self.session = session
+        self.grid = {period: (start, end) for period, start, end in grid}
+        self.days = list(days or DEFAULT_DAYS)
+        self.slots = [(day, period) for day in self.days for period in sorted(self.grid)]
+        self._position = {slot: index for index, slot in enumerate(self.slots)}
+        self.unavailable = unavailable or {}
+        self.max_per_day = max_per_day
+        self.time_budget = time_budget
+        self.replace_existing = replace_existing
+
+        self.groups = []
+        self.pinned = []
+        self.unassigned = []
+        self.best = []
+        self.result = None
+        self._loaded = False
+
+    # ============ Model ============
+
+    def load(self):
+        """Read sections, ClassSubject demand and pinned periods (four queries)"""
+        from .models import ClassSubject, Section, TimeTable
+
+        sections = {
+            section.id: section
+            for section in Section.objects.filter(
+                class_obj__session=self.session, class_obj__is_active=True, is_active=True
+            ).select_related('class_obj')
+        }
+        sections_by_class = defaultdict(list)
+        for section in sections.values():
+            sections_by_class[section.class_obj_id].append(section)
+
+        class_subjects = list(
+            ClassSubject.objects.filter(session=self.session, subject__is_active=True)
+            .select_related('class_obj', 'section', 'subject', 'teacher')
+            .order_by('class_obj_id', 'section_id', 'subject_id')
+        )
+        # A section's own ClassSubject overrides the class-wide one for that subject
+        own = {(cs.section_id, cs.subject_id) for cs in class_subjects if cs.section_id}
+
+        demand = defaultdict(int)
+        teachers = {}
+        for cs in class_subjects:
+            if cs.teacher_id is None or not cs.teacher.is_active:
+                self.unassigned.append({
+                    'class': cs.class_obj.display_name,
+                    'section': cs.section.name if cs.section else None,
+                    'subject': cs.subject.name,
+                    'reason': 'No active teacher assigned',
+                })
+                continue
+            targets = [sections[cs.section_id]] if cs.section_id in sections else (
+                [] if cs.section_id else
+                [s for s in sections_by_class[cs.class_obj_id] if (s.id, cs.subject_id) not in own]
+            )
+            for section in targets:
+                key = (section.id, cs.subject_id)
+                demand[key] += cs.periods_per_week
+                teachers[key] = cs.teacher_id
+
+        # Pinned periods occupy their slots and count towards the demand
+        section_busy, teacher_busy, room_busy = set(), set(), set()
+        pinned_per_day = defaultdict(int)
+        if not self.replace_existing:
+            self.pinned = list(
+                TimeTable.objects.filter(session=self.session, is_active=True)
+                .values('section_id', 'subject_id', 'teacher_id', 'room_number', 'day', 'period')
+            )
+        for row in self.pinned:
+            slot = (row['day'], row['period'])
+            section_busy.add((row['section_id'], slot))
+            teacher_busy.add((row['teacher_id'], slot))
+            if row['room_number']:
+                room_busy.add((row['room_number'], slot))
+            key = (row['section_id'], row['subject_id'])
+            pinned_per_day[key + (row['day'],)] += 1
+            if demand.get(key):
+                demand[key] -= 1
+
+        for (section_id, subject_id), periods in sorted(demand.items()):
+            if periods <= 0:
+                continue
+            section = sections[section_id]
+            teacher_id = teachers[(section_id, subject_id)]
+            room = section.room_number or None
+            blocked = self.unavailable.get(teacher_id, set())
+            domain = {
+                slot for slot in self.slots
+                if (section_id, slot) not in section_busy
+                and (teacher_id, slot) not in teacher_busy
+                and (room is None or (room, slot) not in room_busy)
+                and slot not in blocked
+                and pinned_per_day[(section_id, subject_id, slot[0])] < self.max_per_day
+            }
+            group = _Group(len(self.groups), section, subject_id, teacher_id, room, periods, domain)
+            for day in self.days:
+                group.per_day[day] = pinned_per_day[(section_id, subject_id, day)]
+            self.groups.append(group)
+
+        self._by_section = defaultdict(list)
+        self._by_teacher = defaultdict(list)
+        self._by_room = defaultdict(list)
+        for group in self.groups:
+            self._by_section[group.section.id].append(group)
+            self._by_teacher[group.teacher_id].append(group)
+            if group.room:
+                self._by_room[group.room].append(group)
+        self._loaded = True
+        return self
+
+    # ============ Search ============
+
+    def solve(self):
+        """
+        Run the search until every period is placed, the demand is proven
+        infeasible or the time budget runs out
+
+        Returns:
+            dict: {'complete', 'placed', 'required', 'unscheduled', 'unassigned', 'elapsed_ms', 'timed_out'}
+        """
+        if not self._loaded:
+            self.load()
+        started = time.monotonic()
+        deadline = started + self.time_budget
+        required = sum(group.remaining for group in self.groups)
+
+        # Demand no search can meet is dropped up front (reported as
+        # unscheduled); otherwise the first group would already have
+        # negative slack and nothing at all would be placed
+        short = False
+        for group in self.groups:
+            fits = self._capacity(group)
+            if fits < group.remaining:
+                group.remaining = fits
+                short = True
+
+        stack = []
+        finished = timed_out = False
+        steps = 0
+        while True:
+            steps += 1
+            if steps % 256 == 0 and time.monotonic() > deadline:
+                timed_out = True
+                break
+
+            group = self._select()
+            if group is None:
+                finished = True
+                break
+            if len(group.domain) >= group.remaining:
+                stack.append(_Frame(group, self._order(group)))
+
+            # Place the next candidate of the newest frame, backtracking through exhausted ones
+            while stack:
+                frame = stack[-1]
+                if frame.undo is not None:
+                    self._unassign(frame)
+                if frame.next < len(frame.candidates):
+                    slot = frame.candidates[frame.next]
+                    frame.next += 1
+                    if slot in frame.group.domain:
+                        self._assign(frame, slot)
+                        break
+                    continue
+                stack.pop()
+            else:
+                break  # every option exhausted: the demand cannot be met
+
+            if len(stack) > len(self.best):
+                self.best = [(frame.group, frame.slot) for frame in stack]
+
+        if finished:
+            self.best = [(frame.group, frame.slot) for frame in stack]
+        complete = finished and not short
+
+        placed = defaultdict(int)
+        for group, _ in self.best:
+            placed[group.index] += 1
+        unscheduled = [
+            {
+                'class': group.section.class_obj.display_name,
+                'section': group.section.name,
+                'subject_id': group.subject_id,
+                'teacher_id': group.teacher_id,
+                'missing_periods': group.required - placed[group.index],
+            }
+            for group in self.groups
+            if group.required > placed[group.index]
+        ]
+
+        self.result = {
+            'complete': complete,
+            'placed': len(self.best),
+            'pinned': len(self.pinned),
+            'required': required,
+            'unscheduled': unscheduled,
+            'unassigned': self.unassigned,
+            'elapsed_ms': int((time.monotonic() - started) * 1000),
+            'timed_out': timed_out,
+        }
+        logger.info('Timetable generation for session %s: %s', self.session.id, {
+            key: value for key, value in self.result.items() if key not in ('unscheduled', 'unassigned')
+        })
+        return self.result
+
+    def _select(self):
+        """Most constrained group: least free slots beyond the periods it still needs"""
+        best, best_slack = None, None
+        for group in self.groups:
+            if group.remaining <= 0:
+                continue
+            slack = len(group.domain) - group.remaining
+            if best is None or slack < best_slack:
+                best, best_slack = group, slack
+                if slack < 0:
+                    break
+        return best
+
+    def _capacity(self, group):
+        """Most periods the group could take in its domain given max_per_day"""
+        per_day = defaultdict(int)
+        for day, _ in group.domain:
+            per_day[day] += 1
+        return sum(
+            max(0, min(count, self.max_per_day - group.per_day[day]))
+            for day, count in per_day.items()
+        )
+
+    def _order(self, group):
+        """
+        Spread a subject over the week (days it has fewest periods on
+        first), then least constraining first: slots the fewest other
+        groups of the same section, teacher or room could still use
+
+        Slots leaving too few later slots for the group's other periods
+        are left out (periods are placed in increasing slot order).
+        """
+        neighbours = self._neighbours(group)
+        positions = sorted(self._position[slot] for slot in group.domain)
+        # Only the first (len - remaining + 1) slots have enough successors
+        last_start = positions[len(positions) - group.remaining] if positions else -1
+        candidates = [slot for slot in group.domain if self._position[slot] <= last_start]
+        return sorted(candidates, key=lambda slot: (
+            group.per_day[slot[0]],
+            sum(1 for other in neighbours if other is not group and other.remaining and slot in other.domain),
+            self.days.index(slot[0]),
+            slot[1],
+        ))
+
+    def _neighbours(self, group):
+        neighbours = self._by_section[group.section.id] + self._by_teacher[group.teacher_id]
+        if group.room:
+            neighbours += self._by_room[group.room]
+        return neighbours
+
+    def _assign(self, frame, slot):
+        group = frame.group
+        undo = []
+        for other in self._neighbours(group):
+            if slot in other.domain:
+                other.domain.discard(slot)
+                undo.append((other, slot))
+
+        group.remaining -= 1
+        group.per_day[slot[0]] += 1
+        # Later periods of the group go after this slot, and not on a full day
+        position = self._position[slot]
+        day_full = group.per_day[slot[0]] >= self.max_per_day
+        for other_slot in [
+            s for s in group.domain
+            if self._position[s] < position or (day_full and s[0] == slot[0])
+        ]:
+            group.domain.discard(other_slot)
+            undo.append((group, other_slot))
+        frame.slot = slot
+        frame.undo = undo
+
+    def _unassign(self, frame):
+        group = frame.group
+        for other, slot in frame.undo:
+            other.domain.add(slot)
+        group.remaining += 1
+        group.per_day[frame.slot[0]] -= 1
+        frame.slot = None
+        frame.undo = None
+
+    # ============ Output ============
+
+    def entries(self):
+        """Unsaved TimeTable rows for the placed periods"""
+        from .models import TimeTable
+
+        rows = []
+        for group, (day, period) in self.best:
+            start_time, end_time = self.grid[period]
+            rows.append(TimeTable(
+                class_obj_id=group.section.class_obj_id,
+                section=group.section,
+                day=day,
+                period=period,
+                subject_id=group.subject_id,
+                teacher_id=group.teacher_id,
+                start_time=start_time,
+                end_time=end_time,
+                room_number=group.room or '',
+                session=self.session,
+                is_active=True,
+            ))
+        rows.sort(key=lambda row: (row.section.id, self.days.index(row.day), row.period))
+        return rows
+
+    def save(self):
+        """
+        Bulk insert the generated periods (replacing the session's
+        timetable when replace_existing)
+
+        Returns:
+            int: Rows created
+        """
+        from .models import TimeTable
+
+        rows = self.entries()
+        with transaction.atomic():
+            if self.replace_existing:
+                TimeTable.objects.filter(session=self.session).delete()
+            TimeTable.objects.bulk_create(rows, batch_size=1000)
+        # bulk_create sends no post_save, so drop the cached grids here
+        transaction.on_commit(bump_timetable_version)
+        return len(rows)
+
+
+def parse_unavailable(value):
+    """{"12": ["MON:1", "TUE:3"]} -> {12: {('MON', 1), ('TUE', 3)}}"""
+    unavailable = {}
+    for teacher_id, slots in (value or {}).items():
+        parsed = set()
+        for slot in slots:
+            day, _, period = str(slot).partition(':')
+            parsed.add((day.upper(), int(period)))
+        unavailable[int(teacher_id)] = parsed
+    return unavailable
+
@@ -0,0 +1,183 @@
+# classes/timetable_service.py
+
+from collections import defaultdict
+
+# Resources a period occupies: (dimension, key on the proposed slot, error field)
+DIMENSIONS = [
+    ('teacher', 'teacher_id', 'teacher'),
+    ('room', 'room_number', 'room_number'),
+    ('section', 'section_id', 'section'),
+]
+
+_EXISTING_FIELDS = (
+    'id', 'day', 'period', 'start_time', 'end_time', 'teacher_id', 'room_number', 'section_id',
+    'session_id', 'class_obj__display_name', 'section__name',
+)
+
+
+def find_conflicts(slots):
+    """
+    Every teacher, room and class-section clash of the proposed slots,
+    against the saved timetable and against each other
+
+    One query per dimension loads the saved periods that could clash
+    (same session, day and teacher / room / section); each
+    (session, resource, day) group is then swept in start-time order, so
+    a batch of n slots costs three queries instead of O(n) per slot.
+
+    Args:
+        slots: Unsaved or edited TimeTable instances; class_obj and section
+            must already be loaded (they name the slot in messages)
+
+    Returns:
+        list: Conflict dicts {'index', 'field', 'dimension', 'day', 'start_time',
+            'end_time', 'conflict_with', 'message'}, ordered by index
+    """
+    from .models import TimeTable
+
+    slots = list(slots)
+    if not slots:
+        return []
+
+    proposed = [_proposed_interval(index, slot) for index, slot in enumerate(slots)]
+    editing = [slot.pk for slot in slots if slot.pk]
+    sessions = {item['session_id'] for item in proposed}
+    days = {item['day'] for item in proposed}
+
+    conflicts = []
+    for dimension, key, field in DIMENSIONS:
+        values = {item[key] for item in proposed if item[key]}
+        if not values:
+            continue
+
+        existing = (
+            TimeTable.objects.filter(
+                session_id__in=sessions, day__in=days, is_active=True, **{f'{key}__in': values}
+            )
+            .exclude(pk__in=editing)
+            .values(*_EXISTING_FIELDS)
+        )
+
+        groups = defaultdict(list)
+        for row in existing:
+            groups[(row['session_id'], row[key], row['day'])].append(_existing_interval(row))
+        for item in proposed:
+            if item[key]:
+                groups[(item['session_id'], item[key], item['day'])].append(item)
+
+        for intervals in groups.values():
+            for first, second in _clashes(intervals, same_period=dimension == 'section'):
+                for item, other in ((first, second), (second, first)):
+                    if item['index'] is not None:
+                        conflicts.append(_conflict(dimension, field, item, other, slots))
+
+    conflicts.sort(key=lambda conflict: (conflict['index'], conflict['field']))
+    return conflicts
+
+
+def conflict_errors(conflicts):
+    """Conflict messages grouped by field, as ValidationError(dict) expects"""
+    errors = defaultdict(list)
+    for conflict in conflicts:
+        errors[conflict['field']].append(conflict['message'])
+    return dict(errors)
+
+
+def _clashes(intervals, same_period=False):
+    """
+    (a, b) pairs of overlapping intervals with at least one proposed
+
+    Sorted sweep: an interval clashes with every earlier one still running
+    at its start. With same_period, equal period numbers also clash (the
+    unique class-section slot), whatever their times.
+    """
+    intervals.sort(key=lambda item: (item['start'], item['end']))
+    running = []
+    seen = set()
+    for item in intervals:
+        running = [other for other in running if other['end'] > item['start']]
+        for other in running:
+            if item['index'] is not None or other['index'] is not None:
+                seen.add((id(item), id(other)))
+                yield item, other
+        running.append(item)
+
+    if same_period:
+        by_period = defaultdict(list)
+        for item in intervals:
+            by_period[item['period']].append(item)
+        for items in by_period.values():
+            for position, item in enumerate(items):
+                for other in items[:position]:
+                    if (item['index'] is not None or other['index'] is not None) \
+                            and (id(item), id(other)) not in seen and (id(other), id(item)) not in seen:
+                        yield item, other
+
+
+def _proposed_interval(index, slot):
+    return {
+        'index': index,
+        'id': slot.pk,
+        'day': slot.day,
+        'period': slot.period,
+        'start': slot.start_time,
+        'end': slot.end_time,
+        'teacher_id': slot.teacher_id,
+        'room_number': slot.room_number or None,
+        'section_id': slot.section_id,
+        'session_id': slot.session_id,
+        'class_name': slot.class_obj.display_name,
+        'section_name': slot.section.name,
+    }
+
+
+def _existing_interval(row):
+    return {
+        'index': None,
+        'id': row['id'],
+        'day': row['day'],
+        'period': row['period'],
+        'start': row['start_time'],
+        'end': row['end_time'],
+        'teacher_id': row['teacher_id'],
+        'room_number': row['room_number'] or None,
+        'section_id': row['section_id'],
+        'session_id': row['session_id'],
+        'class_name': row['class_obj__display_name'],
+        'section_name': row['section__name'],
+    }
+
+
+def _conflict(dimension, field, item, other, slots):
+    """Conflict of proposed `item` with `other` (saved or proposed)"""
+    from .models import TimeTable
+
+    slot = slots[item['index']]
+    day = dict(TimeTable.DAY_CHOICES).get(item['day'], item['day'])
+    when = f"from {other['start'].strftime('%H:%M')} to {other['end'].strftime('%H:%M')} on {day}"
+    occupied = f"{other['class_name']} {other['section_name']} {when}"
+    if dimension == 'teacher':
+        message = f'Teacher {slot.teacher.user.get_full_name()} is already assigned to {occupied}.'
+    elif dimension == 'room':
+        message = f'Room {item["room_number"]} is already occupied by {occupied}.'
+    else:
+        message = f"{other['class_name']} {other['section_name']} already has period {other['period']} {when}."
+
+    return {
+        'index': item['index'],
+        'field': field,
+        'dimension': dimension,
+        'day': item['day'],
+        'start_time': item['start'].strftime('%H:%M'),
+        'end_time': item['end'].strftime('%H:%M'),
+        'conflict_with': {
+            'id': other['id'],
+            'index': other['index'],
+            'class': other['class_name'],
+            'section': other['section_name'],
+            'period': other['period'],
+            'start_time': other['start'].strftime('%H:%M'),
+            'end_time': other['end'].strftime('%H:%M'),
+        },
+        'message': message,
+    }
@@ -36,9 +36,12 @@ urlpatterns = [
     path('timetables/<int:pk>/', TimeTableRetrieveAPIView.as_view(), name='timetable-retrieve'),
     path('timetables/<int:pk>/update/', TimeTableUpdateAPIView.as_view(), name='timetable-update'),
     path('timetables/<int:pk>/delete/', TimeTableDeleteAPIView.as_view(), name='timetable-delete'),
+    path('timetables/bulk-import/', TimeTableBulkImportAPIView.as_view(), name='timetable-bulk-import'),
+    path('timetables/generate/', TimeTableGenerateAPIView.as_view(), name='timetable-generate'),
     
     # ==================== SPECIAL URLs ====================
     path('classes/<int:class_id>/sections/', ClassSectionCheckAPIView.as_view(), name='class-sections'),
+    path('classes/<int:class_id>/sections/bulk-create/', SectionBulkCreateAPIView.as_view(), name='class-sections-bulk-create'),
     path('class-subjects/bulk-assign/', BulkAssignSubjectsAPIView.as_view(), name='bulk-assign-subjects'),
     path('class-subjects/assigned/', AssignedSubjectsAPIView.as_view(), name='assigned-subjects'),
 ]
\ No newline at end of file
@@ -3,15 +3,22 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.core.exceptions import ValidationError as DjangoValidationError
-from django.db import IntegrityError
-from django.db.models import Sum
+from django.db import IntegrityError, connection, transaction
 
 from .models import Class, Section, Subject, ClassSubject, TimeTable
 from schools.models import SchoolSession
+from schools.session_resolver import get_current_session
+from teachers.models import Teacher
 from .serializers import (
     ClassSerializer, SectionSerializer, SubjectSerializer,
-    ClassSubjectSerializer, TimeTableSerializer
+    ClassSubjectSerializer, TimeTableSerializer, TimeTableImportRowSerializer,
+    TimeTableGenerateSerializer, SectionBulkRowSerializer, BulkAssignSubjectsSerializer
 )
+from .capacity_service import create_sections
+from .class_subject_service import bulk_assign_subjects
+from .timetable_generator import TimetableGenerator, parse_unavailable
+from .timetable_cache import bump_timetable_version
+from .timetable_service import find_conflicts
 
 
 # ==================== CLASS VIEWS ====================
@@ -32,7 +39,7 @@ class ClassListAPIView(APIView):
             classes = classes.filter(session_id=session_id)
         else:
             # Default: current session
-            current_session = SchoolSession.objects.filter(is_current=True).first()
+            current_session = get_current_session(request)
             if current_session:
                 classes = classes.filter(session=current_session)
             
@@ -50,7 +57,7 @@ class ClassCreateAPIView(APIView):
     def post(self, request):
         # ✅ Auto-assign current session if not provided
         if 'session' not in request.data:
-            current_session = SchoolSession.objects.filter(is_current=True).first()
+            current_session = get_current_session(request)
             if not current_session:
                 return Response(
                     {"error": "No active session found. Please create a session first."},
@@ -96,15 +103,14 @@ class ClassRetrieveAPIView(APIView):
         
         # ✅ Additional metadata
         sections = class_obj.sections.filter(is_active=True)
-        total_section_capacity = sections.aggregate(total=Sum('capacity'))['total'] or 0
         
         return Response({
             'success': True,
             'data': serializer.data,
             'meta': {
                 'sections_count': sections.count(),
-                'total_section_capacity': total_section_capacity,
-                'remaining_capacity': class_obj.capacity - total_section_capacity
+                'total_section_capacity': class_obj.allocated_capacity,
+                'remaining_capacity': class_obj.capacity - class_obj.allocated_capacity
             }
         }, status=status.HTTP_200_OK)
 
@@ -300,6 +306,80 @@ class SectionDeleteAPIView(APIView):
         )
 
 
+class SectionBulkCreateAPIView(APIView):
+    """
+    POST: Create several sections of one class at once
+
+    Body:
+    {
+        "sections": [
+            {"name": "A", "capacity": 40, "room_number": "101", "section_incharge": 7},
+            {"name": "B", "capacity": 40}
+        ],
+        "dry_run": false
+    }
+
+    The whole set is validated against the class (names, incharges and
+    the combined capacity) before anything is saved.
+    """
+
+    def post(self, request, class_id):
+        try:
+            class_obj = Class.objects.get(pk=class_id)
+        except Class.DoesNotExist:
+            return Response(
+                {"error": "Class not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        rows = request.data.get('sections')
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {"error": "sections must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = SectionBulkRowSerializer(data=rows, many=True)
+        if not rows.is_valid():
+            return Response({
+                'success': False,
+                'error': 'Validation error',
+                'details': rows.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = bool(request.data.get('dry_run'))
+        try:
+            sections, errors = create_sections(class_obj, rows.validated_data, dry_run=dry_run)
+        except IntegrityError as e:
+            return Response(
+                {"error": "Section already exists for this class", "details": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if errors:
+            return Response({
+                'success': False,
+                'error': 'Validation error',
+                'errors': errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if dry_run:
+            return Response({
+                'success': True,
+                'message': f'{len(rows.validated_data)} sections can be created',
+                'count': len(rows.validated_data),
+                'remaining_capacity': class_obj.capacity - class_obj.allocated_capacity
+            }, status=status.HTTP_200_OK)
+
+        return Response({
+            'success': True,
+            'message': f'{len(sections)} sections created successfully',
+            'count': len(sections),
+            'remaining_capacity': class_obj.capacity - class_obj.allocated_capacity,
+            'data': SectionSerializer(sections, many=True).data
+        }, status=status.HTTP_201_CREATED)
+
+
 # ==================== SUBJECT VIEWS ====================
 class SubjectListAPIView(APIView):
     """GET: Returns list of all subjects"""
@@ -444,7 +524,7 @@ class ClassSubjectListAPIView(APIView):
         if session_id:
             class_subjects = class_subjects.filter(session_id=session_id)
         else:
-            current_session = SchoolSession.objects.filter(is_current=True).first()
+            current_session = get_current_session(request)
             if current_session:
                 class_subjects = class_subjects.filter(session=current_session)
         
@@ -588,7 +668,7 @@ class TimeTableListAPIView(APIView):
         if session_id:
             timetable = timetable.filter(session_id=session_id)
         else:
-            current_session = SchoolSession.objects.filter(is_current=True).first()
+            current_session = get_current_session(request)
             if current_session:
                 timetable = timetable.filter(session=current_session)
         
@@ -706,6 +786,227 @@ class TimeTableDeleteAPIView(APIView):
         )
 
 
+class TimeTableBulkImportAPIView(APIView):
+    """
+    POST: Create many timetable entries at once
+
+    Body:
+    {
+        "entries": [
+            {"class_obj": 5, "section": 1, "subject": 3, "teacher": 2, "day": "MON", "period": 1,
+             "start_time": "09:00", "end_time": "09:45", "room_number": "101"}
+        ],
+        "dry_run": false
+    }
+
+    Every row is validated and all teacher, room and class-section
+    conflicts (with saved periods and within the batch) are reported
+    together; nothing is saved unless every row passes. dry_run only
+    reports.
+    """
+
+    def post(self, request):
+        entries = request.data.get('entries')
+        if not isinstance(entries, list) or not entries:
+            return Response(
+                {"error": "entries must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = TimeTableImportRowSerializer(data=entries, many=True)
+        if not rows.is_valid():
+            return Response({
+                'success': False,
+                'error': 'Validation error',
+                'details': rows.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        rows = rows.validated_data
+
+        # Resolve every referenced id with one query per model
+        lookups = {
+            'class_obj': Class.objects.in_bulk({row['class_obj'] for row in rows}),
+            'section': Section.objects.in_bulk({row['section'] for row in rows}),
+            'subject': Subject.objects.in_bulk({row['subject'] for row in rows}),
+            'teacher': Teacher.objects.select_related('user').in_bulk({row['teacher'] for row in rows}),
+        }
+
+        errors = []
+        slots, row_indexes = [], []
+        for index, row in enumerate(rows):
+            missing = [field for field, objects in lookups.items() if row[field] not in objects]
+            if missing:
+                errors.extend(
+                    {'index': index, 'field': field, 'message': f'{field} {row[field]} not found'}
+                    for field in missing
+                )
+                continue
+
+            class_obj = lookups['class_obj'][row['class_obj']]
+            slot = TimeTable(
+                class_obj=class_obj,
+                section=lookups['section'][row['section']],
+                subject=lookups['subject'][row['subject']],
+                teacher=lookups['teacher'][row['teacher']],
+                day=row['day'],
+                period=row['period'],
+                start_time=row['start_time'],
+                end_time=row['end_time'],
+                room_number=row['room_number'],
+                session_id=row.get('session') or class_obj.session_id,
+            )
+            try:
+                slot.validate_slot()
+            except DjangoValidationError as e:
+                errors.extend(
+                    {'index': index, 'field': field, 'message': message}
+                    for field, messages in e.message_dict.items()
+                    for message in messages
+                )
+                continue
+            slots.append(slot)
+            row_indexes.append(index)
+
+        # Conflict indexes refer to `slots`; report them as request row numbers
+        conflicts = find_conflicts(slots)
+        for conflict in conflicts:
+            conflict['index'] = row_indexes[conflict['index']]
+            if conflict['conflict_with']['index'] is not None:
+                conflict['conflict_with']['index'] = row_indexes[conflict['conflict_with']['index']]
+
+        if errors or conflicts:
+            return Response({
+                'success': False,
+                'error': 'Timetable conflicts',
+                'errors': errors,
+                'conflicts': conflicts
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.data.get('dry_run'):
+            return Response({
+                'success': True,
+                'message': f'{len(slots)} timetable entries can be imported',
+                'count': len(slots)
+            }, status=status.HTTP_200_OK)
+
+        try:
+            with transaction.atomic():
+                TimeTable.objects.bulk_create(slots)
+            # bulk_create sends no post_save, so drop the cached grids here
+            transaction.on_commit(bump_timetable_version)
+        except IntegrityError as e:
+            return Response(
+                {"error": "Timetable slot already occupied", "details": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'success': True,
+            'message': f'{len(slots)} timetable entries created successfully',
+            'count': len(slots)
+        }, status=status.HTTP_201_CREATED)
+
+
+class TimeTableGenerateAPIView(APIView):
+    """
+    POST: Generate the whole school's timetable for a session
+
+    Body:
+    {
+        "session_id": 3,                      # default: current session
+        "periods": [{"period": 1, "start_time": "09:00", "end_time": "09:45"}, ...],
+        "days": ["MON", "TUE", "WED", "THU", "FRI", "SAT"],
+        "unavailable": {"12": ["MON:1", "SAT:8"]},
+        "max_per_day": 2,
+        "time_budget": 10,                    # seconds, at most TIMETABLE_MAX_TIME_BUDGET
+        "replace_existing": false,            # false: existing periods stay as pinned slots
+        "allow_partial": false,
+        "dry_run": false
+    }
+
+    Demand is ClassSubject.periods_per_week with the assigned teacher; the
+    result is saved only when complete (or allow_partial) and not dry_run.
+    """
+
+    def post(self, request):
+        serializer = TimeTableGenerateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'Validation error',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        options = serializer.validated_data
+
+        if options.get('session_id'):
+            session = SchoolSession.objects.filter(
+                id=options['session_id'], school=connection.tenant
+            ).first()
+        else:
+            session = get_current_session(request)
+        if session is None:
+            return Response(
+                {"error": "Session not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        generator = TimetableGenerator(
+            session,
+            grid=[(p['period'], p['start_time'], p['end_time']) for p in options['periods']],
+            days=options.get('days'),
+            unavailable=parse_unavailable(options.get('unavailable')),
+            max_per_day=options['max_per_day'],
+            time_budget=options['time_budget'],
+            replace_existing=options['replace_existing'],
+        )
+        result = generator.solve()
+
+        if not result['complete'] and not options['allow_partial']:
+            return Response({
+                'success': False,
+                'error': 'Timetable could not be completed',
+                'message': (
+                    'Time budget exceeded' if result['timed_out']
+                    else 'The periods requested do not fit the grid'
+                ),
+                'data': result
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if options['dry_run']:
+            return Response({
+                'success': True,
+                'message': f"{result['placed']} periods can be scheduled",
+                'data': result,
+                'entries': [
+                    {
+                        'class_obj': entry.class_obj_id,
+                        'section': entry.section_id,
+                        'day': entry.day,
+                        'period': entry.period,
+                        'subject': entry.subject_id,
+                        'teacher': entry.teacher_id,
+                        'start_time': entry.start_time.strftime('%H:%M'),
+                        'end_time': entry.end_time.strftime('%H:%M'),
+                        'room_number': entry.room_number,
+                    }
+                    for entry in generator.entries()
+                ]
+            }, status=status.HTTP_200_OK)
+
+        try:
+            created = generator.save()
+        except IntegrityError as e:
+            return Response(
+                {"error": "Timetable slot already occupied", "details": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'success': True,
+            'message': f'{created} timetable entries created successfully',
+            'data': result
+        }, status=status.HTTP_201_CREATED)
+
+
 # ==================== SPECIAL VIEWS ====================
 class ClassSectionCheckAPIView(APIView):
     """GET: Check sections for a specific class"""
@@ -732,20 +1033,34 @@ class ClassSectionCheckAPIView(APIView):
 
 
 class BulkAssignSubjectsAPIView(APIView):
-    """POST: Bulk assign subjects to a class/section"""
+    """
+    POST: Bulk assign subjects to a class, one section or many sections
+
+    Body:
+    {
+        "class_id": 5,
+        "section_ids": [1, 2, 3],      # or "section_id": 1, or neither for class-wide
+        "subject_ids": [3, 4, 7],
+        "teacher_id": 2,
+        "periods_per_week": 5
+    }
+    """
     
     def post(self, request):
-        class_id = request.data.get('class_id')
-        section_id = request.data.get('section_id')
-        subject_ids = request.data.get('subject_ids', [])
-        teacher_id = request.data.get('teacher_id')
-        periods_per_week = request.data.get('periods_per_week', 5)
-
-        if not class_id or not subject_ids:
-            return Response(
-                {"error": "class_id and subject_ids are required"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        serializer = BulkAssignSubjectsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'Validation error',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        class_id = data['class_id']
+        section_id = data.get('section_id')
+        section_ids = data.get('section_ids') or ([section_id] if section_id else [])
+        subject_ids = data['subject_ids']
+        teacher_id = data.get('teacher_id')
+        periods_per_week = data['periods_per_week']
 
         try:
             class_obj = Class.objects.select_related('session').get(id=class_id)
@@ -755,83 +1070,75 @@ class BulkAssignSubjectsAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # ✅ Auto-get session from class
-        session = class_obj.session
+        # ✅ ClassSubject.clean() checks, done once for the whole batch
+        if not class_obj.is_active:
+            return Response(
+                {"error": "Cannot assign subject to inactive class."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not class_obj.session.is_current:
+            return Response(
+                {"error": "Cannot assign subject to inactive session."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        section_obj = None
-        if section_id:
-            try:
-                section_obj = Section.objects.get(id=section_id)
-                if section_obj.class_obj_id != class_obj.id:
-                    return Response(
-                        {"error": "Section does not belong to this class"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                if not section_obj.is_active:
-                    return Response(
-                        {"error": "Section is not active"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            except Section.DoesNotExist:
+        sections = [None]
+        if section_ids:
+            found = Section.objects.in_bulk(section_ids)
+            missing = [pk for pk in section_ids if pk not in found]
+            if missing:
                 return Response(
-                    {"error": "Section not found"},
+                    {"error": "Section not found", "section_ids": missing},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            sections = list(found.values())
+            if any(section.class_obj_id != class_obj.id for section in sections):
+                return Response(
+                    {"error": "Section does not belong to this class"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if any(not section.is_active for section in sections):
+                return Response(
+                    {"error": "Section is not active"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        subjects = Subject.objects.filter(id__in=subject_ids, is_active=True)
-        if subjects.count() != len(subject_ids):
+        teacher = None
+        if teacher_id:
+            teacher = Teacher.objects.filter(id=teacher_id).select_related('user').first()
+            if teacher is None:
+                return Response(
+                    {"error": "Teacher not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if not teacher.is_active:
+                return Response(
+                    {"error": "Cannot assign inactive teacher."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        subjects = list(Subject.objects.filter(id__in=subject_ids, is_active=True))
+        if len(subjects) != len(set(subject_ids)):
             return Response(
                 {"error": "One or more subjects not found or inactive"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        created_objects = []
-        skipped_assignments = []
-        validation_errors = []
-
-        for subject in subjects:
-            try:
-                exists = ClassSubject.objects.filter(
-                    class_obj=class_obj,
-                    section=section_obj,
-                    subject=subject,
-                    session=session  # ✅ session check
-                ).exists()
-                
-                if exists:
-                    skipped_assignments.append({
-                        'subject': subject.name,
-                        'reason': 'Already assigned'
-                    })
-                    continue
-
-                class_subject = ClassSubject(
-                    class_obj=class_obj,
-                    section=section_obj,
-                    subject=subject,
-                    teacher_id=teacher_id,
-                    periods_per_week=periods_per_week,
-                    session=session,  # ✅ session
-                    is_optional=not subject.is_core
-                )
-                class_subject.save()
-                created_objects.append(class_subject)
-
-            except DjangoValidationError as e:
-                validation_errors.append({
-                    'subject': subject.name,
-                    'errors': e.message_dict if hasattr(e, 'message_dict') else str(e)
-                })
-            except IntegrityError as e:
-                validation_errors.append({
-                    'subject': subject.name,
-                    'errors': 'Database integrity error'
-                })
+        try:
+            created_objects, skipped_assignments, validation_errors = bulk_assign_subjects(
+                class_obj, sections, subjects, teacher=teacher, periods_per_week=periods_per_week
+            )
+        except IntegrityError as e:
+            return Response(
+                {"error": "Database integrity error", "details": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         if validation_errors and not created_objects:
             return Response({
                 "success": False,
                 "error": "All assignments failed validation",
+                "skipped_assignments": skipped_assignments,
                 "validation_errors": validation_errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1,14 +1,28 @@
 # core/middleware.py
 from django.utils.deprecation import MiddlewareMixin
-from .models import AcademicYear
+
+from schools.session_resolver import get_current_academic_year, get_current_session
+
 
 class AcademicYearMiddleware(MiddlewareMixin):
     def process_request(self, request):
-        # Add current academic year to request
-        request.current_academic_year = AcademicYear.get_current_academic_year()
-    
+        # Add current academic year to request (cached per tenant, no query on a cache hit)
+        request.current_academic_year = get_current_academic_year(request)
+
+
+class CurrentSessionMiddleware(MiddlewareMixin):
+    """
+    Adds request.current_session (SchoolSession or None); must come after
+    TenantHeaderMiddleware. Views call get_current_session(request), which
+    returns the same memoized value with or without this middleware.
+    """
+
+    def process_request(self, request):
+        request.current_session = get_current_session(request)
+
 # # settings.py
 # MIDDLEWARE = [
 #     # ... other middleware ...
 #     'core.middleware.AcademicYearMiddleware',
-# ]
\ No newline at end of file
+#     'core.middleware.CurrentSessionMiddleware',
+# ]
@@ -1,6 +1,10 @@
-from django.db import models
+from functools import partial
+
+from django.db import connection, models, transaction
 from django.contrib.auth import get_user_model
 
+from schools.session_resolver import get_current_academic_year, invalidate_current_academic_year
+
 User = get_user_model()
 
 class Module(models.Model):
@@ -102,10 +106,15 @@ class AcademicYear(models.Model):
         if self.is_current:
             AcademicYear.objects.filter(is_current=True).update(is_current=False)
         super().save(*args, **kwargs)
+        # After commit, or another request could cache the old year again
+        transaction.on_commit(partial(invalidate_current_academic_year, connection.schema_name))
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(partial(invalidate_current_academic_year, connection.schema_name))
+        return result
 
     @classmethod
-    def get_current_academic_year(cls):
-        try:
-            return cls.objects.get(is_current=True)
-        except cls.DoesNotExist:
-            return None
\ No newline at end of file
+    def get_current_academic_year(cls, request=None):
+        # Memoized per request and cached per tenant (schools.session_resolver)
+        return get_current_academic_year(request)
\ No newline at end of file
@@ -1,3 +1,38 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from schools.session_resolver import get_current_academic_year
+from schools.testing import SchoolTestCase
+from .models import AcademicYear
+
+
+class CurrentAcademicYearCacheTests(SchoolTestCase):
+
+    def make_year(self, name, start_year, is_current=True):
+        return AcademicYear.objects.create(
+            name=name, start_date=date(start_year, 4, 1), end_date=date(start_year + 1, 3, 31),
+            is_current=is_current,
+        )
+
+    def test_cache_is_dropped_when_the_save_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            current = self.make_year('2024-25', 2024)
+        self.assertEqual(get_current_academic_year(), current)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            upcoming = self.make_year('2025-26', 2025)
+            # Not committed yet: other requests keep the cached year
+            self.assertEqual(get_current_academic_year(), current)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_current_academic_year(), upcoming)
+
+    def test_cache_is_dropped_when_the_delete_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            current = self.make_year('2024-25', 2024)
+        self.assertEqual(get_current_academic_year(), current)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            current.delete()
+
+        self.assertIsNone(get_current_academic_year())
@@ -0,0 +1,143 @@
+# fees/concession_service.py
+
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from .models import FeeConcession
+
+
+ALL_FEE_TYPES = 'ALL'
+
+TWO_PLACES = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+
+def parse_fee_types(applicable_fee_types):
+    """
+    Parse FeeConcession.applicable_fee_types into a set of FEE_TYPES codes
+    Example: "tuition, LAB" -> {'TUITION', 'LAB'}
+    """
+    return frozenset(
+        code.strip().upper()
+        for code in (applicable_fee_types or '').split(',')
+        if code.strip()
+    )
+
+
+class ConcessionEvaluator:
+    """
+    Evaluate FeeConcession rules for many students from one query
+
+    All active concessions of the selected students are loaded with a single
+    query and indexed by (student_id, fee_type), with each comma-separated
+    fee-type list parsed exactly once. Invoice lines are still evaluated one
+    at a time in Python: each line costs two dictionary lookups plus a scan
+    of that student's rules for the fee type and for ALL, so a class costs
+    O(lines x rules per student) with no further queries, instead of a
+    concession query per student or line.
+    """
+
+    def __init__(self, concessions):
+        # (student_id, fee_type) -> [(concession_id, start_date, end_date, percentage, fixed_amount)]
+        self._rules = defaultdict(list)
+        # (concession_id, student_id, due date) -> fixed_amount already given on that invoice
+        self._fixed_used = defaultdict(lambda: Decimal('0'))
+        self._breakdown = defaultdict(lambda: {
+            'gross_amount': Decimal('0'),
+            'discount': Decimal('0'),
+            'net_amount': Decimal('0'),
+            'concessions': defaultdict(lambda: Decimal('0')),
+        })
+
+        for concession_id, student_id, fee_types, percentage, fixed_amount, start_date, end_date in concessions:
+            rule = (concession_id, start_date, end_date, percentage or Decimal('0'), fixed_amount or Decimal('0'))
+            for fee_type in parse_fee_types(fee_types):
+                self._rules[(student_id, fee_type)].append(rule)
+
+    @classmethod
+    def _load(cls, queryset):
+        return cls(queryset.filter(is_active=True).values_list(
+            'id', 'student_id', 'applicable_fee_types', 'percentage',
+            'fixed_amount', 'start_date', 'end_date',
+        ))
+
+    @classmethod
+    def for_students(cls, student_ids):
+        return cls._load(FeeConcession.objects.filter(student_id__in=student_ids))
+
+    @classmethod
+    def for_class(cls, class_obj):
+        return cls._load(FeeConcession.objects.filter(
+            student__current_class=class_obj,
+            student__is_active=True,
+        ))
+
+    def discount(self, student_id, fee_type, amount, on_date):
+        """
+        Discount for one invoice line; percentage and fixed concessions stack
+        and are capped at the line amount
+
+        A concession counts once per line even when it lists both the fee
+        type and ALL. Percentages apply to every line; a fixed_amount is an
+        allowance per invoice (student and due date) used up by its lines
+        in evaluation order, not deducted again from each installment line.
+        """
+        rules = {}
+        for key in ((student_id, fee_type), (student_id, ALL_FEE_TYPES)):
+            for rule in self._rules.get(key, ()):
+                concession_id, start_date, end_date = rule[:3]
+                if concession_id in rules or start_date > on_date or (end_date and end_date < on_date):
+                    continue
+                rules[concession_id] = rule
+
+        applied = {}
+        total = Decimal('0')
+        for concession_id, _, _, percentage, _ in rules.values():
+            if percentage:
+                applied[concession_id] = amount * percentage / HUNDRED
+                total += applied[concession_id]
+        for concession_id, _, _, _, fixed_amount in rules.values():
+            if not fixed_amount:
+                continue
+            allowance = (concession_id, student_id, on_date)
+            value = min(fixed_amount - self._fixed_used[allowance], amount - total)
+            if value > 0:
+                self._fixed_used[allowance] += value
+                applied[concession_id] = applied.get(concession_id, Decimal('0')) + value
+                total += value
+
+        discount = min(total, amount).quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+
+        entry = self._breakdown[student_id]
+        entry['gross_amount'] += amount
+        entry['discount'] += discount
+        entry['net_amount'] += amount - discount
+        if applied and total:
+            # Attribute a capped discount back to concessions proportionally
+            for concession_id, value in applied.items():
+                entry['concessions'][concession_id] += (discount * value / total).quantize(TWO_PLACES)
+        return discount
+
+    def evaluate(self, lines):
+        """
+        Evaluate many invoice lines (one discount() call per line)
+
+        Args:
+            lines: iterable of (student_id, fee_type, amount, on_date)
+
+        Returns:
+            list: discount per line, in input order
+        """
+        return [self.discount(*line) for line in lines]
+
+    def breakdown(self):
+        """
+        Per-student totals of everything evaluated so far
+
+        Returns:
+            dict: {student_id: {'gross_amount', 'discount', 'net_amount', 'concessions': {id: amount}}}
+        """
+        return {
+            student_id: {**entry, 'concessions': dict(entry['concessions'])}
+            for student_id, entry in self._breakdown.items()
+        }
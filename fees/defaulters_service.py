@@ -0,0 +1,214 @@
+# fees/defaulters_service.py
+
+import base64
+import csv
+import json
+from datetime import date
+
+from django.db.models import (
+    Case, When, Value, F, Q, Func, Count, Sum,
+    CharField, DateField, IntegerField,
+)
+from django.db.models.functions import Coalesce, Concat, NullIf
+
+from .models import FeeInvoice
+
+
+# Invoice statuses that can still be owed
+UNPAID_STATUSES = ['PENDING', 'PARTIAL', 'OVERDUE']
+
+# Overdue-day buckets: (label, first day, last day or None)
+OVERDUE_BUCKETS = [
+    ('0-30', 0, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None),
+]
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+CSV_COLUMNS = [
+    ('invoice_number', 'Invoice Number'),
+    ('admission_number', 'Admission Number'),
+    ('student_name', 'Student Name'),
+    ('class_name', 'Class'),
+    ('section_name', 'Section'),
+    ('balance_amount', 'Amount Due'),
+    ('due_date', 'Due Date'),
+    ('overdue_days', 'Overdue Days'),
+    ('bucket', 'Bucket'),
+    ('contact_phone', 'Parent Phone'),
+]
+
+
+class DaysBetween(Func):
+    """`end - start` in whole days (date minus date is an integer in PostgreSQL)"""
+    arg_joiner = ' - '
+    template = '(%(expressions)s)'
+    output_field = IntegerField()
+
+
+def overdue_invoices(as_of=None, class_id=None, section_id=None, bucket=None):
+    """
+    Overdue invoices annotated with overdue_days and bucket, both computed in SQL
+
+    The filter on (status, due_date) is served by fee_invoice_overdue_idx.
+
+    Args:
+        as_of: Reference date (default: today)
+        class_id: Limit to students of this class
+        section_id: Limit to students of this section
+        bucket: One of the OVERDUE_BUCKETS labels
+    """
+    as_of = as_of or date.today()
+
+    queryset = FeeInvoice.objects.filter(
+        status__in=UNPAID_STATUSES,
+        due_date__lt=as_of,
+        balance_amount__gt=0,
+    )
+    if class_id:
+        queryset = queryset.filter(student__current_class_id=class_id)
+    if section_id:
+        queryset = queryset.filter(student__section_id=section_id)
+
+    queryset = queryset.annotate(
+        overdue_days=DaysBetween(Value(as_of, output_field=DateField()), F('due_date')),
+    ).annotate(
+        bucket=_bucket_case(),
+    )
+    if bucket:
+        queryset = queryset.filter(bucket=bucket)
+    return queryset
+
+
+def defaulters_queryset(as_of=None, class_id=None, section_id=None, bucket=None):
+    """
+    Report rows for overdue invoices
+
+    Only the columns needed for the report are selected (student, class and
+    section come in through joins), so no model instances and no per-row
+    lookups are made.
+
+    Returns:
+        QuerySet: values() rows ordered by (due_date, id)
+    """
+    queryset = overdue_invoices(as_of, class_id, section_id, bucket).annotate(
+        student_name=Concat(
+            'student__user__first_name', Value(' '), 'student__user__last_name',
+            output_field=CharField(),
+        ),
+        contact_phone=Coalesce(
+            NullIf('student__father_phone', Value('')),
+            NullIf('student__mother_phone', Value('')),
+            NullIf('student__guardian_phone', Value('')),
+            output_field=CharField(),
+        ),
+        admission_number=F('student__admission_number'),
+        class_name=F('student__current_class__display_name'),
+        section_name=F('student__section__name'),
+    )
+    return queryset.values(
+        'id', 'invoice_number', 'student_id', 'admission_number', 'student_name',
+        'class_name', 'section_name', 'contact_phone', 'balance_amount',
+        'due_date', 'overdue_days', 'bucket',
+    ).order_by('due_date', 'id')
+
+
+def bucket_summary(queryset):
+    """
+    Invoice count, defaulting students and amount per bucket in one grouped query
+
+    Args:
+        queryset: overdue_invoices() queryset
+
+    Returns:
+        list: [{'bucket', 'invoices', 'students', 'amount'}] in bucket order
+    """
+    rows = {
+        row['bucket']: row
+        for row in queryset.order_by().values('bucket').annotate(
+            invoices=Count('id'),
+            students=Count('student_id', distinct=True),
+            amount=Sum('balance_amount'),
+        )
+    }
+    return [
+        {
+            'bucket': label,
+            'invoices': rows.get(label, {}).get('invoices', 0),
+            'students': rows.get(label, {}).get('students', 0),
+            'amount': rows.get(label, {}).get('amount') or 0,
+        }
+        for label, _, _ in OVERDUE_BUCKETS
+    ]
+
+
+def paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Keyset pagination on (due_date, id)
+
+    Each page is an index range scan starting after the last row of the
+    previous page, so deep pages cost the same as the first one.
+
+    Returns:
+        tuple: (rows, next_cursor or None)
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    if cursor:
+        due_date, last_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(due_date__gt=due_date) | Q(due_date=due_date, id__gt=last_id)
+        )
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1]['due_date'], rows[-1]['id'])
+    return rows, next_cursor
+
+
+def encode_cursor(due_date, invoice_id):
+    payload = json.dumps([due_date.isoformat(), invoice_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Raises:
+        ValueError: When the cursor is malformed
+    """
+    try:
+        due_date, invoice_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(due_date), int(invoice_id)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back to csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset, chunk_size=2000):
+    """
+    Yield the report as CSV lines, fetching rows with a server-side cursor
+    so memory stays flat however many defaulters there are
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow([title for _, title in CSV_COLUMNS])
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield writer.writerow([row[key] for key, _ in CSV_COLUMNS])
+
+
+def _bucket_case():
+    whens = []
+    for label, _, last_day in OVERDUE_BUCKETS:
+        if last_day is None:
+            continue
+        whens.append(When(overdue_days__lte=last_day, then=Value(label)))
+    return Case(*whens, default=Value(OVERDUE_BUCKETS[-1][0]), output_field=CharField())
@@ -0,0 +1,318 @@
+# fees/fact_service.py
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import FeeInvoice, InvoiceItem, FeeLedgerEntry, FeePayment, FeeDailyFact
+
+
+ZERO = Decimal('0')
+TWO_PLACES = Decimal('0.01')
+
+# Due rows carry no payment mode
+DUE_MODE = ''
+
+REBUILD_CHUNK_SIZE = 2000
+
+# Periods the reports can roll up to (date_trunc precision)
+ROLLUP_PERIODS = ['day', 'week', 'month', 'quarter', 'year']
+
+
+def apply_ledger_entries(entries):
+    """
+    Move the daily facts by freshly posted ledger entries
+
+    Called by ledger_service.post_entries, so every invoice, concession,
+    cancellation, payment and refund lands in the cube exactly once (the
+    ledger already drops duplicate postings). Amounts are split over the
+    invoice's fee types in proportion to its items (items saved after their
+    invoice move its dues with apply_item_added()). Invoice ADJUSTMENT
+    entries are booked by their poster (apply_item_changes(),
+    apply_invoice_adjustment()); payment adjustments move the collections.
+    """
+    entries = [
+        entry for entry in entries
+        if entry.invoice_id and (entry.entry_type != 'ADJUSTMENT' or entry.payment_id)
+    ]
+    if not entries:
+        return
+
+    invoice_ids = {entry.invoice_id for entry in entries}
+    invoices = {
+        row['id']: row
+        for row in FeeInvoice.objects.filter(id__in=invoice_ids).values(
+            'id', 'due_date', 'student__current_class_id'
+        )
+    }
+    items = _invoice_items(invoice_ids)
+    payment_ids = {entry.payment_id for entry in entries if entry.payment_id}
+    payments = {
+        row['id']: row
+        for row in FeePayment.objects.filter(id__in=payment_ids).values('id', 'payment_date', 'payment_mode')
+    }
+
+    deltas = _new_deltas()
+    for entry in entries:
+        invoice = invoices.get(entry.invoice_id)
+        if invoice is None:
+            continue
+        class_id = invoice['student__current_class_id']
+        invoice_items = items.get(entry.invoice_id, {})
+
+        if entry.entry_type == 'INVOICE':
+            for fee_type, amount in _split(entry.amount, invoice_items, 'amount').items():
+                deltas[(invoice['due_date'], class_id, fee_type, DUE_MODE)][0] += amount
+        elif entry.entry_type == 'CONCESSION':
+            for fee_type, amount in _split(entry.amount, invoice_items, 'discount').items():
+                deltas[(invoice['due_date'], class_id, fee_type, DUE_MODE)][0] += amount
+        elif entry.entry_type == 'CANCELLATION':
+            for fee_type, amount in _split(entry.amount, invoice_items, 'net_amount').items():
+                deltas[(invoice['due_date'], class_id, fee_type, DUE_MODE)][0] += amount
+        elif entry.entry_type in ('PAYMENT', 'REFUND', 'ADJUSTMENT') and entry.payment_id in payments:
+            payment = payments[entry.payment_id]
+            # A credit adds a collected payment, a debit takes one back
+            count = 1 if entry.amount < 0 else -1
+            # Ledger credits are negative; collections are positive in the cube
+            for fee_type, amount in _split(-entry.amount, invoice_items, 'net_amount').items():
+                delta = deltas[(payment['payment_date'], class_id, fee_type, payment['payment_mode'])]
+                delta[1] += amount
+                delta[2] += count
+
+    upsert(deltas)
+
+
+def apply_item_changes(items, sign=1):
+    """
+    Book added (sign=1) or removed (sign=-1) invoice items as dues
+
+    Args:
+        items: iterable of (due_date, class_id, fee_type, net_amount)
+    """
+    deltas = _new_deltas()
+    for due_date, class_id, fee_type, net_amount in items:
+        deltas[(due_date, class_id, fee_type, DUE_MODE)][0] += sign * net_amount
+    upsert(deltas)
+
+
+def apply_item_added(item):
+    """
+    Re-split an invoice's booked dues after one item was saved on its own
+
+    An invoice saved through the ORM is posted before its items exist, so
+    its dues start out under MISCELLANEOUS (or the items saved so far).
+    Each new item moves them to the fee types of the items now on the
+    invoice, in the same transaction. Bulk-created items send no signal;
+    their poster books them.
+    """
+    invoice = FeeInvoice.objects.filter(id=item.invoice_id).values('due_date', 'student__current_class_id').first()
+    if invoice is None:
+        return
+    # Everything booked as dues: debit, concession, cancellation and invoice edits
+    booked = FeeLedgerEntry.objects.filter(invoice_id=item.invoice_id, payment__isnull=True).aggregate(
+        total=Sum('amount')
+    )['total']
+    if not booked:
+        return
+
+    after = _invoice_items([item.invoice_id]).get(item.invoice_id, {})
+    before = {fee_type: dict(values) for fee_type, values in after.items()}
+    before[item.fee_type]['net_amount'] -= item.net_amount
+
+    deltas = _new_deltas()
+    key = (invoice['due_date'], invoice['student__current_class_id'])
+    for fee_type, share in _split(booked, before, 'net_amount').items():
+        deltas[(*key, fee_type, DUE_MODE)][0] -= share
+    for fee_type, share in _split(booked, after, 'net_amount').items():
+        deltas[(*key, fee_type, DUE_MODE)][0] += share
+    upsert(deltas)
+
+
+def apply_invoice_adjustment(invoice_id, amount):
+    """Book a change of an invoice's ledger amount as dues, split over its items"""
+    invoice = FeeInvoice.objects.filter(id=invoice_id).values('due_date', 'student__current_class_id').first()
+    if invoice is None or not amount:
+        return
+    deltas = _new_deltas()
+    for fee_type, share in _split(amount, _invoice_items([invoice_id]).get(invoice_id, {}), 'net_amount').items():
+        deltas[(invoice['due_date'], invoice['student__current_class_id'], fee_type, DUE_MODE)][0] += share
+    upsert(deltas)
+
+
+def upsert(deltas):
+    """
+    Add deltas to the fact rows with one INSERT ... ON CONFLICT statement
+
+    Concurrent writers increment the same row safely: the conflicting row is
+    locked and updated in place by PostgreSQL, no read-modify-write here.
+
+    Args:
+        deltas: {(fact_date, class_id, fee_type, payment_mode): [due, collected, count]}
+    """
+    rows = [
+        (fact_date, class_id, fee_type, payment_mode, due, collected, count)
+        for (fact_date, class_id, fee_type, payment_mode), (due, collected, count) in deltas.items()
+        if due or collected or count
+    ]
+    if not rows:
+        return
+
+    table = FeeDailyFact._meta.db_table
+    now = timezone.now()
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))
+    params = [value for row in sorted(rows, key=_row_order) for value in (*row, now)]
+    sql = (
+        f'INSERT INTO {table} '
+        f'(fact_date, class_obj_id, fee_type, payment_mode, due_amount, collected_amount, payment_count, updated_at) '
+        f'VALUES {placeholders} '
+        f'ON CONFLICT (fact_date, COALESCE(class_obj_id, 0), fee_type, payment_mode) DO UPDATE SET '
+        f'due_amount = {table}.due_amount + EXCLUDED.due_amount, '
+        f'collected_amount = {table}.collected_amount + EXCLUDED.collected_amount, '
+        f'payment_count = {table}.payment_count + EXCLUDED.payment_count, '
+        f'updated_at = EXCLUDED.updated_at'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def rebuild_facts():
+    """
+    Recompute the whole cube from invoices and payments
+
+    Dues are the items' net amounts of live invoices (for cancelled ones only
+    the paid share stays due); collections are the SUCCESS payments.
+
+    Returns:
+        int: Number of fact rows written
+    """
+    deltas = _new_deltas()
+
+    invoices = FeeInvoice.objects.values_list(
+        'id', 'due_date', 'student__current_class_id', 'status', 'total_amount', 'paid_amount'
+    ).order_by('id')
+    payments = FeePayment.objects.filter(status='SUCCESS').values_list(
+        'invoice_id', 'payment_date', 'payment_mode', 'amount'
+    ).order_by('invoice_id')
+
+    invoice_rows = {}
+    for row in invoices.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+        invoice_rows[row[0]] = row
+        if len(invoice_rows) >= REBUILD_CHUNK_SIZE:
+            _rebuild_invoice_chunk(invoice_rows, deltas)
+            invoice_rows = {}
+    _rebuild_invoice_chunk(invoice_rows, deltas)
+
+    classes = dict(FeeInvoice.objects.values_list('id', 'student__current_class_id'))
+    payment_rows = []
+    for row in payments.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+        payment_rows.append(row)
+        if len(payment_rows) >= REBUILD_CHUNK_SIZE:
+            _rebuild_payment_chunk(payment_rows, classes, deltas)
+            payment_rows = []
+    _rebuild_payment_chunk(payment_rows, classes, deltas)
+
+    with transaction.atomic():
+        FeeDailyFact.objects.all().delete()
+        keys = list(deltas)
+        for start in range(0, len(keys), REBUILD_CHUNK_SIZE):
+            upsert({key: deltas[key] for key in keys[start:start + REBUILD_CHUNK_SIZE]})
+    return FeeDailyFact.objects.count()
+
+
+def fact_queryset(start_date, end_date, class_id=None, fee_type=None):
+    """Fact rows of a date range, optionally for one class / fee type"""
+    queryset = FeeDailyFact.objects.filter(fact_date__gte=start_date, fact_date__lte=end_date)
+    if class_id:
+        queryset = queryset.filter(class_obj_id=class_id)
+    if fee_type:
+        queryset = queryset.filter(fee_type=fee_type)
+    return queryset
+
+
+def rollup(queryset, *dimensions, period=None):
+    """
+    Sum facts grouped by the given dimensions and/or a date_trunc period
+
+    Example: rollup(facts, period='month') or rollup(facts, 'class_obj__display_name')
+
+    Returns:
+        QuerySet: values rows with due_amount, collected_amount, payment_count
+    """
+    if period:
+        queryset = queryset.annotate(period=Trunc('fact_date', period))
+        dimensions = ('period', *dimensions)
+    return queryset.values(*dimensions).annotate(
+        due_amount=Sum('due_amount'),
+        collected_amount=Sum('collected_amount'),
+        payment_count=Sum('payment_count'),
+    ).order_by(*dimensions)
+
+
+def _rebuild_invoice_chunk(invoice_rows, deltas):
+    items = _invoice_items(list(invoice_rows))
+    for invoice_id, due_date, class_id, status, total_amount, paid_amount in invoice_rows.values():
+        invoice_items = items.get(invoice_id, {})
+        if status == 'CANCELLED':
+            due = _split(paid_amount, invoice_items, 'net_amount')
+        else:
+            due = _split(total_amount, invoice_items, 'net_amount')
+        for fee_type, amount in due.items():
+            deltas[(due_date, class_id, fee_type, DUE_MODE)][0] += amount
+
+
+def _rebuild_payment_chunk(payment_rows, classes, deltas):
+    items = _invoice_items({invoice_id for invoice_id, _, _, _ in payment_rows})
+    for invoice_id, payment_date, payment_mode, amount in payment_rows:
+        class_id = classes.get(invoice_id)
+        for fee_type, share in _split(amount, items.get(invoice_id, {}), 'net_amount').items():
+            delta = deltas[(payment_date, class_id, fee_type, payment_mode)]
+            delta[1] += share
+            delta[2] += 1
+
+
+def _invoice_items(invoice_ids):
+    """{invoice_id: {fee_type: {'amount', 'discount', 'net_amount'}}}"""
+    items = defaultdict(dict)
+    rows = InvoiceItem.objects.filter(invoice_id__in=invoice_ids).values('invoice_id', 'fee_type').annotate(
+        amount=Sum('amount'), discount=Sum('discount'), net_amount=Sum('net_amount'),
+    ).order_by()
+    for row in rows:
+        items[row['invoice_id']][row['fee_type']] = row
+    return items
+
+
+def _split(amount, invoice_items, weight_field):
+    """
+    Split an amount over fee types in proportion to `weight_field`; the
+    rounding remainder goes to the last fee type. Invoices without items
+    book everything under MISCELLANEOUS.
+    """
+    weights = [
+        (fee_type, values[weight_field] or ZERO)
+        for fee_type, values in sorted(invoice_items.items())
+    ]
+    total = sum((weight for _, weight in weights), ZERO)
+    if not total:
+        return {'MISCELLANEOUS': amount}
+
+    shares = {}
+    remaining = amount
+    for fee_type, weight in weights[:-1]:
+        share = (amount * weight / total).quantize(TWO_PLACES)
+        shares[fee_type] = share
+        remaining -= share
+    shares[weights[-1][0]] = remaining
+    return shares
+
+
+def _new_deltas():
+    return defaultdict(lambda: [ZERO, ZERO, 0])
+
+
+def _row_order(row):
+    # Lock fact rows in a stable order so concurrent upserts cannot deadlock
+    return (row[0], row[1] or 0, row[2], row[3])
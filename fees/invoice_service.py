@@ -0,0 +1,402 @@
+# fees/invoice_service.py
+
+import calendar
+import re
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from schools.models import School
+from students.models import Student
+from .models import FeeStructure, FeeInvoice, InvoiceItem, FeeLedgerEntry
+from .concession_service import ConcessionEvaluator
+from .ledger_service import post_entries, post_invoices
+from .fact_service import apply_item_changes
+
+
+# Number of installments a FeeStructure.frequency expands into per academic year
+FREQUENCY_INSTALLMENTS = {
+    'MONTHLY': 12,
+    'QUARTERLY': 4,
+    'HALF_YEARLY': 2,
+    'YEARLY': 1,
+    'ONE_TIME': 1,
+}
+
+# Day of month used for installments when the structure has no due_date
+DEFAULT_DUE_DAY = 10
+
+# Key for pg_advisory_xact_lock() while invoices are generated and numbered
+INVOICE_NUMBER_LOCK_KEY = 0x46454549  # "FEEI"
+
+# Academic years are written as consecutive years, e.g. "2024-2025"
+ACADEMIC_YEAR_PATTERN = re.compile(r'^(\d{4})-(\d{4})$')
+
+
+def get_academic_year_start_month():
+    """
+    Academic year start month of the current tenant (School.academic_year_start_month)
+
+    Returns:
+        int: Month number, defaults to 4 (April)
+    """
+    try:
+        school = School.objects.get(schema_name=connection.schema_name)
+        return school.academic_year_start_month or 4
+    except School.DoesNotExist:
+        return 4
+
+
+def add_months(day, months):
+    """Shift a date by N months, clamping the day to the target month length"""
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, min(day.day, last_day))
+
+
+def is_valid_academic_year(academic_year):
+    """True for "2024-2025" style values (two consecutive years)"""
+    match = ACADEMIC_YEAR_PATTERN.match(str(academic_year or ''))
+    return bool(match) and int(match.group(2)) == int(match.group(1)) + 1
+
+
+def academic_year_bounds(academic_year, start_month=4):
+    """
+    Convert "2024-2025" into (start_date, end_date) of the academic year
+
+    Example: ("2024-2025", 4) -> (2024-04-01, 2025-03-31)
+    """
+    start_year = int(academic_year.split('-')[0])
+    start_date = date(start_year, start_month, 1)
+    end_date = date.fromordinal(add_months(start_date, 12).toordinal() - 1)
+    return start_date, end_date
+
+
+def installment_schedule(structure, start_month=4):
+    """
+    Expand a FeeStructure into dated installments
+
+    MONTHLY -> 12, QUARTERLY -> 4, HALF_YEARLY -> 2, YEARLY / ONE_TIME -> 1.
+    For single installments the structure's due_date is used as-is. Periodic
+    installments fall on the due_date's day of month (or DEFAULT_DUE_DAY) in
+    the first month of each period.
+
+    Returns:
+        list: [(installment_number, due_date), ...]
+    """
+    count = FREQUENCY_INSTALLMENTS.get(structure.frequency, 1)
+    year_start, _ = academic_year_bounds(structure.academic_year, start_month)
+
+    if count == 1:
+        return [(1, structure.due_date or year_start.replace(day=DEFAULT_DUE_DAY))]
+
+    due_day = structure.due_date.day if structure.due_date else DEFAULT_DUE_DAY
+    months_per_installment = 12 // count
+
+    schedule = []
+    for index in range(count):
+        period_start = add_months(year_start, index * months_per_installment)
+        last_day = calendar.monthrange(period_start.year, period_start.month)[1]
+        schedule.append((index + 1, period_start.replace(day=min(due_day, last_day))))
+    return schedule
+
+
+def lock_invoice_generation():
+    """
+    Serialize invoice generation on a transaction-level advisory lock
+    (re-entrant within the transaction; released on commit or rollback)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [INVOICE_NUMBER_LOCK_KEY])
+
+
+def allocate_invoice_numbers(academic_year, count):
+    """
+    Reserve `count` sequential invoice numbers for an academic year
+    Format: INV<start year>-<6 digit sequence>, e.g. INV2024-000001
+
+    Must be called inside transaction.atomic(); concurrent generators are
+    serialized on a transaction-level advisory lock.
+    """
+    prefix = f"INV{academic_year.split('-')[0]}-"
+
+    lock_invoice_generation()
+
+    last_number = FeeInvoice.objects.filter(
+        invoice_number__startswith=prefix
+    ).order_by('-invoice_number').values_list('invoice_number', flat=True).first()
+
+    next_number = 1
+    if last_number:
+        try:
+            next_number = int(last_number[len(prefix):]) + 1
+        except ValueError:
+            next_number = 1
+
+    return [f"{prefix}{next_number + offset:06d}" for offset in range(count)]
+
+
+def generate_class_invoices(class_obj, academic_year, structures=None, effective_from=None,
+                            invoice_date=None, start_month=None):
+    """
+    Generate FeeInvoice/InvoiceItem rows for every active student of a class
+
+    All installments of the class's fee structures that fall on the same due
+    date are billed on one invoice per student. Installments that were already
+    invoiced (student, fee_structure, installment) are skipped, so the
+    generator is safe to re-run after new students or structures are added.
+    The skip list is read under the generation lock, so concurrent runs
+    queue behind each other instead of billing an installment twice.
+
+    Args:
+        class_obj: classes.Class instance
+        academic_year: "2024-2025"
+        structures: Optional iterable of FeeStructure to limit generation to
+        effective_from: Skip installments due before this date
+        invoice_date: Invoice date (default: today)
+        start_month: Academic year start month (default: tenant setting)
+
+    Returns:
+        dict: {'students', 'invoices_created', 'items_created', 'total_amount',
+               'total_discount', 'concessions': per-student breakdown}
+    """
+    invoice_date = invoice_date or date.today()
+    start_month = start_month or get_academic_year_start_month()
+
+    if structures is None:
+        structures = FeeStructure.objects.filter(
+            class_name=class_obj,
+            academic_year=academic_year,
+            is_active=True,
+        )
+    structures = [fs for fs in structures if fs.is_active]
+
+    student_ids = list(
+        Student.objects.filter(current_class=class_obj, is_active=True).values_list('id', flat=True)
+    )
+    summary = {
+        'students': len(student_ids),
+        'invoices_created': 0,
+        'items_created': 0,
+        'total_amount': Decimal('0'),
+        'total_discount': Decimal('0'),
+        'concessions': {},
+    }
+    if not student_ids or not structures:
+        return summary
+
+    # Installments grouped by due date: {due_date: [(structure, installment, amount)]}
+    installments_by_due_date = defaultdict(list)
+    # FeeStructure.amount is billed per installment (e.g. monthly tuition)
+    for structure in structures:
+        for installment, due_date in installment_schedule(structure, start_month):
+            if effective_from and due_date < effective_from:
+                continue
+            installments_by_due_date[due_date].append((structure, installment, structure.amount))
+
+    concessions = ConcessionEvaluator.for_class(class_obj)
+
+    # The lock is taken before reading what is already invoiced, so two
+    # concurrent runs for the same class cannot both bill an installment
+    with transaction.atomic():
+        lock_invoice_generation()
+        pending = _pending_invoices(
+            student_ids, structures, installments_by_due_date, concessions, invoice_date, academic_year,
+        )
+
+        summary['concessions'] = concessions.breakdown()
+        summary['total_discount'] = sum(
+            (entry['discount'] for entry in summary['concessions'].values()), Decimal('0')
+        )
+        if not pending:
+            return summary
+
+        numbers = allocate_invoice_numbers(academic_year, len(pending))
+        for (invoice, _), number in zip(pending, numbers):
+            invoice.invoice_number = number
+
+        invoices = FeeInvoice.objects.bulk_create([invoice for invoice, _ in pending])
+
+        all_items = []
+        for invoice, (_, items) in zip(invoices, pending):
+            for item in items:
+                item.invoice = invoice
+                all_items.append(item)
+        InvoiceItem.objects.bulk_create(all_items, batch_size=1000)
+
+        # bulk_create bypasses post_save, so post the ledger debits here
+        post_invoices(invoices)
+
+    summary['invoices_created'] = len(invoices)
+    summary['items_created'] = len(all_items)
+    summary['total_amount'] = sum((invoice.total_amount for invoice in invoices), Decimal('0'))
+    return summary
+
+
+def preview_class_concessions(class_obj, academic_year, start_month=None):
+    """
+    Per-student concession breakdown for a class's full-year schedule,
+    without writing any invoices
+
+    Returns:
+        dict: {student_id: {'gross_amount', 'discount', 'net_amount', 'concessions'}}
+    """
+    start_month = start_month or get_academic_year_start_month()
+    structures = FeeStructure.objects.filter(
+        class_name=class_obj,
+        academic_year=academic_year,
+        is_active=True,
+    )
+    schedule = [
+        (structure.fee_type, structure.amount, due_date)
+        for structure in structures
+        for _, due_date in installment_schedule(structure, start_month)
+    ]
+    student_ids = Student.objects.filter(
+        current_class=class_obj, is_active=True
+    ).values_list('id', flat=True)
+
+    concessions = ConcessionEvaluator.for_class(class_obj)
+    concessions.evaluate(
+        (student_id, fee_type, amount, due_date)
+        for student_id in student_ids
+        for fee_type, amount, due_date in schedule
+    )
+    return concessions.breakdown()
+
+
+def regenerate_structure_invoices(structure, effective_from=None, invoice_date=None):
+    """
+    Re-bill a FeeStructure after it changed mid-year
+
+    Items of this structure on untouched invoices (PENDING, nothing paid) due on
+    or after `effective_from` are removed and the remaining installments are
+    generated again from the current amount/frequency/due_date. Paid or
+    partially paid invoices are never modified.
+
+    Returns:
+        dict: {'items_removed', 'invoices_removed', 'invoices_created', 'items_created', ...}
+    """
+    effective_from = effective_from or date.today()
+
+    with transaction.atomic():
+        stale_items = InvoiceItem.objects.filter(
+            fee_structure=structure,
+            invoice__due_date__gte=effective_from,
+            invoice__status='PENDING',
+            invoice__paid_amount=0,
+            invoice__payments__isnull=True,
+        )
+        stale_rows = list(stale_items.values_list(
+            'id', 'invoice_id', 'invoice__due_date', 'invoice__student__current_class_id', 'fee_type', 'net_amount'
+        ))
+        touched_invoice_ids = {row[1] for row in stale_rows}
+        previous = {
+            invoice.id: invoice
+            for invoice in FeeInvoice.objects.filter(id__in=touched_invoice_ids)
+        }
+        items_removed, _ = InvoiceItem.objects.filter(id__in=[row[0] for row in stale_rows]).delete()
+        apply_item_changes((row[2:] for row in stale_rows), sign=-1)
+
+        # Recompute totals of the invoices that lost items, drop the empty ones
+        totals = dict(
+            InvoiceItem.objects.filter(invoice_id__in=touched_invoice_ids)
+            .values('invoice_id')
+            .annotate(total=Sum('net_amount'))
+            .values_list('invoice_id', 'total')
+        )
+        empty_ids = touched_invoice_ids - set(totals)
+        FeeInvoice.objects.filter(id__in=empty_ids).delete()
+
+        invoices = list(FeeInvoice.objects.filter(id__in=totals.keys()))
+        for invoice in invoices:
+            invoice.total_amount = totals[invoice.id]
+            invoice.balance_amount = totals[invoice.id]
+        FeeInvoice.objects.bulk_update(invoices, ['total_amount', 'balance_amount'])
+
+        # Credit the removed amounts on the ledger before re-billing
+        post_entries([
+            FeeLedgerEntry(
+                student_id=invoice.student_id,
+                entry_type='ADJUSTMENT',
+                amount=totals.get(invoice_id, Decimal('0')) - invoice.total_amount,
+                invoice_id=invoice_id if invoice_id in totals else None,
+                description=f"{structure.get_fee_type_display()} re-billed on invoice #{invoice.invoice_number}",
+            )
+            for invoice_id, invoice in previous.items()
+        ])
+
+        summary = generate_class_invoices(
+            structure.class_name,
+            structure.academic_year,
+            structures=[structure],
+            effective_from=effective_from,
+            invoice_date=invoice_date,
+        )
+
+    summary['items_removed'] = items_removed
+    summary['invoices_removed'] = len(empty_ids)
+    return summary
+
+
+def _pending_invoices(student_ids, structures, installments_by_due_date, concessions,
+                      invoice_date, academic_year):
+    """
+    Unsaved (invoice, [items]) pairs for the installments not invoiced yet
+
+    Call with the generation lock held, so the skip list is current.
+    """
+    already_invoiced = set(
+        InvoiceItem.objects.filter(
+            fee_structure__in=structures,
+            invoice__student_id__in=student_ids,
+        ).exclude(
+            invoice__status='CANCELLED'
+        ).values_list('invoice__student_id', 'fee_structure_id', 'installment')
+    )
+
+    pending = []
+    for student_id in student_ids:
+        for due_date in sorted(installments_by_due_date):
+            items = []
+            for structure, installment, amount in installments_by_due_date[due_date]:
+                if (student_id, structure.id, installment) in already_invoiced:
+                    continue
+                discount = concessions.discount(student_id, structure.fee_type, amount, due_date)
+                items.append(InvoiceItem(
+                    fee_structure=structure,
+                    installment=installment,
+                    fee_type=structure.fee_type,
+                    description=_item_description(structure, installment),
+                    amount=amount,
+                    discount=discount,
+                    net_amount=amount - discount,
+                ))
+            if not items:
+                continue
+
+            total = sum((item.net_amount for item in items), Decimal('0'))
+            pending.append((FeeInvoice(
+                student_id=student_id,
+                invoice_date=invoice_date,
+                due_date=due_date,
+                total_amount=total,
+                paid_amount=Decimal('0'),
+                balance_amount=total,
+                status='PENDING' if total > 0 else 'PAID',
+                academic_year=academic_year,
+            ), items))
+    return pending
+
+
+def _item_description(structure, installment):
+    count = FREQUENCY_INSTALLMENTS.get(structure.frequency, 1)
+    label = structure.get_fee_type_display()
+    if count == 1:
+        return f"{label} ({structure.academic_year})"
+    return f"{label} - {structure.get_frequency_display()} installment {installment}/{count} ({structure.academic_year})"
@@ -0,0 +1,352 @@
+# fees/ledger_service.py
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import FeeInvoice, InvoiceItem, FeePayment, FeeLedgerEntry, StudentFeeBalance
+from . import fact_service
+
+
+ZERO = Decimal('0')
+
+# Students whose entries are posted per statement when rebuilding the ledger
+REBUILD_BATCH_STUDENTS = 500
+
+
+def post_entries(entries, update_facts=True):
+    """
+    Append ledger entries and move the affected students' balances
+    (and the daily fee facts, unless update_facts is False)
+
+    Balance rows are locked in student_id order (so concurrent postings cannot
+    deadlock), running balances are computed in memory and both tables are
+    written with one bulk statement each. Runs in the caller's transaction
+    when there is one.
+
+    Args:
+        entries: list of unsaved FeeLedgerEntry (student_id, entry_type, amount, ...)
+
+    Returns:
+        list: The created entries
+    """
+    entries = [entry for entry in entries if entry.amount]
+    if not entries:
+        return []
+
+    student_ids = sorted({entry.student_id for entry in entries})
+    now = timezone.now()
+
+    with transaction.atomic():
+        StudentFeeBalance.objects.bulk_create(
+            [StudentFeeBalance(student_id=student_id) for student_id in student_ids],
+            ignore_conflicts=True,
+        )
+        balances = {
+            balance.student_id: balance
+            for balance in StudentFeeBalance.objects.select_for_update()
+            .filter(student_id__in=student_ids)
+            .order_by('student_id')
+        }
+
+        for entry in entries:
+            balance = balances[entry.student_id]
+            if entry.amount > 0:
+                balance.total_debit += entry.amount
+            else:
+                balance.total_credit -= entry.amount
+            balance.balance += entry.amount
+            balance.last_entry_at = now
+            balance.updated_at = now
+            entry.balance_after = balance.balance
+
+        created = FeeLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+        StudentFeeBalance.objects.bulk_update(
+            balances.values(),
+            ['total_debit', 'total_credit', 'balance', 'last_entry_at', 'updated_at'],
+            batch_size=1000,
+        )
+        if update_facts:
+            fact_service.apply_ledger_entries(created)
+    return created
+
+
+def invoice_entries(invoice, gross_amount=None, discount=None):
+    """
+    Ledger entries for a new invoice: the gross debit and, when items carry a
+    discount, a separate concession credit. Without item totals the invoice's
+    total_amount is debited as-is.
+    """
+    if gross_amount is None:
+        gross_amount, discount = invoice.total_amount, ZERO
+
+    entries = [FeeLedgerEntry(
+        student_id=invoice.student_id,
+        entry_type='INVOICE',
+        amount=gross_amount,
+        invoice=invoice,
+        description=f"Invoice #{invoice.invoice_number}",
+    )]
+    if discount:
+        entries.append(FeeLedgerEntry(
+            student_id=invoice.student_id,
+            entry_type='CONCESSION',
+            amount=-discount,
+            invoice=invoice,
+            description=f"Concession on invoice #{invoice.invoice_number}",
+        ))
+    return entries
+
+
+def post_invoices(invoices):
+    """Post debits (and concession credits) for freshly created invoices in bulk"""
+    invoices = list(invoices)
+    if not invoices:
+        return []
+
+    item_totals = {
+        row['invoice_id']: (row['gross'], row['discount'])
+        for row in InvoiceItem.objects.filter(invoice__in=invoices)
+        .values('invoice_id')
+        .annotate(gross=Sum('amount'), discount=Sum('discount'))
+    }
+    entries = []
+    for invoice in invoices:
+        gross, discount = item_totals.get(invoice.id, (None, None))
+        entries.extend(invoice_entries(invoice, gross, discount))
+    return post_entries(entries)
+
+
+def post_invoice(invoice):
+    """Post a single invoice unless it is already on the ledger"""
+    if FeeLedgerEntry.objects.filter(invoice=invoice, entry_type='INVOICE').exists():
+        return []
+    return post_invoices([invoice])
+
+
+def post_invoice_cancellation(invoice):
+    """Credit the unpaid balance of a cancelled invoice"""
+    if FeeLedgerEntry.objects.filter(invoice=invoice, entry_type='CANCELLATION').exists():
+        return []
+    return post_entries([FeeLedgerEntry(
+        student_id=invoice.student_id,
+        entry_type='CANCELLATION',
+        amount=-invoice.balance_amount,
+        invoice=invoice,
+        description=f"Invoice #{invoice.invoice_number} cancelled",
+    )])
+
+
+def invoice_effect(total_amount, status, balance_amount):
+    """
+    Net amount an invoice in this state has put on the ledger: the whole
+    total while live, only the paid share once cancelled
+    """
+    if status == 'CANCELLED':
+        return total_amount - balance_amount
+    return total_amount
+
+
+def post_invoice_change(invoice, previous):
+    """
+    Compensate an edited invoice: amount changes (including discounts,
+    which reduce total_amount), cancellation and reinstatement
+
+    Args:
+        invoice: The saved FeeInvoice
+        previous: Its ledger_state() when loaded, or None if unknown
+
+    Returns:
+        list: The created entries
+    """
+    if previous is None:
+        # Old values unknown: only a cancellation can still be booked
+        return post_invoice_cancellation(invoice) if invoice.status == 'CANCELLED' else []
+
+    old_total, old_status, _ = previous
+    if old_status == 'CANCELLED' and invoice.status == 'CANCELLED':
+        return []
+    amount = invoice_effect(invoice.total_amount, invoice.status, invoice.balance_amount) - invoice_effect(*previous)
+    if not amount:
+        return []
+
+    if invoice.status == 'CANCELLED':
+        if invoice.total_amount == old_total and not FeeLedgerEntry.objects.filter(
+            invoice=invoice, entry_type='CANCELLATION'
+        ).exists():
+            return post_invoice_cancellation(invoice)
+        description = f"Invoice #{invoice.invoice_number} cancelled"
+    elif old_status == 'CANCELLED':
+        description = f"Invoice #{invoice.invoice_number} reinstated"
+    else:
+        description = f"Invoice #{invoice.invoice_number} changed from ₹{old_total} to ₹{invoice.total_amount}"
+
+    created = post_entries([FeeLedgerEntry(
+        student_id=invoice.student_id,
+        entry_type='ADJUSTMENT',
+        amount=amount,
+        invoice=invoice,
+        description=description,
+    )])
+    # ADJUSTMENT entries are not booked by post_entries, see apply_ledger_entries()
+    fact_service.apply_invoice_adjustment(invoice.id, amount)
+    return created
+
+
+def payment_entry(payment, student_id=None):
+    """Ledger credit for a successful payment"""
+    return FeeLedgerEntry(
+        student_id=student_id or payment.invoice.student_id,
+        entry_type='PAYMENT',
+        amount=-payment.amount,
+        invoice_id=payment.invoice_id,
+        payment=payment,
+        description=f"{payment.get_payment_mode_display()} payment {payment.transaction_id}".strip(),
+    )
+
+
+def post_payments(payments):
+    """Credit many successful payments at once (payments must have invoice loaded)"""
+    payments = list(payments)
+    posted = set(FeeLedgerEntry.objects.filter(
+        payment__in=payments, entry_type='PAYMENT'
+    ).values_list('payment_id', flat=True))
+    return post_entries([payment_entry(payment) for payment in payments if payment.id not in posted])
+
+
+def post_payment_change(payment):
+    """
+    Bring the ledger in line with a payment's current status and amount
+
+    A SUCCESS payment should have credited its amount, anything else
+    (PENDING, FAILED, REFUNDED) nothing; the difference to what the
+    ledger already holds for the payment is posted as PAYMENT, REFUND or,
+    for later corrections such as SUCCESS -> FAILED, ADJUSTMENT.
+
+    Returns:
+        list: The created entries
+    """
+    posted = dict(
+        FeeLedgerEntry.objects.filter(payment=payment)
+        .values('entry_type').annotate(total=Sum('amount')).order_by()
+        .values_list('entry_type', 'total')
+    )
+    wanted = -payment.amount if payment.status == 'SUCCESS' else ZERO
+    amount = wanted - sum(posted.values(), ZERO)
+    if not amount:
+        return []
+
+    if payment.status == 'SUCCESS' and 'PAYMENT' not in posted:
+        entry = payment_entry(payment)
+    elif payment.status == 'REFUNDED' and 'REFUND' not in posted:
+        entry = FeeLedgerEntry(
+            student_id=payment.invoice.student_id,
+            entry_type='REFUND',
+            invoice_id=payment.invoice_id,
+            payment=payment,
+            description=f"Refund of payment #{payment.id}",
+        )
+    else:
+        entry = FeeLedgerEntry(
+            student_id=payment.invoice.student_id,
+            entry_type='ADJUSTMENT',
+            invoice_id=payment.invoice_id,
+            payment=payment,
+            description=f"Payment #{payment.id} now {payment.get_status_display().lower()}",
+        )
+    entry.amount = amount
+    return post_entries([entry])
+
+
+def outstanding_balance(student_id):
+    """Outstanding dues of one student (single primary-key lookup)"""
+    return StudentFeeBalance.objects.filter(student_id=student_id).values_list(
+        'balance', flat=True
+    ).first() or ZERO
+
+
+def students_with_dues():
+    """Balance rows of all students owing money (served by fee_balance_due_idx)"""
+    return StudentFeeBalance.objects.filter(balance__gt=0)
+
+
+def rebuild_ledger(student_ids=None):
+    """
+    Rebuild ledger and balances from invoices and payments
+    (backfill for data created before the ledger existed)
+
+    Returns:
+        int: Number of ledger entries written
+    """
+    invoices = FeeInvoice.objects.all()
+    payments = FeePayment.objects.select_related('invoice').filter(status__in=['SUCCESS', 'REFUNDED'])
+    if student_ids is not None:
+        invoices = invoices.filter(student_id__in=student_ids)
+        payments = payments.filter(invoice__student_id__in=student_ids)
+
+    with transaction.atomic():
+        ledger = FeeLedgerEntry.objects.all()
+        balances = StudentFeeBalance.objects.all()
+        if student_ids is not None:
+            ledger = ledger.filter(student_id__in=student_ids)
+            balances = balances.filter(student_id__in=student_ids)
+        ledger.delete()
+        balances.delete()
+
+        item_totals = {
+            row['invoice_id']: (row['gross'], row['discount'])
+            for row in InvoiceItem.objects.filter(invoice__in=invoices)
+            .values('invoice_id')
+            .annotate(gross=Sum('amount'), discount=Sum('discount'))
+        }
+
+        # Entries per student in chronological order
+        entries_by_student = defaultdict(list)
+        for invoice in invoices.order_by('invoice_date', 'id').iterator(chunk_size=2000):
+            gross, discount = item_totals.get(invoice.id, (None, None))
+            entries_by_student[invoice.student_id].extend(invoice_entries(invoice, gross, discount))
+            if gross is not None and invoice.total_amount != gross - discount:
+                # Total edited after the items were billed (see post_invoice_change)
+                entries_by_student[invoice.student_id].append(FeeLedgerEntry(
+                    student_id=invoice.student_id,
+                    entry_type='ADJUSTMENT',
+                    amount=invoice.total_amount - (gross - discount),
+                    invoice=invoice,
+                    description=f"Invoice #{invoice.invoice_number} changed to ₹{invoice.total_amount}",
+                ))
+            if invoice.status == 'CANCELLED':
+                entries_by_student[invoice.student_id].append(FeeLedgerEntry(
+                    student_id=invoice.student_id,
+                    entry_type='CANCELLATION',
+                    amount=-invoice.balance_amount,
+                    invoice=invoice,
+                    description=f"Invoice #{invoice.invoice_number} cancelled",
+                ))
+
+        for payment in payments.order_by('payment_date', 'id').iterator(chunk_size=2000):
+            student_id = payment.invoice.student_id
+            entries_by_student[student_id].append(payment_entry(payment, student_id))
+            if payment.status == 'REFUNDED':
+                entries_by_student[student_id].append(FeeLedgerEntry(
+                    student_id=student_id,
+                    entry_type='REFUND',
+                    amount=payment.amount,
+                    invoice_id=payment.invoice_id,
+                    payment=payment,
+                    description=f"Refund of payment #{payment.id}",
+                ))
+
+        written = 0
+        student_ids = sorted(entries_by_student)
+        for start in range(0, len(student_ids), REBUILD_BATCH_STUDENTS):
+            batch = student_ids[start:start + REBUILD_BATCH_STUDENTS]
+            written += len(post_entries([
+                entry for student_id in batch for entry in entries_by_student[student_id]
+            ], update_facts=False))
+
+        # Replaying the ledger must not count amounts into the facts twice
+        fact_service.rebuild_facts()
+    return written
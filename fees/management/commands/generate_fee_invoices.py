@@ -0,0 +1,63 @@
+# fees/management/commands/generate_fee_invoices.py
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import schema_context
+
+from classes.models import Class
+from fees.models import FeeStructure
+from fees.invoice_service import generate_class_invoices, regenerate_structure_invoices
+
+
+class Command(BaseCommand):
+    help = 'Generate fee invoices from FeeStructure schedules for a tenant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', type=str, required=True, help='Tenant schema (e.g., school_gvs01)')
+        parser.add_argument('--academic-year', type=str, help='Academic year (e.g., 2025-2026)')
+        parser.add_argument('--class-id', type=int, help='Only this class (default: all active classes)')
+        parser.add_argument('--structure-id', type=int, help='Re-bill a single FeeStructure after a change')
+        parser.add_argument('--effective-from', type=str, help='Skip installments due before YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        effective_from = None
+        if options['effective_from']:
+            try:
+                effective_from = datetime.strptime(options['effective_from'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid --effective-from. Use YYYY-MM-DD')
+
+        with schema_context(options['schema']):
+            if options['structure_id']:
+                try:
+                    structure = FeeStructure.objects.select_related('class_name').get(pk=options['structure_id'])
+                except FeeStructure.DoesNotExist:
+                    raise CommandError(f'FeeStructure {options["structure_id"]} not found')
+
+                summary = regenerate_structure_invoices(structure, effective_from=effective_from)
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ {structure}: removed {summary['items_removed']} stale items, "
+                    f"created {summary['invoices_created']} invoices / {summary['items_created']} items"
+                ))
+                return
+
+            if not options['academic_year']:
+                raise CommandError('--academic-year is required unless --structure-id is given')
+
+            classes = Class.objects.filter(is_active=True)
+            if options['class_id']:
+                classes = classes.filter(pk=options['class_id'])
+
+            invoices_total = 0
+            for class_obj in classes:
+                summary = generate_class_invoices(
+                    class_obj, options['academic_year'], effective_from=effective_from
+                )
+                invoices_total += summary['invoices_created']
+                self.stdout.write(
+                    f"   {class_obj.display_name}: {summary['students']} students, "
+                    f"{summary['invoices_created']} invoices, {summary['items_created']} items, "
+                    f"₹{summary['total_amount']}"
+                )
+
+            self.stdout.write(self.style.SUCCESS(f'✅ {invoices_total} invoices generated'))
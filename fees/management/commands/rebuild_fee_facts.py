@@ -0,0 +1,18 @@
+# fees/management/commands/rebuild_fee_facts.py
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from fees.fact_service import rebuild_facts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily fee fact table of a tenant from invoices and payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', type=str, required=True, help='Tenant schema (e.g., school_gvs01)')
+
+    def handle(self, *args, **options):
+        with schema_context(options['schema']):
+            rows = rebuild_facts()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {rows} daily fee fact rows rebuilt'))
@@ -0,0 +1,20 @@
+# fees/management/commands/rebuild_fee_ledger.py
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from fees.ledger_service import rebuild_ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the fee ledger and per-student balances from invoices and payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', type=str, required=True, help='Tenant schema (e.g., school_gvs01)')
+        parser.add_argument('--student-id', type=int, action='append', dest='student_ids',
+                            help='Only these students (repeatable)')
+
+    def handle(self, *args, **options):
+        with schema_context(options['schema']):
+            self.stdout.write('🔄 Rebuilding fee ledger...')
+            written = rebuild_ledger(options['student_ids'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {written} ledger entries written'))
@@ -0,0 +1,45 @@
+# fees/management/commands/reconcile_settlements.py
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import schema_context
+
+from fees.models import ReconciliationRun
+from fees.reconciliation_service import StatementFormatError, reconcile_statement
+
+
+class Command(BaseCommand):
+    help = 'Reconcile a bank statement / UPI settlement file against fee payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=str, help='Path to the settlement file')
+        parser.add_argument('--schema', type=str, required=True, help='Tenant schema (e.g., school_gvs01)')
+        parser.add_argument('--source', type=str, default='BANK',
+                            choices=[code for code, _ in ReconciliationRun.SOURCES])
+        parser.add_argument('--format', type=str, default='CSV', dest='file_format',
+                            choices=[code for code, _ in ReconciliationRun.FORMATS])
+
+    def handle(self, *args, **options):
+        try:
+            stream = open(options['file'], encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f'Cannot open {options["file"]}: {e}')
+
+        with stream, schema_context(options['schema']):
+            try:
+                run = reconcile_statement(
+                    stream,
+                    options['source'],
+                    options['file_format'],
+                    file_name=options['file'],
+                    created_by='manage.py',
+                )
+            except StatementFormatError as e:
+                raise CommandError(str(e))
+
+        self.stdout.write(
+            f"   {run.total_lines} lines, ₹{run.statement_amount} | "
+            f"matched {run.matched_count} (₹{run.matched_amount}), "
+            f"mismatched {run.mismatch_count}, unmatched {run.unmatched_count}, "
+            f"duplicates {run.duplicate_count}, rejected {run.rejected_count}, "
+            f"ambiguous {run.ambiguous_count}"
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Reconciliation run #{run.id} completed'))
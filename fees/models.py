@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Coalesce
 
 class FeeStructure(models.Model):
     FEE_TYPES = [
@@ -63,14 +64,30 @@ class FeeInvoice(models.Model):
         indexes = [
             models.Index(fields=['invoice_number']),
             models.Index(fields=['student', 'status']),
+            models.Index(fields=['status', 'due_date'], name='fee_invoice_overdue_idx'),
         ]
     
     def __str__(self):
         return f"Invoice #{self.invoice_number} - {self.student.admission_number}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the ledger was last posted for (see fees/signals.py)
+        instance._loaded_ledger = instance.ledger_state()
+        return instance
+
+    def ledger_state(self):
+        """(total_amount, status, balance_amount), or None when any is deferred"""
+        values = tuple(self.__dict__.get(field) for field in ('total_amount', 'status', 'balance_amount'))
+        return None if None in values else values
+
 
 class InvoiceItem(models.Model):
     invoice = models.ForeignKey(FeeInvoice, on_delete=models.CASCADE, related_name='items')
+    fee_structure = models.ForeignKey(FeeStructure, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='invoice_items')
+    installment = models.PositiveSmallIntegerField(default=1)  # 1..12 for monthly schedules
     fee_type = models.CharField(max_length=15, choices=FeeStructure.FEE_TYPES)
     description = models.CharField(max_length=200)
     amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
@@ -79,6 +96,9 @@ class InvoiceItem(models.Model):
     
     class Meta:
         ordering = ['fee_type']
+        indexes = [
+            models.Index(fields=['fee_structure', 'installment']),
+        ]
     
     def __str__(self):
         return f"{self.invoice.invoice_number} - {self.get_fee_type_display()}"
@@ -113,6 +133,9 @@ class FeePayment(models.Model):
     status = models.CharField(max_length=10, choices=PAYMENT_STATUS, default='SUCCESS')
     remarks = models.TextField(blank=True)
     received_by = models.CharField(max_length=100)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    reconciliation_run = models.ForeignKey('ReconciliationRun', on_delete=models.SET_NULL, null=True, blank=True,
+                                           related_name='payments')
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -120,10 +143,25 @@ class FeePayment(models.Model):
         indexes = [
             models.Index(fields=['transaction_id']),
         ]
+        constraints = [
+            # transaction_id is the idempotency key of payment_service.record_payment
+            models.UniqueConstraint(
+                fields=['transaction_id'],
+                condition=~models.Q(transaction_id=''),
+                name='unique_payment_transaction_id',
+            ),
+        ]
     
     def __str__(self):
         return f"Payment #{self.id} - {self.invoice.invoice_number} - ₹{self.amount}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the ledger was last posted for (see fees/signals.py)
+        instance._loaded_ledger = (instance.__dict__.get('status'), instance.__dict__.get('amount'))
+        return instance
+
 
 class FeeConcession(models.Model):
     student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='fee_concessions')
@@ -148,4 +186,183 @@ class FeeConcession(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.student.admission_number} - {self.get_concession_type_display()}"
\ No newline at end of file
+        return f"{self.student.admission_number} - {self.get_concession_type_display()}"
+
+class FeeLedgerEntry(models.Model):
+    """
+    Append-only fee ledger of a student.
+    Debits (invoices, refunds) are positive, credits (payments, concessions,
+    cancellations) are negative; balance_after is the running balance.
+    """
+    ENTRY_TYPES = [
+        ('INVOICE', 'Invoice Debit'),
+        ('CONCESSION', 'Concession Adjustment'),
+        ('PAYMENT', 'Payment Credit'),
+        ('REFUND', 'Refund'),
+        ('CANCELLATION', 'Invoice Cancellation'),
+        ('ADJUSTMENT', 'Invoice Adjustment'),
+    ]
+
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='fee_ledger')
+    entry_type = models.CharField(max_length=15, choices=ENTRY_TYPES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2)
+    invoice = models.ForeignKey(FeeInvoice, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='ledger_entries')
+    payment = models.ForeignKey(FeePayment, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='ledger_entries')
+    description = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['student', 'id']
+        indexes = [
+            models.Index(fields=['student', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['payment', 'entry_type'],
+                condition=models.Q(payment__isnull=False) & ~models.Q(entry_type='ADJUSTMENT'),
+                name='unique_ledger_payment_entry',
+            ),
+            models.UniqueConstraint(
+                fields=['invoice', 'entry_type'],
+                condition=models.Q(payment__isnull=True, invoice__isnull=False) & ~models.Q(entry_type='ADJUSTMENT'),
+                name='unique_ledger_invoice_entry',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.student.admission_number} - {self.get_entry_type_display()} - ₹{self.amount}"
+
+
+class StudentFeeBalance(models.Model):
+    """Per-student running totals, maintained with every FeeLedgerEntry"""
+    student = models.OneToOneField('students.Student', on_delete=models.CASCADE, related_name='fee_balance')
+    total_debit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_credit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_entry_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-balance']
+        indexes = [
+            # "All students with dues" is a scan of this partial index only
+            models.Index(fields=['balance'], condition=models.Q(balance__gt=0), name='fee_balance_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.admission_number} - ₹{self.balance}"
+
+
+class ReconciliationRun(models.Model):
+    """One import of a bank statement / UPI settlement file"""
+    SOURCES = [
+        ('BANK', 'Bank Statement'),
+        ('UPI', 'UPI Settlement'),
+    ]
+    FORMATS = [
+        ('CSV', 'CSV'),
+        ('MT940', 'MT940'),
+    ]
+    RUN_STATUS = [
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+
+    source = models.CharField(max_length=10, choices=SOURCES)
+    file_format = models.CharField(max_length=10, choices=FORMATS)
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=RUN_STATUS, default='RUNNING')
+    total_lines = models.PositiveIntegerField(default=0)
+    matched_count = models.PositiveIntegerField(default=0)
+    mismatch_count = models.PositiveIntegerField(default=0)
+    unmatched_count = models.PositiveIntegerField(default=0)
+    duplicate_count = models.PositiveIntegerField(default=0)
+    rejected_count = models.PositiveIntegerField(default=0)
+    ambiguous_count = models.PositiveIntegerField(default=0)
+    statement_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    matched_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    error = models.TextField(blank=True)
+    created_by = models.CharField(max_length=100, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.get_source_display()} - {self.file_name} ({self.status})"
+
+
+class ReconciliationLine(models.Model):
+    """A statement line and what it was matched to"""
+    LINE_STATUS = [
+        ('MATCHED', 'Matched'),
+        ('AMOUNT_MISMATCH', 'Amount Mismatch'),
+        ('UNMATCHED', 'Unmatched'),
+        ('DUPLICATE', 'Duplicate'),
+        ('REJECTED', 'Payment Rejected'),
+        ('AMBIGUOUS', 'Ambiguous Reference'),
+    ]
+
+    run = models.ForeignKey(ReconciliationRun, on_delete=models.CASCADE, related_name='lines')
+    line_number = models.PositiveIntegerField()
+    reference = models.CharField(max_length=100)
+    normalized_reference = models.CharField(max_length=100)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    value_date = models.DateField(null=True, blank=True)
+    narration = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=15, choices=LINE_STATUS)
+    payment = models.ForeignKey(FeePayment, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='reconciliation_lines')
+    note = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ['run', 'line_number']
+        indexes = [
+            models.Index(fields=['run', 'status']),
+            models.Index(fields=['normalized_reference']),
+        ]
+
+    def __str__(self):
+        return f"{self.run_id}:{self.line_number} {self.reference} - {self.status}"
+
+
+class FeeDailyFact(models.Model):
+    """
+    Pre-aggregated fee figures per day x class x fee type x payment mode.
+    Dues are booked on the invoice due date with an empty payment_mode,
+    collections on the payment date under their payment mode.
+    Maintained by fees.fact_service from ledger postings.
+    """
+    fact_date = models.DateField()
+    class_obj = models.ForeignKey('classes.Class', on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='fee_facts')
+    fee_type = models.CharField(max_length=15, choices=FeeStructure.FEE_TYPES)
+    payment_mode = models.CharField(max_length=15, choices=FeePayment.PAYMENT_MODES, blank=True)
+    due_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    collected_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payment_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['fact_date']
+        indexes = [
+            models.Index(fields=['fact_date', 'class_obj']),
+        ]
+        constraints = [
+            # Upsert target of fact_service (students without a class share class 0)
+            models.UniqueConstraint(
+                models.F('fact_date'),
+                Coalesce('class_obj', models.Value(0)),
+                models.F('fee_type'),
+                models.F('payment_mode'),
+                name='unique_fee_daily_fact',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.fact_date} - {self.fee_type} {self.payment_mode or 'DUE'}"
@@ -0,0 +1,211 @@
+# fees/payment_service.py
+
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import FeeInvoice, FeePayment
+from .ledger_service import post_payments
+
+
+# Invoice statuses that accept payments
+PAYABLE_STATUSES = ['PENDING', 'PARTIAL', 'OVERDUE']
+
+
+class PaymentError(Exception):
+    """Payment rejected (invoice not payable, invalid or excess amount)"""
+
+
+def record_payment(invoice_id, amount, payment_mode, transaction_id='', received_by='',
+                   payment_date=None, **details):
+    """
+    Record a payment against an invoice exactly once
+
+    The transaction id is the idempotency key: a retried gateway callback or
+    a double-clicked counter submit returns the payment recorded the first
+    time instead of counting the money again. The invoice row is locked
+    with SELECT ... FOR UPDATE only for the few statements that create the
+    payment and move paid/balance/status, so concurrent counters serialize
+    per invoice while payments on different invoices run in parallel.
+    The payment's ledger entry is posted in the same transaction.
+
+    Args:
+        invoice_id: FeeInvoice primary key
+        amount: Amount received (Decimal, str or number); None pays the
+            outstanding balance
+        payment_mode: One of FeePayment.PAYMENT_MODES
+        transaction_id: Idempotency key (gateway/bank reference, receipt number)
+        received_by: Cashier name or "ONLINE"
+        payment_date: Date received (default: today)
+        details: Other FeePayment fields (bank_name, cheque_dd_number, remarks, ...)
+
+    Returns:
+        tuple: (FeePayment, created) - created is False for a duplicate key
+
+    Raises:
+        FeeInvoice.DoesNotExist: Unknown invoice
+        PaymentError: Invalid amount, invoice not payable, or a reused key
+            whose invoice or amount differs from the recorded payment
+    """
+    transaction_id = (transaction_id or '').strip()
+
+    # A replay is answered before any amount checks: the invoice may be
+    # fully paid by now, so its balance is no longer a valid amount
+    if transaction_id:
+        existing = _existing_payment(transaction_id)
+        if existing:
+            return _replay(existing, invoice_id, amount), False
+
+    if amount is not None:
+        amount = _to_amount(amount)
+
+    try:
+        with transaction.atomic():
+            invoice = FeeInvoice.objects.select_for_update().get(pk=invoice_id)
+
+            # A duplicate that raced us on this invoice committed while we waited for the lock
+            if transaction_id:
+                existing = _existing_payment(transaction_id)
+                if existing:
+                    return _replay(existing, invoice_id, amount), False
+
+            if invoice.status not in PAYABLE_STATUSES:
+                raise PaymentError(f'Invoice #{invoice.invoice_number} is {invoice.get_status_display().lower()}')
+            if amount is None:
+                amount = _to_amount(invoice.balance_amount)
+            if amount > invoice.balance_amount:
+                raise PaymentError(
+                    f'Amount exceeds the outstanding balance of ₹{invoice.balance_amount}'
+                )
+
+            payment = FeePayment.objects.create(
+                invoice=invoice,
+                payment_date=payment_date or date.today(),
+                amount=amount,
+                payment_mode=payment_mode,
+                transaction_id=transaction_id,
+                received_by=received_by,
+                status='SUCCESS',
+                **details,
+            )
+
+            invoice.paid_amount += amount
+            invoice.balance_amount -= amount
+            invoice.status = 'PAID' if invoice.balance_amount <= 0 else 'PARTIAL'
+            FeeInvoice.objects.filter(pk=invoice.pk).update(
+                paid_amount=invoice.paid_amount,
+                balance_amount=invoice.balance_amount,
+                status=invoice.status,
+                updated_at=timezone.now(),
+            )
+    except IntegrityError:
+        # Same key recorded concurrently against another invoice
+        # (unique_payment_transaction_id); hand back that payment
+        existing = _existing_payment(transaction_id) if transaction_id else None
+        if existing is None:
+            raise
+        return _replay(existing, invoice_id, amount), False
+
+    payment.invoice = invoice
+    return payment, True
+
+
+def confirm_payments(payment_ids, reconciled_at=None, reconciliation_run=None):
+    """
+    Settle PENDING payments (e.g. gateway payments seen on a settlement file)
+
+    Invoices are locked in id order, amounts are applied in memory and
+    invoices, payments and ledger are written with one bulk statement each.
+    A payment that no longer fits its invoice (cancelled, or more than the
+    outstanding balance) is left PENDING and reported back.
+
+    Returns:
+        tuple: (confirmed payment ids, {payment_id: reason} for rejected ones)
+    """
+    if not payment_ids:
+        return [], {}
+    now = timezone.now()
+
+    with transaction.atomic():
+        invoice_ids = set(
+            FeePayment.objects.filter(id__in=payment_ids).values_list('invoice_id', flat=True)
+        )
+        invoices = {
+            invoice.id: invoice
+            for invoice in FeeInvoice.objects.select_for_update().filter(id__in=invoice_ids).order_by('id')
+        }
+        # Re-read under lock so a payment confirmed concurrently is not applied twice
+        payments = list(
+            FeePayment.objects.select_for_update().filter(id__in=payment_ids, status='PENDING').order_by('id')
+        )
+
+        confirmed, rejected = [], {}
+        for payment in payments:
+            invoice = invoices[payment.invoice_id]
+            if invoice.status not in PAYABLE_STATUSES:
+                rejected[payment.id] = f'Invoice #{invoice.invoice_number} is {invoice.get_status_display().lower()}'
+                continue
+            if payment.amount > invoice.balance_amount:
+                rejected[payment.id] = f'Exceeds invoice balance of ₹{invoice.balance_amount}'
+                continue
+
+            invoice.paid_amount += payment.amount
+            invoice.balance_amount -= payment.amount
+            invoice.status = 'PAID' if invoice.balance_amount <= 0 else 'PARTIAL'
+            invoice.updated_at = now
+            payment.invoice = invoice
+            payment.status = 'SUCCESS'
+            payment.reconciled_at = reconciled_at
+            payment.reconciliation_run = reconciliation_run
+            confirmed.append(payment)
+
+        if confirmed:
+            FeeInvoice.objects.bulk_update(
+                {payment.invoice_id: payment.invoice for payment in confirmed}.values(),
+                ['paid_amount', 'balance_amount', 'status', 'updated_at'],
+            )
+            FeePayment.objects.bulk_update(
+                confirmed, ['status', 'reconciled_at', 'reconciliation_run'], batch_size=1000
+            )
+            # bulk_update bypasses post_save, so credit the ledger here
+            post_payments(confirmed)
+
+    return [payment.id for payment in confirmed], rejected
+
+
+def _existing_payment(transaction_id):
+    return FeePayment.objects.select_related('invoice').filter(transaction_id=transaction_id).first()
+
+
+def _replay(existing, invoice_id, amount):
+    """
+    The payment already recorded under a transaction id, provided the
+    repeated request is for the same invoice and (when given) amount
+
+    Raises:
+        PaymentError: The key was used for a different payment
+    """
+    if str(existing.invoice_id) != str(invoice_id):
+        raise PaymentError(f'Transaction {existing.transaction_id} was already used for another invoice')
+    if amount is not None:
+        try:
+            same_amount = Decimal(str(amount)).quantize(Decimal('0.01')) == existing.amount
+        except (InvalidOperation, TypeError, ValueError):
+            same_amount = False
+        if not same_amount:
+            raise PaymentError(
+                f'Transaction {existing.transaction_id} was already recorded for ₹{existing.amount}'
+            )
+    return existing
+
+
+def _to_amount(amount):
+    try:
+        amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError, ValueError):
+        raise PaymentError('Invalid amount format')
+    if amount <= 0:
+        raise PaymentError('Amount must be positive')
+    return amount
@@ -0,0 +1,373 @@
+# fees/reconciliation_service.py
+
+import csv
+import io
+import re
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import FeePayment, ReconciliationRun, ReconciliationLine
+from .payment_service import confirm_payments
+
+
+# Statement lines matched per batch (one bulk write per table per batch)
+BATCH_SIZE = 2000
+
+# Payment modes that settle through the bank / UPI files
+SETTLED_PAYMENT_MODES = ['UPI', 'BANK_TRANSFER', 'ONLINE', 'CARD']
+
+# Rail prefixes banks put in front of the reference ("UPI/4123...", "NEFT-N2345...")
+REFERENCE_PREFIX = re.compile(r'^(UPI|NEFT|IMPS|RTGS|UTR|RRN|TXN|REF)(?:[\s/:\-_.#]+|(?=\d))')
+NON_ALPHANUMERIC = re.compile(r'[^A-Z0-9]')
+
+CSV_REFERENCE_COLUMNS = ['utr', 'reference', 'ref', 'reference_no', 'transaction_id', 'txn_id', 'rrn']
+CSV_AMOUNT_COLUMNS = ['amount', 'credit', 'credit_amount', 'settled_amount']
+CSV_DATE_COLUMNS = ['value_date', 'date', 'txn_date', 'transaction_date', 'settlement_date']
+CSV_NARRATION_COLUMNS = ['narration', 'description', 'remarks', 'particulars']
+DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%d-%b-%Y', '%d %b %Y', '%y%m%d']
+
+# :61:YYMMDD[MMDD](C|D|RC|RD)[funds code]amount N<type><customer ref>[//bank ref]
+MT940_STATEMENT_LINE = re.compile(
+    r'^(?P<date>\d{6})(?:\d{4})?(?P<mark>R?[CD])[A-Z]?(?P<amount>[\d,]+)'
+    r'[NFS][A-Z0-9]{3}(?P<reference>[^/\n]*)(?://(?P<bank_reference>.*))?$'
+)
+
+StatementLine = namedtuple('StatementLine', ['line_number', 'reference', 'amount', 'value_date', 'narration'])
+
+
+class StatementFormatError(Exception):
+    """The settlement file cannot be read in the given format"""
+
+
+def normalize_reference(reference):
+    """
+    Canonical form of a payment reference, used as the join key
+
+    Example: " upi/4123-5678 90 " -> "4123567890"
+    """
+    value = (reference or '').strip().upper()
+    value = REFERENCE_PREFIX.sub('', value)
+    return NON_ALPHANUMERIC.sub('', value)
+
+
+# ----------------------------------------
+# Parsers (generators, the file is never loaded whole)
+# ----------------------------------------
+
+def parse_csv(stream):
+    """
+    Yield credit lines of a CSV statement
+
+    Columns are found by header name (see CSV_*_COLUMNS); rows without a
+    reference or with a non-positive amount (debits) are skipped.
+    """
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        raise StatementFormatError('Empty CSV file')
+    columns = {name.strip().lower().replace(' ', '_'): name for name in reader.fieldnames}
+
+    reference_column = _pick_column(columns, CSV_REFERENCE_COLUMNS)
+    amount_column = _pick_column(columns, CSV_AMOUNT_COLUMNS)
+    if not reference_column or not amount_column:
+        raise StatementFormatError('CSV needs a reference (e.g. UTR) and an amount column')
+    date_column = _pick_column(columns, CSV_DATE_COLUMNS)
+    narration_column = _pick_column(columns, CSV_NARRATION_COLUMNS)
+
+    for line_number, row in enumerate(reader, start=2):
+        reference = (row.get(reference_column) or '').strip()
+        amount = _parse_amount(row.get(amount_column))
+        if not reference or amount is None or amount <= 0:
+            continue
+        yield StatementLine(
+            line_number,
+            reference,
+            amount,
+            _parse_date(row.get(date_column)) if date_column else None,
+            (row.get(narration_column) or '').strip() if narration_column else '',
+        )
+
+
+def parse_mt940(stream):
+    """
+    Yield credit lines of an MT940-like statement
+
+    Each :61: statement line gives date, amount and reference; the
+    following :86: field is used as narration. Debits are skipped.
+    """
+    pending = None
+    for line_number, raw_line in enumerate(stream, start=1):
+        line = raw_line.rstrip('\r\n')
+        if line.startswith(':61:'):
+            if pending:
+                yield pending
+            pending = _parse_mt940_statement_line(line_number, line[4:])
+        elif line.startswith(':86:') and pending:
+            pending = pending._replace(narration=line[4:].strip()[:255])
+        elif line.startswith(':'):
+            if pending:
+                yield pending
+            pending = None
+    if pending:
+        yield pending
+
+
+PARSERS = {
+    'CSV': parse_csv,
+    'MT940': parse_mt940,
+}
+
+
+# ----------------------------------------
+# Reconciliation
+# ----------------------------------------
+
+def reconcile_statement(stream, source, file_format, file_name='', created_by=''):
+    """
+    Match a settlement file against unreconciled FeePayments
+
+    The unreconciled PENDING/SUCCESS payments of the settled payment modes
+    are loaded once into a dictionary keyed by normalized transaction id
+    (the build side of a hash join). The file is then streamed and probed
+    against it in batches of BATCH_SIZE lines, so a month-end file costs a
+    handful of queries per batch instead of one lookup per line:
+
+        MATCHED          reference and amount agree; SUCCESS payments are
+                         stamped reconciled, PENDING ones are confirmed
+        AMOUNT_MISMATCH  reference found, amount differs (payment untouched)
+        REJECTED         reference and amount agree but the PENDING payment
+                         cannot be confirmed (invoice cancelled, paid, or
+                         short of balance); the reason is kept in the note
+        AMBIGUOUS        the reference normalizes to the key of more than
+                         one payment (none of them is touched)
+        UNMATCHED        no payment with this reference
+        DUPLICATE        reference already reconciled (earlier line or run)
+
+    Each batch is written in its own transaction, so a failure leaves the
+    run with whole batches only: a payment is never stamped reconciled
+    without its line.
+
+    Args:
+        stream: Text stream of the statement
+        source: 'BANK' or 'UPI'
+        file_format: 'CSV' or 'MT940'
+
+    Returns:
+        ReconciliationRun: The persisted run report
+    """
+    parser = PARSERS.get(file_format)
+    if parser is None:
+        raise StatementFormatError(f'Unsupported format: {file_format}')
+
+    run = ReconciliationRun.objects.create(
+        source=source, file_format=file_format, file_name=file_name, created_by=created_by,
+    )
+    try:
+        payments, ambiguous = _unreconciled_payments()
+        seen = set()
+        batch = []
+        for line in parser(stream):
+            batch.append(line)
+            if len(batch) >= BATCH_SIZE:
+                _reconcile_batch(run, batch, payments, ambiguous, seen)
+                batch = []
+        if batch:
+            _reconcile_batch(run, batch, payments, ambiguous, seen)
+    except Exception as e:
+        # The counters in memory may include a batch that was rolled back;
+        # the saved ones cover the committed batches
+        run.status = 'FAILED'
+        run.error = str(e)
+        run.completed_at = timezone.now()
+        run.save(update_fields=['status', 'error', 'completed_at'])
+        raise
+
+    run.status = 'COMPLETED'
+    run.completed_at = timezone.now()
+    run.save()
+    return run
+
+
+def open_text(uploaded_file, encoding='utf-8-sig'):
+    """Wrap an uploaded (binary) file as a text stream without reading it whole"""
+    uploaded_file.seek(0)
+    return io.TextIOWrapper(getattr(uploaded_file, 'file', uploaded_file), encoding=encoding, newline='')
+
+
+def _unreconciled_payments():
+    """
+    Build side of the join
+
+    Returns:
+        tuple: ({normalized transaction id: (payment_id, amount, status)},
+            {normalized transaction id: [payment ids]} for keys shared by
+            several payments, which are left out of the first dict)
+    """
+    rows = FeePayment.objects.filter(
+        status__in=['PENDING', 'SUCCESS'],
+        payment_mode__in=SETTLED_PAYMENT_MODES,
+        reconciled_at__isnull=True,
+    ).exclude(transaction_id='').values_list('id', 'transaction_id', 'amount', 'status')
+
+    payments, ambiguous = {}, {}
+    for payment_id, transaction_id, amount, status in rows.iterator(chunk_size=5000):
+        key = normalize_reference(transaction_id)
+        if not key:
+            continue
+        if key in ambiguous:
+            ambiguous[key].append(payment_id)
+        elif key in payments:
+            ambiguous[key] = [payments.pop(key)[0], payment_id]
+        else:
+            payments[key] = (payment_id, amount, status)
+    return payments, ambiguous
+
+
+def _reconcile_batch(run, batch, payments, ambiguous, seen):
+    """Match and write one batch in its own transaction"""
+    with transaction.atomic():
+        _match_batch(run, batch, payments, ambiguous, seen)
+
+
+def _match_batch(run, batch, payments, ambiguous, seen):
+    now = timezone.now()
+    lines = []
+    reconciled_ids, pending_ids = [], []
+    pending_lines = {}
+
+    for statement_line in batch:
+        key = normalize_reference(statement_line.reference)
+        line = ReconciliationLine(
+            run=run,
+            line_number=statement_line.line_number,
+            reference=statement_line.reference[:100],
+            normalized_reference=key[:100],
+            amount=statement_line.amount,
+            value_date=statement_line.value_date,
+            narration=statement_line.narration[:255],
+        )
+        lines.append(line)
+        run.total_lines += 1
+        run.statement_amount += statement_line.amount
+
+        if key in seen:
+            line.status = 'DUPLICATE'
+            line.note = 'Reference repeated in this file'
+            continue
+
+        if key in ambiguous:
+            line.status = 'AMBIGUOUS'
+            line.note = ('Reference matches payments ' + ', '.join(f'#{pk}' for pk in ambiguous[key]))[:200]
+            continue
+
+        match = payments.get(key)
+        if match is None:
+            line.status = 'UNMATCHED'
+            continue
+
+        payment_id, amount, status = match
+        line.payment_id = payment_id
+        if amount != statement_line.amount:
+            line.status = 'AMOUNT_MISMATCH'
+            line.note = f'Payment amount ₹{amount}'
+            continue
+
+        line.status = 'MATCHED'
+        seen.add(key)
+        del payments[key]
+        if status == 'PENDING':
+            pending_ids.append(payment_id)
+            pending_lines[payment_id] = line
+        else:
+            reconciled_ids.append(payment_id)
+
+    # Unmatched references that were reconciled by an earlier run
+    unmatched = {line.normalized_reference: line for line in lines if line.status == 'UNMATCHED'}
+    if unmatched:
+        raw_references = [line.reference for line in unmatched.values()]
+        earlier = FeePayment.objects.filter(
+            Q(transaction_id__in=raw_references) | Q(transaction_id__in=list(unmatched)),
+            reconciled_at__isnull=False,
+        ).values_list('id', 'transaction_id')
+        # Lines matched by earlier runs catch references the bank wrote
+        # differently from the stored transaction id ("UPI/4123 5678" vs "4123-5678")
+        matched_before = ReconciliationLine.objects.filter(
+            normalized_reference__in=list(unmatched), status='MATCHED',
+        ).values_list('payment_id', 'normalized_reference')
+        for payment_id, key in [*earlier, *matched_before]:
+            line = unmatched.get(normalize_reference(key))
+            if line is not None:
+                line.status = 'DUPLICATE'
+                line.payment_id = payment_id
+                line.note = 'Already reconciled'
+
+    if reconciled_ids:
+        FeePayment.objects.filter(id__in=reconciled_ids).update(reconciled_at=now, reconciliation_run=run)
+    if pending_ids:
+        _, rejected = confirm_payments(pending_ids, reconciled_at=now, reconciliation_run=run)
+        for payment_id, reason in rejected.items():
+            line = pending_lines[payment_id]
+            line.status = 'REJECTED'
+            line.note = reason[:200]
+
+    ReconciliationLine.objects.bulk_create(lines, batch_size=1000)
+
+    for line in lines:
+        if line.status == 'MATCHED':
+            run.matched_count += 1
+            run.matched_amount += line.amount
+        elif line.status == 'AMOUNT_MISMATCH':
+            run.mismatch_count += 1
+        elif line.status == 'UNMATCHED':
+            run.unmatched_count += 1
+        elif line.status == 'REJECTED':
+            run.rejected_count += 1
+        elif line.status == 'AMBIGUOUS':
+            run.ambiguous_count += 1
+        else:
+            run.duplicate_count += 1
+    run.save(update_fields=[
+        'total_lines', 'matched_count', 'mismatch_count', 'unmatched_count',
+        'duplicate_count', 'rejected_count', 'ambiguous_count', 'statement_amount', 'matched_amount',
+    ])
+
+
+def _parse_mt940_statement_line(line_number, value):
+    match = MT940_STATEMENT_LINE.match(value.strip())
+    if not match or match.group('mark') not in ('C', 'RD'):
+        return None
+    amount = _parse_amount(match.group('amount').replace(',', '.'))
+    reference = match.group('reference').strip()
+    if reference in ('', 'NONREF'):
+        reference = (match.group('bank_reference') or '').strip()
+    if not reference or amount is None:
+        return None
+    return StatementLine(line_number, reference, amount, _parse_date(match.group('date')), '')
+
+
+def _pick_column(columns, candidates):
+    for candidate in candidates:
+        if candidate in columns:
+            return columns[candidate]
+    return None
+
+
+def _parse_amount(value):
+    try:
+        return Decimal(str(value).replace(',', '').strip()).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def _parse_date(value):
+    value = (value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
@@ -0,0 +1,61 @@
+from rest_framework import serializers
+from .models import (
+    FeeInvoice, InvoiceItem, FeePayment, FeeLedgerEntry, ReconciliationRun, ReconciliationLine,
+)
+
+
+class InvoiceItemSerializer(serializers.ModelSerializer):
+    fee_type_display = serializers.CharField(source='get_fee_type_display', read_only=True)
+
+    class Meta:
+        model = InvoiceItem
+        fields = ['id', 'fee_type', 'fee_type_display', 'description', 'installment',
+                  'amount', 'discount', 'net_amount']
+
+
+class FeeInvoiceSerializer(serializers.ModelSerializer):
+    items = InvoiceItemSerializer(many=True, read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = FeeInvoice
+        fields = ['id', 'invoice_number', 'invoice_date', 'due_date', 'total_amount',
+                  'paid_amount', 'balance_amount', 'status', 'status_display',
+                  'academic_year', 'items']
+
+
+class FeePaymentSerializer(serializers.ModelSerializer):
+    invoice_number = serializers.CharField(source='invoice.invoice_number', read_only=True)
+    payment_mode_display = serializers.CharField(source='get_payment_mode_display', read_only=True)
+
+    class Meta:
+        model = FeePayment
+        fields = ['id', 'invoice', 'invoice_number', 'payment_date', 'amount', 'payment_mode',
+                  'payment_mode_display', 'transaction_id', 'status', 'remarks', 'received_by',
+                  'created_at']
+
+
+class FeeLedgerEntrySerializer(serializers.ModelSerializer):
+    entry_type_display = serializers.CharField(source='get_entry_type_display', read_only=True)
+    invoice_number = serializers.CharField(source='invoice.invoice_number', read_only=True, allow_null=True)
+
+    class Meta:
+        model = FeeLedgerEntry
+        fields = ['id', 'entry_type', 'entry_type_display', 'amount', 'balance_after',
+                  'invoice', 'invoice_number', 'payment', 'description', 'created_at']
+
+
+class ReconciliationRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReconciliationRun
+        fields = ['id', 'source', 'file_format', 'file_name', 'status', 'total_lines',
+                  'matched_count', 'mismatch_count', 'unmatched_count', 'duplicate_count',
+                  'rejected_count', 'ambiguous_count', 'statement_amount', 'matched_amount', 'error', 'created_by',
+                  'started_at', 'completed_at']
+
+
+class ReconciliationLineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReconciliationLine
+        fields = ['id', 'line_number', 'reference', 'amount', 'value_date', 'narration',
+                  'status', 'payment', 'note']
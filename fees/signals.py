@@ -0,0 +1,37 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import FeeInvoice, FeePayment, InvoiceItem
+from . import fact_service, ledger_service
+
+
+@receiver(post_save, sender=FeeInvoice)
+def post_invoice_to_ledger(sender, instance: FeeInvoice, created, **kwargs):
+    if created:
+        if instance.status != 'CANCELLED':
+            # Posted in the invoice's transaction; items saved afterwards
+            # re-split the dues (split_invoice_dues_by_item)
+            ledger_service.post_invoice(instance)
+        else:
+            ledger_service.post_invoice_cancellation(instance)
+    else:
+        # Amount edits, cancellation and reinstatement against the loaded values
+        ledger_service.post_invoice_change(instance, getattr(instance, '_loaded_ledger', None))
+    instance._loaded_ledger = instance.ledger_state()
+
+
+@receiver(post_save, sender=InvoiceItem)
+def split_invoice_dues_by_item(sender, instance: InvoiceItem, created, **kwargs):
+    # bulk_create sends no post_save; invoice generation books its own items
+    if created:
+        fact_service.apply_item_added(instance)
+
+
+@receiver(post_save, sender=FeePayment)
+def post_payment_to_ledger(sender, instance: FeePayment, created, **kwargs):
+    loaded = getattr(instance, '_loaded_ledger', None)
+    current = (instance.status, instance.amount)
+    # Saves that change neither status nor amount cannot move the ledger
+    if loaded != current and (not created or instance.status in ('SUCCESS', 'REFUNDED')):
+        ledger_service.post_payment_change(instance)
+    instance._loaded_ledger = current
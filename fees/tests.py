@@ -1,3 +1,432 @@
-from django.test import TestCase
+import io
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db.models import Q
+from django.test import SimpleTestCase
+
+from schools.testing import SchoolTestCase
+from .concession_service import ConcessionEvaluator
+from .defaulters_service import bucket_summary, defaulters_queryset, overdue_invoices, paginate, stream_csv
+from .fact_service import fact_queryset, rebuild_facts, rollup
+from .invoice_service import generate_class_invoices, is_valid_academic_year, preview_class_concessions
+from .ledger_service import outstanding_balance, rebuild_ledger, students_with_dues
+from .models import (
+    FeeConcession, FeeInvoice, FeeLedgerEntry, FeePayment, FeeStructure, InvoiceItem, ReconciliationLine,
+)
+from .payment_service import PaymentError, record_payment
+from .reconciliation_service import normalize_reference, parse_mt940, reconcile_statement
+
+ACADEMIC_YEAR = '2025-2026'
+
+
+class FeeTestCase(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.class_obj = self.make_class()
+        self.students = [self.make_student(self.class_obj) for _ in range(2)]
+
+    def make_structure(self, amount='1000.00', frequency='YEARLY', fee_type='TUITION'):
+        return FeeStructure.objects.create(
+            class_name=self.class_obj, fee_type=fee_type, amount=Decimal(amount),
+            frequency=frequency, academic_year=ACADEMIC_YEAR,
+        )
+
+    def yearly_invoice(self, amount='1000.00'):
+        """One generated invoice of the first student"""
+        self.make_structure(amount)
+        generate_class_invoices(self.class_obj, ACADEMIC_YEAR, start_month=4)
+        return FeeInvoice.objects.get(student=self.students[0])
+
+
+class InvoiceGenerationTests(FeeTestCase):
+
+    def test_installments_are_invoiced_once(self):
+        self.make_structure(frequency='QUARTERLY')
+
+        first = generate_class_invoices(self.class_obj, ACADEMIC_YEAR, start_month=4)
+        again = generate_class_invoices(self.class_obj, ACADEMIC_YEAR, start_month=4)
+
+        self.assertEqual(first['invoices_created'], 8)
+        self.assertEqual(again['invoices_created'], 0)
+        self.assertEqual(FeeInvoice.objects.count(), 8)
+        self.assertEqual(outstanding_balance(self.students[0].id), Decimal('4000.00'))
+
+    def test_new_structure_is_billed_after_a_rerun(self):
+        self.make_structure()
+        generate_class_invoices(self.class_obj, ACADEMIC_YEAR, start_month=4)
+        self.make_structure(amount='300.00', fee_type='LAB')
+
+        summary = generate_class_invoices(self.class_obj, ACADEMIC_YEAR, start_month=4)
+
+        self.assertEqual(summary['items_created'], 2)
+        self.assertEqual(outstanding_balance(self.students[0].id), Decimal('1300.00'))
+
+    def test_academic_year_format(self):
+        self.assertTrue(is_valid_academic_year('2025-2026'))
+        self.assertFalse(is_valid_academic_year('2025-2027'))
+        self.assertFalse(is_valid_academic_year('2025'))
+        self.assertFalse(is_valid_academic_year(None))
+
+
+class ConcessionEvaluatorTests(SimpleTestCase):
+
+    def test_concession_counts_once_and_fixed_amount_once_per_invoice(self):
+        start = date(2025, 4, 1)
+        evaluator = ConcessionEvaluator([
+            (1, 7, 'TUITION, ALL', Decimal('10'), None, start, None),
+            (2, 7, 'ALL', None, Decimal('500'), start, None),
+        ])
+        april, may = date(2025, 4, 10), date(2025, 5, 10)
+
+        self.assertEqual(evaluator.discount(7, 'TUITION', Decimal('1000'), april), Decimal('600.00'))
+        self.assertEqual(evaluator.discount(7, 'LAB', Decimal('300'), april), Decimal('30.00'))
+        self.assertEqual(evaluator.discount(7, 'LAB', Decimal('300'), may), Decimal('300.00'))
+
+    def test_capped_discount_is_attributed_to_its_concessions(self):
+        start = date(2025, 4, 1)
+        evaluator = ConcessionEvaluator([
+            (1, 7, 'TUITION', Decimal('50'), None, start, None),
+            (2, 7, 'TUITION', None, Decimal('800'), start, None),
+            (3, 7, 'TUITION', Decimal('20'), None, date(2026, 4, 1), None),
+        ])
+
+        discounts = evaluator.evaluate([(7, 'TUITION', Decimal('1000'), date(2025, 4, 10)),
+                                        (8, 'TUITION', Decimal('1000'), date(2025, 4, 10))])
+
+        self.assertEqual(discounts, [Decimal('1000.00'), Decimal('0.00')])
+        self.assertEqual(evaluator.breakdown()[7]['concessions'], {1: Decimal('500.00'), 2: Decimal('500.00')})
+        self.assertEqual(evaluator.breakdown()[8]['net_amount'], Decimal('1000'))
+
+
+class ConcessionInvoiceTests(FeeTestCase):
+
+    def test_generated_items_carry_the_class_concessions(self):
+        student = self.students[0]
+        FeeConcession.objects.create(
+            student=student, concession_type='SCHOLARSHIP', description='Merit', percentage=Decimal('25'),
+            applicable_fee_types='TUITION', start_date=date(2025, 4, 1), approved_by='Principal',
+            approved_date=date(2025, 3, 1),
+        )
+        self.make_structure()
+
+        preview = preview_class_concessions(self.class_obj, ACADEMIC_YEAR, start_month=4)
+        generate_class_invoices(self.class_obj, ACADEMIC_YEAR, start_month=4)
+
+        self.assertEqual(preview[student.id]['discount'], Decimal('250.00'))
+        self.assertEqual(FeeInvoice.objects.get(student=student).total_amount, Decimal('750.00'))
+        self.assertEqual(outstanding_balance(student.id), Decimal('750.00'))
+        self.assertEqual(outstanding_balance(self.students[1].id), Decimal('1000.00'))
+
+
+class LedgerPostingTests(FeeTestCase):
+
+    def test_invoice_edit_cancellation_and_reinstatement(self):
+        invoice = self.yearly_invoice()
+        student_id = invoice.student_id
+
+        invoice.total_amount = invoice.balance_amount = Decimal('800.00')
+        invoice.save()
+        self.assertEqual(outstanding_balance(student_id), Decimal('800.00'))
+
+        invoice.status = 'CANCELLED'
+        invoice.save()
+        self.assertEqual(outstanding_balance(student_id), Decimal('0.00'))
+
+        invoice.status = 'PENDING'
+        invoice.save()
+        self.assertEqual(outstanding_balance(student_id), Decimal('800.00'))
+
+    def test_failed_payment_reverses_its_credit(self):
+        invoice = self.yearly_invoice()
+        payment, _ = record_payment(invoice.id, None, 'CARD', transaction_id='TXN-4')
+        self.assertEqual(outstanding_balance(invoice.student_id), Decimal('0.00'))
+
+        payment = FeePayment.objects.get(pk=payment.pk)
+        payment.status = 'FAILED'
+        payment.save()
+        self.assertEqual(outstanding_balance(invoice.student_id), Decimal('1000.00'))
+
+        payment.status = 'SUCCESS'
+        payment.save()
+        self.assertEqual(outstanding_balance(invoice.student_id), Decimal('0.00'))
+
+    def test_running_balance_and_rebuild_agree(self):
+        invoice = self.yearly_invoice()
+        record_payment(invoice.id, '400', 'CASH')
+
+        balances = list(FeeLedgerEntry.objects.filter(student_id=invoice.student_id)
+                        .order_by('id').values_list('balance_after', flat=True))
+        self.assertEqual(balances, [Decimal('1000.00'), Decimal('600.00')])
+        self.assertEqual(students_with_dues().count(), 2)
+
+        rebuild_ledger()
+
+        self.assertEqual(outstanding_balance(invoice.student_id), Decimal('600.00'))
+        self.assertEqual(outstanding_balance(self.students[1].id), Decimal('1000.00'))
+
+
+class DefaultersReportTests(FeeTestCase):
+
+    AS_OF = date(2025, 12, 31)
+
+    def setUp(self):
+        super().setUp()
+        first, second = self.students
+        self.invoice(first, date(2025, 12, 15))                    # 16 days
+        self.invoice(first, date(2025, 11, 1))                     # 60 days
+        self.invoice(second, date(2025, 8, 1))                     # 152 days
+        self.invoice(second, date(2025, 10, 1), status='PAID')
+        self.invoice(second, date(2026, 1, 15))                    # not due yet
+
+    def invoice(self, student, due_date, status='PENDING'):
+        balance = Decimal('0') if status == 'PAID' else Decimal('500.00')
+        return FeeInvoice.objects.create(
+            student=student, invoice_number=f'INV-{FeeInvoice.objects.count() + 1}',
+            invoice_date=due_date.replace(day=1), due_date=due_date, total_amount=Decimal('500.00'),
+            paid_amount=Decimal('500.00') - balance, balance_amount=balance, status=status,
+            academic_year=ACADEMIC_YEAR,
+        )
+
+    def test_rows_are_bucketed_by_overdue_days(self):
+        rows = list(defaulters_queryset(as_of=self.AS_OF))
+
+        self.assertEqual([(row['overdue_days'], row['bucket']) for row in rows],
+                         [(152, '90+'), (60, '31-60'), (16, '0-30')])
+        self.assertEqual(rows[0]['admission_number'], self.students[1].admission_number)
+        self.assertEqual(
+            [row['invoice_number'] for row in defaulters_queryset(as_of=self.AS_OF, bucket='31-60')],
+            [rows[1]['invoice_number']],
+        )
+
+    def test_bucket_summary(self):
+        summary = bucket_summary(overdue_invoices(as_of=self.AS_OF))
+
+        self.assertEqual([(row['bucket'], row['invoices'], row['students']) for row in summary],
+                         [('0-30', 1, 1), ('31-60', 1, 1), ('61-90', 0, 0), ('90+', 1, 1)])
+        self.assertEqual(summary[0]['amount'], Decimal('500.00'))
+
+    def test_cursor_pages_cover_every_row_once(self):
+        queryset = defaulters_queryset(as_of=self.AS_OF)
+
+        first, cursor = paginate(queryset, page_size=2)
+        second, last_cursor = paginate(queryset, cursor, page_size=2)
+
+        self.assertEqual([row['id'] for row in first + second], [row['id'] for row in queryset])
+        self.assertIsNone(last_cursor)
+        with self.assertRaises(ValueError):
+            paginate(queryset, 'not-a-cursor')
+
+    def test_csv_export_streams_every_row(self):
+        lines = list(stream_csv(defaulters_queryset(as_of=self.AS_OF), chunk_size=1))
+
+        self.assertTrue(lines[0].startswith('Invoice Number,'))
+        self.assertEqual(len(lines), 4)
+
+
+class PaymentReplayTests(FeeTestCase):
+
+    def test_replay_returns_the_first_payment(self):
+        invoice = self.yearly_invoice()
+
+        payment, created = record_payment(invoice.id, None, 'UPI', transaction_id='TXN-1', received_by='ONLINE')
+        replay, replay_created = record_payment(invoice.id, None, 'UPI', transaction_id='TXN-1', received_by='ONLINE')
+
+        self.assertTrue(created)
+        self.assertFalse(replay_created)
+        self.assertEqual(replay.pk, payment.pk)
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.status, 'PAID')
+        self.assertEqual(FeePayment.objects.count(), 1)
+        self.assertEqual(FeeLedgerEntry.objects.filter(entry_type='PAYMENT').count(), 1)
+        self.assertEqual(outstanding_balance(invoice.student_id), Decimal('0.00'))
+
+    def test_replay_with_the_same_amount_after_full_payment(self):
+        invoice = self.yearly_invoice()
+        record_payment(invoice.id, '1000', 'UPI', transaction_id='TXN-2')
+
+        payment, created = record_payment(invoice.id, '1000.00', 'UPI', transaction_id='TXN-2')
+
+        self.assertFalse(created)
+        self.assertEqual(payment.amount, Decimal('1000.00'))
+
+    def test_reused_key_with_another_amount_or_invoice_is_rejected(self):
+        invoice = self.yearly_invoice()
+        other = FeeInvoice.objects.get(student=self.students[1])
+        record_payment(invoice.id, '400', 'UPI', transaction_id='TXN-3')
+
+        with self.assertRaises(PaymentError):
+            record_payment(invoice.id, '500', 'UPI', transaction_id='TXN-3')
+        with self.assertRaises(PaymentError):
+            record_payment(other.id, '400', 'UPI', transaction_id='TXN-3')
+        self.assertEqual(FeePayment.objects.count(), 1)
+
+    def test_invalid_and_excess_amounts_are_rejected(self):
+        invoice = self.yearly_invoice()
+
+        for amount in ('abc', '0', '1000.01'):
+            with self.assertRaises(PaymentError):
+                record_payment(invoice.id, amount, 'CASH')
+        record_payment(invoice.id, None, 'CASH')
+        with self.assertRaises(PaymentError):
+            record_payment(invoice.id, '1', 'CASH')
+        self.assertEqual(FeePayment.objects.count(), 1)
+
+
+class ReconciliationTests(FeeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.make_structure()
+        generate_class_invoices(self.class_obj, ACADEMIC_YEAR, start_month=4)
+        self.invoice, self.other_invoice = (FeeInvoice.objects.get(student=student) for student in self.students)
+
+    def pending_payment(self, transaction_id, amount='400.00', invoice=None):
+        return FeePayment.objects.create(
+            invoice=invoice or self.invoice, payment_date=date(2025, 4, 5), amount=Decimal(amount),
+            payment_mode='UPI', transaction_id=transaction_id, status='PENDING', received_by='ONLINE',
+        )
+
+    def reconcile(self, *rows):
+        statement = 'UTR,Amount,Value Date\n' + ''.join(f'{ref},{amount},2025-04-06\n' for ref, amount in rows)
+        return reconcile_statement(io.StringIO(statement), 'UPI', 'CSV', file_name='settlement.csv')
+
+    def line_statuses(self, run):
+        return list(run.lines.order_by('line_number').values_list('status', flat=True))
+
+    def test_matched_lines_settle_payments_once(self):
+        record_payment(self.invoice.id, '400', 'UPI', transaction_id='UPI/4123 5678')
+        pending = self.pending_payment('UPI-99887766', amount='300.00')
+
+        run = self.reconcile(('4123-5678', '400.00'), ('99887766', '300.00'), ('55555', '10.00'))
+        again = self.reconcile(('4123-5678', '400.00'))
+
+        self.assertEqual(self.line_statuses(run), ['MATCHED', 'MATCHED', 'UNMATCHED'])
+        self.assertEqual((run.matched_count, run.matched_amount), (2, Decimal('700.00')))
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'SUCCESS')
+        self.assertIsNotNone(pending.reconciled_at)
+        self.assertEqual(outstanding_balance(self.invoice.student_id), Decimal('300.00'))
+        self.assertEqual(self.line_statuses(again), ['DUPLICATE'])
+
+    def test_confirmation_rejections_keep_their_reason(self):
+        self.pending_payment('TXN-CANCELLED')
+        self.pending_payment('TXN-WRONG', amount='250.00', invoice=self.other_invoice)
+        self.invoice.status = 'CANCELLED'
+        self.invoice.save()
+
+        run = self.reconcile(('TXN-CANCELLED', '400.00'), ('TXN-WRONG', '200.00'))
+
+        self.assertEqual(self.line_statuses(run), ['REJECTED', 'AMOUNT_MISMATCH'])
+        self.assertEqual((run.rejected_count, run.mismatch_count), (1, 1))
+        self.assertIn('cancelled', run.lines.get(status='REJECTED').note)
+        self.assertFalse(FeePayment.objects.filter(reconciled_at__isnull=False).exists())
+
+    def test_colliding_references_are_ambiguous(self):
+        first = self.pending_payment('ABC-123')
+        second = self.pending_payment('abc/123', invoice=self.other_invoice)
+
+        run = self.reconcile(('ABC123', '400.00'))
+
+        line = run.lines.get()
+        self.assertEqual((line.status, line.payment_id), ('AMBIGUOUS', None))
+        self.assertIn(f'#{first.id}', line.note)
+        self.assertIn(f'#{second.id}', line.note)
+        self.assertEqual(run.ambiguous_count, 1)
+        self.assertEqual(FeePayment.objects.filter(status='PENDING').count(), 2)
+
+    def test_failed_batch_is_rolled_back(self):
+        record_payment(self.invoice.id, '400', 'UPI', transaction_id='TXN-ROLLBACK')
+
+        with mock.patch.object(ReconciliationLine.objects, 'bulk_create', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                self.reconcile(('TXN-ROLLBACK', '400.00'))
+
+        self.assertFalse(FeePayment.objects.filter(reconciled_at__isnull=False).exists())
+        run = self.reconcile(('TXN-ROLLBACK', '400.00'))
+        self.assertEqual(self.line_statuses(run), ['MATCHED'])
+
+
+class StatementParserTests(SimpleTestCase):
+
+    def test_reference_normalization(self):
+        self.assertEqual(normalize_reference(' upi/4123-5678 90 '), '4123567890')
+        self.assertEqual(normalize_reference('NEFT-N2345'), 'N2345')
+        self.assertEqual(normalize_reference(None), '')
+
+    def test_mt940_keeps_credits_only(self):
+        statement = io.StringIO(
+            ':20:STATEMENT\n'
+            ':61:2504060406C1500,00NTRFUPI4123//BANKREF1\n'
+            ':86:Fee payment\n'
+            ':61:2504060406D200,00NTRFREF77\n'
+            ':62F:C250406INR1300,00\n'
+        )
+
+        lines = list(parse_mt940(statement))
+
+        self.assertEqual([(line.reference, line.amount, line.narration) for line in lines],
+                         [('UPI4123', Decimal('1500.00'), 'Fee payment')])
+        self.assertEqual(lines[0].value_date, date(2025, 4, 6))
+
+
+class FinancialFactTests(FeeTestCase):
+
+    YEAR = (date(2025, 4, 1), date(2026, 3, 31))
+
+    def dues_by_fee_type(self):
+        return {
+            row['fee_type']: row['due_amount']
+            for row in rollup(fact_queryset(*self.YEAR), 'fee_type') if row['due_amount']
+        }
+
+    def snapshot(self):
+        return sorted(fact_queryset(*self.YEAR).filter(
+            Q(due_amount__gt=0) | Q(collected_amount__gt=0)
+        ).values_list('fact_date', 'fee_type', 'payment_mode', 'due_amount', 'collected_amount', 'payment_count'))
+
+    def test_postings_move_the_cube_like_a_rebuild(self):
+        self.make_structure()
+        self.make_structure(amount='200.00', fee_type='LAB')
+        generate_class_invoices(self.class_obj, ACADEMIC_YEAR, start_month=4)
+        invoice = FeeInvoice.objects.get(student=self.students[0])
+        record_payment(invoice.id, '600', 'UPI', transaction_id='TXN-F1', payment_date=date(2025, 4, 20))
+
+        self.assertEqual(self.dues_by_fee_type(), {'TUITION': Decimal('2000.00'), 'LAB': Decimal('400.00')})
+        collected = {
+            row['payment_mode']: row['collected_amount']
+            for row in rollup(fact_queryset(*self.YEAR), 'payment_mode')
+        }
+        self.assertEqual(collected['UPI'], Decimal('600.00'))
+        incremental = self.snapshot()
+
+        rebuild_facts()
+
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_saved_invoice_is_posted_in_its_transaction_and_split_by_its_items(self):
+        invoice = FeeInvoice.objects.create(
+            student=self.students[0], invoice_number='INV-MANUAL-1', invoice_date=date(2025, 4, 1),
+            due_date=date(2025, 4, 10), total_amount=Decimal('1100.00'), paid_amount=0,
+            balance_amount=Decimal('1100.00'), academic_year=ACADEMIC_YEAR,
+        )
+        # Debited as soon as the invoice row exists, before any item
+        self.assertEqual(outstanding_balance(invoice.student_id), Decimal('1100.00'))
+        self.assertEqual(self.dues_by_fee_type(), {'MISCELLANEOUS': Decimal('1100.00')})
+
+        InvoiceItem.objects.create(
+            invoice=invoice, fee_type='TUITION', description='Tuition', amount=Decimal('1000.00'),
+            discount=Decimal('100.00'), net_amount=Decimal('900.00'),
+        )
+        InvoiceItem.objects.create(
+            invoice=invoice, fee_type='LAB', description='Lab', amount=Decimal('200.00'),
+            net_amount=Decimal('200.00'),
+        )
+
+        self.assertEqual(self.dues_by_fee_type(), {'TUITION': Decimal('900.00'), 'LAB': Decimal('200.00')})
+        self.assertEqual(outstanding_balance(invoice.student_id), Decimal('1100.00'))
+        incremental = self.snapshot()
+        rebuild_facts()
+        self.assertEqual(self.snapshot(), incremental)
@@ -1,5 +1,18 @@
-from django.urls import path, include
+from django.urls import path
+from .views import *
 
 urlpatterns = [
-    
-]
\ No newline at end of file
+    # ==================== INVOICE URLs ====================
+    path('invoices/generate/', GenerateInvoicesAPIView.as_view(), name='fee-invoice-generate'),
+    path('concessions/preview/', ConcessionPreviewAPIView.as_view(), name='fee-concession-preview'),
+
+    # ==================== LEDGER URLs ====================
+    path('students/<int:student_id>/ledger/', StudentLedgerAPIView.as_view(), name='fee-student-ledger'),
+
+    # ==================== DEFAULTERS URLs ====================
+    path('defaulters/', DefaultersReportAPIView.as_view(), name='fee-defaulters'),
+
+    # ==================== RECONCILIATION URLs ====================
+    path('reconciliation/', ReconciliationRunListCreateAPIView.as_view(), name='fee-reconciliation'),
+    path('reconciliation/<int:run_id>/', ReconciliationRunDetailAPIView.as_view(), name='fee-reconciliation-detail'),
+]
@@ -1,3 +1,410 @@
-from django.shortcuts import render
+# fees/views.py
 
-# Create your views here.
+from datetime import datetime
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser, FormParser
+
+from classes.models import Class
+from core.custom_permission import FeesModulePermission
+from students.models import Student
+from .models import FeeStructure, FeeLedgerEntry, StudentFeeBalance, ReconciliationRun
+from .serializers import (
+    FeeLedgerEntrySerializer,
+    ReconciliationRunSerializer,
+    ReconciliationLineSerializer,
+)
+from .defaulters_service import (
+    OVERDUE_BUCKETS,
+    DEFAULT_PAGE_SIZE,
+    overdue_invoices,
+    defaulters_queryset,
+    bucket_summary,
+    paginate,
+    stream_csv,
+)
+from .reconciliation_service import StatementFormatError, reconcile_statement, open_text
+from .invoice_service import (
+    generate_class_invoices,
+    regenerate_structure_invoices,
+    preview_class_concessions,
+    is_valid_academic_year,
+)
+
+
+# ========================================
+# INVOICE GENERATION
+# ========================================
+
+class GenerateInvoicesAPIView(APIView):
+    """
+    POST: Generate fee invoices for a class from its FeeStructure schedules
+
+    URL: /api/v1/fees/invoices/generate/
+
+    Body (full class):
+    {
+        "class_id": 3,
+        "academic_year": "2025-2026"
+    }
+
+    Body (re-bill one structure after a mid-year change):
+    {
+        "fee_structure_id": 12,
+        "effective_from": "2025-10-01"
+    }
+    """
+    permission_classes = [IsAuthenticated, FeesModulePermission]
+
+    def post(self, request):
+        if request.user.user_type not in ['school_admin', 'principal', 'accountant']:
+            return Response({
+                'success': False,
+                'error': 'Permission denied'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        effective_from = request.data.get('effective_from')
+        if effective_from:
+            try:
+                effective_from = datetime.strptime(effective_from, '%Y-%m-%d').date()
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'error': 'Invalid effective_from. Use YYYY-MM-DD'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        structure_id = request.data.get('fee_structure_id')
+        if structure_id:
+            try:
+                structure = FeeStructure.objects.select_related('class_name').get(pk=structure_id)
+            except FeeStructure.DoesNotExist:
+                return Response({
+                    'success': False,
+                    'error': 'Fee structure not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            summary = regenerate_structure_invoices(structure, effective_from=effective_from)
+            return Response({
+                'success': True,
+                'message': 'Invoices regenerated successfully',
+                'data': _serialize_summary(summary)
+            }, status=status.HTTP_200_OK)
+
+        class_id = request.data.get('class_id')
+        academic_year = request.data.get('academic_year')
+        if not class_id or not academic_year:
+            return Response({
+                'success': False,
+                'error': 'class_id and academic_year are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not is_valid_academic_year(academic_year):
+            return Response({
+                'success': False,
+                'error': 'Invalid academic_year. Use YYYY-YYYY, e.g. 2025-2026'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            class_obj = Class.objects.get(pk=class_id)
+        except Class.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': 'Class not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        summary = generate_class_invoices(class_obj, academic_year, effective_from=effective_from)
+        return Response({
+            'success': True,
+            'message': 'Invoices generated successfully',
+            'data': _serialize_summary(summary)
+        }, status=status.HTTP_201_CREATED)
+
+
+class ConcessionPreviewAPIView(APIView):
+    """
+    GET: Per-student concession breakdown for a class's yearly fee schedule
+
+    URL: /api/v1/fees/concessions/preview/?class_id=3&academic_year=2025-2026
+    """
+    permission_classes = [IsAuthenticated, FeesModulePermission]
+
+    def get(self, request):
+        class_id = request.GET.get('class_id')
+        academic_year = request.GET.get('academic_year')
+        if not class_id or not academic_year:
+            return Response({
+                'success': False,
+                'error': 'class_id and academic_year are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not is_valid_academic_year(academic_year):
+            return Response({
+                'success': False,
+                'error': 'Invalid academic_year. Use YYYY-YYYY, e.g. 2025-2026'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            class_obj = Class.objects.get(pk=class_id)
+        except Class.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': 'Class not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        breakdown = preview_class_concessions(class_obj, academic_year)
+        return Response({
+            'success': True,
+            'class_id': class_obj.id,
+            'academic_year': academic_year,
+            'data': [
+                {'student_id': student_id, **_serialize_summary(entry)}
+                for student_id, entry in breakdown.items()
+            ]
+        }, status=status.HTTP_200_OK)
+
+
+# ========================================
+# STUDENT LEDGER
+# ========================================
+
+class StudentLedgerAPIView(APIView):
+    """
+    GET: Current balance and latest ledger entries of a student
+
+    URL: /api/v1/fees/students/<student_id>/ledger/?limit=50
+    """
+    permission_classes = [IsAuthenticated, FeesModulePermission]
+
+    def get(self, request, student_id):
+        try:
+            student = Student.objects.select_related('user').get(pk=student_id)
+        except Student.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': 'Student not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            limit = min(int(request.GET.get('limit', 50)), 500)
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'Invalid limit'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        balance = StudentFeeBalance.objects.filter(student=student).first()
+        entries = FeeLedgerEntry.objects.filter(student=student).select_related(
+            'invoice'
+        ).order_by('-id')[:limit]
+
+        return Response({
+            'success': True,
+            'student': {
+                'id': student.id,
+                'name': student.user.get_full_name(),
+                'admission_number': student.admission_number
+            },
+            'balance': {
+                'total_debit': float(balance.total_debit) if balance else 0,
+                'total_credit': float(balance.total_credit) if balance else 0,
+                'outstanding': float(balance.balance) if balance else 0,
+            },
+            'entries': FeeLedgerEntrySerializer(entries, many=True).data
+        }, status=status.HTTP_200_OK)
+
+
+# ========================================
+# DEFAULTERS
+# ========================================
+
+class DefaultersReportAPIView(APIView):
+    """
+    GET: Overdue invoices bucketed by days overdue (0-30 / 31-60 / 61-90 / 90+)
+
+    URL: /api/v1/fees/defaulters/?class_id=3&bucket=31-60&page_size=50&cursor=<next_cursor>
+    CSV: /api/v1/fees/defaulters/?export=csv (streams every matching row)
+
+    Optional: as_of=YYYY-MM-DD, section_id
+    """
+    permission_classes = [IsAuthenticated, FeesModulePermission]
+
+    def get(self, request):
+        as_of = request.GET.get('as_of')
+        if as_of:
+            try:
+                as_of = datetime.strptime(as_of, '%Y-%m-%d').date()
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'error': 'Invalid as_of. Use YYYY-MM-DD'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        bucket = request.GET.get('bucket')
+        if bucket and bucket not in [label for label, _, _ in OVERDUE_BUCKETS]:
+            return Response({
+                'success': False,
+                'error': f"Invalid bucket. Use one of: {', '.join(label for label, _, _ in OVERDUE_BUCKETS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {
+            'as_of': as_of,
+            'class_id': request.GET.get('class_id'),
+            'section_id': request.GET.get('section_id'),
+            'bucket': bucket,
+        }
+        rows = defaulters_queryset(**filters)
+
+        if request.GET.get('export') == 'csv':
+            response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
+            response['Content-Disposition'] = (
+                f'attachment; filename="fee_defaulters_{datetime.now().strftime("%Y%m%d")}.csv"'
+            )
+            return response
+
+        try:
+            page_size = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'Invalid page_size'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page, next_cursor = paginate(rows, request.GET.get('cursor'), page_size)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Bucket totals only on the first page; they do not change while paging
+        summary = None
+        if not request.GET.get('cursor'):
+            summary = _serialize_summary(bucket_summary(overdue_invoices(**filters)))
+
+        return Response({
+            'success': True,
+            'summary': summary,
+            'data': [
+                {
+                    **_serialize_summary(row),
+                    'due_date': row['due_date'].isoformat(),
+                }
+                for row in page
+            ],
+            'next_cursor': next_cursor
+        }, status=status.HTTP_200_OK)
+
+
+# ========================================
+# SETTLEMENT RECONCILIATION
+# ========================================
+
+class ReconciliationRunListCreateAPIView(APIView):
+    """
+    GET: Recent reconciliation runs
+    POST: Upload a bank statement / UPI settlement file and reconcile it
+
+    URL: /api/v1/fees/reconciliation/
+
+    Body (multipart):
+        file: settlement file
+        source: BANK | UPI
+        file_format: CSV | MT940
+    """
+    permission_classes = [IsAuthenticated, FeesModulePermission]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get(self, request):
+        runs = ReconciliationRun.objects.all()[:50]
+        return Response({
+            'success': True,
+            'data': ReconciliationRunSerializer(runs, many=True).data
+        }, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        if request.user.user_type not in ['school_admin', 'principal', 'accountant']:
+            return Response({
+                'success': False,
+                'error': 'Permission denied'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        uploaded_file = request.FILES.get('file')
+        if not uploaded_file:
+            return Response({
+                'success': False,
+                'error': 'file is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        source = request.data.get('source', 'BANK').upper()
+        file_format = request.data.get('file_format', 'CSV').upper()
+        if source not in dict(ReconciliationRun.SOURCES) or file_format not in dict(ReconciliationRun.FORMATS):
+            return Response({
+                'success': False,
+                'error': 'Invalid source or file_format'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            run = reconcile_statement(
+                open_text(uploaded_file),
+                source,
+                file_format,
+                file_name=uploaded_file.name,
+                created_by=request.user.get_full_name() or request.user.username,
+            )
+        except (StatementFormatError, UnicodeDecodeError) as e:
+            return Response({
+                'success': False,
+                'error': f'Could not read settlement file: {e}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': 'Reconciliation completed',
+            'data': ReconciliationRunSerializer(run).data
+        }, status=status.HTTP_201_CREATED)
+
+
+class ReconciliationRunDetailAPIView(APIView):
+    """
+    GET: Run report with its flagged lines (or ?status=MATCHED etc.)
+
+    URL: /api/v1/fees/reconciliation/<run_id>/
+    """
+    permission_classes = [IsAuthenticated, FeesModulePermission]
+
+    def get(self, request, run_id):
+        try:
+            run = ReconciliationRun.objects.get(pk=run_id)
+        except ReconciliationRun.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': 'Reconciliation run not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        lines = run.lines.all()
+        line_status = request.GET.get('status')
+        if line_status:
+            lines = lines.filter(status=line_status.upper())
+        else:
+            lines = lines.exclude(status='MATCHED')
+
+        return Response({
+            'success': True,
+            'data': ReconciliationRunSerializer(run).data,
+            'lines': ReconciliationLineSerializer(lines[:1000], many=True).data
+        }, status=status.HTTP_200_OK)
+
+
+def _serialize_summary(summary):
+    """Convert Decimal amounts (also nested) to float for the JSON response"""
+    if isinstance(summary, dict):
+        return {key: _serialize_summary(value) for key, value in summary.items()}
+    if isinstance(summary, Decimal):
+        return float(summary)
+    return summary
@@ -0,0 +1,273 @@
+# library/circulation_service.py
+
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .fine_service import assess_issue_fines
+from .models import Book, BookIssue, LibraryMember
+
+# Every flow locks rows in the same order - member(s) by id, then book(s)
+# by id - so concurrent issues, returns and class-set runs queue behind
+# each other instead of deadlocking.
+
+
+# Statuses a title can be lent out in (ISSUED only means no copy is on the shelf)
+ISSUABLE_STATUSES = ('AVAILABLE', 'ISSUED')
+
+
+class CirculationError(Exception):
+    """An issue or return that cannot go ahead; the message is user facing"""
+
+
+def default_due_date(issue_date):
+    return issue_date + timedelta(days=settings.LIBRARY_LOAN_DAYS)
+
+
+def issue_book(book_id, student, issued_by, issue_date=None, due_date=None, remarks=''):
+    """
+    Issue one copy of a book to a student
+
+    The member's quota and the book's copies are taken with conditional
+    F() updates (current_books_issued < max_books_allowed,
+    available_copies > 0) in one transaction, so two librarians issuing
+    the last copy at once cannot both succeed.
+
+    Args:
+        book_id: Book to issue
+        student: Borrowing Student
+        issued_by: User issuing the book
+        issue_date: Default today
+        due_date: Default issue_date + LIBRARY_LOAN_DAYS
+
+    Returns:
+        BookIssue
+
+    Raises:
+        CirculationError: No membership, quota used up, or no copy available
+    """
+    issue_date = issue_date or date.today()
+    due_date = due_date or default_due_date(issue_date)
+
+    with transaction.atomic():
+        taken = LibraryMember.objects.filter(
+            user_id=student.user_id,
+            is_active=True,
+            current_books_issued__lt=F('max_books_allowed'),
+        ).filter(
+            Q(expiry_date__isnull=True) | Q(expiry_date__gte=issue_date)
+        ).update(current_books_issued=F('current_books_issued') + 1)
+        if not taken:
+            raise CirculationError(_member_refusal(student))
+
+        taken = Book.objects.filter(
+            pk=book_id, is_active=True, status__in=ISSUABLE_STATUSES, available_copies__gt=0,
+        ).update(
+            available_copies=F('available_copies') - 1,
+            status=Case(When(available_copies=1, then=Value('ISSUED')), default=F('status')),
+        )
+        if not taken:
+            # Raising rolls the quota update back with the transaction
+            raise CirculationError(_book_refusal(book_id))
+
+        return BookIssue.objects.create(
+            student=student,
+            book_id=book_id,
+            issue_date=issue_date,
+            due_date=due_date,
+            issued_by=issued_by,
+            remarks=remarks,
+        )
+
+
+def return_book(issue_id, received_by, return_date=None):
+    """
+    Close an open issue and give the copy and the quota slot back
+
+    The issue row is closed with a conditional update first, so a
+    double-submitted return counts once. Every return gets its final fine.
+
+    Returns:
+        BookIssue
+
+    Raises:
+        CirculationError: Unknown or already returned issue
+    """
+    return_date = return_date or date.today()
+    try:
+        issue = BookIssue.objects.select_related('student', 'book').get(pk=issue_id)
+    except BookIssue.DoesNotExist:
+        raise CirculationError('Book issue not found')
+
+    with transaction.atomic():
+        closed = BookIssue.objects.filter(pk=issue_id, return_date__isnull=True).update(
+            return_date=return_date, received_by=received_by,
+        )
+        if not closed:
+            raise CirculationError('Book has already been returned')
+
+        LibraryMember.objects.filter(
+            user_id=issue.student.user_id, current_books_issued__gt=0,
+        ).update(current_books_issued=F('current_books_issued') - 1)
+        Book.objects.filter(pk=issue.book_id, available_copies__lt=F('total_copies')).update(
+            available_copies=F('available_copies') + 1,
+            status=Case(When(status='ISSUED', then=Value('AVAILABLE')), default=F('status')),
+        )
+        # Settle the fine at the return date (dropping one charged for an
+        # on-time return); the nightly run only follows open issues
+        assess_issue_fines([issue_id])
+
+    issue.refresh_from_db(fields=['return_date', 'received_by', 'fine_amount'])
+    return issue
+
+
+def issue_class_set(book_ids, students, issued_by, issue_date=None, due_date=None, dry_run=False):
+    """
+    Issue one copy of each book to every student (start-of-term textbook
+    distribution) in one transaction
+
+    Members are locked in id order and checked together; students without
+    an active membership or quota room for the whole set are skipped. Every
+    book must have a copy for each remaining student, otherwise nothing is
+    issued. Copies are taken with one conditional update per book and the
+    issues are written with bulk_create.
+
+    Args:
+        book_ids: Books making up the set
+        students: Students receiving the set (with user_id)
+        issued_by: User issuing the books
+
+    Returns:
+        dict: {'issued': [BookIssue], 'skipped': [{'student_id', 'reason'}],
+            'eligible': number of students receiving the set}
+
+    Raises:
+        CirculationError: A book is missing, inactive or short of copies
+    """
+    issue_date = issue_date or date.today()
+    due_date = due_date or default_due_date(issue_date)
+    book_ids = sorted(set(book_ids))
+    per_student = len(book_ids)
+
+    with transaction.atomic():
+        members = {
+            member.user_id: member
+            for member in LibraryMember.objects.select_for_update()
+            .filter(user_id__in=[student.user_id for student in students])
+            .order_by('id')
+        }
+
+        eligible, skipped = [], []
+        for student in students:
+            member = members.get(student.user_id)
+            if member is None or not member.is_active:
+                skipped.append({'student_id': student.id, 'reason': 'No active library membership'})
+            elif member.expiry_date and member.expiry_date < issue_date:
+                skipped.append({'student_id': student.id, 'reason': 'Library membership expired'})
+            elif member.current_books_issued + per_student > member.max_books_allowed:
+                skipped.append({'student_id': student.id, 'reason': (
+                    f'Quota exceeded ({member.current_books_issued} of {member.max_books_allowed} books issued)'
+                )})
+            else:
+                eligible.append(student)
+
+        books = list(Book.objects.select_for_update().filter(pk__in=book_ids).order_by('id'))
+        _check_class_set_books(book_ids, books, len(eligible))
+
+        if dry_run or not eligible:
+            transaction.set_rollback(True)
+            return {'issued': [], 'skipped': skipped, 'eligible': len(eligible)}
+
+        LibraryMember.objects.filter(
+            pk__in=[members[student.user_id].pk for student in eligible]
+        ).update(current_books_issued=F('current_books_issued') + per_student)
+        for book in books:
+            Book.objects.filter(pk=book.pk, available_copies__gte=len(eligible)).update(
+                available_copies=F('available_copies') - len(eligible),
+                status=Case(When(available_copies=len(eligible), then=Value('ISSUED')), default=F('status')),
+            )
+
+        issued = BookIssue.objects.bulk_create([
+            BookIssue(
+                student=student,
+                book=book,
+                issue_date=issue_date,
+                due_date=due_date,
+                issued_by=issued_by,
+            )
+            for student in eligible
+            for book in books
+        ], batch_size=1000)
+    return {'issued': issued, 'skipped': skipped, 'eligible': len(eligible)}
+
+
+def recount_counters():
+    """
+    Recompute Book.available_copies / status and
+    LibraryMember.current_books_issued from the open issues
+    (backfill, or repair after manual edits)
+
+    Returns:
+        tuple: (books updated, members updated)
+    """
+    open_issues = BookIssue.objects.filter(return_date__isnull=True)
+
+    open_per_book = Subquery(
+        open_issues.filter(book=OuterRef('pk')).order_by().values('book')
+        .annotate(total=Count('id')).values('total'),
+        output_field=IntegerField(),
+    )
+    with transaction.atomic():
+        books = Book.objects.update(
+            available_copies=F('total_copies') - Coalesce(open_per_book, Value(0)),
+        )
+        Book.objects.filter(status='AVAILABLE', available_copies__lte=0).update(status='ISSUED')
+        Book.objects.filter(status='ISSUED', available_copies__gt=0).update(status='AVAILABLE')
+
+        open_per_member = Subquery(
+            open_issues.filter(student__user_id=OuterRef('user_id')).order_by().values('student__user_id')
+            .annotate(total=Count('id')).values('total'),
+            output_field=IntegerField(),
+        )
+        members = LibraryMember.objects.update(
+            current_books_issued=Coalesce(open_per_member, Value(0)),
+        )
+    return books, members
+
+
+def _check_class_set_books(book_ids, books, needed):
+    found = {book.id: book for book in books}
+    problems = []
+    for book_id in book_ids:
+        book = found.get(book_id)
+        if book is None:
+            problems.append(f'Book {book_id} not found')
+        elif not book.is_active or book.status not in ISSUABLE_STATUSES:
+            problems.append(f'{book.title} cannot be issued ({book.get_status_display()})')
+        elif book.available_copies < needed:
+            problems.append(f'{book.title}: {book.available_copies} copies available, {needed} needed')
+    if problems:
+        raise CirculationError('; '.join(problems))
+
+
+def _member_refusal(student):
+    """Why the quota update for a student matched no row"""
+    member = LibraryMember.objects.filter(user_id=student.user_id).first()
+    if member is None or not member.is_active:
+        return 'Student does not have an active library membership'
+    if member.expiry_date and member.expiry_date < date.today():
+        return 'Library membership expired'
+    return f'Quota exceeded ({member.current_books_issued} of {member.max_books_allowed} books issued)'
+
+
+def _book_refusal(book_id):
+    """Why the copy update for a book matched no row"""
+    book = Book.objects.filter(pk=book_id).first()
+    if book is None:
+        return 'Book not found'
+    if not book.is_active or book.status not in ISSUABLE_STATUSES:
+        return f'{book.title} cannot be issued ({book.get_status_display()})'
+    return f'No copies of {book.title} available'
@@ -0,0 +1,183 @@
+# library/fine_service.py
+
+import logging
+import time
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+from django_tenants.utils import schema_context
+
+from attendance.models import Holiday
+from schools.models import School
+from .models import BookIssue, Fine
+
+logger = logging.getLogger(__name__)
+
+
+CHUNK_SIZE = 5000
+
+
+def assess_overdue_fines(as_of=None, fine_per_day=None, chunk_size=CHUNK_SIZE):
+    """
+    Bring the fines of every open overdue issue of the current tenant up to date
+
+    Walks the open issues in (due_date, id) order through
+    library_issue_open_due_idx, one chunk per statement and transaction.
+    Each statement computes days overdue net of attendance holidays,
+    upserts Fine and copies the total to BookIssue.fine_amount. Rows whose
+    fine did not change (e.g. over a holiday) and waived fines are not
+    written; an unpaid fine of an issue no longer overdue is deleted and
+    its fine_amount reset to 0.
+
+    Args:
+        as_of: Date to charge up to (default today)
+        fine_per_day: Default settings.LIBRARY_FINE_PER_DAY
+
+    Returns:
+        dict: {'scanned', 'fines_written', 'issues_updated'}
+    """
+    as_of = as_of or date.today()
+    fine_per_day = settings.LIBRARY_FINE_PER_DAY if fine_per_day is None else fine_per_day
+
+    totals = {'scanned': 0, 'fines_written': 0, 'issues_updated': 0}
+    after = None
+    while True:
+        if after is None:
+            where, params = 'bi.return_date IS NULL AND bi.due_date < %s', [as_of]
+        else:
+            where = 'bi.return_date IS NULL AND bi.due_date < %s AND (bi.due_date, bi.id) > (%s, %s)'
+            params = [as_of, *after]
+        with transaction.atomic():
+            scanned, last_due, last_id, written, updated = _assess(
+                where, params, as_of, fine_per_day, order_limit=chunk_size,
+            )
+        totals['scanned'] += scanned
+        totals['fines_written'] += written
+        totals['issues_updated'] += updated
+        if scanned < chunk_size:
+            return totals
+        after = (last_due, last_id)
+
+
+def assess_issue_fines(issue_ids, fine_per_day=None):
+    """
+    Final fine of returned (or any) issues, charged up to their return date
+
+    Called on every return, so the nightly run only has to look at issues
+    that are still out and a fine it charged is dropped again when the
+    return turns out to be on time (e.g. backdated, or the due date moved).
+
+    Returns:
+        int: Fines written
+    """
+    if not issue_ids:
+        return 0
+    fine_per_day = settings.LIBRARY_FINE_PER_DAY if fine_per_day is None else fine_per_day
+    _, _, _, written, _ = _assess('bi.id = ANY(%s)', [list(issue_ids)], date.today(), fine_per_day)
+    return written
+
+
+def assess_all_tenants(schools=None, as_of=None, on_result=None):
+    """
+    Run assess_overdue_fines in every active school (or the given ones), one
+    tenant after another; a failing tenant is logged and skipped
+
+    Returns:
+        dict: {school_code: result dict, or {'error': message}}
+    """
+    with schema_context(settings.PUBLIC_SCHEMA_NAME):
+        if schools is None:
+            schools = School.objects.filter(is_active=True).exclude(schema_name=settings.PUBLIC_SCHEMA_NAME)
+        schools = list(schools)
+
+    results = {}
+    for school in schools:
+        started = time.monotonic()
+        try:
+            with schema_context(school.schema_name):
+                result = assess_overdue_fines(as_of=as_of)
+        except Exception as e:
+            logger.exception('Library fines failed for schema %s', school.schema_name)
+            result = {'error': str(e)}
+        result['elapsed_ms'] = int((time.monotonic() - started) * 1000)
+        results[school.school_code] = result
+        if on_result:
+            on_result(school, result)
+    return results
+
+
+def _assess(where, params, as_of, fine_per_day, order_limit=None):
+    """
+    One set-based pass over the issues matching `where` (alias bi)
+
+    Returns:
+        tuple: (issues scanned, last due_date, last id, fines written, issues updated)
+    """
+    issues = BookIssue._meta.db_table
+    fines = Fine._meta.db_table
+    holidays = Holiday._meta.db_table
+    limit = 'ORDER BY bi.due_date, bi.id LIMIT %s' if order_limit else ''
+
+    sql = f'''
+        WITH chunk AS (
+            SELECT bi.id, bi.due_date, LEAST(COALESCE(bi.return_date, %s), %s) AS end_date
+            FROM {issues} bi
+            WHERE {where}
+            {limit}
+        ),
+        computed AS (
+            SELECT c.id,
+                   (c.end_date - c.due_date) - (
+                       SELECT COUNT(DISTINCT h.date) FROM {holidays} h
+                       WHERE h.date > c.due_date AND h.date <= c.end_date
+                   ) AS days
+            FROM chunk c
+            WHERE c.end_date > c.due_date
+        ),
+        upserted AS (
+            INSERT INTO {fines} AS f
+                (book_issue_id, days_overdue, fine_per_day, total_fine, paid_amount, is_waived,
+                 waiver_reason, created_at)
+            SELECT id, days, %s, days * %s, 0, FALSE, '', NOW()
+            FROM computed
+            WHERE days > 0
+            ON CONFLICT (book_issue_id) DO UPDATE SET
+                days_overdue = EXCLUDED.days_overdue,
+                fine_per_day = EXCLUDED.fine_per_day,
+                total_fine = EXCLUDED.total_fine
+            WHERE NOT f.is_waived
+              AND (f.days_overdue, f.fine_per_day) IS DISTINCT FROM (EXCLUDED.days_overdue, EXCLUDED.fine_per_day)
+            RETURNING f.book_issue_id, f.total_fine
+        ),
+        cleared AS (
+            DELETE FROM {fines} f
+            USING chunk c
+            WHERE f.book_issue_id = c.id
+              AND NOT f.is_waived AND f.paid_amount = 0
+              AND NOT EXISTS (SELECT 1 FROM computed d WHERE d.id = c.id AND d.days > 0)
+            RETURNING f.book_issue_id, 0::numeric AS total_fine
+        ),
+        updated AS (
+            UPDATE {issues} bi SET fine_amount = u.total_fine
+            FROM (SELECT * FROM upserted UNION ALL SELECT * FROM cleared) u
+            WHERE bi.id = u.book_issue_id AND bi.fine_amount IS DISTINCT FROM u.total_fine
+            RETURNING bi.id
+        ),
+        last AS (
+            SELECT due_date, id FROM chunk ORDER BY due_date DESC, id DESC LIMIT 1
+        )
+        SELECT (SELECT COUNT(*) FROM chunk),
+               (SELECT due_date FROM last),
+               (SELECT id FROM last),
+               (SELECT COUNT(*) FROM upserted) + (SELECT COUNT(*) FROM cleared),
+               (SELECT COUNT(*) FROM updated)
+    '''
+    all_params = [as_of, as_of, *params]
+    if order_limit:
+        all_params.append(order_limit)
+    all_params += [fine_per_day, fine_per_day]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, all_params)
+        return cursor.fetchone()
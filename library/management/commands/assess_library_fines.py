@@ -0,0 +1,47 @@
+# library/management/commands/assess_library_fines.py
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.models import School
+from library.fine_service import assess_all_tenants
+
+
+class Command(BaseCommand):
+    help = 'Nightly job: bring the overdue fines of open library issues up to date in every school'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school-code', type=str, action='append', dest='school_codes',
+                            help='Only these schools (repeatable)')
+        parser.add_argument('--as-of', type=str, help='Charge up to this date, YYYY-MM-DD (default: today)')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['as_of']:
+            try:
+                as_of = datetime.strptime(options['as_of'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--as-of must be YYYY-MM-DD')
+
+        schools = None
+        if options['school_codes']:
+            schools = School.objects.filter(school_code__in=options['school_codes'], is_active=True)
+            if not schools.exists():
+                raise CommandError('No active school matches the given codes')
+
+        def report(school, result):
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f"❌ {school.school_code}: {result['error']}"))
+            else:
+                self.stdout.write(
+                    f"   {school.school_code}: {result['scanned']} overdue issues, "
+                    f"{result['fines_written']} fines written in {result['elapsed_ms']} ms"
+                )
+
+        self.stdout.write('💰 Assessing library fines...')
+        results = assess_all_tenants(schools=schools, as_of=as_of, on_result=report)
+
+        failed = sum(1 for result in results.values() if 'error' in result)
+        if failed:
+            self.stdout.write(self.style.WARNING(f'⚠️  {failed} schools failed, see the log'))
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(results) - failed} schools assessed'))
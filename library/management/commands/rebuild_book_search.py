@@ -0,0 +1,18 @@
+# library/management/commands/rebuild_book_search.py
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from library.search_service import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Recompute the full-text search vectors of the library catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', type=str, required=True, help='Tenant schema (e.g., school_gvs01)')
+
+    def handle(self, *args, **options):
+        with schema_context(options['schema']):
+            self.stdout.write('🔄 Rebuilding book search vectors...')
+            updated = update_search_vectors()
+        self.stdout.write(self.style.SUCCESS(f'✅ {updated} books indexed'))
@@ -0,0 +1,18 @@
+# library/management/commands/recount_library_counters.py
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from library.circulation_service import recount_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute available copies, book status and member issue counts from the open issues'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', type=str, required=True, help='Tenant schema (e.g., school_gvs01)')
+
+    def handle(self, *args, **options):
+        with schema_context(options['schema']):
+            self.stdout.write('🔄 Recounting library counters...')
+            books, members = recount_counters()
+        self.stdout.write(self.style.SUCCESS(f'✅ {books} books and {members} members updated'))
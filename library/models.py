@@ -1,5 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 class BookCategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -43,6 +45,8 @@ class Book(models.Model):
     description = models.TextField(blank=True)
     acquired_date = models.DateField()
     is_active = models.BooleanField(default=True)
+    # Weighted title/author/publisher/description tsvector, kept up to date by library.signals
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -52,6 +56,10 @@ class Book(models.Model):
             models.Index(fields=['isbn']),
             models.Index(fields=['title']),
             models.Index(fields=['author']),
+            GinIndex(fields=['search_vector'], name='library_book_search_idx'),
+            # Misspelling fallback (needs pg_trgm, created by library.signals before migrate)
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='library_book_title_trgm'),
+            GinIndex(fields=['author'], opclasses=['gin_trgm_ops'], name='library_book_author_trgm'),
         ]
     
     def __str__(self):
@@ -80,6 +88,12 @@ class BookIssue(models.Model):
         indexes = [
             models.Index(fields=['student', 'book']),
             models.Index(fields=['due_date']),
+            # Open issues in due order: the nightly fine run walks this range
+            models.Index(
+                fields=['due_date', 'id'],
+                condition=models.Q(return_date__isnull=True),
+                name='library_issue_open_due_idx',
+            ),
         ]
     
     def __str__(self):
@@ -100,6 +114,10 @@ class Fine(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # One overdue fine per issue, upserted by library.fine_service
+            models.UniqueConstraint(fields=['book_issue'], name='library_fine_one_per_issue'),
+        ]
     
     def __str__(self):
         return f"Fine for {self.book_issue} - ₹{self.total_fine}"
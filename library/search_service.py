@@ -0,0 +1,215 @@
+# library/search_service.py
+
+import base64
+import json
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Greatest
+
+from .models import Book
+
+
+SEARCH_CONFIG = 'english'
+
+# Title and author decide the ranking; publisher and blurb only help recall
+BOOK_SEARCH_VECTOR = (
+    SearchVector('title', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('author', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('publisher', weight='C', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='D', config=SEARCH_CONFIG)
+)
+
+# Fields feeding the vector; saves that touch none of them keep it
+SEARCH_FIELDS = {'title', 'author', 'publisher', 'description'}
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def update_search_vectors(book_ids=None):
+    """
+    Recompute Book.search_vector in one UPDATE (for the given books, or all)
+
+    Returns:
+        int: Books updated
+    """
+    books = Book.objects.all()
+    if book_ids is not None:
+        books = books.filter(pk__in=book_ids)
+    return books.update(search_vector=BOOK_SEARCH_VECTOR)
+
+
+def prefix_query(text):
+    """
+    tsquery matching every term, the last one as a prefix, so results
+    follow the librarian's typing ("harry pot" finds "Harry Potter")
+
+    Returns:
+        SearchQuery or None when the text has no searchable terms
+    """
+    terms = _TERM.findall(text.lower())
+    if not terms:
+        return None
+    raw = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+def catalogue(category_id=None, language=None, available=None):
+    """Active books narrowed by the facet filters"""
+    books = Book.objects.filter(is_active=True)
+    if category_id:
+        books = books.filter(category_id=category_id)
+    if language:
+        books = books.filter(language__iexact=language)
+    if available is not None:
+        books = books.filter(available_copies__gt=0) if available else books.filter(available_copies__lte=0)
+    return books
+
+
+def fulltext_matches(books, text):
+    """
+    Books whose search_vector matches, ranked with ts_rank
+    (served by the GIN index on search_vector)
+    """
+    query = prefix_query(text)
+    if query is None:
+        return books.none()
+    return books.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+    )
+
+
+def fuzzy_matches(books, text):
+    """
+    Misspelling fallback: title or author sharing enough trigrams with the
+    text (`<%` word similarity above pg_trgm.word_similarity_threshold,
+    0.6 by default; served by the gin_trgm_ops indexes)
+    """
+    text = text.strip()
+    return books.filter(
+        Q(title__trigram_word_similar=text) | Q(author__trigram_word_similar=text)
+    ).annotate(
+        rank=Cast(
+            Greatest(TrigramWordSimilarity(text, 'title'), TrigramWordSimilarity(text, 'author')),
+            FloatField(),
+        ),
+    )
+
+
+def search(text, cursor=None, page_size=DEFAULT_PAGE_SIZE, **filters):
+    """
+    Ranked catalogue search with keyset pagination
+
+    Full-text first; when that finds nothing the fuzzy trigram match is
+    used instead. The mode travels in the cursor so later pages keep it.
+
+    Args:
+        text: Search box contents
+        cursor: next_cursor of the previous page
+        page_size: Books per page (capped at MAX_PAGE_SIZE)
+        **filters: category_id, language, available (see catalogue())
+
+    Returns:
+        tuple: (mode, matches queryset, rows of this page, next_cursor or None)
+
+    Raises:
+        ValueError: When the cursor is malformed
+    """
+    books = catalogue(**filters)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    if cursor:
+        mode, last_rank, last_id = decode_cursor(cursor)
+        matches = fulltext_matches(books, text) if mode == 'fulltext' else fuzzy_matches(books, text)
+        rows = _page(matches.filter(Q(rank__lt=last_rank) | Q(rank=last_rank, id__gt=last_id)), page_size)
+    else:
+        mode, matches = 'fulltext', fulltext_matches(books, text)
+        rows = _page(matches, page_size)
+        if not rows:
+            mode, matches = 'fuzzy', fuzzy_matches(books, text)
+            rows = _page(matches, page_size)
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(mode, rows[-1]['rank'], rows[-1]['id'])
+    return mode, matches, rows, next_cursor
+
+
+def _page(matches, page_size):
+    """One row more than page_size, best rank first (ties by id)"""
+    return list(
+        matches.order_by('-rank', 'id').values(
+            'id', 'isbn', 'title', 'author', 'publisher', 'publication_year', 'edition',
+            'language', 'category_id', 'category__name', 'shelf_number', 'rack_number',
+            'total_copies', 'available_copies', 'status', 'rank',
+        )[:page_size + 1]
+    )
+
+
+def facet_counts(matches):
+    """
+    Category, language and availability counts of the matching books in
+    one GROUPING SETS query
+
+    Returns:
+        dict: {'category': [{'id', 'name', 'count'}], 'language': [{'value', 'count'}],
+            'availability': [{'value', 'count'}]}
+    """
+    inner = matches.annotate(
+        is_available=Case(When(available_copies__gt=0, then=Value(True)), default=Value(False)),
+    ).order_by().values('category_id', 'category__name', 'language', 'is_available')
+    sql, params = inner.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            SELECT GROUPING(m.category_id, m.language, m.is_available) AS grouping_id,
+                   m.category_id, MAX(m.category_name), m.language, m.is_available, COUNT(*)
+            FROM ({sql}) AS m (category_id, category_name, language, is_available)
+            GROUP BY GROUPING SETS ((m.category_id), (m.language), (m.is_available))
+            ORDER BY COUNT(*) DESC
+            ''',
+            params,
+        )
+        rows = cursor.fetchall()
+
+    # GROUPING() sets a bit for every column not grouped in that row:
+    # 3 = only category grouped, 5 = only language, 6 = only availability
+    facets = {'category': [], 'language': [], 'availability': []}
+    for grouping_id, category_id, category_name, language, is_available, count in rows:
+        if grouping_id == 3:
+            facets['category'].append({'id': category_id, 'name': category_name, 'count': count})
+        elif grouping_id == 5:
+            facets['language'].append({'value': language, 'count': count})
+        elif grouping_id == 6:
+            facets['availability'].append({
+                'value': 'available' if is_available else 'unavailable', 'count': count,
+            })
+    return facets
+
+
+def encode_cursor(mode, rank, book_id):
+    payload = json.dumps([mode, rank, book_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Raises:
+        ValueError: When the cursor is malformed
+    """
+    try:
+        mode, rank, book_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if mode not in ('fulltext', 'fuzzy'):
+            raise ValueError
+        return mode, float(rank), int(book_id)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
@@ -0,0 +1,22 @@
+from rest_framework import serializers
+
+
+class BookIssueSerializer(serializers.Serializer):
+    """Body of a single issue; the student is resolved by the view"""
+    book_id = serializers.IntegerField(min_value=1)
+    student_id = serializers.IntegerField(min_value=1)
+    due_date = serializers.DateField(required=False, allow_null=True, default=None)
+    remarks = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class BookReturnSerializer(serializers.Serializer):
+    return_date = serializers.DateField(required=False, allow_null=True, default=None)
+
+
+class ClassSetIssueSerializer(serializers.Serializer):
+    """Body of a class-set issue; the students are resolved by the view in bulk"""
+    book_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    class_id = serializers.IntegerField(min_value=1)
+    section_id = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    due_date = serializers.DateField(required=False, allow_null=True, default=None)
+    dry_run = serializers.BooleanField(default=False)
@@ -0,0 +1,21 @@
+from django.db import connections
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Book
+from .search_service import SEARCH_FIELDS, update_search_vectors
+
+
+def create_search_extensions(sender, using='default', **kwargs):
+    """
+    pg_trgm backs the gin_trgm_ops indexes on Book; it is created once per
+    database in public, which every tenant schema has on its search_path
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public')
+
+
+@receiver(post_save, sender=Book)
+def refresh_book_search_vector(sender, instance: Book, created, update_fields=None, **kwargs):
+    if created or update_fields is None or SEARCH_FIELDS & set(update_fields):
+        update_search_vectors([instance.pk])
@@ -1,3 +1,297 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from attendance.models import Holiday
+from schools.provisioning import seed_rbac
+from schools.testing import SchoolTestCase
+from .circulation_service import CirculationError, issue_book, recount_counters, return_book
+from .fine_service import assess_overdue_fines
+from .models import Book, BookCategory, BookIssue, Fine, LibraryMember
+from .search_service import decode_cursor, facet_counts, search
+from .views import BookIssueAPIView, BookReturnAPIView, ClassSetIssueAPIView
+
+ISSUED_ON = date(2025, 1, 1)
+DUE_ON = date(2025, 1, 10)
+
+
+class BookSearchTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.fiction = BookCategory.objects.create(name='Fiction', code='FIC')
+        self.science = BookCategory.objects.create(name='Science', code='SCI')
+
+    def add_book(self, title, author='Author', category=None, language='English', copies=1, **fields):
+        number = Book.objects.count() + 1
+        return Book.objects.create(
+            isbn=f'978100000{number:04d}', title=title, author=author, category=category or self.fiction,
+            language=language, shelf_number='S1', rack_number='R1', total_copies=copies,
+            available_copies=copies, acquired_date=ISSUED_ON, **fields,
+        )
+
+    def titles(self, rows):
+        return [row['title'] for row in rows]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.add_book('Garden Birds', description='A potter about the garden')
+        self.add_book('Harry Potter and the Philosopher\'s Stone', 'J. K. Rowling')
+
+        mode, _, rows, next_cursor = search('potter')
+
+        self.assertEqual(mode, 'fulltext')
+        self.assertEqual(self.titles(rows), ['Harry Potter and the Philosopher\'s Stone', 'Garden Birds'])
+        self.assertIsNone(next_cursor)
+
+    def test_last_term_is_a_prefix(self):
+        self.add_book('Harry Potter and the Chamber of Secrets')
+
+        self.assertEqual(len(search('harry pot')[2]), 1)
+
+    def test_vector_follows_title_changes(self):
+        book = self.add_book('Untitled')
+        book.title = 'Brief History of Time'
+        book.save(update_fields=['title'])
+
+        self.assertEqual(self.titles(search('history')[2]), ['Brief History of Time'])
+
+    def test_misspelling_falls_back_to_fuzzy(self):
+        self.add_book('Matilda', 'Roald Dahl')
+
+        mode, _, rows, _ = search('Roald Dahll')
+
+        self.assertEqual(mode, 'fuzzy')
+        self.assertEqual(self.titles(rows), ['Matilda'])
+
+    def test_keyset_pages_cover_every_match_once(self):
+        for n in range(5):
+            self.add_book(f'Atlas volume {n}')
+
+        seen, cursor = [], None
+        while True:
+            _, _, rows, cursor = search('atlas', cursor=cursor, page_size=2)
+            seen += self.titles(rows)
+            if cursor is None:
+                break
+
+        self.assertEqual(sorted(seen), [f'Atlas volume {n}' for n in range(5)])
+        with self.assertRaises(ValueError):
+            decode_cursor('not-a-cursor')
+
+    def test_filters_and_facets(self):
+        self.add_book('Ocean Life', category=self.science)
+        self.add_book('Ocean Tales', language='Hindi', copies=0)
+        self.add_book('Ocean Stories')
+
+        rows = search('ocean', available=True)[2]
+        self.assertEqual(sorted(self.titles(rows)), ['Ocean Life', 'Ocean Stories'])
+
+        facets = facet_counts(search('ocean')[1])
+        self.assertEqual(
+            {row['name']: row['count'] for row in facets['category']}, {'Fiction': 2, 'Science': 1},
+        )
+        self.assertEqual({row['value']: row['count'] for row in facets['language']}, {'English': 2, 'Hindi': 1})
+        self.assertEqual(
+            {row['value']: row['count'] for row in facets['availability']}, {'available': 2, 'unavailable': 1},
+        )
+
+
+class LibraryTestCase(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.librarian = self.make_user('staff', 'Library', 'Desk')
+        self.student = self.make_member_student()
+        self.book = self.make_book()
+
+    def make_member_student(self, max_books_allowed=2):
+        student = self.make_student()
+        LibraryMember.objects.create(
+            user=student.user, member_id=f'LIB{student.pk:05d}', member_type='STUDENT',
+            max_books_allowed=max_books_allowed, membership_date=ISSUED_ON,
+        )
+        return student
+
+    def make_book(self, copies=1):
+        number = Book.objects.count() + 1
+        return Book.objects.create(
+            isbn=f'978000000{number:04d}', title=f'Book {number}', author='Author', shelf_number='S1',
+            rack_number='R1', total_copies=copies, available_copies=copies, acquired_date=ISSUED_ON,
+        )
+
+    def issue(self, student=None, book=None):
+        return issue_book((book or self.book).id, student or self.student, self.librarian,
+                          issue_date=ISSUED_ON, due_date=DUE_ON)
+
+    def member(self, student=None):
+        return LibraryMember.objects.get(user_id=(student or self.student).user_id)
+
+    def book_row(self, book=None):
+        return Book.objects.get(pk=(book or self.book).pk)
+
+
+class CirculationCounterTests(LibraryTestCase):
+
+    def test_issue_and_return_move_the_counters(self):
+        issue = self.issue()
+        self.assertEqual(self.member().current_books_issued, 1)
+        self.assertEqual((self.book_row().available_copies, self.book_row().status), (0, 'ISSUED'))
+
+        return_book(issue.id, self.librarian, return_date=DUE_ON)
+        self.assertEqual(self.member().current_books_issued, 0)
+        self.assertEqual((self.book_row().available_copies, self.book_row().status), (1, 'AVAILABLE'))
+
+    def test_last_copy_is_issued_once(self):
+        other = self.make_member_student()
+        self.issue()
+
+        with self.assertRaises(CirculationError):
+            self.issue(student=other)
+        # The refused issue gives the member's quota slot back
+        self.assertEqual(self.member(other).current_books_issued, 0)
+        self.assertEqual(BookIssue.objects.count(), 1)
+
+    def test_quota_is_enforced(self):
+        student = self.make_member_student(max_books_allowed=1)
+        self.issue(student=student)
+
+        with self.assertRaises(CirculationError):
+            self.issue(student=student, book=self.make_book())
+        self.assertEqual(self.member(student).current_books_issued, 1)
+
+    def test_double_return_counts_once(self):
+        issue = self.issue()
+        return_book(issue.id, self.librarian, return_date=DUE_ON)
+
+        with self.assertRaises(CirculationError):
+            return_book(issue.id, self.librarian, return_date=DUE_ON)
+        self.assertEqual(self.member().current_books_issued, 0)
+        self.assertEqual(self.book_row().available_copies, 1)
+
+    def test_recount_repairs_the_counters(self):
+        book = self.make_book(copies=3)
+        self.issue(book=book)
+        Book.objects.filter(pk=book.pk).update(available_copies=0, status='ISSUED')
+        LibraryMember.objects.filter(user_id=self.student.user_id).update(current_books_issued=2)
+
+        recount_counters()
+
+        self.assertEqual((self.book_row(book).available_copies, self.book_row(book).status), (2, 'AVAILABLE'))
+        self.assertEqual((self.book_row().available_copies, self.book_row().status), (1, 'AVAILABLE'))
+        self.assertEqual(self.member().current_books_issued, 1)
+
+
+class CirculationViewTests(LibraryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        seed_rbac()
+        self.admin = self.make_user('school_admin')
+
+    def post(self, view_class, body, **kwargs):
+        request = APIRequestFactory().post('/api/v1/library/issues/', body, format='json')
+        force_authenticate(request, user=self.admin)
+        return view_class.as_view()(request, **kwargs)
+
+    def test_issue_and_return(self):
+        response = self.post(BookIssueAPIView, {
+            'book_id': self.book.id, 'student_id': self.student.id, 'due_date': '2025-07-15',
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['data']['due_date'], '2025-07-15')
+
+        response = self.post(BookReturnAPIView, {}, issue_id=response.data['data']['id'])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.member().current_books_issued, 0)
+
+    def test_malformed_issue_is_rejected_before_the_quota_is_taken(self):
+        for body in [
+            {'book_id': 'abc', 'student_id': self.student.id},
+            {'book_id': self.book.id, 'student_id': [self.student.id]},
+            {'book_id': self.book.id},
+            {'book_id': self.book.id, 'student_id': self.student.id, 'due_date': '15/07/2025'},
+        ]:
+            with self.subTest(body=body):
+                response = self.post(BookIssueAPIView, body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('details', response.data)
+        self.assertEqual(self.member().current_books_issued, 0)
+
+    def test_malformed_return_date_is_rejected(self):
+        issue = self.issue()
+
+        response = self.post(BookReturnAPIView, {'return_date': 'yesterday'}, issue_id=issue.id)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(BookIssue.objects.get(pk=issue.pk).return_date)
+
+    def test_malformed_class_set_is_rejected(self):
+        class_id = self.make_class().id
+        for body in [
+            {'book_ids': [self.book.id, 'two'], 'class_id': class_id},
+            {'book_ids': self.book.id, 'class_id': class_id},
+            {'book_ids': [], 'class_id': class_id},
+            {'book_ids': [self.book.id], 'class_id': 'five'},
+        ]:
+            with self.subTest(body=body):
+                self.assertEqual(self.post(ClassSetIssueAPIView, body).status_code, 400)
+        self.assertEqual(BookIssue.objects.count(), 0)
+
+
+class FineAssessmentTests(LibraryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.book_issue = self.issue()
+
+    def assess(self, as_of, fine_per_day='5.00'):
+        return assess_overdue_fines(as_of=as_of, fine_per_day=Decimal(fine_per_day))
+
+    def fine(self):
+        return Fine.objects.get(book_issue=self.book_issue)
+
+    def fine_amount(self):
+        return BookIssue.objects.get(pk=self.book_issue.pk).fine_amount
+
+    def test_overdue_days_are_charged_once(self):
+        first = self.assess(date(2025, 1, 15))
+        again = self.assess(date(2025, 1, 15))
+
+        self.assertEqual(first, {'scanned': 1, 'fines_written': 1, 'issues_updated': 1})
+        self.assertEqual(again, {'scanned': 1, 'fines_written': 0, 'issues_updated': 0})
+        self.assertEqual((self.fine().days_overdue, self.fine().total_fine), (5, Decimal('25.00')))
+        self.assertEqual(self.fine_amount(), Decimal('25.00'))
+
+    def test_holidays_are_not_charged(self):
+        Holiday.objects.create(name='Holiday', date=date(2025, 1, 12), type='SCHOOL', academic_year='2024-2025')
+
+        self.assess(date(2025, 1, 15))
+
+        self.assertEqual(self.fine().days_overdue, 4)
+
+    def test_late_return_settles_the_fine_at_the_return_date(self):
+        self.assess(date(2025, 1, 15))
+
+        return_book(self.book_issue.id, self.librarian, return_date=date(2025, 1, 13))
+
+        self.assertEqual(self.fine().days_overdue, 3)
+        self.assertEqual(self.fine_amount(), 3 * settings.LIBRARY_FINE_PER_DAY)
+
+    def test_on_time_return_clears_an_unpaid_fine(self):
+        self.assess(date(2025, 1, 15))
+
+        # Backdated return inside the loan period
+        return_book(self.book_issue.id, self.librarian, return_date=DUE_ON)
+
+        self.assertFalse(Fine.objects.filter(book_issue=self.book_issue).exists())
+        self.assertEqual(self.fine_amount(), Decimal('0.00'))
+
+    def test_waived_fine_is_left_alone(self):
+        self.assess(date(2025, 1, 15))
+        Fine.objects.filter(book_issue=self.book_issue).update(is_waived=True, waiver_reason='Medical leave')
+
+        self.assess(date(2025, 1, 20))
+
+        self.assertEqual((self.fine().days_overdue, self.fine().total_fine), (5, Decimal('25.00')))
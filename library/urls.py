@@ -1,5 +1,12 @@
-from django.urls import path, include
+from django.urls import path
+from .views import *
 
 urlpatterns = [
-    
-]
\ No newline at end of file
+    # ==================== CATALOGUE URLs ====================
+    path('books/search/', BookSearchAPIView.as_view(), name='library-book-search'),
+
+    # ==================== CIRCULATION URLs ====================
+    path('issues/', BookIssueAPIView.as_view(), name='library-book-issue'),
+    path('issues/class-set/', ClassSetIssueAPIView.as_view(), name='library-class-set-issue'),
+    path('issues/<int:issue_id>/return/', BookReturnAPIView.as_view(), name='library-book-return'),
+]
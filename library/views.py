@@ -1,3 +1,244 @@
-from django.shortcuts import render
+# library/views.py
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
 
-# Create your views here.
+from core.custom_permission import LibraryModulePermission
+from students.models import Student
+from .circulation_service import CirculationError, issue_book, issue_class_set, return_book
+from .search_service import DEFAULT_PAGE_SIZE, search, facet_counts
+from .serializers import BookIssueSerializer, BookReturnSerializer, ClassSetIssueSerializer
+
+
+# ========================================
+# CATALOGUE SEARCH
+# ========================================
+
+class BookSearchAPIView(APIView):
+    """
+    GET: Ranked catalogue search over title, author, publisher and description
+
+    URL: /api/v1/library/books/search/?q=harry pot&page_size=20&cursor=<next_cursor>
+
+    Optional filters: category_id, language, available=true|false
+
+    Terms are matched full-text (the last one as a prefix); when nothing
+    matches, a fuzzy title/author match catches misspellings ("mode" in the
+    response). Facet counts come with the first page only.
+    """
+    permission_classes = [IsAuthenticated, LibraryModulePermission]
+
+    def get(self, request):
+        text = request.GET.get('q', '').strip()
+        if not text:
+            return Response({
+                'success': False,
+                'error': 'q is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page_size = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'Invalid page_size'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        available = request.GET.get('available')
+        filters = {
+            'category_id': request.GET.get('category_id'),
+            'language': request.GET.get('language'),
+            'available': None if available is None else available.lower() == 'true',
+        }
+
+        try:
+            mode, matches, rows, next_cursor = search(text, request.GET.get('cursor'), page_size, **filters)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Facets only on the first page; they do not change while paging
+        facets = None
+        if not request.GET.get('cursor'):
+            facets = facet_counts(matches) if rows else {'category': [], 'language': [], 'availability': []}
+
+        return Response({
+            'success': True,
+            'mode': mode,
+            'facets': facets,
+            'data': [
+                {
+                    **{key: value for key, value in row.items() if key != 'category__name'},
+                    'category_name': row['category__name'],
+                    'rank': round(row['rank'], 4),
+                }
+                for row in rows
+            ],
+            'next_cursor': next_cursor
+        }, status=status.HTTP_200_OK)
+
+
+# ========================================
+# CIRCULATION
+# ========================================
+
+def _serialize_issue(issue):
+    return {
+        'id': issue.id,
+        'book_id': issue.book_id,
+        'student_id': issue.student_id,
+        'issue_date': issue.issue_date.isoformat(),
+        'due_date': issue.due_date.isoformat(),
+        'return_date': issue.return_date.isoformat() if issue.return_date else None,
+        'fine_amount': float(issue.fine_amount),
+    }
+
+
+class BookIssueAPIView(APIView):
+    """
+    POST: Issue a book to a student
+
+    URL: /api/v1/library/issues/
+
+    Body:
+    {
+        "book_id": 12,
+        "student_id": 340,
+        "due_date": "2025-07-15",     # optional, default today + LIBRARY_LOAN_DAYS
+        "remarks": ""
+    }
+    """
+    permission_classes = [IsAuthenticated, LibraryModulePermission]
+
+    def post(self, request):
+        # Validated before issue_book() takes the member's quota
+        serializer = BookIssueSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'Validation error',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        student = Student.objects.filter(pk=data['student_id'], is_active=True).first()
+        if student is None:
+            return Response({
+                'success': False,
+                'error': 'Student not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            issue = issue_book(
+                data['book_id'], student, request.user, due_date=data['due_date'], remarks=data['remarks']
+            )
+        except CirculationError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': 'Book issued successfully',
+            'data': _serialize_issue(issue)
+        }, status=status.HTTP_201_CREATED)
+
+
+class BookReturnAPIView(APIView):
+    """
+    POST: Return an issued book
+
+    URL: /api/v1/library/issues/<issue_id>/return/
+    """
+    permission_classes = [IsAuthenticated, LibraryModulePermission]
+
+    def post(self, request, issue_id):
+        serializer = BookReturnSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'Validation error',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            issue = return_book(issue_id, request.user, return_date=serializer.validated_data['return_date'])
+        except CirculationError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': 'Book returned successfully',
+            'data': _serialize_issue(issue)
+        }, status=status.HTTP_200_OK)
+
+
+class ClassSetIssueAPIView(APIView):
+    """
+    POST: Issue a set of textbooks to every active student of a class or section
+
+    URL: /api/v1/library/issues/class-set/
+
+    Body:
+    {
+        "book_ids": [12, 13, 14],
+        "class_id": 5,
+        "section_id": 2,              # optional
+        "due_date": "2026-03-31",     # optional
+        "dry_run": false
+    }
+
+    Students without an active membership or quota room for the whole set
+    are skipped and listed; if any book is short of copies nothing is issued.
+    """
+    permission_classes = [IsAuthenticated, LibraryModulePermission]
+
+    def post(self, request):
+        serializer = ClassSetIssueSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'Validation error',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        students = Student.objects.filter(current_class_id=data['class_id'], is_active=True)
+        if data.get('section_id'):
+            students = students.filter(section_id=data['section_id'])
+        students = list(students.only('id', 'user_id').order_by('roll_number'))
+        if not students:
+            return Response({
+                'success': False,
+                'error': 'No active students found for this class'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        dry_run = data['dry_run']
+        try:
+            result = issue_class_set(
+                data['book_ids'], students, request.user, due_date=data['due_date'], dry_run=dry_run
+            )
+        except CirculationError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': (
+                f"{result['eligible']} students can receive the set" if dry_run
+                else f"{len(result['issued'])} books issued to {result['eligible']} students"
+            ),
+            'issued_count': len(result['issued']),
+            'student_count': result['eligible'],
+            'skipped_count': len(result['skipped']),
+            'skipped': result['skipped']
+        }, status=status.HTTP_200_OK if dry_run or not result['issued'] else status.HTTP_201_CREATED)
@@ -3,6 +3,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from schools.models import School
+from schools.session_resolver import get_current_session
 from .serializers import *
 
 
@@ -106,7 +107,7 @@ class CurrentSessionView(APIView):
     def get(self, request):
         try:
             # Current session fetch karo
-            session = SchoolSession.objects.filter(is_current=True).first()
+            session = get_current_session(request)
             
             if not session:
                 return Response(
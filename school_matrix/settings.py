@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from decouple import config
 import sys
+from decimal import Decimal
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +39,40 @@ DATABASES = {
     }
 }
 
+# Shared cache. The in-process default is fine for one worker (and gets short
+# timeouts below); with several workers use a shared backend (e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache,
+# CACHE_LOCATION=redis://127.0.0.1:6379/1) so invalidation reaches all of them.
+# Keys are prefixed with the tenant schema.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='school-matrix'),
+        'KEY_FUNCTION': 'django_tenants.cache.make_key',
+        'REVERSE_KEY_FUNCTION': 'django_tenants.cache.reverse_key',
+    }
+}
+
+# A per-process cache only sees the invalidations of its own worker, so the
+# other workers serve stale entries until they expire: keep them short there
+LOCAL_CACHE = CACHES['default']['BACKEND'].endswith('LocMemCache')
+CACHE_TIMEOUT_DEFAULT = 60 if LOCAL_CACHE else 3600
+
+# Seconds a cached timetable grid lives (it is also dropped on any timetable change)
+TIMETABLE_CACHE_TIMEOUT = config('TIMETABLE_CACHE_TIMEOUT', default=CACHE_TIMEOUT_DEFAULT, cast=int)
+
+# Longest timetable generation search one request may run; keep it well
+# below the web worker timeout (gunicorn's default is 30 s)
+TIMETABLE_MAX_TIME_BUDGET = config('TIMETABLE_MAX_TIME_BUDGET', default=10, cast=int)
+
+# Seconds the current session / academic year stays cached per tenant (dropped when one is saved)
+CURRENT_SESSION_CACHE_TIMEOUT = config('CURRENT_SESSION_CACHE_TIMEOUT', default=CACHE_TIMEOUT_DEFAULT, cast=int)
+
+# Days a library book is lent for when no due date is given
+LIBRARY_LOAN_DAYS = config('LIBRARY_LOAN_DAYS', default=14, cast=int)
+
+# Fine per overdue day of a library book (holidays are not counted)
+LIBRARY_FINE_PER_DAY = config('LIBRARY_FINE_PER_DAY', default='5.00', cast=Decimal)
+
 # Tenant settings
 PUBLIC_SCHEMA_NAME = 'public'
 TENANT_MODEL = "schools.School"
@@ -54,6 +89,7 @@ SHARED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
 ]
@@ -84,6 +120,7 @@ TENANT_APPS = [
 
 INSTALLED_APPS = list(SHARED_APPS) + [app for app in TENANT_APPS if app not in SHARED_APPS]
 MIDDLEWARE = [
+    'api.middleware.QueryInstrumentationMiddleware',
     'api.middleware.TenantHeaderMiddleware',  # केवल आपका middleware
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -158,20 +195,70 @@ STUDENT_DOCUMENT_FILE_LOCATION = 'students/documents/'
 
 
 
-# Logging configuration
+# Logging configuration: JSON lines written by a background thread
+# (school_matrix.structured_logging). Routine per-request records are kept at
+# LOG_SAMPLE_RATE (0-1); warnings, errors and failed requests are always logged.
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_SAMPLE_RATE = config('LOG_SAMPLE_RATE', default=1.0, cast=float)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {
+            '()': 'school_matrix.structured_logging.RequestContextFilter',
+        },
+        'sampling': {
+            '()': 'school_matrix.structured_logging.SamplingFilter',
+            'rate': LOG_SAMPLE_RATE,
+        },
+    },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            'class': 'school_matrix.structured_logging.QueueJsonHandler',
+            'filters': ['request_context'],
+        },
+        'sampled_console': {
+            'class': 'school_matrix.structured_logging.QueueJsonHandler',
+            'filters': ['sampling', 'request_context'],
+        },
+    },
+    'loggers': {
+        'api.requests': {
+            'handlers': ['sampled_console'],
+            'level': 'INFO',
+            'propagate': False,
         },
     },
     'root': {
         'handlers': ['console'],
-        'level': 'INFO',
+        'level': LOG_LEVEL,
     },
 }
 
 
-TOKEN_EXPIRED_AFTER_SECONDS = 86400 
\ No newline at end of file
+TOKEN_EXPIRED_AFTER_SECONDS = 86400 
+
+# Platform analytics (cross-tenant fan-out, run by `manage.py refresh_platform_analytics --if-stale`
+# from cron; the API only reads the cached rows)
+PLATFORM_ANALYTICS_WORKERS = config('PLATFORM_ANALYTICS_WORKERS', default=8, cast=int)
+PLATFORM_ANALYTICS_REFRESH_MINUTES = config('PLATFORM_ANALYTICS_REFRESH_MINUTES', default=60, cast=int)
+
+# Login without the Tenant-Name header (school resolved from schools.GlobalUserIndex)
+HEADERLESS_LOGIN_ENABLED = config('HEADERLESS_LOGIN_ENABLED', default=False, cast=bool)
+
+# Tenant provisioning: 'migrate' runs every tenant migration for a new school,
+# 'clone' copies the pre-migrated template schema (see prepare_tenant_template)
+TENANT_PROVISIONING_MODE = config('TENANT_PROVISIONING_MODE', default='migrate')
+TENANT_TEMPLATE_SCHEMA = config('TENANT_TEMPLATE_SCHEMA', default='tenant_template')
+
+# Worker processes of migrate_tenants_parallel
+TENANT_MIGRATION_WORKERS = config('TENANT_MIGRATION_WORKERS', default=4, cast=int)
+
+# Per-request query statistics (api.middleware.QueryInstrumentationMiddleware);
+# strict mode turns an exceeded view query_budget into an error, on by default under `manage.py test`
+QUERY_INSTRUMENTATION_ENABLED = config('QUERY_INSTRUMENTATION_ENABLED', default=True, cast=bool)
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default='test' in sys.argv, cast=bool)
+
+# Teacher workload reports: weekly periods above this count are flagged as over cap
+TEACHER_MAX_PERIODS_PER_WEEK = config('TEACHER_MAX_PERIODS_PER_WEEK', default=36, cast=int)
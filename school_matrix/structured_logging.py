@@ -0,0 +1,156 @@
+# school_matrix/structured_logging.py
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import weakref
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+# Per-request fields (tenant, user, route, ...) added to every record logged while serving it
+_request_context = ContextVar('request_context', default={})
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def bind(**fields):
+    """Add fields to the current request's log context"""
+    _request_context.set({**_request_context.get(), **fields})
+
+
+def clear():
+    _request_context.set({})
+
+
+class RequestContextFilter(logging.Filter):
+    """Copies the bound request context onto each record (explicit extra wins)"""
+
+    def filter(self, record):
+        for key, value in _request_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a `rate` share of routine records; warnings, errors and records of
+    failed requests (status_code >= 400) always pass
+    """
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or getattr(record, 'status_code', 0) >= 400:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and all extra fields"""
+
+    def format(self, record):
+        payload = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class QueueJsonHandler(QueueHandler):
+    """
+    Non-blocking handler: request threads only enqueue the record, a
+    QueueListener thread formats it as JSON and writes it to stderr.
+
+    Each process (e.g. every gunicorn worker) starts its own listener when
+    logging is configured; it is flushed and stopped at exit. Threads do not
+    survive fork(), so a forked child (gunicorn --preload, the
+    migrate_tenants_parallel workers) gets a fresh queue and listener;
+    records logged while no listener runs are written directly.
+    """
+
+    # Seconds an ERROR record waits for room in a full queue before it is written directly
+    ERROR_PUT_TIMEOUT = 1
+
+    def __init__(self, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.target = logging.StreamHandler()
+        self.target.setFormatter(JsonFormatter())
+        self.listener = None
+        self._start_listener()
+        atexit.register(self._stop_listener)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_weak_call(self._restart_after_fork))
+
+    def _start_listener(self):
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=False)
+        self.listener.start()
+
+    def _stop_listener(self):
+        if self._listener_alive():
+            self.listener.stop()
+
+    def _restart_after_fork(self):
+        # The parent's listener thread does not exist here and its queue may
+        # have been copied mid-operation: start over with an empty one
+        self.queue = queue.Queue(self.maxsize)
+        self._start_listener()
+
+    def _listener_alive(self):
+        thread = getattr(self.listener, '_thread', None)
+        return thread is not None and thread.is_alive()
+
+    def prepare(self, record):
+        # Render the message and traceback here (args may not be thread-safe),
+        # leave the JSON encoding to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if not self._listener_alive():
+            # Stopped at exit, or not restarted in this process: nothing would drain the queue
+            self.target.handle(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Drop routine records rather than block a request; never drop errors
+            if record.levelno >= logging.ERROR:
+                try:
+                    self.queue.put(record, timeout=self.ERROR_PUT_TIMEOUT)
+                except queue.Full:
+                    self.target.handle(record)
+
+
+def _weak_call(method):
+    """Callback calling a bound method for as long as its object is alive"""
+    ref = weakref.WeakMethod(method)
+
+    def call():
+        bound = ref()
+        if bound is not None:
+            bound()
+    return call
@@ -0,0 +1,217 @@
+# schools/analytics_service.py
+
+import logging
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from .models import School, SchoolAnalytics
+
+logger = logging.getLogger(__name__)
+
+
+ATTENDANCE_WINDOW_DAYS = 30
+
+# Metrics summed into the platform totals
+SUMMED_METRICS = [
+    'active_students', 'active_teachers', 'collections_month',
+    'collections_year', 'outstanding_dues',
+]
+
+
+def fan_out(schools, task, workers=None):
+    """
+    Run `task(school)` in every school's schema in parallel
+
+    A fixed pool of worker threads pulls schools from a queue. Django keeps
+    one database connection per thread, so each worker opens exactly one
+    connection, switches its search_path per school and closes it when the
+    queue is drained; the caller's connection is never touched. Each task
+    runs in a READ ONLY transaction.
+
+    Args:
+        schools: iterable of School
+        task: callable(school) -> result, executed inside the tenant schema
+        workers: Thread count (default: settings.PLATFORM_ANALYTICS_WORKERS)
+
+    Returns:
+        dict: {school.id: (result, error message or None, elapsed ms)}
+    """
+    schools = list(schools)
+    workers = max(1, min(workers or settings.PLATFORM_ANALYTICS_WORKERS, len(schools) or 1))
+    pending = queue.Queue()
+    for school in schools:
+        pending.put(school)
+
+    def worker():
+        results = {}
+        try:
+            while True:
+                try:
+                    school = pending.get_nowait()
+                except queue.Empty:
+                    return results
+                started = time.monotonic()
+                try:
+                    with schema_context(school.schema_name), transaction.atomic():
+                        with connection.cursor() as cursor:
+                            cursor.execute('SET TRANSACTION READ ONLY')
+                        result = task(school)
+                    results[school.id] = (result, None, _elapsed_ms(started))
+                except Exception as e:
+                    logger.exception('Analytics failed for schema %s', school.schema_name)
+                    results[school.id] = (None, str(e), _elapsed_ms(started))
+        finally:
+            connection.close()
+
+    merged = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tenant-fanout') as executor:
+        for results in executor.map(lambda _: worker(), range(workers)):
+            merged.update(results)
+    return merged
+
+
+def collect_school_metrics(school):
+    """
+    Aggregate metrics of the current tenant schema (runs inside fan_out)
+
+    Returns:
+        dict: SchoolAnalytics field values
+    """
+    from attendance.models import Attendance
+    from fees.models import FeePayment, StudentFeeBalance
+    from students.models import Student
+    from teachers.models import Teacher
+
+    today = timezone.now().date()
+    month_start = today.replace(day=1)
+    year_start = today.replace(month=1, day=1)
+
+    active_students = Student.objects.filter(is_active=True).count()
+    active_teachers = Teacher.objects.filter(is_active=True).count()
+
+    collections = FeePayment.objects.filter(status='SUCCESS', payment_date__gte=year_start).aggregate(
+        year=Sum('amount'),
+        month=Sum('amount', filter=Q(payment_date__gte=month_start)),
+    )
+    outstanding = StudentFeeBalance.objects.filter(balance__gt=0).aggregate(total=Sum('balance'))['total']
+
+    attendance = Attendance.objects.filter(
+        date__gt=today - timedelta(days=ATTENDANCE_WINDOW_DAYS), date__lte=today
+    ).aggregate(
+        total=Count('id'),
+        present=Count('id', filter=Q(status__in=['P', 'L'])),
+        half_day=Count('id', filter=Q(status='H')),
+    )
+    attendance_rate = None
+    if attendance['total']:
+        attended = attendance['present'] + Decimal('0.5') * attendance['half_day']
+        attendance_rate = round(attended * 100 / attendance['total'], 2)
+
+    return {
+        'active_students': active_students,
+        'active_teachers': active_teachers,
+        'capacity_usage': round(Decimal(active_students) * 100 / school.student_capacity, 2)
+        if school.student_capacity else Decimal('0'),
+        'collections_month': collections['month'] or Decimal('0'),
+        'collections_year': collections['year'] or Decimal('0'),
+        'outstanding_dues': outstanding or Decimal('0'),
+        'attendance_rate': attendance_rate,
+    }
+
+
+def refresh_platform_analytics(schools=None, workers=None):
+    """
+    Recompute SchoolAnalytics for all active schools (or the given ones)
+
+    Tenant queries run in parallel via fan_out; the merged results are
+    written to the public schema with one bulk statement each for new and
+    existing rows. A failing tenant keeps its previous numbers and records
+    the error.
+
+    Returns:
+        dict: {'schools', 'failed', 'elapsed_ms'}
+    """
+    started = time.monotonic()
+    with schema_context(settings.PUBLIC_SCHEMA_NAME):
+        if schools is None:
+            schools = School.objects.filter(is_active=True).exclude(schema_name=settings.PUBLIC_SCHEMA_NAME)
+        schools = list(schools)
+
+    results = fan_out(schools, collect_school_metrics, workers=workers)
+    now = timezone.now()
+
+    with schema_context(settings.PUBLIC_SCHEMA_NAME):
+        existing = {row.school_id: row for row in SchoolAnalytics.objects.filter(school__in=schools)}
+        to_create, to_update = [], []
+        for school in schools:
+            metrics, error, elapsed_ms = results.get(school.id, (None, 'Not collected', 0))
+            row = existing.get(school.id) or SchoolAnalytics(school=school)
+            if metrics:
+                for field, value in metrics.items():
+                    setattr(row, field, value)
+                row.refreshed_at = now
+            row.error = error or ''
+            row.query_ms = elapsed_ms
+            (to_update if row.pk else to_create).append(row)
+
+        SchoolAnalytics.objects.bulk_create(to_create)
+        SchoolAnalytics.objects.bulk_update(
+            to_update,
+            ['active_students', 'active_teachers', 'capacity_usage', 'collections_month',
+             'collections_year', 'outstanding_dues', 'attendance_rate', 'error', 'query_ms',
+             'refreshed_at'],
+        )
+
+    return {
+        'schools': len(schools),
+        'failed': sum(1 for _, error, _ in results.values() if error),
+        'elapsed_ms': _elapsed_ms(started),
+    }
+
+
+def is_stale():
+    """True when the cache is older than PLATFORM_ANALYTICS_REFRESH_MINUTES (or empty)"""
+    with schema_context(settings.PUBLIC_SCHEMA_NAME):
+        last_refresh = SchoolAnalytics.objects.order_by('-refreshed_at').values_list(
+            'refreshed_at', flat=True
+        ).first()
+    if last_refresh is None:
+        return True
+    return timezone.now() - last_refresh > timedelta(minutes=settings.PLATFORM_ANALYTICS_REFRESH_MINUTES)
+
+
+def platform_summary():
+    """
+    Cached per-school rows plus platform totals (public schema only, no fan-out)
+
+    Returns:
+        dict: {'totals', 'schools', 'refreshed_at'}
+    """
+    with schema_context(settings.PUBLIC_SCHEMA_NAME):
+        rows = list(SchoolAnalytics.objects.select_related('school').filter(school__is_active=True))
+
+    totals = {metric: sum(getattr(row, metric) for row in rows) for metric in SUMMED_METRICS}
+    totals['schools'] = len(rows)
+    totals['student_capacity'] = sum(row.school.student_capacity for row in rows)
+    totals['capacity_usage'] = round(
+        Decimal(totals['active_students']) * 100 / totals['student_capacity'], 2
+    ) if totals['student_capacity'] else Decimal('0')
+
+    return {
+        'totals': totals,
+        'schools': rows,
+        'refreshed_at': min((row.refreshed_at for row in rows if row.refreshed_at), default=None),
+    }
+
+
+def _elapsed_ms(started):
+    return int((time.monotonic() - started) * 1000)
@@ -0,0 +1,292 @@
+# schools/benchmark_service.py
+
+import json
+import math
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django_tenants.utils import schema_context
+
+from api.query_instrumentation import QueryStats
+from .models import School
+from .synthetic_data import SYNTHETIC_PASSWORD
+
+BASELINE_PATH = settings.BASE_DIR / 'benchmarks' / 'baseline.json'
+
+# Allowed drift from the baseline before an endpoint counts as regressed.
+# Latency must exceed both the percentage and the absolute floor, so a
+# 2 ms endpoint does not fail on scheduler noise.
+DEFAULT_THRESHOLDS = {
+    'latency_pct': 25,
+    'latency_floor_ms': 5,
+    'memory_pct': 25,
+    'query_slack': 0,
+}
+
+# (name, actor, method, path, body) - path and body are filled from the fixtures
+ENDPOINTS = [
+    ('login', None, 'post', '/api/v1/auth/login/', 'login_body'),
+    ('student_list', 'admin', 'get', '/api/v1/students/students/?page_size=50', None),
+    ('student_search', 'admin', 'get', '/api/v1/students/students/search/?q={search_term}', None),
+    ('student_detail', 'admin', 'get', '/api/v1/students/students/{student_id}/', None),
+    ('attendance_mark', 'admin', 'post', '/api/v1/admin-dashboard/attendance/mark/', 'attendance_body'),
+    ('attendance_overview', 'admin', 'get',
+     '/api/v1/admin-dashboard/admin/attendance-details-list/'
+     '?date={attendance_date}&class_id={class_id}&section_id={section_id}', None),
+    ('attendance_summary', 'admin', 'get', '/api/v1/students/attendance/{student_id}/summary/', None),
+    ('teacher_timetable', 'admin', 'get', '/api/v1/admin-dashboard/teachers/{teacher_id}/timetable/', None),
+    ('admin_dashboard', 'admin', 'get', '/api/v1/admin-dashboard/dashboard-details/', None),
+    ('student_dashboard', 'admin', 'get', '/api/v1/admin-dashboard/dashboard/students/', None),
+    ('workload_summary', 'admin', 'get', '/api/v1/admin-dashboard/teachers/workload-summary/', None),
+    ('fee_details', 'student', 'get', '/api/v1/students/me/fees/', None),
+    ('report_card', 'student', 'get', '/api/v1/students/me/report-card/', None),
+    ('my_attendance_summary', 'student', 'get', '/api/v1/students/me/attendance/summary/', None),
+]
+
+
+class BenchmarkSetupError(Exception):
+    """The synthetic dataset needed by the benchmarks is missing"""
+
+
+def load_fixtures(school_code):
+    """
+    Ids, credentials and request bodies the endpoints need, read from a
+    school built by generate_synthetic_data
+
+    Returns:
+        dict: Fixture values keyed by the placeholders used in ENDPOINTS
+    """
+    from students.models import Student, StudentAttendance
+
+    connection.set_schema_to_public()
+    try:
+        school = School.objects.get(school_code=school_code, is_active=True)
+    except School.DoesNotExist:
+        raise BenchmarkSetupError(
+            f'School {school_code} not found. Run: python manage.py generate_synthetic_data'
+        )
+
+    with schema_context(school.schema_name):
+        latest = StudentAttendance.objects.aggregate(latest=Max('date'))['latest']
+        marked = StudentAttendance.objects.filter(date=latest, timetable__isnull=False).order_by('id').first()
+        if marked is None:
+            raise BenchmarkSetupError(f'School {school_code} has no period attendance to benchmark')
+
+        students = list(
+            Student.objects.filter(section=marked.section, is_active=True)
+            .select_related('user')
+            .order_by('roll_number')
+        )
+        student = students[0]
+        fixtures = {
+            'school_code': school.school_code,
+            'schema_name': school.schema_name,
+            'student_count': Student.objects.count(),
+            'admin_email': f'admin@{school.school_code.lower()}.example.com',
+            'student_email': student.user.email,
+            'student_id': student.id,
+            'search_term': student.user.last_name,
+            'teacher_id': marked.timetable.teacher_id,
+            'class_id': marked.class_obj_id,
+            'section_id': marked.section_id,
+            'attendance_date': latest.isoformat(),
+        }
+        # Re-marking an already marked period updates rows in place, so every run does the same work
+        fixtures['attendance_body'] = {
+            'date': fixtures['attendance_date'],
+            'class_id': marked.class_obj_id,
+            'section_id': marked.section_id,
+            'subject_id': marked.subject_id,
+            'period_number': marked.period_number,
+            'timetable_id': marked.timetable_id,
+            'attendance': [{'student_id': s.id, 'status': 'P'} for s in students],
+        }
+    connection.set_schema_to_public()
+    fixtures['login_body'] = {'email': fixtures['admin_email'], 'password': SYNTHETIC_PASSWORD}
+    return fixtures
+
+
+def login(school_code, email):
+    """Access token for a synthetic user, via the real login endpoint"""
+    client = Client(HTTP_TENANT_NAME=school_code)
+    response = client.post(
+        '/api/v1/auth/login/',
+        {'email': email, 'password': SYNTHETIC_PASSWORD},
+        content_type='application/json',
+    )
+    if response.status_code != 200:
+        raise BenchmarkSetupError(f'Login failed for {email}: HTTP {response.status_code}')
+    return response.json()['tokens']['access']
+
+
+def run_benchmarks(school_code, iterations=30, warmup=3, only=None, on_result=None):
+    """
+    Call each endpoint in-process through the Django test client
+
+    Latency comes from `iterations` timed calls after `warmup` untimed ones;
+    query count and peak memory from one extra call with tracemalloc on,
+    so tracing overhead stays out of the timings.
+
+    Args:
+        school_code: Synthetic school to run against (e.g. LOAD001)
+        iterations: Timed calls per endpoint
+        warmup: Untimed calls per endpoint
+        only: Endpoint names to run (default: all)
+        on_result: callable(result) called as endpoints finish
+
+    Returns:
+        tuple: (fixtures, {endpoint name: result})
+    """
+    fixtures = load_fixtures(school_code)
+    tokens = {
+        'admin': login(school_code, fixtures['admin_email']),
+        'student': login(school_code, fixtures['student_email']),
+    }
+
+    results = {}
+    for name, actor, method, path, body_key in ENDPOINTS:
+        if only and name not in only:
+            continue
+        headers = {'HTTP_TENANT_NAME': school_code}
+        if actor:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {tokens[actor]}'
+        client = Client(**headers)
+        body = fixtures[body_key] if body_key else None
+        result = _measure(client, method, path.format(**fixtures), body, iterations, warmup)
+        result['name'] = name
+        results[name] = result
+        if on_result:
+            on_result(result)
+    connection.set_schema_to_public()
+    return fixtures, results
+
+
+def _measure(client, method, path, body, iterations, warmup):
+    def call():
+        if body is None:
+            return getattr(client, method)(path)
+        return getattr(client, method)(path, json.dumps(body), content_type='application/json')
+
+    for _ in range(warmup):
+        call()
+
+    timings = []
+    status_code = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = call()
+        timings.append((time.perf_counter() - started) * 1000)
+        status_code = response.status_code
+
+    stats = QueryStats()
+    tracemalloc.start()
+    try:
+        with connection.execute_wrapper(stats):
+            call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'path': path,
+        'status_code': status_code,
+        'p50_ms': _percentile(timings, 50),
+        'p95_ms': _percentile(timings, 95),
+        'p99_ms': _percentile(timings, 99),
+        'max_ms': round(timings[-1], 2) if timings else 0.0,
+        'queries': stats.count,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return round(sorted_values[rank - 1], 2)
+
+
+def load_baseline(path=None):
+    path = path or BASELINE_PATH
+    try:
+        with open(path) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    baseline.setdefault('thresholds', dict(DEFAULT_THRESHOLDS))
+    baseline.setdefault('endpoints', {})
+    return baseline
+
+
+def baseline_recorded(baseline):
+    """False until a run has been recorded with --update-baseline"""
+    return bool(baseline['endpoints'])
+
+
+def compare(results, baseline, allow_new=False):
+    """
+    Check results against the baseline thresholds
+
+    With no baseline recorded yet (no endpoints at all) only error statuses
+    fail: there is nothing to compare against, and the command says so.
+    Once one is recorded, endpoints absent from it fail unless allow_new,
+    so a stale baseline cannot pass the gate. An endpoint answering with an
+    error status always fails.
+
+    Returns:
+        dict: {endpoint name: list of regression messages}
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get('thresholds', {})}
+    allow_new = allow_new or not baseline_recorded(baseline)
+    regressions = {}
+    for name, result in results.items():
+        problems = []
+        if result['status_code'] is None or result['status_code'] >= 400:
+            problems.append(f"HTTP {result['status_code']}")
+
+        base = baseline['endpoints'].get(name)
+        if not base:
+            if not allow_new:
+                problems.append('not in the baseline (record it with --update-baseline)')
+        else:
+            latency_limit = max(
+                base['p95_ms'] * (1 + thresholds['latency_pct'] / 100),
+                base['p95_ms'] + thresholds['latency_floor_ms'],
+            )
+            if result['p95_ms'] > latency_limit:
+                problems.append(f"p95 {result['p95_ms']} ms > {latency_limit:.1f} ms (baseline {base['p95_ms']})")
+            query_limit = base['queries'] + thresholds['query_slack']
+            if result['queries'] > query_limit:
+                problems.append(f"{result['queries']} queries > {query_limit} (baseline {base['queries']})")
+            memory_limit = base['peak_kb'] * (1 + thresholds['memory_pct'] / 100)
+            if result['peak_kb'] > memory_limit:
+                problems.append(f"peak {result['peak_kb']} KB > {memory_limit:.1f} KB (baseline {base['peak_kb']})")
+        if problems:
+            regressions[name] = problems
+    return regressions
+
+
+def write_baseline(results, fixtures, path=None):
+    """Record the current results as the new baseline, keeping its thresholds"""
+    path = Path(path or BASELINE_PATH)
+    baseline = load_baseline(path)
+    baseline['dataset'] = {
+        'school_code': fixtures['school_code'],
+        'students': fixtures['student_count'],
+    }
+    for name, result in results.items():
+        baseline['endpoints'][name] = {
+            key: result[key] for key in ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'peak_kb')
+        }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return path
@@ -0,0 +1,29 @@
+# schools/management/commands/backfill_user_index.py
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.models import School
+from schools.user_index import backfill
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the public GlobalUserIndex (email -> school) from all tenant schemas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Parallel workers (default: PLATFORM_ANALYTICS_WORKERS)')
+        parser.add_argument('--school-code', type=str, action='append', dest='school_codes',
+                            help='Only these schools (repeatable)')
+
+    def handle(self, *args, **options):
+        schools = None
+        if options['school_codes']:
+            schools = School.objects.filter(school_code__in=options['school_codes'])
+            if not schools.exists():
+                raise CommandError('No school matches the given codes')
+
+        summary = backfill(schools=schools, workers=options['workers'])
+
+        if summary['failed']:
+            self.stdout.write(self.style.WARNING(f"⚠️  {summary['failed']} schools could not be read"))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {summary['users']} users indexed across {summary['schools']} schools"
+        ))
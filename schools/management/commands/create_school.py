@@ -9,6 +9,7 @@ from django.db import connection
 from django.contrib.auth import get_user_model
 
 from schools.models import School, Domain
+from schools.provisioning import clone_mode_enabled, clone_school_schema, drop_schema, seed_rbac
 
 User = get_user_model()
 
@@ -49,6 +50,10 @@ class Command(BaseCommand):
         # Advanced
         parser.add_argument('--skip-validation', action='store_true')
         parser.add_argument('--auto-verify', action='store_true', default=True)
+        parser.add_argument('--clone', action='store_true', default=None,
+                            help='Clone the template schema instead of running migrations')
+        parser.add_argument('--migrate', action='store_false', dest='clone',
+                            help='Run full tenant migrations (ignores TENANT_PROVISIONING_MODE)')
 
     def handle(self, *args, **options):
         try:
@@ -60,13 +65,24 @@ class Command(BaseCommand):
 
             self._print_plan(options)
 
+            clone = options['clone'] if options['clone'] is not None else clone_mode_enabled()
+            schema_name = self._schema_name(options)
+
+            if clone:
+                # Schema comes pre-migrated and RBAC-seeded; School.create() then skips create_schema()
+                self.stdout.write('🔄 Cloning tenant template schema...')
+                elapsed_ms = clone_school_schema(schema_name)
+                cloned_schema = schema_name
+                self.stdout.write(self.style.SUCCESS(f'✅ Schema cloned in {elapsed_ms} ms'))
+
             # Create tenant
-            school = self._create_school(options)
+            school = self._create_school(options, schema_name)
             domain = self._create_domain(school, options['domain'])
 
-            # Migrate tenant schema
-            self.stdout.write('🔄 Creating tenant schema and running migrations...')
-            call_command('migrate_schemas', '--schema', school.schema_name)
+            if not clone:
+                # Migrate tenant schema
+                self.stdout.write('🔄 Creating tenant schema and running migrations...')
+                call_command('migrate_schemas', '--schema', school.schema_name)
 
             # Switch to tenant
             connection.set_tenant(school)
@@ -74,8 +90,8 @@ class Command(BaseCommand):
             # ✅ CREATE ADMIN USER WITH SCHOOL FIELDS
             admin_user, admin_password = self._create_admin_user(school, options)
 
-            # Seed module-level RBAC
-            modules_count, roles_count = self._seed_modules_and_roles()
+            # Seed module-level RBAC (a cloned schema already carries it)
+            modules_count, roles_count = (0, 0) if clone else seed_rbac()
 
             # Assign Super Admin role to admin
             self._assign_super_admin(admin_user)
@@ -92,6 +108,8 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'❌ School creation failed: {e}'))
             # Reset connection to public schema on error
             connection.set_schema_to_public()
+            if 'cloned_schema' in locals() and 'school' not in locals():
+                drop_schema(cloned_schema)
             raise CommandError(str(e))
 
     # ============ Validation ============
@@ -119,10 +137,11 @@ class Command(BaseCommand):
 
     # ============ Creation ============
 
-    def _create_school(self, opts):
+    def _schema_name(self, opts):
         clean_code = opts['code'].lower().replace(' ', '_').replace('-', '_')
-        schema_name = f'school_{clean_code}'
+        return f'school_{clean_code}'
 
+    def _create_school(self, opts, schema_name):
         today = date.today()  # IST (since USE_TZ = False and server is IST)
 
         school = School.objects.create(
@@ -202,118 +221,6 @@ class Command(BaseCommand):
         )
         return admin, pwd
 
-    # ============ Seeding (Module-level RBAC only) ============
-
-    def _seed_modules_and_roles(self):
-        from core.models import Module, Permission, Role
-
-        core = [
-            ('dashboard', 'Dashboard', 'fas fa-tachometer-alt', True),
-            ('students', 'Students', 'fas fa-user-graduate', True),
-            ('teachers', 'Teachers', 'fas fa-chalkboard-teacher', True),
-            ('classes', 'Classes', 'fas fa-school', True),
-            ('attendance', 'Attendance', 'fas fa-check-square', True),
-            ('settings', 'Settings', 'fas fa-cog', True),
-        ]
-        optional = [
-            ('fees', 'Fees', 'fas fa-money-bill-wave', False),
-            ('examinations', 'Examinations', 'fas fa-file-alt', False),
-            ('timetable', 'Timetable', 'fas fa-calendar-alt', False),
-            ('reports', 'Reports', 'fas fa-chart-bar', False),
-            ('library', 'Library', 'fas fa-book-open', False),
-            ('communications', 'Communications', 'fas fa-bullhorn', False),
-            ('transport', 'Transport', 'fas fa-bus', False),
-            ('events', 'Events', 'fas fa-calendar-check', False),
-        ]
-        all_modules = core + optional
-
-        modules_created = 0
-        for name, label, icon, is_core in all_modules:
-            m, created = Module.objects.get_or_create(
-                name=name,
-                defaults=dict(
-                    display_name=label,
-                    icon=icon,
-                    is_core=is_core,
-                    is_active=True,
-                    created_by_system=True,
-                ),
-            )
-            if created:
-                modules_created += 1
-
-        # Create module-level permissions and ALL_MODULES
-        perm_codes = ['ALL_MODULES'] + [m[0] for m in all_modules]
-
-        def get_module_or_none(code):
-            if code == 'ALL_MODULES':
-                return None
-            try:
-                return Module.objects.get(name=code)
-            except Module.DoesNotExist:
-                return None
-
-        for code in perm_codes:
-            Permission.objects.get_or_create(
-                module=get_module_or_none(code),
-                action='module',
-                defaults=dict(
-                    codename=code,
-                    description=(
-                        'Access to all modules'
-                        if code == 'ALL_MODULES'
-                        else f'Full access to {code} module'
-                    ),
-                ),
-            )
-
-        # Create roles and attach module-level permissions
-        roles_created = 0
-
-        def perms(codes):
-            return Permission.objects.filter(codename__in=codes)
-
-        # Super Admin
-        super_admin, created = Role.objects.get_or_create(
-            name='Super Admin',
-            defaults=dict(
-                is_system_role=True,
-                description='Full access to all modules',
-                is_active=True,
-            ),
-        )
-        if created:
-            roles_created += 1
-            super_admin.permissions.set(perms(['ALL_MODULES']))
-
-        # Principal
-        principal_modules = [
-            'dashboard',
-            'students',
-            'teachers',
-            'classes',
-            'attendance',
-            'fees',
-            'examinations',
-            'timetable',
-            'reports',
-            'library',
-            'communications',
-        ]
-        principal, created = Role.objects.get_or_create(
-            name='Principal',
-            defaults=dict(
-                is_system_role=True,
-                description='Comprehensive module access',
-                is_active=True,
-            ),
-        )
-        if created:
-            roles_created += 1
-            principal.permissions.set(perms(principal_modules))
-
-        return modules_created, roles_created
-
     def _assign_super_admin(self, user):
         from core.models import Role, UserRole
 
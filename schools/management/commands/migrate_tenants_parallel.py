@@ -0,0 +1,98 @@
+# schools/management/commands/migrate_tenants_parallel.py
+import json
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from schools.migration_service import pending_by_schema, run_parallel, target_migrations, tenant_schemas
+
+
+class Command(BaseCommand):
+    help = 'Migrate tenant schemas in parallel worker processes, skipping schemas that are up to date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Worker processes (default: TENANT_MIGRATION_WORKERS)')
+        parser.add_argument('--schema', type=str, action='append', dest='schemas',
+                            help='Only these tenant schemas (repeatable)')
+        parser.add_argument('--skip-public', action='store_true',
+                            help='Do not migrate the public schema first')
+        parser.add_argument('--include-template', action='store_true',
+                            help='Also migrate the TENANT_TEMPLATE_SCHEMA clone source')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the schemas that need migrating')
+        parser.add_argument('--report', type=str,
+                            help='JSON report path (default: tenant_migrations_<timestamp>.json)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        started_at = timezone.now()
+
+        if not options['skip_public'] and not options['dry_run']:
+            self.stdout.write('🔄 Migrating public schema...')
+            call_command('migrate_schemas', '--shared', interactive=False, verbosity=0)
+
+        schemas = tenant_schemas(options['schemas'], include_template=options['include_template'])
+        if options['schemas'] and not schemas:
+            raise CommandError('No tenant matches the given schemas')
+
+        pending = pending_by_schema(schemas, target_migrations())
+        to_migrate = [schema for schema in schemas if pending[schema]]
+        self.stdout.write(
+            f'📋 {len(schemas)} tenant schemas, {len(schemas) - len(to_migrate)} up to date, '
+            f'{len(to_migrate)} to migrate'
+        )
+
+        if options['dry_run']:
+            for schema in to_migrate:
+                self.stdout.write(f'   {schema}: {len(pending[schema])} pending ({", ".join(pending[schema][:3])})')
+            return
+
+        results = run_parallel(to_migrate, workers=options['workers'], on_result=self._progress)
+        results += [
+            {'schema': schema, 'status': 'UP_TO_DATE', 'elapsed_ms': 0, 'error': '', 'output': ''}
+            for schema in schemas if not pending[schema]
+        ]
+        results.sort(key=lambda result: result['schema'])
+        for result in results:
+            result['pending'] = pending[result['schema']]
+
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        failed = [result for result in results if result['status'] == 'FAILED']
+        self._print_summary(results, elapsed_ms)
+
+        report_path = options['report'] or f"tenant_migrations_{started_at.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(report_path, 'w') as report:
+            json.dump({
+                'started_at': started_at.isoformat(),
+                'elapsed_ms': elapsed_ms,
+                'schemas': len(results),
+                'migrated': sum(1 for result in results if result['status'] == 'MIGRATED'),
+                'up_to_date': sum(1 for result in results if result['status'] == 'UP_TO_DATE'),
+                'failed': len(failed),
+                'results': results,
+            }, report, indent=2)
+        self.stdout.write(f'📝 Report written to {report_path}')
+
+        if failed:
+            raise CommandError(f'{len(failed)} schemas failed: {", ".join(r["schema"] for r in failed)}')
+        self.stdout.write(self.style.SUCCESS(f'✅ Tenant migrations finished in {elapsed_ms} ms'))
+
+    def _progress(self, result, done, total):
+        line = f"[{done}/{total}] {result['schema']} {result['status']} in {result['elapsed_ms']} ms"
+        if result['status'] == 'FAILED':
+            self.stdout.write(self.style.ERROR(f"{line}: {result['error']}"))
+        else:
+            self.stdout.write(line)
+
+    def _print_summary(self, results, elapsed_ms):
+        width = max([len('Schema')] + [len(result['schema']) for result in results])
+        self.stdout.write(f'\n{"Schema".ljust(width)}  {"Status".ljust(10)}  {"Pending":>7}  {"Time (ms)":>9}')
+        self.stdout.write(f'{"-" * width}  {"-" * 10}  {"-" * 7}  {"-" * 9}')
+        for result in results:
+            row = (
+                f"{result['schema'].ljust(width)}  {result['status'].ljust(10)}  "
+                f"{len(result['pending']):>7}  {result['elapsed_ms']:>9}"
+            )
+            self.stdout.write(self.style.ERROR(row) if result['status'] == 'FAILED' else row)
+        self.stdout.write(f'\nTotal wall time: {elapsed_ms} ms\n')
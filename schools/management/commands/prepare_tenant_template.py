@@ -0,0 +1,30 @@
+# schools/management/commands/prepare_tenant_template.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from schools.provisioning import prepare_template, template_is_current
+
+
+class Command(BaseCommand):
+    help = 'Create or refresh the migrated, RBAC-seeded template schema new schools are cloned from'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', type=str, help='Template schema (default: TENANT_TEMPLATE_SCHEMA)')
+        parser.add_argument('--if-stale', action='store_true',
+                            help='Skip when the template already has every migration (for deploy hooks)')
+
+    def handle(self, *args, **options):
+        template = options['schema'] or settings.TENANT_TEMPLATE_SCHEMA
+
+        if options['if_stale'] and template_is_current(template):
+            self.stdout.write(f'⏭️  Template schema "{template}" is up to date, nothing to do')
+            return
+
+        started = time.monotonic()
+        modules_count, roles_count = prepare_template(template)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Template schema "{template}" ready in {int((time.monotonic() - started) * 1000)} ms '
+            f'(modules created: {modules_count}, roles created: {roles_count})'
+        ))
@@ -0,0 +1,35 @@
+# schools/management/commands/refresh_platform_analytics.py
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.models import School
+from schools.analytics_service import is_stale, refresh_platform_analytics
+
+
+class Command(BaseCommand):
+    help = 'Refresh cached platform analytics by querying all tenant schemas in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Parallel workers (default: PLATFORM_ANALYTICS_WORKERS)')
+        parser.add_argument('--school-code', type=str, action='append', dest='school_codes',
+                            help='Only these schools (repeatable)')
+        parser.add_argument('--if-stale', action='store_true',
+                            help='Skip when the cache is younger than PLATFORM_ANALYTICS_REFRESH_MINUTES (for cron)')
+
+    def handle(self, *args, **options):
+        if options['if_stale'] and not is_stale():
+            self.stdout.write('⏭️  Platform analytics are fresh, nothing to do')
+            return
+
+        schools = None
+        if options['school_codes']:
+            schools = School.objects.filter(school_code__in=options['school_codes'], is_active=True)
+            if not schools.exists():
+                raise CommandError('No active school matches the given codes')
+
+        summary = refresh_platform_analytics(schools=schools, workers=options['workers'])
+
+        if summary['failed']:
+            self.stdout.write(self.style.WARNING(f"⚠️  {summary['failed']} schools failed, see SchoolAnalytics.error"))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {summary['schools']} schools refreshed in {summary['elapsed_ms']} ms"
+        ))
@@ -0,0 +1,115 @@
+# schools/management/commands/run_benchmarks.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from schools.benchmark_service import (
+    BASELINE_PATH, ENDPOINTS, BenchmarkSetupError, baseline_recorded, compare, load_baseline, run_benchmarks,
+    write_baseline,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the hottest API endpoints against a synthetic school and compare with the baseline. '
+        'While no baseline is recorded only HTTP errors fail; record one with --update-baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school-code', type=str, default='LOAD001',
+                            help='Synthetic school to run against (default: LOAD001)')
+        parser.add_argument('--iterations', type=int, default=30, help='Timed calls per endpoint (default: 30)')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed calls per endpoint (default: 3)')
+        parser.add_argument('--endpoint', type=str, action='append', dest='endpoints',
+                            help='Only these endpoints (repeatable)')
+        parser.add_argument('--baseline', type=str, help=f'Baseline JSON (default: {BASELINE_PATH})')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Record this run as the new baseline instead of comparing')
+        parser.add_argument('--allow-new', action='store_true',
+                            help='Do not fail endpoints that have no baseline entry yet')
+        parser.add_argument('--report', type=str, help='Also write the full results to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('--iterations must be positive and --warmup not negative')
+        known = {name for name, *_ in ENDPOINTS}
+        unknown = set(options['endpoints'] or []) - known
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}. Choose from: {", ".join(sorted(known))}')
+
+        school_code = options['school_code'].upper()
+        baseline_path = options['baseline'] or BASELINE_PATH
+        baseline = load_baseline(baseline_path)
+
+        self.stdout.write(
+            f'⏱️ Benchmarking {school_code}: {options["iterations"]} iterations, {options["warmup"]} warmup'
+        )
+        try:
+            fixtures, results = run_benchmarks(
+                school_code,
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                only=options['endpoints'],
+                on_result=lambda result: self.stdout.write(
+                    f"   {result['name']}: p95 {result['p95_ms']} ms, {result['queries']} queries"
+                ),
+            )
+        except BenchmarkSetupError as e:
+            raise CommandError(str(e))
+
+        dataset = baseline.get('dataset')
+        if dataset and (dataset.get('school_code'), dataset.get('students')) != (school_code, fixtures['student_count']):
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Baseline was recorded on {dataset.get('school_code')} with {dataset.get('students')} students, "
+                f"this run has {fixtures['student_count']}; numbers are not comparable"
+            ))
+
+        regressions = {} if options['update_baseline'] else compare(results, baseline, allow_new=options['allow_new'])
+        self._print_summary(results, baseline, regressions)
+
+        if options['report']:
+            with open(options['report'], 'w') as report:
+                json.dump({
+                    'run_at': timezone.now().isoformat(),
+                    'school_code': school_code,
+                    'students': fixtures['student_count'],
+                    'iterations': options['iterations'],
+                    'results': results,
+                    'regressions': regressions,
+                }, report, indent=2)
+            self.stdout.write(f'📝 Report written to {options["report"]}')
+
+        if options['update_baseline']:
+            path = write_baseline(results, fixtures, baseline_path)
+            self.stdout.write(self.style.SUCCESS(f'✅ Baseline updated: {path}'))
+            return
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} endpoints regressed: {", ".join(sorted(regressions))}')
+        if not baseline_recorded(baseline):
+            self.stdout.write(self.style.WARNING(
+                f'⚠️ No baseline recorded in {baseline_path}: only HTTP errors were checked. '
+                f'Record one with --update-baseline against {school_code}.'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(results)} endpoints within the baseline thresholds'))
+
+    def _print_summary(self, results, baseline, regressions):
+        width = max([len('Endpoint')] + [len(name) for name in results])
+        self.stdout.write(
+            f'\n{"Endpoint".ljust(width)}  {"Status":>6}  {"p50 ms":>8}  {"p95 ms":>8}  {"p99 ms":>8}  '
+            f'{"Queries":>7}  {"Peak KB":>8}  Baseline p95 / queries'
+        )
+        self.stdout.write(f'{"-" * width}  {"-" * 6}  {"-" * 8}  {"-" * 8}  {"-" * 8}  {"-" * 7}  {"-" * 8}  {"-" * 22}')
+        for name, result in results.items():
+            base = baseline['endpoints'].get(name)
+            reference = f"{base['p95_ms']} / {base['queries']}" if base else 'new'
+            row = (
+                f"{name.ljust(width)}  {result['status_code']:>6}  {result['p50_ms']:>8}  {result['p95_ms']:>8}  "
+                f"{result['p99_ms']:>8}  {result['queries']:>7}  {result['peak_kb']:>8}  {reference}"
+            )
+            self.stdout.write(self.style.ERROR(row) if name in regressions else row)
+        for name, problems in regressions.items():
+            self.stdout.write(self.style.ERROR(f'❌ {name}: {"; ".join(problems)}'))
+        self.stdout.write('')
@@ -0,0 +1,144 @@
+# schools/migration_service.py
+
+import io
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.migrations.loader import MigrationLoader
+
+from .models import School
+
+logger = logging.getLogger(__name__)
+
+
+# Lines of migrate output kept in the report for a failed schema
+ERROR_OUTPUT_LINES = 40
+
+
+def target_migrations():
+    """(app, name) of every leaf migration on disk - the state a schema must reach"""
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    return set(loader.graph.leaf_nodes())
+
+
+def tenant_schemas(schema_names=None, include_template=False):
+    """Schema names of all tenants (or the given ones), public excluded"""
+    schools = School.objects.exclude(schema_name=settings.PUBLIC_SCHEMA_NAME)
+    if schema_names:
+        schools = schools.filter(schema_name__in=schema_names)
+    schemas = list(schools.order_by('schema_name').values_list('schema_name', flat=True))
+    if include_template and settings.TENANT_TEMPLATE_SCHEMA not in schemas:
+        schemas.insert(0, settings.TENANT_TEMPLATE_SCHEMA)
+    return schemas
+
+
+def pending_by_schema(schemas, targets=None):
+    """
+    Leaf migrations each schema still lacks
+
+    One catalog query finds the schemas that have a django_migrations
+    table, then one query per schema reads its applied migrations;
+    a schema without the table needs everything.
+
+    Returns:
+        dict: {schema_name: sorted list of 'app.name' not yet applied}
+    """
+    targets = targets or target_migrations()
+    connection.set_schema_to_public()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT table_schema FROM information_schema.tables "
+            "WHERE table_name = 'django_migrations' AND table_schema = ANY(%s)",
+            [list(schemas)],
+        )
+        migrated = {row[0] for row in cursor.fetchall()}
+
+        pending = {}
+        for schema in schemas:
+            applied = set()
+            if schema in migrated:
+                cursor.execute(f'SELECT app, name FROM "{schema}".django_migrations')
+                applied = set(cursor.fetchall())
+            pending[schema] = sorted(f'{app}.{name}' for app, name in targets - applied)
+    return pending
+
+
+def migrate_schema(schema_name):
+    """
+    Migrate one tenant schema (runs in a worker process)
+
+    Returns:
+        dict: {'schema', 'status', 'elapsed_ms', 'error', 'output'}
+    """
+    started = time.monotonic()
+    output = io.StringIO()
+    try:
+        call_command(
+            'migrate_schemas', '--schema', schema_name,
+            interactive=False, verbosity=1, stdout=output, stderr=output,
+        )
+        status, error = 'MIGRATED', ''
+    except (Exception, SystemExit) as e:
+        # SystemExit from a migration must not take the worker down with it
+        status, error = 'FAILED', f'{type(e).__name__}: {e}'
+    finally:
+        connections.close_all()
+    return {
+        'schema': schema_name,
+        'status': status,
+        'elapsed_ms': _elapsed_ms(started),
+        'error': error,
+        'output': '\n'.join(output.getvalue().splitlines()[-ERROR_OUTPUT_LINES:]) if error else '',
+    }
+
+
+def run_parallel(schemas, workers=None, on_result=None):
+    """
+    Migrate schemas across worker processes
+
+    Each process has its own database connection and migrates one schema at
+    a time; a failing schema is recorded and the others carry on.
+
+    Args:
+        schemas: Schema names to migrate
+        workers: Process count (default: settings.TENANT_MIGRATION_WORKERS)
+        on_result: callable(result, done, total) called as schemas finish
+
+    Returns:
+        list: migrate_schema() results in completion order
+    """
+    schemas = list(schemas)
+    if not schemas:
+        return []
+    workers = max(1, min(workers or settings.TENANT_MIGRATION_WORKERS, len(schemas)))
+
+    # Forked children must not share the parent's socket
+    connections.close_all()
+
+    results = []
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=connections.close_all) as pool:
+        futures = {pool.submit(migrate_schema, schema): schema for schema in schemas}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. killed by the OOM killer)
+                logger.exception('Migration worker crashed on schema %s', futures[future])
+                result = {
+                    'schema': futures[future], 'status': 'FAILED', 'elapsed_ms': 0,
+                    'error': f'Worker crashed: {e}', 'output': '',
+                }
+            results.append(result)
+            if on_result:
+                on_result(result, len(results), len(schemas))
+    return results
+
+
+def _elapsed_ms(started):
+    return int((time.monotonic() - started) * 1000)
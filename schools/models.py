@@ -1,6 +1,10 @@
-from django.db import models
+from functools import partial
+
+from django.db import models, transaction
 from django_tenants.models import TenantMixin, DomainMixin
 
+from .session_resolver import invalidate_current_session
+
 class School(TenantMixin):
     name = models.CharField(max_length=200)
     school_code = models.CharField(max_length=20, unique=True)
@@ -71,10 +75,70 @@ class SchoolSession(models.Model):
                 is_current=True
             ).exclude(pk=self.pk).update(is_current=False)
         super().save(*args, **kwargs)
+        # After commit, or another request could cache the old session again
+        transaction.on_commit(partial(invalidate_current_session, self.school.schema_name))
+
+    def delete(self, *args, **kwargs):
+        schema_name = self.school.schema_name
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(partial(invalidate_current_session, schema_name))
+        return result
 
     @classmethod
     def get_current_for_school(cls, school):
         try:
             return cls.objects.get(school=school, is_current=True)
         except cls.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
+
+class SchoolAnalytics(models.Model):
+    """
+    Cached per-school platform metrics (public schema).
+    Refreshed by schools.analytics_service across all tenant schemas.
+    """
+    school = models.OneToOneField(
+        School,
+        related_name='analytics',
+        on_delete=models.CASCADE
+    )
+    active_students = models.IntegerField(default=0)
+    active_teachers = models.IntegerField(default=0)
+    capacity_usage = models.DecimalField(max_digits=6, decimal_places=2, default=0)  # % of student_capacity
+    collections_month = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    collections_year = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    outstanding_dues = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    attendance_rate = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # last 30 days
+    error = models.TextField(blank=True)
+    query_ms = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['school__name']
+        verbose_name_plural = 'School analytics'
+
+    def __str__(self):
+        return f"{self.school.school_code} analytics ({self.refreshed_at})"
+
+
+class GlobalUserIndex(models.Model):
+    """
+    Public-schema directory of tenant users: email -> school.
+    Kept in sync by users.signals, backfilled by `backfill_user_index`.
+    """
+    email = models.EmailField(db_index=True)  # stored lower-cased
+    school = models.ForeignKey(
+        School,
+        related_name='user_index',
+        on_delete=models.CASCADE
+    )
+    school_code = models.CharField(max_length=20)
+    user_id = models.IntegerField()
+    user_type = models.CharField(max_length=20, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['email']
+        unique_together = ('school', 'user_id')
+
+    def __str__(self):
+        return f"{self.email} -> {self.school_code}"
@@ -0,0 +1,166 @@
+# schools/provisioning.py
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django_tenants.clone import CloneSchema
+from django_tenants.utils import schema_context, schema_exists
+
+logger = logging.getLogger(__name__)
+
+
+# (name, display name, icon, is_core)
+CORE_MODULES = [
+    ('dashboard', 'Dashboard', 'fas fa-tachometer-alt', True),
+    ('students', 'Students', 'fas fa-user-graduate', True),
+    ('teachers', 'Teachers', 'fas fa-chalkboard-teacher', True),
+    ('classes', 'Classes', 'fas fa-school', True),
+    ('attendance', 'Attendance', 'fas fa-check-square', True),
+    ('settings', 'Settings', 'fas fa-cog', True),
+]
+OPTIONAL_MODULES = [
+    ('fees', 'Fees', 'fas fa-money-bill-wave', False),
+    ('examinations', 'Examinations', 'fas fa-file-alt', False),
+    ('timetable', 'Timetable', 'fas fa-calendar-alt', False),
+    ('reports', 'Reports', 'fas fa-chart-bar', False),
+    ('library', 'Library', 'fas fa-book-open', False),
+    ('communications', 'Communications', 'fas fa-bullhorn', False),
+    ('transport', 'Transport', 'fas fa-bus', False),
+    ('events', 'Events', 'fas fa-calendar-check', False),
+]
+
+PRINCIPAL_MODULES = [
+    'dashboard', 'students', 'teachers', 'classes', 'attendance', 'fees',
+    'examinations', 'timetable', 'reports', 'library', 'communications',
+]
+
+
+def clone_mode_enabled():
+    return settings.TENANT_PROVISIONING_MODE == 'clone'
+
+
+def seed_rbac():
+    """
+    Seed module-level RBAC (modules, module permissions, system roles)
+    into the current schema; safe to run again
+
+    Returns:
+        tuple: (modules_created, roles_created)
+    """
+    from core.models import Module, Permission, Role
+
+    all_modules = CORE_MODULES + OPTIONAL_MODULES
+
+    modules_created = 0
+    modules = {}
+    for name, label, icon, is_core in all_modules:
+        module, created = Module.objects.get_or_create(
+            name=name,
+            defaults=dict(
+                display_name=label,
+                icon=icon,
+                is_core=is_core,
+                is_active=True,
+                created_by_system=True,
+            ),
+        )
+        modules[name] = module
+        if created:
+            modules_created += 1
+
+    # Module-level permissions plus ALL_MODULES
+    for code in ['ALL_MODULES'] + [name for name, _, _, _ in all_modules]:
+        Permission.objects.get_or_create(
+            module=modules.get(code),
+            action='module',
+            defaults=dict(
+                codename=code,
+                description=(
+                    'Access to all modules'
+                    if code == 'ALL_MODULES'
+                    else f'Full access to {code} module'
+                ),
+            ),
+        )
+
+    roles_created = 0
+    roles = [
+        ('Super Admin', 'Full access to all modules', ['ALL_MODULES']),
+        ('Principal', 'Comprehensive module access', PRINCIPAL_MODULES),
+    ]
+    for name, description, codes in roles:
+        role, created = Role.objects.get_or_create(
+            name=name,
+            defaults=dict(is_system_role=True, description=description, is_active=True),
+        )
+        if created:
+            roles_created += 1
+            role.permissions.set(Permission.objects.filter(codename__in=codes))
+
+    return modules_created, roles_created
+
+
+def template_is_current(template=None):
+    """True when the template schema exists and has every migration applied"""
+    template = template or settings.TENANT_TEMPLATE_SCHEMA
+    if not schema_exists(template):
+        return False
+    with schema_context(template):
+        executor = MigrationExecutor(connection)
+        return not executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def prepare_template(template=None):
+    """
+    Create or bring the template schema up to date: run the tenant
+    migrations once and seed RBAC, so every clone starts from here
+
+    Returns:
+        tuple: (modules_created, roles_created)
+    """
+    template = template or settings.TENANT_TEMPLATE_SCHEMA
+    connection.set_schema_to_public()
+    if not schema_exists(template):
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA "{template}"')
+
+    # migrate_schemas --schema only needs the schema, not a School row
+    call_command('migrate_schemas', '--schema', template, interactive=False, verbosity=0)
+
+    with schema_context(template):
+        return seed_rbac()
+
+
+def clone_school_schema(schema_name, template=None):
+    """
+    Create a tenant schema as a copy of the template schema
+    (tables, sequences, django_migrations rows and the RBAC seed)
+
+    Must run outside a transaction: django-tenants' clone_schema() commits.
+    Call it before School.objects.create(), whose create_schema() then
+    finds the schema and skips the migrations. The template is migrated
+    first if a newer migration has landed since it was prepared.
+
+    Returns:
+        int: Elapsed milliseconds
+    """
+    template = template or settings.TENANT_TEMPLATE_SCHEMA
+    started = time.monotonic()
+    if not template_is_current(template):
+        logger.info('Tenant template %s is missing or behind, migrating it', template)
+        prepare_template(template)
+
+    CloneSchema().clone_schema(template, schema_name, clone_mode='DATA')
+    connection.set_schema_to_public()
+    return int((time.monotonic() - started) * 1000)
+
+
+def drop_schema(schema_name):
+    """Remove a half-provisioned schema (cleanup after a failed onboarding)"""
+    connection.set_schema_to_public()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP SCHEMA IF EXISTS "{schema_name}" CASCADE')
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import School
+from .models import School, SchoolAnalytics
 
 class SchoolSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,4 +9,19 @@ class SchoolSerializer(serializers.ModelSerializer):
             'address', 'city', 'state', 'country', 'postal_code',
             'establishment_date', 'board', 'is_active', 'is_verified'
         ]
-        read_only_fields = ['id', 'is_verified']
\ No newline at end of file
+        read_only_fields = ['id', 'is_verified']
+
+
+class SchoolAnalyticsSerializer(serializers.ModelSerializer):
+    school_code = serializers.CharField(source='school.school_code', read_only=True)
+    school_name = serializers.CharField(source='school.name', read_only=True)
+    student_capacity = serializers.IntegerField(source='school.student_capacity', read_only=True)
+
+    class Meta:
+        model = SchoolAnalytics
+        fields = [
+            'school', 'school_code', 'school_name', 'student_capacity',
+            'active_students', 'active_teachers', 'capacity_usage',
+            'collections_month', 'collections_year', 'outstanding_dues',
+            'attendance_rate', 'error', 'query_ms', 'refreshed_at'
+        ]
@@ -0,0 +1,85 @@
+# schools/session_resolver.py
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django_tenants.utils import get_public_schema_name, schema_context
+
+# Cached "nothing is current", distinct from a cache miss
+_NONE = 'none'
+
+SESSION_KEY = 'current:session'
+ACADEMIC_YEAR_KEY = 'current:academic_year'
+
+
+def get_current_session(request=None):
+    """
+    Current SchoolSession of the active tenant, or None
+
+    Memoized on the request, then read from the shared cache (keys carry
+    the tenant schema), then queried. SchoolSession.save() drops the
+    cached value whenever a session is saved.
+
+    Args:
+        request: HttpRequest or DRF Request to memoize on (optional)
+    """
+    return _resolve(request, '_current_session', SESSION_KEY, _load_session)
+
+
+def get_current_academic_year(request=None):
+    """Current core.AcademicYear of the active tenant, or None (cached like get_current_session)"""
+    return _resolve(request, '_current_academic_year', ACADEMIC_YEAR_KEY, _load_academic_year)
+
+
+def invalidate_current_session(schema_name=None):
+    """Drop the cached current session of a tenant (default: the active one)"""
+    _invalidate(SESSION_KEY, schema_name)
+
+
+def invalidate_current_academic_year(schema_name=None):
+    _invalidate(ACADEMIC_YEAR_KEY, schema_name)
+
+
+def _resolve(request, attribute, key, load):
+    # DRF wraps the HttpRequest; memoize on the underlying one so middleware and views share it
+    request = getattr(request, '_request', request)
+    if request is not None and attribute in request.__dict__:
+        return request.__dict__[attribute]
+
+    if connection.schema_name == get_public_schema_name():
+        value = None
+    else:
+        value = cache.get(key)
+        if value is None:
+            value = load()
+            cache.set(key, _NONE if value is None else value, settings.CURRENT_SESSION_CACHE_TIMEOUT)
+        elif value == _NONE:
+            value = None
+
+    if request is not None:
+        request.__dict__[attribute] = value
+    return value
+
+
+def _invalidate(key, schema_name):
+    if schema_name and schema_name != connection.schema_name:
+        # Cache keys are prefixed with the active schema
+        with schema_context(schema_name):
+            cache.delete(key)
+    else:
+        cache.delete(key)
+
+
+def _load_session():
+    from .models import SchoolSession
+
+    school = getattr(connection, 'tenant', None)
+    if school is None or not getattr(school, 'pk', None):
+        return None
+    return SchoolSession.get_current_for_school(school)
+
+
+def _load_academic_year():
+    from core.models import AcademicYear
+
+    return AcademicYear.objects.filter(is_current=True).first()
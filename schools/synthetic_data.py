@@ -0,0 +1,638 @@
+# schools/synthetic_data.py
+
+import io
+import math
+import random
+import string
+import time
+from collections import defaultdict
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django_tenants.utils import schema_context
+
+from .models import School, Domain, SchoolSession
+from .provisioning import clone_school_schema
+from .user_index import backfill
+
+User = get_user_model()
+
+
+# Every generated user logs in with this password (hashed once per run)
+SYNTHETIC_PASSWORD = 'Synthetic@123'
+
+BATCH_SIZE = 5000
+# Attendance rows buffered before each COPY
+COPY_BUFFER_ROWS = 200000
+
+FIRST_NAMES = [
+    'Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan', 'Rohan',
+    'Ananya', 'Diya', 'Aadhya', 'Saanvi', 'Pari', 'Myra', 'Anika', 'Kavya', 'Riya', 'Meera',
+    'Kabir', 'Dhruv', 'Nikhil', 'Pranav', 'Tanvi', 'Sneha', 'Pooja', 'Neha', 'Rahul', 'Varun',
+]
+LAST_NAMES = [
+    'Sharma', 'Verma', 'Gupta', 'Patel', 'Reddy', 'Iyer', 'Nair', 'Joshi', 'Kulkarni', 'Deshmukh',
+    'Singh', 'Kumar', 'Das', 'Banerjee', 'Mehta', 'Shah', 'Rao', 'Pillai', 'Chopra', 'Malhotra',
+]
+CITIES = [('Mumbai', 'Maharashtra'), ('Pune', 'Maharashtra'), ('Bengaluru', 'Karnataka'),
+          ('Chennai', 'Tamil Nadu'), ('Jaipur', 'Rajasthan'), ('Lucknow', 'Uttar Pradesh')]
+
+# (name, code)
+SUBJECTS = [
+    ('English', 'ENG'), ('Hindi', 'HIN'), ('Mathematics', 'MATH'), ('Science', 'SCI'),
+    ('Social Studies', 'SST'), ('Computer Science', 'CS'), ('Sanskrit', 'SKT'), ('Physical Education', 'PE'),
+]
+CLASS_NAMES = ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12']
+SECTION_NAMES = ['A', 'B', 'C', 'D', 'E']
+SECTION_SIZE = 40
+
+TIMETABLE_DAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
+PERIODS_PER_DAY = 8
+PERIOD_MINUTES = 45
+DAY_START = dt_time(8, 0)
+
+# (status, weight)
+ATTENDANCE_STATUSES = [('P', 90), ('A', 6), ('L', 3), ('H', 1)]
+
+# (fee_type, frequency, base amount; tuition grows with the class)
+FEE_PLAN = [
+    ('TUITION', 'MONTHLY', Decimal('2500')),
+    ('EXAM', 'HALF_YEARLY', Decimal('1500')),
+    ('LIBRARY', 'YEARLY', Decimal('800')),
+    ('SPORTS', 'YEARLY', Decimal('1200')),
+]
+PAYMENT_MODES = [('UPI', 45), ('CASH', 20), ('ONLINE', 15), ('BANK_TRANSFER', 10), ('CARD', 7), ('CHEQUE', 3)]
+
+# (code, name, maximum marks, month of the academic year the exam is held in)
+EXAM_TYPES = [
+    ('UT1', 'Unit Test 1', 25, 3),
+    ('HY', 'Half Yearly', 100, 6),
+    ('UT2', 'Unit Test 2', 25, 9),
+    ('ANNUAL', 'Annual Examination', 100, 11),
+]
+GRADE_THRESHOLDS = [(91, 'A+'), (81, 'A'), (71, 'B+'), (61, 'B'), (51, 'C+'), (41, 'C'), (33, 'D'), (21, 'E')]
+
+BOOK_CATEGORIES = [
+    ('Fiction', 'FIC'), ('Science', 'SCI'), ('History', 'HIS'), ('Mathematics', 'MAT'),
+    ('Reference', 'REF'), ('Biography', 'BIO'), ('Comics', 'COM'), ('Languages', 'LAN'),
+]
+LOAN_DAYS = 14
+MAX_OPEN_ISSUES = 2
+
+
+def generate_schools(count, students_per_school, seed=1, as_of=None, code_prefix='LOAD',
+                     attendance_days=365, stdout=None):
+    """
+    Build `count` synthetic tenants with production-like volumes
+
+    Same arguments (seed and as_of included) give the same data. Schools
+    whose code already exists are skipped, so an interrupted run can be
+    resumed.
+
+    Returns:
+        list: SyntheticSchoolBuilder.build() summaries
+    """
+    as_of = as_of or date.today()
+    summaries = []
+    for index in range(1, count + 1):
+        code = f'{code_prefix}{index:03d}'
+        if School.objects.filter(school_code=code).exists():
+            if stdout:
+                stdout.write(f'⏭️  {code} already exists, skipping')
+            continue
+        builder = SyntheticSchoolBuilder(
+            code, students_per_school, random.Random(f'{seed}:{code}'), as_of,
+            attendance_days=attendance_days, stdout=stdout,
+        )
+        summaries.append(builder.build())
+    return summaries
+
+
+class SyntheticSchoolBuilder:
+    """Creates one tenant and fills it with bulk inserts (COPY for attendance)"""
+
+    def __init__(self, code, students, rng, as_of, attendance_days=365, stdout=None):
+        self.code = code
+        self.schema_name = f'school_{code.lower()}'
+        self.student_count = students
+        self.rng = rng
+        self.as_of = as_of
+        self.attendance_days = attendance_days
+        self.stdout = stdout
+        # Everything below comes from rng (seeded with seed:code), never
+        # from database ids, so a rebuild reproduces the same values
+        salt = ''.join(rng.choice(string.ascii_letters + string.digits) for _ in range(22))
+        self.password = make_password(SYNTHETIC_PASSWORD, salt=salt)
+        # Prefix of the Aadhaar and ISBN numbers of this school
+        self.school_number = rng.randrange(1000)
+        self.counts = {}
+
+        start_year = as_of.year if as_of.month >= 4 else as_of.year - 1
+        self.year_start = date(start_year, 4, 1)
+        self.year_end = date(start_year + 1, 3, 31)
+        self.academic_year = f'{start_year}-{start_year + 1}'
+        self.session_name = f'{start_year}-{str(start_year + 1)[-2:]}'
+
+    def build(self):
+        started = time.monotonic()
+        self.school = self._create_school()
+
+        with schema_context(self.schema_name):
+            with transaction.atomic():
+                self._step('academic year', self._create_academic_year)
+                self._step('users and staff', self._create_staff)
+                self._step('classes', self._create_classes)
+                self._step('students', self._create_students)
+                self._step('timetable', self._create_timetable)
+                self._step('exams', self._create_exams)
+                self._step('library', self._create_library)
+            self._step('attendance', self._create_attendance)
+            self._step('fees', self._create_fees)
+
+        backfill(schools=[self.school], workers=1)
+        self.counts['elapsed_ms'] = int((time.monotonic() - started) * 1000)
+        return {'school_code': self.code, 'schema': self.schema_name, **self.counts}
+
+    # ============ Tenant ============
+
+    def _create_school(self):
+        city, state = self.rng.choice(CITIES)
+        clone_school_schema(self.schema_name)
+        school = School.objects.create(
+            name=f'Synthetic School {self.code}',
+            school_code=self.code,
+            schema_name=self.schema_name,
+            email=f'office@{self.code.lower()}.example.com',
+            phone=self._phone(),
+            address=f'{self.code} Campus, {city}',
+            city=city,
+            state=state,
+            establishment_date=date(2000, 1, 1),
+            subscription_type='enterprise',
+            subscription_start=self.year_start,
+            subscription_end=self.year_end,
+            student_capacity=max(1000, self.student_count),
+            academic_year_start_month=4,
+            is_active=True,
+            is_verified=True,
+        )
+        Domain.objects.create(domain=f'{self.code.lower()}.localhost', tenant=school, is_primary=True)
+        self.session, _ = SchoolSession.objects.update_or_create(
+            school=school,
+            name=self.session_name,
+            defaults={'start_date': self.year_start, 'end_date': self.year_end, 'is_current': True},
+        )
+        return school
+
+    def _create_academic_year(self):
+        from core.models import AcademicYear
+
+        AcademicYear.objects.update_or_create(
+            name=self.session_name,
+            defaults={'start_date': self.year_start, 'end_date': self.year_end, 'is_current': True},
+        )
+
+    # ============ People ============
+
+    def _create_staff(self):
+        from core.models import Role, UserRole
+        from classes.models import Subject
+        from teachers.models import Teacher
+
+        self.admin = self._users([('school_admin', 'School', 'Admin', f'admin@{self.code.lower()}.example.com')])[0]
+        UserRole.objects.create(user=self.admin, role=Role.objects.get(name='Super Admin'), assigned_by=self.admin)
+
+        self.subjects = Subject.objects.bulk_create([
+            Subject(name=name, code=code, is_core=code not in ('SKT', 'PE')) for name, code in SUBJECTS
+        ])
+
+        # Enough teachers per subject that no two sections ever need the same one in a period
+        sections_needed = math.ceil(self.student_count / len(CLASS_NAMES) / SECTION_SIZE)
+        self.sections_per_class = min(len(SECTION_NAMES), max(1, sections_needed))
+        section_total = self.sections_per_class * len(CLASS_NAMES)
+        self.pool_size = math.ceil(section_total / len(self.subjects))
+
+        specs = []
+        for subject_index, subject in enumerate(self.subjects):
+            for member in range(self.pool_size):
+                first, last = self._name()
+                specs.append(('teacher', first, last, f't{subject_index:02d}{member:03d}@{self.code.lower()}.example.com'))
+        users = self._users(specs)
+
+        teachers = []
+        for number, user in enumerate(users, start=1):
+            subject = self.subjects[(number - 1) // self.pool_size]
+            city, state = self.rng.choice(CITIES)
+            teachers.append(Teacher(
+                user=user,
+                employee_id=f'{self.code}T{number:04d}',
+                date_of_birth=self._birth_date(25, 58),
+                gender=user.gender,
+                address=f'{self.rng.randint(1, 500)} Main Road, {city}',
+                city=city,
+                state=state,
+                pincode=str(self.rng.randint(110001, 855999)),
+                emergency_contact=self._phone(),
+                qualification=self.rng.choice(['B.Ed', 'M.Ed', 'M.Sc, B.Ed', 'M.A, B.Ed']),
+                specialization=subject.name,
+                experience_years=self.rng.randint(1, 30),
+                date_of_joining=self.year_start - timedelta(days=self.rng.randint(30, 4000)),
+            ))
+        teachers = Teacher.objects.bulk_create(teachers)
+        # pools[subject index] -> teachers of that subject
+        self.pools = [teachers[i * self.pool_size:(i + 1) * self.pool_size] for i in range(len(self.subjects))]
+        self.counts['teachers'] = len(teachers)
+
+    def _create_classes(self):
+        from classes.models import Class, Section
+
+        classes = Class.objects.bulk_create([
+            Class(name=name, display_name=f'Class {name}', session=self.session,
+                  capacity=SECTION_SIZE * self.sections_per_class,
+                  allocated_capacity=SECTION_SIZE * self.sections_per_class, room_number=f'R{index + 1:02d}')
+            for index, name in enumerate(CLASS_NAMES)
+        ])
+        self.sections = Section.objects.bulk_create([
+            Section(class_obj=class_obj, name=name, capacity=SECTION_SIZE, room_number=f'{class_obj.name}{name}')
+            for class_obj in classes
+            for name in SECTION_NAMES[:self.sections_per_class]
+        ])
+        self.classes = classes
+        self.counts['sections'] = len(self.sections)
+
+    def _create_students(self):
+        from students.models import Student
+
+        specs = []
+        for number in range(1, self.student_count + 1):
+            first, last = self._name()
+            specs.append(('student', first, last, f's{number:06d}@{self.code.lower()}.example.com'))
+        users = self._users(specs)
+
+        students = []
+        self.students_by_section = defaultdict(list)
+        for number, user in enumerate(users, start=1):
+            section = self.sections[(number - 1) % len(self.sections)]
+            grade = CLASS_NAMES.index(section.class_obj.name)
+            city, state = self.rng.choice(CITIES)
+            father_first, _ = self._name()
+            mother_first, _ = self._name()
+            student = Student(
+                user=user,
+                admission_number=f'{self.code}{self.year_start.year % 100:02d}{number:05d}',
+                admission_date=self.year_start - timedelta(days=365 * self.rng.randint(0, grade)),
+                college_email=user.email,
+                date_of_birth=self._birth_date(6 + grade, 7 + grade),
+                gender=user.gender,
+                blood_group=self.rng.choice(['A+', 'B+', 'O+', 'AB+', 'A-', 'O-']),
+                category=self.rng.choice(['GEN', 'GEN', 'OBC', 'SC', 'ST']),
+                aadhaar_number=f'{self.school_number % 100:02d}{number:010d}',
+                address=f'{self.rng.randint(1, 999)} {self.rng.choice(LAST_NAMES)} Nagar, {city}',
+                city=city,
+                state=state,
+                pincode=str(self.rng.randint(110001, 855999)),
+                emergency_contact=self._phone(),
+                current_class=section.class_obj,
+                section=section,
+                roll_number=len(self.students_by_section[section.id]) + 1,
+                father_name=f'{father_first} {user.last_name}',
+                father_phone=self._phone(),
+                mother_name=f'{mother_first} {user.last_name}',
+                mother_phone=self._phone() if self.rng.random() < 0.7 else '',
+            )
+            students.append(student)
+            self.students_by_section[section.id].append(student)
+        self.students = Student.objects.bulk_create(students, batch_size=BATCH_SIZE)
+        self.counts['students'] = len(self.students)
+
+    # ============ Academics ============
+
+    def _create_timetable(self):
+        from classes.models import ClassSubject, TimeTable
+
+        subject_count = len(self.subjects)
+        class_subjects, entries = [], []
+        for index, section in enumerate(self.sections):
+            for subject_index, subject in enumerate(self.subjects):
+                class_subjects.append(ClassSubject(
+                    class_obj=section.class_obj, section=section, subject=subject,
+                    teacher=self._teacher(index, subject_index), session=self.session,
+                    periods_per_week=len(TIMETABLE_DAYS), is_optional=not subject.is_core,
+                ))
+            for day_index, day in enumerate(TIMETABLE_DAYS):
+                for period in range(1, PERIODS_PER_DAY + 1):
+                    # Rotating subjects: sections sharing a subject in a period get different pool members
+                    subject_index = (period + day_index + index) % subject_count
+                    start = datetime.combine(self.year_start, DAY_START) + timedelta(minutes=PERIOD_MINUTES * (period - 1))
+                    entries.append(TimeTable(
+                        class_obj=section.class_obj, section=section, day=day, period=period,
+                        subject=self.subjects[subject_index], teacher=self._teacher(index, subject_index),
+                        start_time=start.time(), end_time=(start + timedelta(minutes=PERIOD_MINUTES)).time(),
+                        room_number=section.room_number, session=self.session,
+                    ))
+        ClassSubject.objects.bulk_create(class_subjects, batch_size=BATCH_SIZE)
+        self.timetable = TimeTable.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+        self.counts['timetable_entries'] = len(self.timetable)
+
+    def _create_exams(self):
+        from examinations.models import ExamType, ExamSchedule, ExamResult
+
+        exam_types = ExamType.objects.bulk_create([
+            ExamType(name=name, code=code, total_marks=maximum, passing_marks=math.ceil(maximum * 0.33))
+            for code, name, maximum, _ in EXAM_TYPES
+        ])
+        schedules = []
+        for exam_type, (_, _, maximum, month) in zip(exam_types, EXAM_TYPES):
+            exam_date = self._month_day(month, 10)
+            for class_obj in self.classes:
+                for offset, subject in enumerate(self.subjects):
+                    schedules.append(ExamSchedule(
+                        exam_type=exam_type, class_name=class_obj, subject=subject,
+                        exam_date=exam_date + timedelta(days=offset), start_time=dt_time(9, 0),
+                        end_time=dt_time(12, 0), duration=180, maximum_marks=maximum,
+                        passing_marks=exam_type.passing_marks, academic_year=self.academic_year,
+                    ))
+        schedules = ExamSchedule.objects.bulk_create(schedules, batch_size=BATCH_SIZE)
+
+        section_index = {section.id: index for index, section in enumerate(self.sections)}
+        subject_index = {subject.id: index for index, subject in enumerate(self.subjects)}
+        held = defaultdict(list)
+        for schedule in schedules:
+            if schedule.exam_date < self.as_of:
+                held[schedule.class_name_id].append(schedule)
+
+        results = []
+        result_count = 0
+        for student in self.students:
+            # A student's ability stays roughly the same across exams
+            ability = min(0.98, max(0.2, self.rng.gauss(0.68, 0.14)))
+            for schedule in held[student.current_class_id]:
+                percentage = min(1.0, max(0.0, self.rng.gauss(ability, 0.08)))
+                marks = Decimal(round(schedule.maximum_marks * percentage * 2) / 2).quantize(Decimal('0.01'))
+                results.append(ExamResult(
+                    student=student, exam_schedule=schedule, marks_obtained=marks,
+                    total_marks=marks, grade=self._grade(percentage * 100),
+                    entered_by=self._teacher(
+                        section_index[student.section_id], subject_index[schedule.subject_id]
+                    ),
+                ))
+            if len(results) >= BATCH_SIZE:
+                ExamResult.objects.bulk_create(results)
+                result_count += len(results)
+                results = []
+        ExamResult.objects.bulk_create(results)
+        self.counts['exam_results'] = result_count + len(results)
+
+    def _create_attendance(self):
+        """A year of period-wise StudentAttendance plus daily Attendance, streamed with COPY"""
+        from attendance.models import Attendance
+        from students.models import StudentAttendance
+
+        slots = {(entry.section_id, entry.day, entry.period): entry for entry in self.timetable}
+        teacher_users = {teacher.id: teacher.user_id for pool in self.pools for teacher in pool}
+        statuses = [status for status, _ in ATTENDANCE_STATUSES]
+        weights = [weight for _, weight in ATTENDANCE_STATUSES]
+
+        period_columns = ['student_id', 'date', 'timetable_id', 'class_obj_id', 'section_id', 'subject_id',
+                          'period_number', 'status', 'marked_by_id', 'marked_at', 'session_id']
+        daily_columns = ['student_id', 'date', 'status', 'period', 'subject_id', 'remarks', 'marked_by_id', 'marked_at']
+        period_rows, daily_rows = io.StringIO(), io.StringIO()
+        buffered = period_total = daily_total = 0
+
+        first_day = max(self.as_of - timedelta(days=self.attendance_days), date(2000, 1, 1))
+        day = first_day
+        while day < self.as_of:
+            weekday = day.weekday()
+            if weekday < len(TIMETABLE_DAYS):
+                day_code = TIMETABLE_DAYS[weekday]
+                for section in self.sections:
+                    students = self.students_by_section[section.id]
+                    for period in range(1, PERIODS_PER_DAY + 1):
+                        entry = slots[(section.id, day_code, period)]
+                        marked_by = teacher_users[entry.teacher_id]
+                        marked_at = datetime.combine(day, entry.start_time) + timedelta(minutes=5)
+                        for student, status in zip(students, self.rng.choices(statuses, weights, k=len(students))):
+                            period_rows.write(
+                                f'{student.id}\t{day}\t{entry.id}\t{section.class_obj_id}\t{section.id}\t'
+                                f'{entry.subject_id}\t{period}\t{status}\t{marked_by}\t{marked_at}\t{self.session.id}\n'
+                            )
+                            if period == 1:
+                                daily_rows.write(f'{student.id}\t{day}\t{status}\t\\N\t\\N\t\t{marked_by}\t{marked_at}\n')
+                                daily_total += 1
+                        buffered += len(students)
+                        period_total += len(students)
+            if buffered >= COPY_BUFFER_ROWS:
+                self._copy(StudentAttendance, period_columns, period_rows)
+                self._copy(Attendance, daily_columns, daily_rows)
+                period_rows, daily_rows = io.StringIO(), io.StringIO()
+                buffered = 0
+            day += timedelta(days=1)
+
+        self._copy(StudentAttendance, period_columns, period_rows)
+        self._copy(Attendance, daily_columns, daily_rows)
+        self.counts['period_attendance'] = period_total
+        self.counts['daily_attendance'] = daily_total
+
+    # ============ Fees ============
+
+    def _create_fees(self):
+        from fees.invoice_service import generate_class_invoices
+        from fees.ledger_service import post_payments
+        from fees.models import FeeStructure, FeeInvoice, FeePayment
+
+        structures = []
+        for grade, class_obj in enumerate(self.classes):
+            for fee_type, frequency, amount in FEE_PLAN:
+                if fee_type == 'TUITION':
+                    amount = amount + Decimal('250') * grade
+                structures.append(FeeStructure(
+                    class_name=class_obj, fee_type=fee_type, amount=amount,
+                    frequency=frequency, academic_year=self.academic_year,
+                ))
+        FeeStructure.objects.bulk_create(structures)
+
+        invoice_total = 0
+        for class_obj in self.classes:
+            summary = generate_class_invoices(
+                class_obj, self.academic_year, invoice_date=self.year_start, start_month=4,
+            )
+            invoice_total += summary['invoices_created']
+
+        modes = [mode for mode, _ in PAYMENT_MODES]
+        mode_weights = [weight for _, weight in PAYMENT_MODES]
+        invoices = FeeInvoice.objects.filter(due_date__lte=self.as_of).order_by('id')
+
+        payment_total = 0
+        with transaction.atomic():
+            payments, paid_invoices = [], []
+            for invoice in invoices.iterator(chunk_size=BATCH_SIZE):
+                roll = self.rng.random()
+                if roll < 0.8:
+                    amount = invoice.balance_amount
+                elif roll < 0.87:
+                    amount = (invoice.balance_amount / 2).quantize(Decimal('0.01'))
+                else:
+                    continue
+                mode = self.rng.choices(modes, mode_weights)[0]
+                payment_date = min(self.as_of, max(self.year_start, invoice.due_date - timedelta(days=self.rng.randint(-10, 15))))
+                payment_total += 1
+                payments.append(FeePayment(
+                    invoice=invoice, payment_date=payment_date, amount=amount, payment_mode=mode,
+                    transaction_id='' if mode == 'CASH' else f'{self.code}{payment_total:09d}',
+                    received_by='ONLINE' if mode in ('UPI', 'ONLINE', 'CARD') else 'Accounts Office',
+                    status='SUCCESS',
+                ))
+                invoice.paid_amount += amount
+                invoice.balance_amount -= amount
+                invoice.status = 'PAID' if invoice.balance_amount <= 0 else 'PARTIAL'
+                paid_invoices.append(invoice)
+                if len(payments) >= BATCH_SIZE:
+                    self._save_payments(payments, paid_invoices, post_payments)
+                    payments, paid_invoices = [], []
+            self._save_payments(payments, paid_invoices, post_payments)
+
+        self.counts['invoices'] = invoice_total
+        self.counts['payments'] = payment_total
+
+    def _save_payments(self, payments, invoices, post_payments):
+        from fees.models import FeeInvoice, FeePayment
+
+        if not payments:
+            return
+        FeePayment.objects.bulk_create(payments)
+        FeeInvoice.objects.bulk_update(invoices, ['paid_amount', 'balance_amount', 'status'])
+        # bulk_create bypasses post_save, so credit the ledger here
+        post_payments(payments)
+
+    # ============ Library ============
+
+    def _create_library(self):
+        from library.models import BookCategory, Book, BookIssue, LibraryMember
+        from library.search_service import update_search_vectors
+
+        categories = BookCategory.objects.bulk_create([
+            BookCategory(name=name, code=code) for name, code in BOOK_CATEGORIES
+        ])
+        books = []
+        for number in range(1, max(200, self.student_count // 4) + 1):
+            first, last = self._name()
+            copies = self.rng.randint(1, 5)
+            books.append(Book(
+                isbn=f'978{self.school_number:03d}{number:07d}',
+                title=f'{self.rng.choice(["The", "A", "Our", "My"])} {self.rng.choice(LAST_NAMES)} '
+                      f'{self.rng.choice(["Chronicles", "Guide", "Story", "Handbook", "Journey", "Primer"])} {number}',
+                author=f'{first} {last}',
+                publisher=self.rng.choice(['NCERT', 'Penguin', 'Rupa', 'S. Chand', 'Oxford']),
+                publication_year=self.rng.randint(1980, self.as_of.year),
+                category=self.rng.choice(categories),
+                pages=self.rng.randint(60, 600),
+                price=Decimal(self.rng.randint(100, 900)),
+                shelf_number=f'S{self.rng.randint(1, 40):02d}',
+                rack_number=f'R{self.rng.randint(1, 10):02d}',
+                total_copies=copies,
+                available_copies=copies,
+                acquired_date=self.year_start - timedelta(days=self.rng.randint(0, 3000)),
+            ))
+        books = Book.objects.bulk_create(books, batch_size=BATCH_SIZE)
+        # bulk_create bypasses post_save, so index the catalogue for search here
+        update_search_vectors()
+
+        window_start = self.as_of - timedelta(days=self.attendance_days)
+        open_by_book = defaultdict(int)
+        open_by_student = defaultdict(int)
+        issues = []
+        for student in self.students:
+            if self.rng.random() > 0.6:
+                continue
+            for issue_date in sorted(
+                window_start + timedelta(days=self.rng.randint(0, self.attendance_days - 1))
+                for _ in range(self.rng.randint(1, 8))
+            ):
+                book = self.rng.choice(books)
+                return_date = issue_date + timedelta(days=self.rng.randint(3, LOAN_DAYS + 10))
+                still_out = return_date >= self.as_of or self.rng.random() < 0.03
+                if still_out and (open_by_book[book.id] >= book.total_copies
+                                  or open_by_student[student.id] >= MAX_OPEN_ISSUES):
+                    continue
+                if still_out:
+                    return_date = None
+                    open_by_book[book.id] += 1
+                    open_by_student[student.id] += 1
+                issues.append(BookIssue(
+                    student=student, book=book, issue_date=issue_date,
+                    due_date=issue_date + timedelta(days=LOAN_DAYS), return_date=return_date,
+                    issued_by=self.admin, received_by=self.admin if return_date else None,
+                ))
+        BookIssue.objects.bulk_create(issues, batch_size=BATCH_SIZE)
+
+        for book in books:
+            book.available_copies = book.total_copies - open_by_book[book.id]
+            book.status = 'ISSUED' if book.available_copies == 0 else 'AVAILABLE'
+        Book.objects.bulk_update(books, ['available_copies', 'status'], batch_size=BATCH_SIZE)
+
+        LibraryMember.objects.bulk_create([
+            LibraryMember(
+                user_id=student.user_id, member_id=f'LM{number:07d}', member_type='STUDENT',
+                max_books_allowed=MAX_OPEN_ISSUES, current_books_issued=open_by_student[student.id],
+                membership_date=student.admission_date, expiry_date=self.year_end,
+            )
+            for number, student in enumerate(self.students, start=1)
+        ], batch_size=BATCH_SIZE)
+        self.counts['books'] = len(books)
+        self.counts['book_issues'] = len(issues)
+
+    # ============ Helpers ============
+
+    def _users(self, specs):
+        """Bulk create users from (user_type, first_name, last_name, email)"""
+        users = [
+            User(
+                username=email, email=email, first_name=first, last_name=last, user_type=user_type,
+                password=self.password, phone=self._phone(), gender=self.rng.choice(['M', 'F']),
+                is_staff=user_type == 'school_admin', is_active=True, is_verified=True,
+                school_id=self.school.id, school_code=self.code,
+            )
+            for user_type, first, last, email in specs
+        ]
+        return User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+
+    def _teacher(self, section_index, subject_index):
+        pool = self.pools[subject_index]
+        return pool[(section_index // len(self.subjects)) % len(pool)]
+
+    def _copy(self, model, columns, buffer):
+        if not buffer.tell():
+            return
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {model._meta.db_table} ({", ".join(columns)}) FROM STDIN', buffer
+            )
+
+    def _step(self, label, func):
+        started = time.monotonic()
+        func()
+        if self.stdout:
+            self.stdout.write(f'   {self.code}: {label} in {int((time.monotonic() - started) * 1000)} ms')
+
+    def _name(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def _phone(self):
+        return f'9{self.rng.randint(100000000, 999999999)}'
+
+    def _birth_date(self, min_age, max_age):
+        return self.year_start - timedelta(days=self.rng.randint(min_age * 365, max_age * 365))
+
+    def _month_day(self, month_offset, day):
+        month_index = self.year_start.month - 1 + month_offset
+        return date(self.year_start.year + month_index // 12, month_index % 12 + 1, day)
+
+    def _grade(self, percentage):
+        for threshold, grade in GRADE_THRESHOLDS:
+            if percentage >= threshold:
+                return grade
+        return 'F'
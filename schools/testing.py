@@ -0,0 +1,116 @@
+# schools/testing.py
+
+from datetime import date
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django_tenants.test.cases import TenantTestCase
+
+from .models import SchoolSession
+
+User = get_user_model()
+
+_sequence = count(1)
+
+
+class SchoolTestCase(TenantTestCase):
+    """
+    TenantTestCase for a test school, with small factories for the rows
+    most services need (the school's current session comes from the
+    create_default_session_for_school signal)
+    """
+
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Test School'
+        tenant.school_code = 'TEST'
+        tenant.email = 'office@test.example.com'
+        tenant.phone = '9000000000'
+        tenant.city = 'Pune'
+
+    @classmethod
+    def tearDownClass(cls):
+        # Tenant tables reference the public SchoolSession rows, so drop the
+        # sessions with the tenant schema on the search path before the
+        # school itself is deleted from public
+        connection.set_tenant(cls.tenant)
+        SchoolSession.objects.filter(school=cls.tenant).delete()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        # Cached current session/year and grids would outlive the rolled back rows
+        cache.clear()
+        self.session = SchoolSession.get_current_for_school(self.tenant)
+
+    # ============ Factories ============
+
+    def make_user(self, user_type='student', first_name='Test', last_name='User'):
+        number = next(_sequence)
+        email = f'{user_type}{number}@test.example.com'
+        return User.objects.create(
+            username=email, email=email, first_name=first_name, last_name=last_name,
+            user_type=user_type, password='!', is_active=True,
+        )
+
+    def make_teacher(self, first_name='Asha', last_name='Rao'):
+        from teachers.models import Teacher
+
+        return Teacher.objects.create(
+            user=self.make_user('teacher', first_name, last_name),
+            employee_id=f'T{next(_sequence):05d}',
+            date_of_birth=date(1985, 1, 1),
+            gender='F',
+            address='1 Main Road',
+            city='Pune',
+            state='Maharashtra',
+            pincode='411001',
+            emergency_contact='9000000001',
+            qualification='B.Ed',
+            specialization='Mathematics',
+            date_of_joining=date(2015, 6, 1),
+        )
+
+    def make_class(self, name='5', capacity=80):
+        from classes.models import Class
+
+        return Class.objects.create(
+            name=name, display_name=f'Class {name}', session=self.session, capacity=capacity,
+        )
+
+    def make_section(self, class_obj, name='A', capacity=40, room_number=''):
+        from classes.models import Section
+
+        return Section.objects.create(
+            class_obj=class_obj, name=name, capacity=capacity, room_number=room_number,
+        )
+
+    def make_subject(self, name='Mathematics', code=None, is_core=True):
+        from classes.models import Subject
+
+        return Subject.objects.create(name=name, code=code or f'S{next(_sequence):04d}', is_core=is_core)
+
+    def make_student(self, class_obj=None, section=None):
+        from students.models import Student
+
+        number = next(_sequence)
+        return Student.objects.create(
+            user=self.make_user('student'),
+            admission_number=f'ADM{number:06d}',
+            admission_date=date(2024, 4, 1),
+            date_of_birth=date(2014, 1, 1),
+            gender='M',
+            aadhaar_number=f'{number:012d}',
+            address='2 School Lane',
+            city='Pune',
+            state='Maharashtra',
+            pincode='411001',
+            emergency_contact='9000000002',
+            current_class=class_obj,
+            section=section,
+            roll_number=number,
+            father_name='Father',
+            mother_name='Mother',
+        )
@@ -1,3 +1,233 @@
-from django.test import TestCase
+import random
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Module, Role
+
+from . import analytics_service
+from .analytics_service import is_stale, platform_summary, refresh_platform_analytics
+from .benchmark_service import ENDPOINTS, compare
+from .migration_service import migrate_schema, pending_by_schema, target_migrations, tenant_schemas
+from .models import SchoolAnalytics, SchoolSession
+from .provisioning import clone_mode_enabled, clone_school_schema, seed_rbac, template_is_current
+from .session_resolver import get_current_session
+from .synthetic_data import SyntheticSchoolBuilder
+from .testing import SchoolTestCase
+from .views import PlatformAnalyticsAPIView
+
+
+def _fan_out_inline(schools, task, workers=None):
+    # Test data is not committed, so run the tasks on the test connection
+    return {school.id: (task(school), None, 0) for school in schools}
+
+
+class PlatformAnalyticsTests(SchoolTestCase):
+
+    def _get(self, user):
+        request = APIRequestFactory().get('/api/schools/platform/analytics/')
+        force_authenticate(request, user=user)
+        return PlatformAnalyticsAPIView.as_view()(request)
+
+    def test_refresh_writes_tenant_metrics(self):
+        class_obj = self.make_class()
+        self.make_student(class_obj)
+        self.make_student(class_obj)
+        self.make_teacher()
+
+        with mock.patch.object(analytics_service, 'fan_out', _fan_out_inline):
+            result = refresh_platform_analytics(schools=[self.tenant])
+
+        self.assertEqual(result['schools'], 1)
+        self.assertEqual(result['failed'], 0)
+        row = SchoolAnalytics.objects.get(school=self.tenant)
+        self.assertEqual(row.active_students, 2)
+        self.assertEqual(row.active_teachers, 1)
+        self.assertIsNotNone(row.refreshed_at)
+        self.assertFalse(is_stale())
+
+    def test_summary_totals_cached_rows(self):
+        SchoolAnalytics.objects.create(
+            school=self.tenant, active_students=30, active_teachers=3, refreshed_at=timezone.now(),
+        )
+
+        summary = platform_summary()
+
+        self.assertEqual(summary['totals']['schools'], 1)
+        self.assertEqual(summary['totals']['active_students'], 30)
+        self.assertEqual(summary['totals']['active_teachers'], 3)
+
+    def test_stale_without_recent_refresh(self):
+        self.assertTrue(is_stale())
+        SchoolAnalytics.objects.create(school=self.tenant, refreshed_at=timezone.now() - timedelta(days=1))
+        self.assertTrue(is_stale())
+
+    def test_view_serves_cache_without_fan_out(self):
+        SchoolAnalytics.objects.create(school=self.tenant, active_students=12, refreshed_at=timezone.now())
+        admin = self.make_user('super_admin')
+
+        with mock.patch.object(analytics_service, 'fan_out') as fan_out:
+            response = self._get(admin)
+
+        fan_out.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['totals']['active_students'], 12)
+        self.assertFalse(response.data['data']['stale'])
+
+    def test_view_requires_super_admin(self):
+        response = self._get(self.make_user('teacher'))
+        self.assertEqual(response.status_code, 403)
+
+
+class ProvisioningTests(SchoolTestCase):
+
+    def test_seed_rbac_is_idempotent(self):
+        seed_rbac()
+        modules, roles = Module.objects.count(), Role.objects.count()
+
+        self.assertEqual(seed_rbac(), (0, 0))
+        self.assertEqual(Module.objects.count(), modules)
+        self.assertEqual(Role.objects.count(), roles)
+        self.assertTrue(Role.objects.get(name='Principal').permissions.filter(codename='fees').exists())
+
+    def test_clone_mode_setting(self):
+        with override_settings(TENANT_PROVISIONING_MODE='clone'):
+            self.assertTrue(clone_mode_enabled())
+        with override_settings(TENANT_PROVISIONING_MODE='migrate'):
+            self.assertFalse(clone_mode_enabled())
+
+    def test_template_is_current(self):
+        self.assertTrue(template_is_current(self.tenant.schema_name))
+        self.assertFalse(template_is_current('no_such_template'))
+
+    def test_clone_migrates_stale_template_first(self):
+        # clone_schema() commits, so the copy itself is not run inside a test transaction
+        with mock.patch('schools.provisioning.template_is_current', return_value=False), \
+                mock.patch('schools.provisioning.prepare_template') as prepare, \
+                mock.patch('schools.provisioning.CloneSchema') as clone:
+            clone_school_schema('new_school', template='tenant_template')
+
+        prepare.assert_called_once_with('tenant_template')
+        clone.return_value.clone_schema.assert_called_once_with('tenant_template', 'new_school', clone_mode='DATA')
+        connection.set_tenant(self.tenant)
+
+
+class TenantMigrationTests(SchoolTestCase):
+
+    def tearDown(self):
+        # pending_by_schema() leaves the connection on public
+        connection.set_tenant(self.tenant)
+        super().tearDown()
+
+    def test_tenant_schemas_lists_tenants(self):
+        self.assertIn(self.tenant.schema_name, tenant_schemas())
+        self.assertEqual(tenant_schemas([self.tenant.schema_name]), [self.tenant.schema_name])
+        self.assertEqual(
+            tenant_schemas([self.tenant.schema_name], include_template=True),
+            [settings.TENANT_TEMPLATE_SCHEMA, self.tenant.schema_name],
+        )
+
+    def test_pending_by_schema(self):
+        targets = target_migrations()
+        pending = pending_by_schema([self.tenant.schema_name, 'never_migrated'], targets)
+
+        self.assertEqual(pending[self.tenant.schema_name], [])
+        self.assertEqual(len(pending['never_migrated']), len(targets))
+
+    def test_failed_migration_is_reported(self):
+        with mock.patch('schools.migration_service.call_command', side_effect=SystemExit(1)), \
+                mock.patch('schools.migration_service.connections'):
+            result = migrate_schema(self.tenant.schema_name)
+
+        self.assertEqual(result['schema'], self.tenant.schema_name)
+        self.assertEqual(result['status'], 'FAILED')
+        self.assertEqual(result['error'], 'SystemExit: 1')
+
+
+class SyntheticDataTests(SimpleTestCase):
+
+    def _builder(self, seed, code):
+        return SyntheticSchoolBuilder(code, 100, random.Random(f'{seed}:{code}'), date(2025, 6, 1))
+
+    def _sample(self, builder):
+        return (
+            builder.password, builder.school_number,
+            [builder._name() for _ in range(5)], [builder._phone() for _ in range(5)],
+        )
+
+    def test_same_seed_and_code_give_same_values(self):
+        self.assertEqual(self._sample(self._builder(1, 'LOAD001')), self._sample(self._builder(1, 'LOAD001')))
+
+    def test_seed_and_code_change_values(self):
+        sample = self._sample(self._builder(1, 'LOAD001'))
+        self.assertNotEqual(sample, self._sample(self._builder(2, 'LOAD001')))
+        self.assertNotEqual(sample, self._sample(self._builder(1, 'LOAD002')))
+
+
+def _result(status_code=200, p95_ms=10.0, queries=5, peak_kb=100.0):
+    return {'status_code': status_code, 'p95_ms': p95_ms, 'queries': queries, 'peak_kb': peak_kb}
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+
+    BASELINE = {
+        'thresholds': {},
+        'endpoints': {'student_list': {'p95_ms': 10.0, 'queries': 5, 'peak_kb': 100.0}},
+    }
+
+    def test_no_baseline_recorded_checks_only_errors(self):
+        empty = {'thresholds': {}, 'endpoints': {}}
+
+        self.assertEqual(compare({'student_list': _result()}, empty), {})
+        self.assertEqual(list(compare({'login': _result(status_code=500)}, empty)), ['login'])
+
+    def test_endpoint_missing_from_recorded_baseline_fails(self):
+        results = {'student_list': _result(), 'login': _result()}
+
+        self.assertEqual(list(compare(results, self.BASELINE)), ['login'])
+        self.assertEqual(compare(results, self.BASELINE, allow_new=True), {})
+
+    def test_thresholds(self):
+        # Latency must exceed both +25% and +5 ms
+        self.assertEqual(compare({'student_list': _result(p95_ms=14.9)}, self.BASELINE), {})
+        self.assertIn('student_list', compare({'student_list': _result(p95_ms=15.1)}, self.BASELINE))
+        self.assertIn('student_list', compare({'student_list': _result(queries=6)}, self.BASELINE))
+        self.assertIn('student_list', compare({'student_list': _result(peak_kb=126)}, self.BASELINE))
+
+    def test_endpoint_paths_resolve(self):
+        for name, _, _, path, _ in ENDPOINTS:
+            path = path.split('?')[0].replace('{student_id}', '1').replace('{teacher_id}', '1')
+            with self.subTest(name):
+                resolve(path)
+
+
+class CurrentSessionCacheTests(SchoolTestCase):
+
+    def test_cache_is_dropped_when_the_save_commits(self):
+        self.assertEqual(get_current_session(), self.session)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            next_session = SchoolSession.objects.create(
+                school=self.tenant, name='2099-00', start_date=date(2099, 4, 1),
+                end_date=date(2100, 3, 31), is_current=True,
+            )
+            # Not committed yet: other requests keep the cached session
+            self.assertEqual(get_current_session(), self.session)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_current_session(), next_session)
+
+    def test_cache_is_dropped_when_the_delete_commits(self):
+        self.assertEqual(get_current_session(), self.session)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SchoolSession.objects.filter(pk=self.session.pk).first().delete()
+
+        self.assertIsNone(get_current_session())
@@ -5,4 +5,5 @@ urlpatterns = [
     path('', SchoolListAPIView.as_view(), name='school_list'),
     path('create/', CreateSchoolAPIView.as_view(), name='school_create'),
     path('scladmin/school-dashboard-details/', SchoolAndUserDetailsAPI.as_view(), name='school-user-details'),
+    path('platform/analytics/', PlatformAnalyticsAPIView.as_view(), name='platform-analytics'),
 ]
@@ -0,0 +1,100 @@
+# schools/user_index.py
+
+from django.conf import settings
+from django.db import connection
+from django_tenants.utils import schema_context
+
+from .models import School, GlobalUserIndex
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def current_school():
+    """School of the active tenant schema, None in the public schema"""
+    if connection.schema_name == settings.PUBLIC_SCHEMA_NAME:
+        return None
+    tenant = getattr(connection, 'tenant', None)
+    if isinstance(tenant, School):
+        return tenant
+    with schema_context(settings.PUBLIC_SCHEMA_NAME):
+        return School.objects.filter(schema_name=connection.schema_name).first()
+
+
+def index_user(user, school):
+    """Create or update the directory row of a tenant user"""
+    # Shared-app tables live in public, which is on every tenant's search_path
+    GlobalUserIndex.objects.update_or_create(
+        school=school,
+        user_id=user.id,
+        defaults={
+            'email': normalize_email(user.email),
+            'school_code': school.school_code,
+            'user_type': user.user_type or '',
+        }
+    )
+
+
+def remove_user(user_id, school):
+    GlobalUserIndex.objects.filter(school=school, user_id=user_id).delete()
+
+
+def email_exists(email):
+    """Is the email used by any user of any school? (single indexed lookup)"""
+    return GlobalUserIndex.objects.filter(email=normalize_email(email)).exists()
+
+
+def schools_for_email(email):
+    """Active schools that have a user with this email"""
+    with schema_context(settings.PUBLIC_SCHEMA_NAME):
+        return list(School.objects.filter(
+            is_active=True,
+            user_index__email=normalize_email(email),
+        ).distinct())
+
+
+def backfill(schools=None, workers=None):
+    """
+    Rebuild the directory from the users of every tenant schema
+
+    Tenants are read in parallel (analytics_service.fan_out) and each
+    school's rows are replaced with one delete and one bulk insert.
+
+    Returns:
+        dict: {'schools', 'users', 'failed'}
+    """
+    from users.models import User
+    from .analytics_service import fan_out
+
+    with schema_context(settings.PUBLIC_SCHEMA_NAME):
+        if schools is None:
+            schools = School.objects.exclude(schema_name=settings.PUBLIC_SCHEMA_NAME)
+        schools = list(schools)
+
+    def collect(school):
+        return list(User.objects.values_list('id', 'email', 'user_type'))
+
+    results = fan_out(schools, collect, workers=workers)
+
+    indexed = failed = 0
+    with schema_context(settings.PUBLIC_SCHEMA_NAME):
+        for school in schools:
+            users, error, _ = results.get(school.id, (None, 'Not collected', 0))
+            if error:
+                failed += 1
+                continue
+            GlobalUserIndex.objects.filter(school=school).delete()
+            GlobalUserIndex.objects.bulk_create([
+                GlobalUserIndex(
+                    email=normalize_email(email),
+                    school=school,
+                    school_code=school.school_code,
+                    user_id=user_id,
+                    user_type=user_type or '',
+                )
+                for user_id, email, user_type in users
+            ], batch_size=1000)
+            indexed += len(users)
+
+    return {'schools': len(schools), 'users': indexed, 'failed': failed}
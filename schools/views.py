@@ -2,7 +2,11 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from .models import School
-from .serializers import SchoolSerializer
+from .serializers import SchoolSerializer, SchoolAnalyticsSerializer
+from .analytics_service import is_stale, platform_summary
+from .user_index import email_exists
+from .provisioning import clone_mode_enabled, clone_school_schema, drop_schema, seed_rbac
+from decimal import Decimal
 
 class SchoolListAPIView(APIView):
     def get(self, request):
@@ -23,7 +27,7 @@ import string
 from schools.models import School, Domain
 from django.contrib.auth import get_user_model
 import re
-from django_tenants.utils import schema_context
+from django_tenants.utils import schema_context, schema_exists
 User = get_user_model()
 
 class CreateSchoolAPIView(APIView):
@@ -79,23 +83,28 @@ class CreateSchoolAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Validate admin email not in any tenant
-            # First check in public schema
-            if User.objects.filter(email=data['admin_email']).exists():
-                # Check in all tenant schemas
-                schools = School.objects.all()
-                for school in schools:
-                    connection.set_tenant(school)
-                    if User.objects.filter(email=data['admin_email']).exists():
-                        connection.set_schema_to_public()
-                        return Response(
-                            {'error': f"Admin email '{data['admin_email']}' already exists in another school"},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                connection.set_schema_to_public()
+            # Validate admin email not in any tenant (one lookup in the global user index)
+            if User.objects.filter(email=data['admin_email']).exists() or email_exists(data['admin_email']):
+                return Response(
+                    {'error': f"Admin email '{data['admin_email']}' already exists in another school"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
             # ✅ STEP 1: CREATE SCHOOL IN PUBLIC SCHEMA
             schema_name = f"school_{clean_code}"
+            if schema_exists(schema_name):
+                return Response(
+                    {'error': f"Schema '{schema_name}' already exists"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # From here on the schema is ours, so cleanup may drop it even
+            # when cloning or migrating stops halfway
+            new_schema = schema_name
+            
+            # Clone mode: copy the pre-migrated template so School.create() skips create_schema()
+            clone = clone_mode_enabled()
+            if clone:
+                clone_school_schema(schema_name)
             
             school = School.objects.create(
                 name=data['name'],
@@ -126,8 +135,9 @@ class CreateSchoolAPIView(APIView):
                 is_primary=True
             )
             
-            # ✅ STEP 3: MIGRATE TENANT SCHEMA
-            call_command('migrate_schemas', '--schema', schema_name)
+            # ✅ STEP 3: MIGRATE TENANT SCHEMA (a cloned schema is already migrated)
+            if not clone:
+                call_command('migrate_schemas', '--schema', schema_name)
             
             # ✅ STEP 4: SWITCH TO TENANT AND CREATE ADMIN USER
             connection.set_tenant(school)
@@ -155,8 +165,9 @@ class CreateSchoolAPIView(APIView):
             admin.set_password(data['admin_password'])
             admin.save()
             
-            # ✅ STEP 5: SEED RBAC MODULES
-            self._seed_rbac_modules()
+            # ✅ STEP 5: SEED RBAC MODULES (cloned from the template otherwise)
+            if not clone:
+                seed_rbac()
             
             # ✅ STEP 6: ASSIGN SUPER ADMIN ROLE
             self._assign_super_admin_role(admin)
@@ -210,9 +221,14 @@ class CreateSchoolAPIView(APIView):
         except Exception as e:
             # Cleanup on error
             try:
+                connection.set_schema_to_public()
                 if 'school' in locals():
                     school.delete()
-                connection.set_schema_to_public()
+            except:
+                pass
+            try:
+                if 'new_schema' in locals():
+                    drop_schema(new_schema)
             except:
                 pass
             
@@ -225,69 +241,6 @@ class CreateSchoolAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def _seed_rbac_modules(self):
-        """Seed RBAC modules"""
-        from core.models import Module, Permission, Role
-        
-        # Create modules
-        modules_data = [
-            ('dashboard', 'Dashboard', 'fas fa-tachometer-alt', True),
-            ('students', 'Students', 'fas fa-user-graduate', True),
-            ('teachers', 'Teachers', 'fas fa-chalkboard-teacher', True),
-            ('classes', 'Classes', 'fas fa-school', True),
-            ('attendance', 'Attendance', 'fas fa-check-square', True),
-            ('settings', 'Settings', 'fas fa-cog', True),
-            ('fees', 'Fees', 'fas fa-money-bill-wave', False),
-            ('examinations', 'Examinations', 'fas fa-file-alt', False),
-            ('timetable', 'Timetable', 'fas fa-calendar-alt', False),
-            ('reports', 'Reports', 'fas fa-chart-bar', False),
-        ]
-        
-        for name, display_name, icon, is_core in modules_data:
-            Module.objects.get_or_create(
-                name=name,
-                defaults={
-                    'display_name': display_name,
-                    'icon': icon,
-                    'is_core': is_core,
-                    'is_active': True,
-                    'created_by_system': True
-                }
-            )
-        
-        # Create permissions
-        for name, _, _, _ in modules_data:
-            Permission.objects.get_or_create(
-                codename=name,
-                defaults={
-                    'action': 'module',
-                    'description': f'Access to {name} module'
-                }
-            )
-        
-        # Create ALL_MODULES permission
-        Permission.objects.get_or_create(
-            codename='ALL_MODULES',
-            defaults={
-                'action': 'module',
-                'description': 'Access to all modules'
-            }
-        )
-        
-        # Create Super Admin role
-        super_admin_role, _ = Role.objects.get_or_create(
-            name='Super Admin',
-            defaults={
-                'is_system_role': True,
-                'description': 'Full access to all modules',
-                'is_active': True
-            }
-        )
-        
-        # Assign ALL_MODULES to Super Admin
-        all_modules_perm = Permission.objects.get(codename='ALL_MODULES')
-        super_admin_role.permissions.add(all_modules_perm)
-    
     def _assign_super_admin_role(self, user):
         """Assign Super Admin role to user"""
         from core.models import Role, UserRole
@@ -385,4 +338,36 @@ class SchoolAndUserDetailsAPI(APIView):
             return Response({
                 'success': False,
                 'message': f'Error fetching details: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PlatformAnalyticsAPIView(APIView):
+    """
+    GET: Platform-wide numbers per school (cached in the public schema)
+    Only the cached SchoolAnalytics rows are read; the fan-out over the
+    tenant schemas runs in `manage.py refresh_platform_analytics` (cron
+    with --if-stale). `stale` tells when the cache is older than
+    PLATFORM_ANALYTICS_REFRESH_MINUTES.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not (request.user.is_superuser or getattr(request.user, 'user_type', None) == 'super_admin'):
+            return Response(
+                {'error': 'Only super admin can view platform analytics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        summary = platform_summary()
+        return Response({
+            'success': True,
+            'data': {
+                'totals': {
+                    key: float(value) if isinstance(value, Decimal) else value
+                    for key, value in summary['totals'].items()
+                },
+                'schools': SchoolAnalyticsSerializer(summary['schools'], many=True).data,
+                'refreshed_at': summary['refreshed_at'],
+                'stale': is_stale()
+            }
+        }, status=status.HTTP_200_OK)
@@ -10,6 +10,7 @@ from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from schools.models import SchoolSession
+from schools.session_resolver import get_current_session
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -23,16 +24,25 @@ from .models import (
 )
 from .serializers import *
 from core.custom_permission import StudentsModulePermission
+from api.query_instrumentation import query_budget
 from core.models import AcademicYear
 from classes.models import Class, Section, ClassSubject
+from classes.timetable_cache import section_week
 from assignments.models import Assignment, AssignmentSubmission
 from examinations.models import ExamResult
-from fees.models import FeeStructure, FeePayment
+from fees.models import FeeStructure, FeeInvoice, FeePayment
+from fees.serializers import FeeInvoiceSerializer, FeePaymentSerializer as InvoicePaymentSerializer
+from fees.ledger_service import outstanding_balance
+from fees.payment_service import PaymentError, record_payment
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from .utils import *
 from schools.models import *
 import os
-from django.db.models import Count
+from django.db.models import Count, Sum
+import logging
+
+logger = logging.getLogger(__name__)
+
 # ============================================================
 # STUDENT ADMIN CRUD / LISTING
 # ============================================================
@@ -77,7 +87,7 @@ class StudentCreateAPIView(APIView):
         # ========== AUTO-GENERATE ADMISSION NUMBER ==========
         try:
             admission_number = generate_admission_number(tenant_school)
-            print(f"✅ Generated admission number: {admission_number}")
+            logger.debug('Generated admission number %s', admission_number)
         except Exception as e:
             return Response({
                 'success': False,
@@ -92,7 +102,7 @@ class StudentCreateAPIView(APIView):
                 admission_number,
                 tenant_school
             )
-            print(f"✅ Generated college email: {college_email}")
+            logger.debug('Generated college email %s', college_email)
         except Exception as e:
             return Response({
                 'success': False,
@@ -197,7 +207,7 @@ class StudentCreateAPIView(APIView):
                 )
                 
                 # Create academic record
-                current_session = SchoolSession.objects.filter(is_current=True).first()
+                current_session = get_current_session(request)
                 if current_session:
                     StudentAcademicRecord.objects.create(
                         student=student,
@@ -253,6 +263,7 @@ class StudentListAPIView(APIView):
     """
     permission_classes = [IsAuthenticated, StudentsModulePermission]
     
+    @query_budget(10)
     def get(self, request):
         # ========== GET QUERY PARAMETERS ==========
         class_id = request.GET.get('class')
@@ -362,20 +373,29 @@ class StudentListAPIView(APIView):
         )
         
         # ========== GET STATISTICS ==========
-        total_count = queryset.count()
+        # All counts in one aggregate query
+        counts = queryset.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            inactive=Count('id', filter=Q(is_active=False)),
+            male=Count('id', filter=Q(gender='M')),
+            female=Count('id', filter=Q(gender='F')),
+            other=Count('id', filter=Q(gender='O')),
+        )
+        total_count = counts['total']
         
         # Get class/section wise count
         stats = {
             'total': total_count,
-            'active': queryset.filter(is_active=True).count(),
-            'inactive': queryset.filter(is_active=False).count(),
+            'active': counts['active'],
+            'inactive': counts['inactive'],
         }
         
         if class_id:
             stats['class_wise'] = {
-                'male': queryset.filter(gender='M').count(),
-                'female': queryset.filter(gender='F').count(),
-                'other': queryset.filter(gender='O').count(),
+                'male': counts['male'],
+                'female': counts['female'],
+                'other': counts['other'],
             }
         
         # ========== PAGINATION ==========
@@ -519,7 +539,7 @@ class StudentDetailAPIView(APIView):
             from schools.models import SchoolSession
             from attendance.models import Attendance
             
-            current_session = SchoolSession.objects.filter(is_current=True).first()
+            current_session = get_current_session(request)
             
             if current_session:
                 session_attendances = Attendance.objects.filter(
@@ -1030,6 +1050,7 @@ class ParentContactListAPIView(APIView):
     """
     permission_classes = [IsAuthenticated, StudentsModulePermission]
     
+    @query_budget(8)
     def get(self, request):
         class_id = request.GET.get('class')
         section_id = request.GET.get('section')
@@ -1502,7 +1523,7 @@ class StudentDocumentUpdateAPIView(APIView):
                         os.remove(old_file_path)
                     except Exception as e:
                         # Log error but don't fail the request
-                        print(f"Failed to delete old file: {e}")
+                        logger.warning('Failed to delete old file %s: %s', old_file_path, e)
                 
                 # Refresh from database
                 document.refresh_from_db()
@@ -2023,9 +2044,8 @@ class AdminMarkAttendanceAPIView(APIView):
         validated_data = serializer.validated_data
         
         # ========== GET CURRENT SESSION ==========
-        try:
-            current_session = SchoolSession.objects.get(is_current=True)
-        except SchoolSession.DoesNotExist:
+        current_session = get_current_session(request)
+        if current_session is None:
             return Response({
                 'success': False,
                 'error': 'No active session',
@@ -2179,7 +2199,13 @@ class AdminBulkMarkAttendanceAPIView(APIView):
                 }, status=status.HTTP_404_NOT_FOUND)
             
             # Get current session
-            current_session = SchoolSession.objects.get(is_current=True)
+            current_session = get_current_session(request)
+            if current_session is None:
+                return Response({
+                    'success': False,
+                    'error': 'No active session',
+                    'message': 'Please activate an academic session first'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
             # Mark all students
             with transaction.atomic():
@@ -2411,9 +2437,8 @@ class GenerateStudentIDCardAPIView(APIView):
                 'error': 'School not configured'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            session = SchoolSession.objects.get(is_current=True)
-        except SchoolSession.DoesNotExist:
+        session = get_current_session(request)
+        if session is None:
             return Response({
                 'success': False,
                 'error': 'No active session'
@@ -2486,7 +2511,7 @@ class GenerateStudentIDCardAPIView(APIView):
                     })
             
             except Exception as e:
-                print(f"Error generating card for student {student.id}: {str(e)}")
+                logger.exception('Error generating card for student %s', student.id)
                 continue
         
         # ========== STEP 7: RETURN RESPONSE ==========
@@ -2649,6 +2674,7 @@ class StudentSearchAPIView(APIView):
     """
     permission_classes = [IsAuthenticated, StudentsModulePermission]
 
+    @query_budget(8)
     def get(self, request):
         query = request.query_params.get('q', '')
         if not query:
@@ -2667,7 +2693,7 @@ class StudentSearchAPIView(APIView):
             Q(mother_name__icontains=query) |
             Q(father_phone__icontains=query) |
             Q(mother_phone__icontains=query)
-        ).filter(is_active=True)[:20]
+        ).filter(is_active=True).select_related('user', 'current_class', 'section')[:20]
 
         serializer = StudentSerializer(students, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -3197,6 +3223,7 @@ class StudentClassSectionAPIView(APIView):
     """GET: List all students in a specific class+section"""
     permission_classes = [IsAuthenticated, StudentsModulePermission]
 
+    @query_budget(12)
     def get(self, request, class_id, section_id):
         try:
             class_obj = Class.objects.get(id=class_id)
@@ -3212,7 +3239,7 @@ class StudentClassSectionAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        if getattr(section, 'class_obj', None) and section.class_obj != class_obj:
+        if section.class_obj_id and section.class_obj_id != class_obj.id:
             return Response(
                 {"error": "Section does not belong to the specified class"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -3222,13 +3249,13 @@ class StudentClassSectionAPIView(APIView):
             current_class=class_obj,
             section=section,
             is_active=True,
-        ).select_related('user').order_by('roll_number')
+        ).select_related('user', 'current_class', 'section').order_by('roll_number')
 
         serializer = StudentSerializer(students, many=True)
         return Response({
             "class": class_obj.display_name,
             "section": section.name,
-            "total_students": students.count(),
+            "total_students": len(serializer.data),
             "students": serializer.data,
         }, status=status.HTTP_200_OK)
 
@@ -3590,14 +3617,16 @@ class ClassTimetableAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        timetable = TimeTable.objects.filter(
-            class_name=student.current_class,
-            section=student.section,
-            is_active=True,
-        ).order_by('day', 'period')
+        current_session = get_current_session(request)
+        if current_session is None:
+            return Response(
+                {'error': 'No active session found'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        serializer = TimetableSerializer(timetable, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Weekly grid of the section from the timetable projection cache
+        periods = section_week(student.section_id, current_session.id, TimetableSerializer)
+        return Response(periods, status=status.HTTP_200_OK)
 
 
 class AssignedSubjectsAPIView(APIView):
@@ -3909,7 +3938,7 @@ class DailyAttendanceAPIView(APIView):
 # ============================================================
 
 class FeeDetailsAPIView(APIView):
-    """GET: Fee structure & summary for logged-in student"""
+    """GET: Fee invoices & outstanding summary for logged-in student"""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -3921,40 +3950,32 @@ class FeeDetailsAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        if not student.current_class:
-            return Response(
-                {'error': 'Student not assigned to any class'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        current_year = date.today().year
-        academic_year_name = f"{current_year}-{current_year + 1}"
+        invoices = FeeInvoice.objects.filter(
+            student=student,
+        ).exclude(status='CANCELLED').prefetch_related('items').order_by('due_date')
 
-        fee_structures = FeeStructure.objects.filter(
-            class_name=student.current_class,
-            academic_year__name=academic_year_name,
-        )
+        academic_year = request.GET.get('academic_year')
+        if academic_year:
+            invoices = invoices.filter(academic_year=academic_year)
 
-        serializer = FeeDetailSerializer(
-            fee_structures, many=True, context={'request': request}
+        totals = invoices.aggregate(
+            total_amount=Sum('total_amount'),
+            paid_amount=Sum('paid_amount'),
+            pending_amount=Sum('balance_amount'),
         )
-
-        total_amount = sum(fs.amount for fs in fee_structures)
-        paid_amount = 0
-        for fs in fee_structures:
-            if FeePayment.objects.filter(
-                student=student,
-                fee_structure=fs,
-                payment_status='PAID',
-            ).exists():
-                paid_amount += fs.amount
+        if academic_year:
+            # The ledger balance spans every year; use the same invoices as the totals
+            pending_amount = totals['pending_amount'] or 0
+        else:
+            # Maintained by the fee ledger, no recomputation needed
+            pending_amount = outstanding_balance(student.id)
 
         return Response({
-            'fee_details': serializer.data,
+            'fee_details': FeeInvoiceSerializer(invoices, many=True).data,
             'summary': {
-                'total_amount': total_amount,
-                'paid_amount': paid_amount,
-                'pending_amount': total_amount - paid_amount,
+                'total_amount': totals['total_amount'] or 0,
+                'paid_amount': totals['paid_amount'] or 0,
+                'pending_amount': pending_amount,
             },
         }, status=status.HTTP_200_OK)
 
@@ -3981,7 +4002,12 @@ class FeePaymentHistoryAPIView(APIView):
 
 
 class PayFeeAPIView(APIView):
-    """POST: Pay a fee item (student initiates payment)"""
+    """
+    POST: Pay a fee item (student initiates payment)
+
+    The gateway transaction_id is required and makes the call idempotent:
+    a retried callback returns the payment recorded the first time.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, fee_structure_id):
@@ -3993,30 +4019,44 @@ class PayFeeAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+        transaction_id = request.data.get('transaction_id')
+        if not transaction_id:
+            return Response(
+                {'error': 'transaction_id is required'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         fee_structure = get_object_or_404(FeeStructure, id=fee_structure_id)
 
-        if FeePayment.objects.filter(
+        # Oldest open invoice billing this fee structure
+        # (or the one this transaction already paid, for a retried callback)
+        invoice = FeeInvoice.objects.filter(
+            Q(balance_amount__gt=0) | Q(payments__transaction_id=transaction_id),
             student=student,
-            fee_structure=fee_structure,
-            payment_status='PAID',
-        ).exists():
+            items__fee_structure=fee_structure,
+        ).exclude(status='CANCELLED').order_by('due_date', 'id').first()
+        if not invoice:
             return Response(
                 {'error': 'Fee already paid'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        payment = FeePayment.objects.create(
-            student=student,
-            fee_structure=fee_structure,
-            amount_paid=fee_structure.amount,
-            payment_mode=request.data.get('payment_mode', 'ONLINE'),
-            transaction_id=request.data.get('transaction_id', ''),
-            payment_status='PAID',
-            payment_date=timezone.now().date(),
-        )
+        try:
+            payment, created = record_payment(
+                invoice.id,
+                request.data.get('amount'),
+                request.data.get('payment_mode', 'ONLINE'),
+                transaction_id=transaction_id,
+                received_by='ONLINE',
+            )
+        except PaymentError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = FeePaymentSerializer(payment)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        serializer = InvoicePaymentSerializer(payment)
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
 
 
 class DownloadFeeReceiptAPIView(APIView):
@@ -4,12 +4,15 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from datetime import date
+import logging
 
 from .models import Teacher, TeacherSubject, TeacherAttendance, TeacherSalary
 from classes.models import Class, Section, Subject, ClassSubject, TimeTable
 from schools.models import SchoolSession
+from schools.session_resolver import get_current_session
 from core.models import *
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 # ========== USER SERIALIZER ==========
@@ -59,20 +62,25 @@ class TeacherListSerializer(serializers.ModelSerializer):
     
     def get_total_subjects(self, obj):
         """Count unique subjects assigned to teacher"""
+        # Prefetched by TeacherListAPIView (active_subjects)
+        if hasattr(obj, 'active_subjects'):
+            return len({assignment.subject_id for assignment in obj.active_subjects})
         return obj.subjects.filter(
             subject__is_active=True
         ).values('subject').distinct().count()
     
     def get_total_classes(self, obj):
         """Count unique class-section combinations"""
-        try:
-            current_session = SchoolSession.objects.get(is_current=True)
-            return obj.taught_subjects.filter(
-                class_obj__is_active=True,
-                session=current_session
-            ).values('class_obj', 'section').distinct().count()
-        except SchoolSession.DoesNotExist:
+        # Prefetched by TeacherListAPIView (current_class_subjects)
+        if hasattr(obj, 'current_class_subjects'):
+            return len({(row.class_obj_id, row.section_id) for row in obj.current_class_subjects})
+        current_session = get_current_session(self.context.get('request'))
+        if current_session is None:
             return 0
+        return obj.taught_subjects.filter(
+            class_obj__is_active=True,
+            session=current_session
+        ).values('class_obj', 'section').distinct().count()
 
 
 # ========== TEACHER DETAIL SERIALIZER ==========
@@ -155,41 +163,39 @@ class TeacherDetailSerializer(serializers.ModelSerializer):
     
     def get_assigned_classes(self, obj):
         """Get all class-section-subject combinations"""
-        try:
-            current_session = SchoolSession.objects.get(is_current=True)
-            classes = obj.taught_subjects.filter(
-                class_obj__is_active=True,
-                session=current_session
-            ).select_related('class_obj', 'section', 'subject').values(
-                'id',
-                'class_obj__id',
-                'class_obj__display_name',
-                'section__id',
-                'section__name',
-                'subject__id',
-                'subject__name',
-                'periods_per_week',
-                'is_optional'
-            )
-            return list(classes)
-        except SchoolSession.DoesNotExist:
+        current_session = get_current_session(self.context.get('request'))
+        if current_session is None:
             return []
+        classes = obj.taught_subjects.filter(
+            class_obj__is_active=True,
+            session=current_session
+        ).select_related('class_obj', 'section', 'subject').values(
+            'id',
+            'class_obj__id',
+            'class_obj__display_name',
+            'section__id',
+            'section__name',
+            'subject__id',
+            'subject__name',
+            'periods_per_week',
+            'is_optional'
+        )
+        return list(classes)
     
     def get_class_teacher_of(self, obj):
         """Get classes where this teacher is class teacher"""
-        try:
-            current_session = SchoolSession.objects.get(is_current=True)
-            classes = obj.classes_as_class_teacher.filter(
-                is_active=True,
-                session=current_session
-            ).values(
-                'id',
-                'display_name',
-                'room_number'
-            )
-            return list(classes)
-        except SchoolSession.DoesNotExist:
+        current_session = get_current_session(self.context.get('request'))
+        if current_session is None:
             return []
+        classes = obj.classes_as_class_teacher.filter(
+            is_active=True,
+            session=current_session
+        ).values(
+            'id',
+            'display_name',
+            'room_number'
+        )
+        return list(classes)
 
 
 # ========== TEACHER CREATE SERIALIZER ==========
@@ -355,7 +361,7 @@ class TeacherCreateSerializer(serializers.Serializer):
                 user_role, error = assign_role_to_user(user, 'teacher')
                 
                 if error:
-                    print(f"Warning: Could not assign teacher role: {error}")
+                    logger.warning('Could not assign teacher role to user %s: %s', user.id, error)
             
             # ✅ Assign modules using existing function
             if modules:
@@ -363,7 +369,7 @@ class TeacherCreateSerializer(serializers.Serializer):
                 result = assign_modules_to_user(user, modules)
                 
                 if result['failed']:
-                    print(f"Warning: Failed modules: {result['errors']}")
+                    logger.warning('Failed to assign modules to user %s: %s', user.id, result['errors'])
             
             return teacher
 
@@ -501,7 +507,7 @@ class SubjectAssignmentSerializer(serializers.Serializer):
         # Get academic year
         academic_year = validated_data.get('academic_year')
         if not academic_year:
-            current_session = SchoolSession.objects.filter(is_current=True).first()
+            current_session = get_current_session(self.context.get('request'))
             if current_session:
                 academic_year = current_session.name
             else:
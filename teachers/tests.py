@@ -1,3 +1,88 @@
-from django.test import TestCase
+from datetime import time
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from classes.models import ClassSubject, TimeTable
+from schools.testing import SchoolTestCase
+from .workload_service import load_imbalance, teacher_workloads
+
+PERIOD_TIMES = {1: (time(9, 0), time(9, 40)), 2: (time(9, 40), time(10, 20)), 3: (time(10, 20), time(11, 0))}
+
+
+class TeacherWorkloadTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.class_obj = self.make_class()
+        self.section_a = self.make_section(self.class_obj, 'A')
+        self.section_b = self.make_section(self.class_obj, 'B')
+        self.maths = self.make_subject('Mathematics')
+        self.science = self.make_subject('Science')
+        self.busy = self.make_teacher()
+        self.idle = self.make_teacher('Ravi', 'Kumar')
+
+    def teach(self, teacher, section, subject, slots):
+        ClassSubject.objects.create(
+            class_obj=self.class_obj, section=section, subject=subject, session=self.session,
+            teacher=teacher, periods_per_week=len(slots),
+        )
+        for day, period in slots:
+            start, end = PERIOD_TIMES[period]
+            TimeTable.objects.create(
+                class_obj=self.class_obj, section=section, day=day, period=period, subject=subject,
+                teacher=teacher, start_time=start, end_time=end, session=self.session,
+            )
+
+    def test_periods_subjects_and_classes_per_teacher(self):
+        self.teach(self.busy, self.section_a, self.maths, [('MON', 1), ('MON', 2), ('TUE', 1)])
+        self.teach(self.busy, self.section_b, self.maths, [('MON', 3)])
+        self.teach(self.busy, self.section_b, self.science, [('WED', 1)])
+
+        rows = teacher_workloads(self.session)
+
+        self.assertEqual([row['teacher_id'] for row in rows], [self.busy.id, self.idle.id])
+        busy, idle = rows
+        self.assertEqual(busy['periods_per_week'], 5)
+        self.assertEqual(busy['periods_by_day']['Monday'], 3)
+        self.assertEqual(busy['max_periods_in_a_day'], 3)
+        self.assertEqual(busy['total_subjects'], 2)
+        self.assertEqual(busy['total_classes'], 2)
+        self.assertEqual((idle['periods_per_week'], idle['total_subjects']), (0, 0))
+
+    def test_query_count_does_not_grow_with_teachers(self):
+        with CaptureQueriesContext(connection) as few:
+            teacher_workloads(self.session)
+        for _ in range(10):
+            self.make_teacher()
+
+        with self.assertNumQueries(len(few)):
+            self.assertEqual(len(teacher_workloads(self.session)), 12)
+
+    @override_settings(TEACHER_MAX_PERIODS_PER_WEEK=2)
+    def test_over_cap(self):
+        self.teach(self.busy, self.section_a, self.maths, [('MON', 1), ('TUE', 1), ('WED', 1)])
+
+        rows = teacher_workloads(self.session, teacher_ids=[self.busy.id])
+
+        self.assertTrue(rows[0]['over_cap'])
+
+
+class LoadImbalanceTests(SimpleTestCase):
+
+    @override_settings(TEACHER_MAX_PERIODS_PER_WEEK=30)
+    def test_spread(self):
+        rows = [
+            {'teacher_id': 1, 'periods_per_week': 20, 'over_cap': False},
+            {'teacher_id': 2, 'periods_per_week': 40, 'over_cap': True},
+        ]
+
+        imbalance = load_imbalance(rows)
+
+        self.assertEqual((imbalance['mean'], imbalance['std_dev']), (30.0, 10.0))
+        self.assertEqual(imbalance['coefficient_of_variation'], 0.333)
+        self.assertEqual(imbalance['over_cap_teachers'], [2])
+
+    def test_no_teachers(self):
+        self.assertEqual(load_imbalance([])['coefficient_of_variation'], 0.0)
@@ -6,11 +6,13 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q, Count, Prefetch
 from django.db import transaction
+from django.core.exceptions import ValidationError as DjangoValidationError
 from datetime import datetime, date
 
 from .models import Teacher, TeacherSubject, TeacherAttendance, TeacherSalary
 from classes.models import Class, Section, Subject, ClassSubject, TimeTable
 from schools.models import SchoolSession
+from schools.session_resolver import get_current_session
 from .serializers import (
     TeacherListSerializer,
     TeacherDetailSerializer,
@@ -24,7 +26,10 @@ from .serializers import (
     TeacherSalarySerializer,
 )
 from core.custom_permission import TeachersModulePermission
+from .workload_service import load_imbalance, teacher_workloads
+from classes.timetable_cache import by_day, periods_on, teacher_week
 from core.models import Module, Permission
+from api.query_instrumentation import query_budget
 
 # ========================================
 # TEACHER CRUD APIS
@@ -47,6 +52,7 @@ class TeacherListAPIView(APIView):
     """
     permission_classes = [IsAuthenticated, TeachersModulePermission]
     
+    @query_budget(14)
     def get(self, request):
         # Check if user is admin
         if request.user.user_type not in ['school_admin', 'principal']:
@@ -65,13 +71,21 @@ class TeacherListAPIView(APIView):
         page = int(request.GET.get('page', 1))
         page_size = int(request.GET.get('page_size', 20))
         
-        # Base queryset
+        # Base queryset - the subject and class counts of the page are
+        # prefetched in two queries instead of two per teacher
+        current_session = get_current_session(request)
         queryset = Teacher.objects.select_related('user').prefetch_related(
-            'subjects__subject',
-            'taught_subjects__class_obj',
-            'taught_subjects__section',
-            'classes_as_class_teacher'
-        ).all()
+            Prefetch(
+                'subjects',
+                queryset=TeacherSubject.objects.filter(subject__is_active=True),
+                to_attr='active_subjects'
+            ),
+            Prefetch(
+                'taught_subjects',
+                queryset=ClassSubject.objects.filter(class_obj__is_active=True, session=current_session),
+                to_attr='current_class_subjects'
+            )
+        )
         
         # Apply filters
         if search:
@@ -107,7 +121,7 @@ class TeacherListAPIView(APIView):
         teachers = queryset[start:end]
         
         # Serialize
-        serializer = TeacherListSerializer(teachers, many=True)
+        serializer = TeacherListSerializer(teachers, many=True, context={'request': request})
         
         return Response({
             'success': True,
@@ -509,9 +523,10 @@ class TeacherSubjectsListAPIView(APIView):
     """
     permission_classes = [IsAuthenticated, TeachersModulePermission]
     
+    @query_budget(10)
     def get(self, request, teacher_id):
         try:
-            teacher = Teacher.objects.get(pk=teacher_id)
+            teacher = Teacher.objects.select_related('user').get(pk=teacher_id)
         except Teacher.DoesNotExist:
             return Response({
                 'success': False,
@@ -523,7 +538,7 @@ class TeacherSubjectsListAPIView(APIView):
         queryset = TeacherSubject.objects.filter(
             teacher=teacher,
             subject__is_active=True
-        ).select_related('subject')
+        ).select_related('subject', 'teacher__user')
         
         if academic_year:
             queryset = queryset.filter(academic_year=academic_year)
@@ -532,7 +547,7 @@ class TeacherSubjectsListAPIView(APIView):
         
         return Response({
             'success': True,
-            'count': queryset.count(),
+            'count': len(serializer.data),
             'teacher': {
                 'id': teacher.id,
                 'name': teacher.user.get_full_name(),
@@ -595,6 +610,14 @@ class AssignTimetableToTeacherAPIView(APIView):
                 'data': response_serializer.data
             }, status=status.HTTP_201_CREATED)
         
+        except DjangoValidationError as e:
+            # Teacher, room or class-section double booking (TimeTable.clean)
+            return Response({
+                'success': False,
+                'error': 'Timetable conflict',
+                'details': e.message_dict if hasattr(e, 'message_dict') else e.messages
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         except Exception as e:
             return Response({
                 'success': False,
@@ -655,6 +678,14 @@ class UpdateTimetableAPIView(APIView):
                 'data': TimeTableSerializer(timetable).data
             }, status=status.HTTP_200_OK)
         
+        except DjangoValidationError as e:
+            # Teacher, room or class-section double booking (TimeTable.clean)
+            return Response({
+                'success': False,
+                'error': 'Timetable conflict',
+                'details': e.message_dict if hasattr(e, 'message_dict') else e.messages
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         except Exception as e:
             return Response({
                 'success': False,
@@ -708,7 +739,7 @@ class TeacherTimetableAPIView(APIView):
     
     def get(self, request, teacher_id):
         try:
-            teacher = Teacher.objects.get(pk=teacher_id)
+            teacher = Teacher.objects.select_related('user').get(pk=teacher_id)
         except Teacher.DoesNotExist:
             return Response({
                 'success': False,
@@ -718,36 +749,17 @@ class TeacherTimetableAPIView(APIView):
         day = request.GET.get('day')
         
         # Get current session
-        try:
-            current_session = SchoolSession.objects.get(is_current=True)
-        except SchoolSession.DoesNotExist:
+        current_session = get_current_session(request)
+        if current_session is None:
             return Response({
                 'success': False,
                 'error': 'No active session found'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        queryset = TimeTable.objects.filter(
-            teacher=teacher,
-            session=current_session,
-            is_active=True
-        ).select_related(
-            'class_obj',
-            'section',
-            'subject'
-        ).order_by('day', 'period')
-        
+        # Weekly grid from the timetable projection cache
+        periods = teacher_week(teacher.id, current_session.id)
         if day:
-            queryset = queryset.filter(day=day.upper())
-        
-        serializer = TimeTableSerializer(queryset, many=True)
-        
-        # Group by day
-        timetable_by_day = {}
-        for item in serializer.data:
-            day_name = item['day']
-            if day_name not in timetable_by_day:
-                timetable_by_day[day_name] = []
-            timetable_by_day[day_name].append(item)
+            periods = periods_on(periods, day.upper())
         
         return Response({
             'success': True,
@@ -757,9 +769,9 @@ class TeacherTimetableAPIView(APIView):
                 'employee_id': teacher.employee_id
             },
             'session': current_session.name,
-            'total_periods': queryset.count(),
-            'timetable_by_day': timetable_by_day,
-            'all_periods': serializer.data
+            'total_periods': len(periods),
+            'timetable_by_day': by_day(periods),
+            'all_periods': periods
         }, status=status.HTTP_200_OK)
 
 
@@ -773,7 +785,7 @@ class TeacherTodayClassesAPIView(APIView):
     
     def get(self, request, teacher_id):
         try:
-            teacher = Teacher.objects.get(pk=teacher_id, is_active=True)
+            teacher = Teacher.objects.select_related('user').get(pk=teacher_id, is_active=True)
         except Teacher.DoesNotExist:
             return Response({
                 'success': False,
@@ -785,27 +797,15 @@ class TeacherTodayClassesAPIView(APIView):
         today = days[date.today().weekday()]
         
         # Get current session
-        try:
-            current_session = SchoolSession.objects.get(is_current=True)
-        except SchoolSession.DoesNotExist:
+        current_session = get_current_session(request)
+        if current_session is None:
             return Response({
                 'success': False,
                 'error': 'No active session found'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get today's timetable
-        queryset = TimeTable.objects.filter(
-            teacher=teacher,
-            day=today,
-            session=current_session,
-            is_active=True
-        ).select_related(
-            'class_obj',
-            'section',
-            'subject'
-        ).order_by('period')
-        
-        serializer = TimeTableSerializer(queryset, many=True)
+        # Today's periods from the cached weekly grid
+        classes = periods_on(teacher_week(teacher.id, current_session.id), today)
         
         return Response({
             'success': True,
@@ -816,8 +816,8 @@ class TeacherTodayClassesAPIView(APIView):
             },
             'date': date.today(),
             'day': today,
-            'total_classes': queryset.count(),
-            'classes': serializer.data
+            'total_classes': len(classes),
+            'classes': classes
         }, status=status.HTTP_200_OK)
 
 
@@ -843,41 +843,14 @@ class TeacherWorkloadReportAPIView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
         
         # Get current session
-        try:
-            current_session = SchoolSession.objects.get(is_current=True)
-        except SchoolSession.DoesNotExist:
+        current_session = get_current_session(request)
+        if current_session is None:
             return Response({
                 'success': False,
                 'error': 'No active session found'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Count subjects
-        total_subjects = teacher.subjects.filter(
-            subject__is_active=True
-        ).values('subject').distinct().count()
-        
-        # Count classes
-        total_classes = teacher.taught_subjects.filter(
-            session=current_session
-        ).values('class_obj', 'section').distinct().count()
-        
-        # Count periods per week
-        periods_per_week = TimeTable.objects.filter(
-            teacher=teacher,
-            session=current_session,
-            is_active=True
-        ).count()
-        
-        # Count periods per day
-        periods_by_day = {}
-        for day_code, day_name in TimeTable.DAY_CHOICES:
-            count = TimeTable.objects.filter(
-                teacher=teacher,
-                day=day_code,
-                session=current_session,
-                is_active=True
-            ).count()
-            periods_by_day[day_name] = count
+        workload = teacher_workloads(current_session, teacher_ids=[teacher.id], active_only=False)[0]
         
         return Response({
             'success': True,
@@ -888,10 +861,12 @@ class TeacherWorkloadReportAPIView(APIView):
                 'is_class_teacher': teacher.is_class_teacher
             },
             'workload': {
-                'total_subjects': total_subjects,
-                'total_classes': total_classes,
-                'periods_per_week': periods_per_week,
-                'periods_by_day': periods_by_day
+                'total_subjects': workload['total_subjects'],
+                'total_classes': workload['total_classes'],
+                'periods_per_week': workload['periods_per_week'],
+                'periods_by_day': workload['periods_by_day'],
+                'max_periods_in_a_day': workload['max_periods_in_a_day'],
+                'over_cap': workload['over_cap']
             }
         }, status=status.HTTP_200_OK)
 
@@ -913,50 +888,21 @@ class AllTeachersWorkloadAPIView(APIView):
             }, status=status.HTTP_403_FORBIDDEN)
         
         # Get current session
-        try:
-            current_session = SchoolSession.objects.get(is_current=True)
-        except SchoolSession.DoesNotExist:
+        current_session = get_current_session(request)
+        if current_session is None:
             return Response({
                 'success': False,
                 'error': 'No active session found'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        teachers = Teacher.objects.filter(is_active=True).select_related('user')
-        
-        workload_data = []
-        
-        for teacher in teachers:
-            total_periods = TimeTable.objects.filter(
-                teacher=teacher,
-                session=current_session,
-                is_active=True
-            ).count()
-            
-            total_subjects = teacher.subjects.filter(
-                subject__is_active=True
-            ).values('subject').distinct().count()
-            
-            total_classes = teacher.taught_subjects.filter(
-                session=current_session
-            ).values('class_obj', 'section').distinct().count()
-            
-            workload_data.append({
-                'teacher_id': teacher.id,
-                'employee_id': teacher.employee_id,
-                'name': teacher.user.get_full_name(),
-                'is_class_teacher': teacher.is_class_teacher,
-                'total_subjects': total_subjects,
-                'total_classes': total_classes,
-                'periods_per_week': total_periods
-            })
-        
-        # Sort by periods_per_week descending
-        workload_data.sort(key=lambda x: x['periods_per_week'], reverse=True)
+        # One grouped query for every teacher, heaviest load first
+        workload_data = teacher_workloads(current_session)
         
         return Response({
             'success': True,
             'session': current_session.name,
             'total_teachers': len(workload_data),
+            'imbalance': load_imbalance(workload_data),
             'data': workload_data
         }, status=status.HTTP_200_OK)
 
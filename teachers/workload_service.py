@@ -0,0 +1,100 @@
+# teachers/workload_service.py
+
+import statistics
+
+from django.conf import settings
+from django.db.models import CharField, Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
+
+from classes.models import ClassSubject, TimeTable
+from .models import Teacher
+
+
+def teacher_workloads(session, teacher_ids=None, active_only=True):
+    """
+    Periods per day and week, subjects and class-sections of every teacher
+    for a session, in one query
+
+    Periods are conditional counts over the teacher's TimeTable rows;
+    subjects and class-sections are correlated ClassSubject aggregates,
+    so the cost does not grow with the number of teachers.
+
+    Args:
+        session: SchoolSession to report on
+        teacher_ids: Limit to these teachers (default: all)
+        active_only: Skip inactive teachers
+
+    Returns:
+        list: One dict per teacher, heaviest load first
+    """
+    timetable = Q(timetable__session=session, timetable__is_active=True)
+    day_counts = {
+        f'day_{code}': Count('timetable', filter=timetable & Q(timetable__day=code))
+        for code, _ in TimeTable.DAY_CHOICES
+    }
+
+    assignments = ClassSubject.objects.filter(
+        teacher=OuterRef('pk'), session=session, subject__is_active=True
+    ).order_by().values('teacher')
+    subjects = assignments.annotate(n=Count('subject', distinct=True)).values('n')
+    # A class-wide assignment (no section) counts as one class-section
+    class_sections = assignments.annotate(n=Count(
+        Concat('class_obj_id', Value('-'), Coalesce('section_id', 0), output_field=CharField()),
+        distinct=True,
+    )).values('n')
+
+    teachers = Teacher.objects.select_related('user')
+    if active_only:
+        teachers = teachers.filter(is_active=True)
+    if teacher_ids is not None:
+        teachers = teachers.filter(id__in=teacher_ids)
+
+    teachers = teachers.annotate(
+        periods_per_week=Count('timetable', filter=timetable),
+        total_subjects=Coalesce(Subquery(subjects, output_field=IntegerField()), 0),
+        total_classes=Coalesce(Subquery(class_sections, output_field=IntegerField()), 0),
+        **day_counts,
+    )
+
+    cap = settings.TEACHER_MAX_PERIODS_PER_WEEK
+    rows = []
+    for teacher in teachers:
+        periods_by_day = {name: getattr(teacher, f'day_{code}') for code, name in TimeTable.DAY_CHOICES}
+        rows.append({
+            'teacher_id': teacher.id,
+            'employee_id': teacher.employee_id,
+            'name': teacher.user.get_full_name(),
+            'is_class_teacher': teacher.is_class_teacher,
+            'total_subjects': teacher.total_subjects,
+            'total_classes': teacher.total_classes,
+            'periods_per_week': teacher.periods_per_week,
+            'periods_by_day': periods_by_day,
+            'max_periods_in_a_day': max(periods_by_day.values()),
+            'over_cap': teacher.periods_per_week > cap,
+        })
+    rows.sort(key=lambda row: row['periods_per_week'], reverse=True)
+    return rows
+
+
+def load_imbalance(rows):
+    """
+    Spread of weekly periods across teachers
+
+    Returns:
+        dict: {'mean', 'std_dev', 'coefficient_of_variation', 'min', 'max',
+            'max_periods_per_week', 'over_cap_count', 'over_cap_teachers'}
+    """
+    periods = [row['periods_per_week'] for row in rows]
+    mean = statistics.fmean(periods) if periods else 0.0
+    std_dev = statistics.pstdev(periods) if periods else 0.0
+    over_cap = [row['teacher_id'] for row in rows if row['over_cap']]
+    return {
+        'mean': round(mean, 2),
+        'std_dev': round(std_dev, 2),
+        'coefficient_of_variation': round(std_dev / mean, 3) if mean else 0.0,
+        'min': min(periods, default=0),
+        'max': max(periods, default=0),
+        'max_periods_per_week': settings.TEACHER_MAX_PERIODS_PER_WEEK,
+        'over_cap_count': len(over_cap),
+        'over_cap_teachers': over_cap,
+    }
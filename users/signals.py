@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from schools import user_index
+from .models import User
+
+# User fields that feed the GlobalUserIndex row
+INDEXED_FIELDS = {'email', 'user_type', 'is_active'}
+
+
+@receiver(post_save, sender=User)
+def index_tenant_user(sender, instance: User, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # Saves such as last_login updates leave the directory row unchanged
+    if update_fields and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    school = user_index.current_school()
+    if school is not None:
+        user_index.index_user(instance, school)
+
+
+@receiver(post_delete, sender=User)
+def unindex_tenant_user(sender, instance: User, **kwargs):
+    school = user_index.current_school()
+    if school is not None:
+        user_index.remove_user(instance.id, school)
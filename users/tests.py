@@ -1,3 +1,42 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from schools import user_index
+from schools.models import GlobalUserIndex
+from schools.testing import SchoolTestCase
+
+
+class UserIndexSignalTests(SchoolTestCase):
+
+    def test_tenant_user_is_indexed(self):
+        user = self.make_user('teacher')
+
+        row = GlobalUserIndex.objects.get(school=self.tenant, user_id=user.id)
+        self.assertEqual(row.email, user.email)
+        self.assertEqual(row.user_type, 'teacher')
+        self.assertTrue(user_index.email_exists(user.email.upper()))
+
+    def test_email_change_updates_index(self):
+        user = self.make_user('teacher')
+        user.email = 'Renamed@Test.Example.com'
+        user.save(update_fields=['email'])
+
+        row = GlobalUserIndex.objects.get(school=self.tenant, user_id=user.id)
+        self.assertEqual(row.email, 'renamed@test.example.com')
+
+    def test_unrelated_update_skips_index(self):
+        user = self.make_user('teacher')
+
+        with mock.patch.object(user_index, 'index_user') as index_user:
+            user.first_name = 'Changed'
+            user.save(update_fields=['first_name', 'last_login'])
+            index_user.assert_not_called()
+
+            user.save()
+            index_user.assert_called_once()
+
+    def test_delete_removes_index_row(self):
+        user = self.make_user('teacher')
+        user_id = user.id
+        user.delete()
+
+        self.assertFalse(GlobalUserIndex.objects.filter(school=self.tenant, user_id=user_id).exists())